@@ -0,0 +1,272 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the Factory Hierarchy Builder
+===============================================
+
+Script that compares the vectorized hierarchy builder against the iterrows based group / line / machine JSON
+assembly that the factory layout end points used, on synthetic factories of 10, 100 and 1000 parameters per machine.
+
+The outputs of both implementations are compared before timing, so the script also acts as an equivalence check.
+
+This script requires the following modules be installed in the python environment
+    * logging - To perform logging operations.
+    * numpy - To generate the synthetic factory.
+    * pandas - To hold the parameter rows.
+
+Usage::
+
+    python benchmark_hierarchy_builder.py
+"""
+
+# Standard library imports
+import logging
+import math
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+# Related third party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from machine_monitoring_app.database.hierarchy_builder import build_group_hierarchy, build_line_hierarchy
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+COLUMNS = ['group_name', 'location', 'machine_name', 'parameter_name', 'display_name', 'internal_parameter_name',
+           'time', 'value', 'warn_limit', 'critical_limit', 'condition_name']
+
+LINES = ("Block", "Crank", "Head")
+
+MACHINES_PER_LINE = 20
+
+GROUPS = 17
+
+
+def alphanumeric_key(text):
+    return [int(part) if part.isdigit() else part for part in re.split('([0-9]+)', text)]
+
+
+def synthetic_factory(parameters_per_machine, seed=0):
+    """
+    Function that generates the parameter rows of a synthetic factory
+
+    :param parameters_per_machine: Number of parameters of every machine
+    :type parameters_per_machine: int
+
+    :param seed: Seed of the random generator
+    :type seed: int
+
+    :return: DataFrame of parameter rows, sorted the way the snapshot store returns them
+    :rtype: pd.DataFrame
+    """
+
+    generator = np.random.default_rng(seed)
+    base_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    rows = []
+    for line in LINES:
+        for machine_number in range(MACHINES_PER_LINE):
+            machine_name = f"T_{line[0]}_OP{(machine_number + 1) * 10}"
+            for parameter_number in range(parameters_per_machine):
+                value = float(generator.normal(50, 20))
+                rows.append((f"GROUP_{parameter_number % GROUPS:02d}",
+                             line,
+                             machine_name,
+                             f"Metric{parameter_number}_{parameter_number % 3}_path1_{machine_name}",
+                             "XYZ"[parameter_number % 3],
+                             f"A{parameter_number % 3}-P1",
+                             base_time + timedelta(seconds=int(generator.integers(0, 86400))),
+                             math.nan if generator.random() < 0.02 else value,
+                             70.0,
+                             90.0,
+                             "CRITICAL" if value >= 90 else "WARNING" if value >= 70 else "OK"))
+
+    rows.sort(key=lambda row: (row[0], row[1], alphanumeric_key(row[2]), row[3]))
+
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def legacy_group_hierarchy(result_df):
+    """
+    The iterrows based group / line / machine assembly (as in get_real_time_parameters_data)
+    """
+
+    json_list = []
+
+    for group_name, group_data in result_df.groupby('group_name'):
+        group_json = {'group_name': group_name, 'group_details': [], 'group_state': 'OK',
+                      'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
+
+        for location, location_data in group_data.groupby('location'):
+            location_json = {'line_name': location, 'machines': [], 'line_state': 'OK',
+                             'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
+
+            for machine_name, machine_data in location_data.groupby('machine_name', sort=False):
+                machine_json = {'machine_name': machine_name, 'parameters': [], 'machine_state': 'OK'}
+                machine_count = {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}
+
+                for _, row in machine_data.iterrows():
+                    warning_limit = row['warn_limit'] if not pd.isna(row['warn_limit']) else None
+                    critical_limit = row['critical_limit'] if not pd.isna(row['critical_limit']) else None
+                    parameter_value = None if math.isnan(row['value']) else row['value']
+
+                    machine_json['parameters'].append({
+                        'actual_parameter_name': row['parameter_name'],
+                        'display_name': row['display_name'],
+                        'internal_parameter_name': row['internal_parameter_name'],
+                        'latest_update_time': int(row['time'].timestamp() * 1000),
+                        'parameter_value': parameter_value,
+                        'parameter_state': row['condition_name'],
+                        'warning_limit': warning_limit,
+                        'critical_limit': critical_limit
+                    })
+
+                    if row['condition_name'] in machine_count:
+                        machine_count[row['condition_name']] += 1
+
+                if machine_count['CRITICAL'] > 0:
+                    machine_json['machine_state'] = 'CRITICAL'
+                    location_json['count']['CRITICAL'] += 1
+                elif machine_count['WARNING'] > 0:
+                    machine_json['machine_state'] = 'WARNING'
+                    location_json['count']['WARNING'] += 1
+                else:
+                    location_json['count']['OK'] += 1
+
+                location_json['machines'].append(machine_json)
+
+            if location_json['count']['CRITICAL'] > 0:
+                location_json['line_state'] = 'CRITICAL'
+            elif location_json['count']['WARNING'] > 0:
+                location_json['line_state'] = 'WARNING'
+
+            for state in ('OK', 'WARNING', 'CRITICAL'):
+                group_json['count'][state] += location_json['count'][state]
+
+            group_json['group_details'].append(location_json)
+
+        if group_json['count']['CRITICAL'] > 0:
+            group_json['group_state'] = 'CRITICAL'
+        elif group_json['count']['WARNING'] > 0:
+            group_json['group_state'] = 'WARNING'
+
+        json_list.append(group_json)
+
+    return json_list
+
+
+def legacy_line_hierarchy(result_df):
+    """
+    The iterrows based line / machine assembly (as in get_real_time_layout_data)
+    """
+
+    result_df = result_df.sort_values(by='machine_name', key=lambda col: col.map(alphanumeric_key), kind='stable')
+
+    json_list = []
+
+    for location, location_data in result_df.groupby('location'):
+        location_json = {'line_name': location, 'machines': [], 'line_state': 'OK',
+                         'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
+
+        for machine_name, machine_data in location_data.groupby('machine_name', sort=False):
+            machine_json = {'machine_name': machine_name, 'parameters': [], 'machine_state': 'OK',
+                            'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
+
+            for _, row in machine_data.iterrows():
+                warning_limit = row['warn_limit'] if not pd.isna(row['warn_limit']) else None
+                critical_limit = row['critical_limit'] if not pd.isna(row['critical_limit']) else None
+                parameter_value = None if math.isnan(row['value']) else row['value']
+
+                machine_json['parameters'].append({
+                    'actual_parameter_name': row['parameter_name'],
+                    'display_name': row['display_name'],
+                    'internal_parameter_name': row['internal_parameter_name'],
+                    'latest_update_time': int(row['time'].timestamp() * 1000),
+                    'parameter_value': parameter_value,
+                    'parameter_state': row['condition_name'],
+                    'warning_limit': warning_limit,
+                    'critical_limit': critical_limit
+                })
+
+                if row['condition_name'] in machine_json['count']:
+                    machine_json['count'][row['condition_name']] += 1
+
+            if machine_json['count']['CRITICAL'] > 0:
+                machine_json['machine_state'] = 'CRITICAL'
+            elif machine_json['count']['WARNING'] > 0:
+                machine_json['machine_state'] = 'WARNING'
+
+            location_json['count'][machine_json['machine_state']] += 1
+            location_json['machines'].append(machine_json)
+
+        if location_json['count']['CRITICAL'] > 0:
+            location_json['line_state'] = 'CRITICAL'
+        elif location_json['count']['WARNING'] > 0:
+            location_json['line_state'] = 'WARNING'
+
+        json_list.append(location_json)
+
+    return json_list
+
+
+def best_time(function, frame, repeats):
+    """
+    Function that returns the best wall time of the given number of runs, in milliseconds
+    """
+
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function(frame)
+        timings.append((time.perf_counter() - start_time) * 1000)
+
+    return min(timings)
+
+
+def main():
+    """
+    Main Function
+    ====================
+
+    Main function to run the benchmark on the synthetic factories and print the results
+
+    :return: Nothing
+    :rtype: None
+
+    """
+
+    print(f"{'parameters/machine':>20} {'rows':>8} {'layout':>8} {'legacy ms':>12} {'vectorized ms':>15} "
+          f"{'speed up':>10}")
+
+    for parameters_per_machine in (10, 100, 1000):
+        frame = synthetic_factory(parameters_per_machine)
+        repeats = 1 if parameters_per_machine == 1000 else 3
+
+        # The line layout is built from the rows in line / machine (natural order) / parameter order
+        line_order = sorted(range(len(frame)), key=lambda row: (frame['location'].iat[row],
+                                                                alphanumeric_key(frame['machine_name'].iat[row]),
+                                                                frame['parameter_name'].iat[row]))
+        line_frame = frame.iloc[line_order].reset_index(drop=True)
+
+        cases = (("groups", legacy_group_hierarchy, build_group_hierarchy, frame),
+                 ("lines", legacy_line_hierarchy, build_line_hierarchy, line_frame))
+
+        for layout, legacy, vectorized, case_frame in cases:
+            if legacy(case_frame) != vectorized(case_frame):
+                raise AssertionError(f"Vectorized {layout} hierarchy differs from the legacy output")
+
+            legacy_ms = best_time(legacy, case_frame, repeats)
+            vectorized_ms = best_time(vectorized, case_frame, repeats)
+
+            print(f"{parameters_per_machine:>20} {len(case_frame):>8} {layout:>8} {legacy_ms:>12.1f} "
+                  f"{vectorized_ms:>15.1f} {legacy_ms / vectorized_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+
+    main()
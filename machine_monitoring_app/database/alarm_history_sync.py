@@ -0,0 +1,265 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+ALARM HISTORY MIRROR
+================================
+
+Module that copies the alarms of the MTLINKi Alarm_History collection into the ``alarm_history`` hypertable of
+timescaledb, so the alarm analytics of the plant (pareto of the alarms of all the machines) are one indexed SQL query
+instead of a scan of Alarm_History per machine.
+
+The hypertable is partitioned on the start of the alarm and keyed by (machine_name, alarm_number, start_time), the
+line of the machine is stored with the alarm for the line queries. The alarms are copied in enddate order from a
+watermark persisted in the ``alarm_history_sync_status`` table, a batch and the new watermark being written in the
+same transaction. Every run reads again the alarms that ended in the ``ALARM_SYNC_REWIND_SECONDS`` before the
+watermark (alarms written late), the rows being upserted a re-read alarm is not duplicated.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * datetime - To convert the alarm times.
+
+    Related 3rd Party Library
+    =============================
+    * pony - To run the sql statements on the timescaledb connection.
+    * psycopg2 - To insert the batches of alarms.
+
+This script contains the following function
+    * ensure_alarm_history_table - Function that creates the hypertable, its indexes and the status table
+    * get_alarm_sync_watermark - Function that returns the persisted watermark
+    * get_alarm_sync_status - Function that returns the watermark and the number of copied alarms
+    * alarm_history_rows - Function that converts the alarms to the rows of the hypertable
+    * sync_alarm_history - Function that copies the new alarms to the hypertable
+"""
+
+# Standard library imports
+import logging
+from datetime import timedelta, timezone
+
+# Related third party imports
+from pony.orm import db_session
+from psycopg2.extras import execute_values
+
+# Local application/library specific imports
+from machine_monitoring_app.database.db_utils import PONY_DATABASE
+from machine_monitoring_app.database.pony_models import schema_name
+from machine_monitoring_app.database.mongodb_client import get_mongo_collection
+from machine_monitoring_app.database.mongo_db_utils import get_alarm_history_sync_template
+from machine_monitoring_app.database.disconnection_registry import machine_line
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+SYNC_SOURCE = "Alarm_History"
+
+# Number of alarms copied per transaction, and maximum number of batches per run
+ALARM_SYNC_BATCH_SIZE = 5000
+ALARM_SYNC_BATCHES_PER_RUN = 20
+
+# Seconds re-read before the watermark on every run, for the alarms written late (the machines' clocks differ)
+ALARM_SYNC_REWIND_SECONDS = 300
+
+ALARM_HISTORY_TABLE_STATEMENTS = (
+    f"""CREATE TABLE IF NOT EXISTS {schema_name}.alarm_history (
+        machine_name TEXT NOT NULL,
+        alarm_number TEXT NOT NULL,
+        start_time TIMESTAMPTZ NOT NULL,
+        end_time TIMESTAMPTZ,
+        line TEXT,
+        alarm_type TEXT,
+        message TEXT,
+        timespan DOUBLE PRECISION,
+        PRIMARY KEY (machine_name, alarm_number, start_time)
+    )""",
+    f"SELECT create_hypertable('{schema_name}.alarm_history', 'start_time', if_not_exists => TRUE)",
+    f"""CREATE INDEX IF NOT EXISTS alarm_history_line_start_time_idx
+        ON {schema_name}.alarm_history (line, start_time DESC)""",
+    f"""CREATE INDEX IF NOT EXISTS alarm_history_machine_start_time_idx
+        ON {schema_name}.alarm_history (machine_name, start_time DESC)""",
+    f"""CREATE TABLE IF NOT EXISTS {schema_name}.alarm_history_sync_status (
+        source TEXT PRIMARY KEY,
+        watermark TIMESTAMPTZ NOT NULL,
+        copied_alarms BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )""",
+)
+
+UPSERT_ALARMS_STATEMENT = f"""INSERT INTO {schema_name}.alarm_history
+    (machine_name, alarm_number, start_time, end_time, line, alarm_type, message, timespan) VALUES %s
+    ON CONFLICT (machine_name, alarm_number, start_time) DO UPDATE
+    SET end_time = EXCLUDED.end_time, line = EXCLUDED.line, alarm_type = EXCLUDED.alarm_type,
+        message = EXCLUDED.message, timespan = EXCLUDED.timespan"""
+
+UPDATE_WATERMARK_STATEMENT = f"""INSERT INTO {schema_name}.alarm_history_sync_status
+    (source, watermark, copied_alarms, updated_at) VALUES (%s, %s, %s, now())
+    ON CONFLICT (source) DO UPDATE
+    SET watermark = EXCLUDED.watermark,
+        copied_alarms = {schema_name}.alarm_history_sync_status.copied_alarms + EXCLUDED.copied_alarms,
+        updated_at = now()"""
+
+
+def _as_utc(value):
+    """
+    Returns the datetime as an aware UTC datetime (MTLINKi stores naive UTC datetimes)
+    """
+
+    if value is None:
+        return None
+
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+@db_session
+def ensure_alarm_history_table():
+    """
+    Creates the alarm_history hypertable, its line / machine indexes and the status table when they do not exist
+
+    :return: Nothing
+    :rtype: None
+    """
+
+    for statement in ALARM_HISTORY_TABLE_STATEMENTS:
+        PONY_DATABASE.execute(statement)
+
+
+@db_session
+def get_alarm_sync_watermark():
+    """
+    Returns the enddate of the last copied alarm
+
+    :return: The watermark, None before the first copy
+    :rtype: datetime | None
+    """
+
+    rows = PONY_DATABASE.select(f"SELECT watermark FROM {schema_name}.alarm_history_sync_status "
+                                f"WHERE source = $SYNC_SOURCE", {"SYNC_SOURCE": SYNC_SOURCE})
+
+    return rows[0] if rows else None
+
+
+@db_session
+def get_alarm_sync_status():
+    """
+    Returns the watermark, the number of copied alarms and the time of the last copy
+
+    :return: The status of the copy, empty before the first copy
+    :rtype: dict
+    """
+
+    rows = PONY_DATABASE.select(f"SELECT watermark, copied_alarms, updated_at "
+                                f"FROM {schema_name}.alarm_history_sync_status WHERE source = $SYNC_SOURCE",
+                                {"SYNC_SOURCE": SYNC_SOURCE})
+
+    if not rows:
+        return {}
+
+    watermark, copied_alarms, updated_at = rows[0]
+
+    return {"source": SYNC_SOURCE, "watermark": watermark, "copied_alarms": copied_alarms, "updated_at": updated_at}
+
+
+def alarm_history_rows(alarms):
+    """
+    Converts the alarms of Alarm_History to the rows of the hypertable, the alarm number is the number of the alarm
+    (the message when the alarm has no number). Duplicated keys in the batch are kept once (the last one).
+
+    :param alarms: The alarms (L1Name, number, type, message, timespan, updatedate, enddate)
+    :type alarms: list[dict]
+
+    :return: The rows (machine_name, alarm_number, start_time, end_time, line, alarm_type, message, timespan)
+    :rtype: list[tuple]
+    """
+
+    rows = {}
+
+    for alarm in alarms:
+        if alarm.get("L1Name") is None or alarm.get("updatedate") is None:
+            continue
+
+        alarm_number = alarm.get("number")
+        alarm_number = str(alarm_number) if alarm_number is not None else str(alarm.get("message") or "")
+
+        start_time = _as_utc(alarm["updatedate"])
+        alarm_type = alarm.get("type")
+
+        rows[(alarm["L1Name"], alarm_number, start_time)] = (
+            alarm["L1Name"], alarm_number, start_time, _as_utc(alarm.get("enddate")), machine_line(alarm["L1Name"]),
+            str(alarm_type) if alarm_type is not None else None, alarm.get("message"), alarm.get("timespan"))
+
+    return list(rows.values())
+
+
+@db_session
+def _copy_batch(rows, watermark):
+    """
+    Upserts the rows and persists the watermark in one transaction
+    """
+
+    connection = PONY_DATABASE.get_connection()
+
+    with connection.cursor() as cursor:
+        if rows:
+            execute_values(cursor, UPSERT_ALARMS_STATEMENT, rows, page_size=1000)
+
+        cursor.execute(UPDATE_WATERMARK_STATEMENT, (SYNC_SOURCE, watermark, len(rows)))
+
+    connection.commit()
+
+
+def sync_alarm_history(batch_size=ALARM_SYNC_BATCH_SIZE, max_batches=ALARM_SYNC_BATCHES_PER_RUN):
+    """
+    Copies the alarms that ended since the watermark to the hypertable, batch by batch
+
+    :param batch_size: The number of alarms per batch (and transaction)
+    :type batch_size: int
+
+    :param max_batches: The maximum number of batches of this run
+    :type max_batches: int
+
+    :return: The number of copied alarms
+    :rtype: int
+    """
+
+    collection = get_mongo_collection(collection="Alarm_History")
+    persisted_watermark = _as_utc(get_alarm_sync_watermark())
+    watermark = None
+    inclusive = True
+
+    if persisted_watermark is not None:
+        watermark = persisted_watermark - timedelta(seconds=ALARM_SYNC_REWIND_SECONDS)
+
+    copied = 0
+
+    for _ in range(max_batches):
+        alarms = list(collection.aggregate(get_alarm_history_sync_template(ended_since=watermark, inclusive=inclusive,
+                                                                           limit=batch_size)))
+
+        if not alarms:
+            break
+
+        new_watermark = _as_utc(alarms[-1]["enddate"])
+        rows = alarm_history_rows(alarms)
+
+        # The re-read alarms never move the persisted watermark back
+        persisted_watermark = max(persisted_watermark or new_watermark, new_watermark)
+
+        _copy_batch(rows, persisted_watermark)
+        copied += len(rows)
+
+        if len(alarms) < batch_size:
+            break
+
+        # A full batch of alarms ending at the same time would be read again forever
+        inclusive = watermark is None or new_watermark != _as_utc(watermark)
+
+        if not inclusive:
+            LOGGER.warning(f"More than {batch_size} alarms end at {new_watermark}, skipping past them")
+
+        watermark = new_watermark
+
+    LOGGER.info(f"Copied {copied} alarms to timescaledb")
+
+    return copied
@@ -0,0 +1,201 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+CONDITION EVALUATION KERNEL
+================================
+
+Module that classifies values against their warning / critical limits with array operations. It is the single place
+where the limit checks of the application are implemented (machine parameters, spare part counts, parameter
+comparisons).
+
+The kernel takes an array of values, per row (or scalar) limits, the parameter type and optionally the timestamps of
+the values, and returns an array of condition codes (the codes of the hierarchy builder):
+
+    * decreasing - CRITICAL if value <= critical limit, WARNING if value <= warning limit
+    * increasing - CRITICAL if value >= critical limit, WARNING if value >= warning limit
+    * bool - CRITICAL if the value is true (1), OK otherwise
+    * no / unknown type - OK, the limits are not evaluated
+
+With ``inclusive=False`` the limits themselves are still OK / WARNING (the spare part counts are abnormal only once
+they exceed the limit). Null values, and values older than ``max_age_seconds`` when given, are DISCONNECTED.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * time - To get the current time for the age of the values.
+
+    Related 3rd Party Library
+    =============================
+    * numpy - To perform the array operations.
+    * pandas - To convert the values and timestamps.
+
+This script contains the following function
+    * evaluate_conditions - Function that returns the condition codes of the given values
+    * condition_names - Function that returns the condition names of the given condition codes
+"""
+
+# Standard library imports
+import logging
+import time
+
+# Related third party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from machine_monitoring_app.database.hierarchy_builder import STATE_NAMES, OK, WARNING, CRITICAL, DISCONNECTED
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+PARAMETER_TYPES = ("decreasing", "increasing", "bool")
+
+_STATE_NAME_ARRAY = np.asarray(STATE_NAMES, dtype=object)
+
+
+def _as_float_array(values):
+    """
+    Converts the given values to a float array, anything that is not a number (None, strings) becomes NaN
+
+    :param values: scalar, list, numpy array or pandas series
+    :type values: Any
+
+    :return: The float array
+    :rtype: np.ndarray
+    """
+
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(np.asarray(values, dtype=object).ravel()), errors="coerce") \
+            .to_numpy(dtype=np.float64, na_value=np.nan).reshape(np.shape(values))
+
+
+def _as_epoch_seconds(timestamps):
+    """
+    Converts the given timestamps (epoch seconds or datetimes, naive datetimes are taken as UTC) to epoch seconds,
+    missing timestamps become NaN
+
+    :param timestamps: list, numpy array or pandas series of timestamps
+    :type timestamps: Any
+
+    :return: The epoch seconds
+    :rtype: np.ndarray
+    """
+
+    timestamps = np.asarray(timestamps)
+
+    if timestamps.dtype.kind in "iuf":
+        return timestamps.astype(np.float64)
+
+    timestamps = pd.to_datetime(pd.Series(timestamps.ravel()), utc=True, errors="coerce")
+    seconds = timestamps.to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+    seconds[timestamps.isna().to_numpy()] = np.nan
+
+    return seconds
+
+
+def _limit_codes(values, warning_limits, critical_limits, parameter_type, inclusive):
+    """
+    Returns the OK / WARNING / CRITICAL codes of the values for one parameter type
+    """
+
+    if parameter_type == "decreasing":
+        if inclusive:
+            critical, warning = values <= critical_limits, values <= warning_limits
+        else:
+            critical, warning = values < critical_limits, values < warning_limits
+
+    elif parameter_type == "increasing":
+        if inclusive:
+            critical, warning = values >= critical_limits, values >= warning_limits
+        else:
+            critical, warning = values > critical_limits, values > warning_limits
+
+    elif parameter_type == "bool":
+        critical, warning = values == 1, np.zeros(values.shape, dtype=bool)
+
+    else:
+        return np.full(values.shape, OK, dtype=np.int8)
+
+    return np.where(critical, CRITICAL, np.where(warning, WARNING, OK)).astype(np.int8)
+
+
+def evaluate_conditions(values, warning_limits, critical_limits, parameter_type, timestamps=None, now=None,
+                        max_age_seconds=None, inclusive=True):
+    """
+    Returns the condition codes (OK, WARNING, CRITICAL, DISCONNECTED) of the given values
+
+    :param values: The values
+    :type values: list | np.ndarray | pd.Series
+
+    :param warning_limits: The warning limit of every value (or one for all)
+    :type warning_limits: float | list | np.ndarray | pd.Series
+
+    :param critical_limits: The critical limit of every value (or one for all)
+    :type critical_limits: float | list | np.ndarray | pd.Series
+
+    :param parameter_type: The parameter type of all the values ("decreasing", "increasing", "bool") or of every value
+    :type parameter_type: str | None | list | np.ndarray | pd.Series
+
+    :param timestamps: The time of every value (epoch seconds or datetimes), only used with max_age_seconds
+    :type timestamps: list | np.ndarray | pd.Series | None
+
+    :param now: The current time in epoch seconds (defaults to now)
+    :type now: float | None
+
+    :param max_age_seconds: The age after which a value is DISCONNECTED, None to not check the age
+    :type max_age_seconds: float | None
+
+    :param inclusive: If reaching a limit already counts as crossing it
+    :type inclusive: bool
+
+    :return: The condition codes
+    :rtype: np.ndarray
+    """
+
+    values = _as_float_array(values)
+    warning_limits = np.broadcast_to(_as_float_array(warning_limits), values.shape)
+    critical_limits = np.broadcast_to(_as_float_array(critical_limits), values.shape)
+
+    with np.errstate(invalid="ignore"):
+        if parameter_type is None or isinstance(parameter_type, str):
+            codes = _limit_codes(values, warning_limits, critical_limits, parameter_type, inclusive)
+
+        else:
+            parameter_types = np.asarray(parameter_type, dtype=object)
+            codes = np.full(values.shape, OK, dtype=np.int8)
+
+            for current_type in PARAMETER_TYPES:
+                mask = parameter_types == current_type
+
+                if mask.any():
+                    codes[mask] = _limit_codes(values[mask], warning_limits[mask], critical_limits[mask],
+                                               current_type, inclusive)
+
+        disconnected = np.isnan(values)
+
+        if max_age_seconds is not None and timestamps is not None:
+            ages = (time.time() if now is None else now) - _as_epoch_seconds(timestamps)
+            disconnected |= ~(ages <= max_age_seconds)
+
+    codes[disconnected] = DISCONNECTED
+
+    return codes
+
+
+def condition_names(codes):
+    """
+    Returns the condition names ("OK", "WARNING", "CRITICAL", "DISCONNECTED") of the given condition codes
+
+    :param codes: The condition codes
+    :type codes: np.ndarray
+
+    :return: The condition names
+    :rtype: np.ndarray
+    """
+
+    return _STATE_NAME_ARRAY[codes]
@@ -30,12 +30,14 @@ import pytz
 from typing import Optional, List,Dict
 import calendar
 import math
+import threading
 import json
 
 # Related third party imports
 from pony.orm import db_session, desc, commit, count as pony_count, select
 from pony.orm.core import ObjectNotFound
 import pandas as pd
+from bson import ObjectId
 from fastapi import HTTPException
 import numpy as np
 
@@ -43,7 +45,8 @@ import numpy as np
 from machine_monitoring_app.database.orm import update_operation
 from machine_monitoring_app.database.pony_models import Machine, ParameterGroup, MachineParameter, \
     RealTimeParameter, User as UserPony, SparePart, EmailUser, MachinePartCount, User, RealTimeParameterActive, \
-    MachineProductionTimeline, MachinePartCount, CorrectiveActivity, ActivityHistory, ParameterCondition, UpdateLog,UserAccessLog
+    MachineProductionTimeline, MachinePartCount, CorrectiveActivity, ActivityHistory, ParameterCondition, UpdateLog,UserAccessLog, \
+    schema_name as TIMESCALE_SCHEMA_NAME
 
 from machine_monitoring_app.exception_handling.custom_exceptions import NoParameterGroupError, \
     GetParamGroupDBError, GetAllParameterDBError, GetMachineTimelineError
@@ -64,19 +67,43 @@ from machine_monitoring_app.database.mongo_db_utils import (get_exceed_group_tem
                                                             get_real_time_data_mtlinki,
                                                             get_value_before_requested_data_mtlinki,
                                                             get_recent_active_pool_value,
-                                                            get_machine_states_mtlinki)
+                                                            get_machine_states_mtlinki,
+                                                            get_disconnected_machines_template,
+                                                            get_disconnection_history_template,
+                                                            get_disconnection_history_page_template,
+                                                            get_alarm_summary_facet_template)
 
 from machine_monitoring_app.models.request_models import SparePartUpdateList
 
 from machine_monitoring_app.models.response_models import SparePart as PydanticSparePart, UpdateLogResponse,DisconnectionHistoryItem
 from machine_monitoring_app.database.db_utils import get_all_status_templates, get_all_recent_time_template, \
-    initialize_pony
+    initialize_pony, get_alarm_pareto_template
 from machine_monitoring_app.database.db_utils import PONY_DATABASE
+from machine_monitoring_app.database.snapshot_store import get_snapshot_store, SNAPSHOT_COLUMNS, natural_machine_key
+from machine_monitoring_app.database.signal_registry import get_signal_registry
+from machine_monitoring_app.database.mtlinki_reader import read_active_signals, merge_active_signals
+from machine_monitoring_app.database.hierarchy_builder import build_group_hierarchy, build_single_group, \
+    build_line_hierarchy, normalize_layout_options, WARNING, CRITICAL
+from machine_monitoring_app.database.condition_kernel import evaluate_conditions, condition_names
+from machine_monitoring_app.database.state_duration_engine import get_state_duration_matrix, state_summary_slots, \
+    get_state_interval_index, STATE_SIGNALS
+from machine_monitoring_app.database.interval_index import get_alarm_interval_index
+from machine_monitoring_app.database.state_rollup_store import get_state_day_matrix
+from machine_monitoring_app.database.mtlinki_repository import get_mtlinki_repository
+from machine_monitoring_app.database.disconnection_registry import machine_line, DISCONNECTION_LINES
+from machine_monitoring_app.utils.downsampling import downsample_timeline
+from machine_monitoring_app.database.timescale_reader import fetch_realtime_columns
+from machine_monitoring_app.database.timeline_tiles import get_tile_cache
+from machine_monitoring_app.database.cycle_index import get_recent_cycles, get_cycle_values, kruskal_wallis, \
+    DYNAMIC_PARAMETER_GROUP_ID
 
 __author__ = "smt18m005@iiitdm.ac.in"
 
 LOGGER = logging.getLogger(__name__)
 
+# Maximum number of cycles returned for a time range of a dynamic parameter
+DYNAMIC_CYCLES_LIMIT = 500
+
 
 @db_session
 def get_schema_name():
@@ -93,151 +120,66 @@ def alphanumeric_key(s):
     return [int(text) if text.isdigit() else text for text in re.split('([0-9]+)', s)]
 
 @db_session(optimistic=False)
-def get_real_time_parameters_data():
+def get_real_time_parameters_data(depth="parameter", fields=None, only_abnormal=False):
     """
     Retrieves real-time parameter data for a specific set of conditions.
 
     Returns a nested JSON structure containing information about parameter groups,
-    locations, machines, and their respective parameters.
+    locations, machines, and their respective parameters. The response is served from the
+    in-memory factory snapshot and rebuilt only when the snapshot version changes.
+
+    :param depth: The deepest level to be built ("group", "line", "machine" or "parameter")
+    :type depth: str
+
+    :param fields: The parameter fields to be included (all if not given)
+    :type fields: str | list[str] | None
+
+    :param only_abnormal: Whether the machines and parameters in the OK state are left out
+    :type only_abnormal: bool
 
     :return: List of JSON objects representing parameter group data
     :rtype: dict
     """
 
-    # Query the database for relevant data
-    result = select(
-        (pg.group_name,
-         m.location,
-         m.name,
-         mp.name,
-         mp.display_name,
-         mp.internal_parameter_name,
-         rtpa.time,
-         rtpa.value,
-         mp.warning_limit,
-         mp.critical_limit,
-         rtpa.parameter_condition.name)
-
-        for rtpa in RealTimeParameterActive
-        for mp in MachineParameter
-        for pg in ParameterGroup
-        for m in Machine
-        if (
-                rtpa.machine_parameter == mp and
-                mp.parameter_group == pg and
-                mp.machine == m
-
-        )
-    ).order_by(lambda _group_name, machine_location, _machine_name,
-                      parameter_name, display_name, internal_parameter_name, timestamp, value, warn_limit,
-                      _critical_limit, condition_name: (_group_name, machine_location, _machine_name, parameter_name))
+    depth, fields = normalize_layout_options(depth, fields)
 
-    # Convert the result to a pandas DataFrame
-    columns = ['group_name', 'location', 'machine_name', 'parameter_name',
-               'display_name', 'internal_parameter_name', 'time', 'value', 'warn_limit',
-               'critical_limit', 'condition_name']
-    result_df = pd.DataFrame(result, columns=columns)
-    result_df = result_df.sort_values(by='machine_name', key=lambda col: col.map(alphanumeric_key))
-
-    # result_df = result_df.sort_values(
-    #     by=['group_name', 'location', 'machine_name'],
-    #     key=lambda x: x.map(lambda y: custom_sort_key(y) if x.name == 'machine_name' else y)
-    # )
-    groups_overview = []
-
-    # Create a nested JSON structure
-    json_list = []
-
-    # Iterate over unique parameter groups
-    for group_name, group_data in result_df.groupby('group_name'):
-        group_json = {'group_name': group_name, 'group_details': [], 'group_state': 'OK',
-                      'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
-
-        # Iterate over unique locations within the parameter group
-        for location, location_data in group_data.groupby('location'):
-            location_json = {'line_name': location, 'machines': [], 'line_state': 'OK',
-                             'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
-            # Iterate over unique machines within the location
-            for machine_name, machine_data in location_data.groupby('machine_name', sort=False):
-                machine_json = {'machine_name': machine_name, 'parameters': [], 'machine_state': 'OK'}
+    return get_snapshot_store().memoize(("real_time_parameters_data", depth, fields, only_abnormal),
+                                        lambda: _build_real_time_parameters_data(depth, fields, only_abnormal))
 
-                # Initialize counts for the machine
-                machine_count = {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}
 
-                # Iterate over parameter data for the machine
-                for _, row in machine_data.iterrows():
-                    # Replace NaN values with None
-                    warning_limit = row['warn_limit'] if not pd.isna(row['warn_limit']) else None
-                    critical_limit = row['critical_limit'] if not pd.isna(row['critical_limit']) else None
-                    parameter_value = None if math.isnan(row['value']) else row['value']
-
-                    parameter_json = {
-                        'actual_parameter_name': row['parameter_name'],
-                        'display_name': row['display_name'],
-                        'internal_parameter_name': row['internal_parameter_name'],
-                        'latest_update_time': int(row['time'].timestamp() * 1000),
-                        'parameter_value': parameter_value,
-                        'parameter_state': row['condition_name'],
-                        'warning_limit': warning_limit,
-                        'critical_limit': critical_limit
-                    }
-
-                    machine_json['parameters'].append(parameter_json)
-
-                    # Update counts based on parameter state
-                    if row['condition_name'] == 'OK':
-                        machine_count['OK'] += 1
-                    elif row['condition_name'] == 'WARNING':
-                        machine_count['WARNING'] += 1
-                    elif row['condition_name'] == 'CRITICAL':
-                        machine_count['CRITICAL'] += 1
-
-                # Determine machine state and line count based on machine's counts
-                if machine_count['CRITICAL'] > 0:
-                    machine_json['machine_state'] = 'CRITICAL'
-
-                    # Increment the location's critical count also
-                    location_json['count']['CRITICAL'] += 1
-                elif machine_count['WARNING'] > 0:
-                    machine_json['machine_state'] = 'WARNING'
-
-                    # Increment the location's warning count also
-                    location_json['count']['WARNING'] += 1
-                else:
-                    # Increment the location's ok count also
-                    location_json['count']['OK'] += 1
+def _build_real_time_parameters_data(depth, fields, only_abnormal):
+    """
+    Builds the response of get_real_time_parameters_data from the factory snapshot
 
-                location_json['machines'].append(machine_json)
+    :return: List of JSON objects representing parameter group data
+    :rtype: dict
+    """
 
-            # Determine line state based on counts
-            if location_json['count']['CRITICAL'] > 0:
-                location_json['line_state'] = 'CRITICAL'
-            elif location_json['count']['WARNING'] > 0:
-                location_json['line_state'] = 'WARNING'
+    # The snapshot rows are already sorted by group, location, machine (natural order) and parameter name
+    result_df = pd.DataFrame(get_snapshot_store().get_rows(), columns=SNAPSHOT_COLUMNS)
 
-            # Update counts for the line state
-            group_json['count']['OK'] += location_json['count']['OK']
-            group_json['count']['WARNING'] += location_json['count']['WARNING']
-            group_json['count']['CRITICAL'] += location_json['count']['CRITICAL']
+    # Build the nested group / line / machine structure with array operations, only down to the requested depth
+    json_list = build_group_hierarchy(result_df, depth=depth, fields=fields, only_abnormal=only_abnormal)
 
-            group_json['group_details'].append(location_json)
+    groups_overview = [{"item_name": group_json['group_name'], "item_state": group_json['group_state']}
+                       for group_json in json_list]
 
-        # Determine group state based on counts
-        if group_json['count']['CRITICAL'] > 0:
-            group_json['group_state'] = 'CRITICAL'
-        elif group_json['count']['WARNING'] > 0:
-            group_json['group_state'] = 'WARNING'
+    response = {"group_names": groups_overview,
+                "all_group_details": json_list}
+    return response
 
-        group_info = {"item_name": group_name,
-                      "item_state": group_json['group_state']}
 
-        groups_overview.append(group_info)
+def get_parameter_types():
+    """
+    Returns the parameter type of every machine parameter, the type of its parameter group when it has none
 
-        json_list.append(group_json)
+    :return: Mapping of machine parameter id to parameter type
+    :rtype: dict[int, str]
+    """
 
-    response = {"group_names": groups_overview,
-                "all_group_details": json_list}
-    return response
+    return {parameter_id: parameter_type or group_type
+            for parameter_id, parameter_type, group_type in
+            select((mp.id, mp.parameter_type, mp.parameter_group.parameter_type) for mp in MachineParameter)[:]}
 
 
 # TODO : CHANGES TO THE LAYOUT UISNG THE MTLINKI
@@ -256,179 +198,24 @@ def get_real_time_parameters_data_mtlinki():
     """
 
     # Get the PostgreSQL data
-    machines = select(m.name for m in Machine)
-    parameters = select(mp.name for mp in MachineParameter)
-    mongodb_q = select(mpg.mongodb_query for mpg in ParameterGroup)
-
-    # Get the MongoDB collection
-    collection = get_mongo_collection("L1Signal_Pool_Active")
-
-    # Initialize an empty list to store processed data
-    processed_data = []
-
-    # Loop through each machine name from PostgreSQL
-    for machine_name in machines:
-        # Loop through each parameter using regex pattern from PostgreSQL
-        for mongodb_query in mongodb_q:
-            # Define the MongoDB query regex pattern
-            regex_pattern = re.compile(f".*{mongodb_query}.*")
-
-            # MongoDB aggregation pipeline
-            pipeline = [
-                {
-                    '$match': {
-                        'L1Name': machine_name,
-                        'signalname': {'$regex': regex_pattern}
-                    }
-                },
-                {
-                    '$project': {
-                        'L1Name': 1,
-                        'signalname': 1,
-                        'value': 1
-                    }
-                }
-            ]
-
-            # Execute the aggregation pipeline
-            result = collection.aggregate(pipeline)
+    machines = select(m.name for m in Machine)[:]
+    group_queries = dict(select((pg.group_name, pg.mongodb_query) for pg in ParameterGroup)[:])
+    parameter_types = get_parameter_types()
 
-            # Convert the cursor to a list of dictionaries
-            result_list = list(result)
+    # Read every active signal of the machines in one round trip, bucketed by machine and parameter group
+    active_signals = read_active_signals(list(machines), group_queries)
 
-            # Append the processed data to the list
-            processed_data.extend(result_list)
+    # The machine / parameter details and limits come from the in-memory factory snapshot (already sorted)
+    result_df = pd.DataFrame(get_snapshot_store().get_rows(), columns=SNAPSHOT_COLUMNS)
 
-    # Convert the processed data to a Pandas DataFrame
-    df = pd.DataFrame(processed_data)
-    LOGGER.info(df)
+    # Overwrite the parameter values with the current MTLINKi values and evaluate their conditions again
+    result_df = merge_active_signals(result_df, active_signals, parameter_types)
 
-    # Query the database for relevant data
-    result = select(
-        (pg.group_name,
-         m.location,
-         m.name,
-         mp.name,
-         mp.display_name,
-         mp.internal_parameter_name,
-         rtpa.time,
-         rtpa.value,
-         mp.warning_limit,
-         mp.critical_limit,
-         rtpa.parameter_condition.name)
-
-        for rtpa in RealTimeParameterActive
-        for mp in MachineParameter
-        for pg in ParameterGroup
-        for m in Machine
-        if (
-                rtpa.machine_parameter == mp and
-                mp.parameter_group == pg and
-                mp.machine == m
-
-        )
-    ).order_by(lambda _group_name, machine_location, _machine_name,
-                      parameter_name, display_name, internal_parameter_name, timestamp, value, warn_limit,
-                      _critical_limit, condition_name: (_group_name, machine_location, _machine_name, parameter_name))
-
-    # Convert the result to a pandas DataFrame
-    columns = ['group_name', 'location', 'machine_name', 'parameter_name',
-               'display_name', 'internal_parameter_name', 'time', 'value', 'warn_limit',
-               'critical_limit', 'condition_name']
-    result_df = pd.DataFrame(result, columns=columns)
-    result_df = result_df.sort_values(by='machine_name', key=lambda col: col.map(alphanumeric_key))
-
-    groups_overview = []
-
-    # Create a nested JSON structure
-    json_list = []
-
-    # Iterate over unique parameter groups
-    for group_name, group_data in result_df.groupby('group_name'):
-        group_json = {'group_name': group_name, 'group_details': [], 'group_state': 'OK',
-                      'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
-
-        # Iterate over unique locations within the parameter group
-        for location, location_data in group_data.groupby('location'):
-            location_json = {'line_name': location, 'machines': [], 'line_state': 'OK',
-                             'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
-            # Iterate over unique machines within the location
-            for machine_name, machine_data in location_data.groupby('machine_name', sort=False):
-                machine_json = {'machine_name': machine_name, 'parameters': [], 'machine_state': 'OK'}
-
-                # Initialize counts for the machine
-                machine_count = {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}
+    # Build the nested group / line / machine structure with array operations
+    json_list = build_group_hierarchy(result_df)
 
-                # Iterate over parameter data for the machine
-                for _, row in machine_data.iterrows():
-                    # Replace NaN values with None
-                    warning_limit = row['warn_limit'] if not pd.isna(row['warn_limit']) else None
-                    critical_limit = row['critical_limit'] if not pd.isna(row['critical_limit']) else None
-                    parameter_value = None if math.isnan(row['value']) else row['value']
-
-                    parameter_json = {
-                        'actual_parameter_name': row['parameter_name'],
-                        'display_name': row['display_name'],
-                        'internal_parameter_name': row['internal_parameter_name'],
-                        'latest_update_time': int(row['time'].timestamp() * 1000),
-                        'parameter_value': parameter_value,
-                        'parameter_state': row['condition_name'],
-                        'warning_limit': warning_limit,
-                        'critical_limit': critical_limit
-                    }
-
-                    machine_json['parameters'].append(parameter_json)
-
-                    # Update counts based on parameter state
-                    if row['condition_name'] == 'OK':
-                        machine_count['OK'] += 1
-                    elif row['condition_name'] == 'WARNING':
-                        machine_count['WARNING'] += 1
-                    elif row['condition_name'] == 'CRITICAL':
-                        machine_count['CRITICAL'] += 1
-
-                # Determine machine state and line count based on machine's counts
-                if machine_count['CRITICAL'] > 0:
-                    machine_json['machine_state'] = 'CRITICAL'
-
-                    # Increment the location's critical count also
-                    location_json['count']['CRITICAL'] += 1
-                elif machine_count['WARNING'] > 0:
-                    machine_json['machine_state'] = 'WARNING'
-
-                    # Increment the location's warning count also
-                    location_json['count']['WARNING'] += 1
-                else:
-                    # Increment the location's ok count also
-                    location_json['count']['OK'] += 1
-
-                location_json['machines'].append(machine_json)
-
-            # Determine line state based on counts
-            if location_json['count']['CRITICAL'] > 0:
-                location_json['line_state'] = 'CRITICAL'
-            elif location_json['count']['WARNING'] > 0:
-                location_json['line_state'] = 'WARNING'
-
-            # Update counts for the line state
-            group_json['count']['OK'] += location_json['count']['OK']
-            group_json['count']['WARNING'] += location_json['count']['WARNING']
-            group_json['count']['CRITICAL'] += location_json['count']['CRITICAL']
-
-            group_json['group_details'].append(location_json)
-
-        # Determine group state based on counts
-        if group_json['count']['CRITICAL'] > 0:
-            group_json['group_state'] = 'CRITICAL'
-        elif group_json['count']['WARNING'] > 0:
-            group_json['group_state'] = 'WARNING'
-
-        group_info = {"item_name": group_name,
-                      "item_state": group_json['group_state']}
-
-        groups_overview.append(group_info)
-
-        json_list.append(group_json)
+    groups_overview = [{"item_name": group_json['group_name'], "item_state": group_json['group_state']}
+                       for group_json in json_list]
 
     response = {"group_names": groups_overview,
                 "all_group_details": json_list}
@@ -1107,118 +894,26 @@ def get_real_time_parameters_data_by_group(group_name):
     :return: JSON object representing parameter group data
     :rtype: dict
     """
-    # Query the database for relevant data for the specified group
-    result = select(
-        (m.location,
-         m.name,
-         mp.name,
-         mp.display_name,
-         mp.internal_parameter_name,
-         rtpa.time,
-         rtpa.value,
-         mp.warning_limit,
-         mp.critical_limit,
-         rtpa.parameter_condition.name)
-
-        for rtpa in RealTimeParameterActive
-        for mp in MachineParameter
-        for pg in ParameterGroup
-        for m in Machine
-        if (
-                rtpa.machine_parameter == mp and
-                mp.parameter_group == pg and
-                mp.machine == m and
-                pg.group_name == group_name
-        )
-    ).order_by(lambda machine_location, _machine_name,
-                      parameter_name, display_name, internal_parameter_name, timestamp, value, warn_limit,
-                      _critical_limit, condition_name: (machine_location, _machine_name, parameter_name))
-
-    # Convert the result to a pandas DataFrame
-    columns = ['location', 'machine_name', 'parameter_name',
-               'display_name', 'internal_parameter_name', 'time', 'value', 'warn_limit',
-               'critical_limit', 'condition_name']
-    result_df = pd.DataFrame(result, columns=columns)
-
-    group_json = {'group_name': group_name, 'group_details': [], 'group_state': 'OK',
-                  'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
-
-    # Iterate over unique locations within the parameter group
-    for location, location_data in result_df.groupby('location'):
-        location_json = {'line_name': location, 'machines': [], 'line_state': 'OK',
-                         'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
-        # Iterate over unique machines within the location
-        for machine_name, machine_data in location_data.groupby('machine_name'):
-            machine_json = {'machine_name': machine_name, 'parameters': [], 'machine_state': 'OK'}
-
-            # Initialize counts for the machine
-            machine_count = {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}
-
-            # Iterate over parameter data for the machine
-            for _, row in machine_data.iterrows():
-                # Replace NaN values with None
-                warning_limit = row['warn_limit'] if not pd.isna(row['warn_limit']) else None
-                critical_limit = row['critical_limit'] if not pd.isna(row['critical_limit']) else None
-                parameter_value = None if math.isnan(row['value']) else row['value']
-
-                parameter_json = {
-                    'actual_parameter_name': row['parameter_name'],
-                    'display_name': row['display_name'],
-                    'internal_parameter_name': row['internal_parameter_name'],
-                    'latest_update_time': int(row['time'].timestamp() * 1000),
-                    'parameter_value': parameter_value,
-                    'parameter_state': row['condition_name'],
-                    'warning_limit': warning_limit,
-                    'critical_limit': critical_limit
-                }
-
-                machine_json['parameters'].append(parameter_json)
 
-                # Update counts based on parameter state
-                if row['condition_name'] == 'OK':
-                    machine_count['OK'] += 1
-                elif row['condition_name'] == 'WARNING':
-                    machine_count['WARNING'] += 1
-                elif row['condition_name'] == 'CRITICAL':
-                    machine_count['CRITICAL'] += 1
+    return get_snapshot_store().memoize(("real_time_parameters_data_by_group", group_name),
+                                        lambda: _build_real_time_parameters_data_by_group(group_name))
 
-            # Determine machine state and line count based on machine's counts
-            if machine_count['CRITICAL'] > 0:
-                machine_json['machine_state'] = 'CRITICAL'
 
-                # Increment the location's critical count also
-                location_json['count']['CRITICAL'] += 1
-            elif machine_count['WARNING'] > 0:
-                machine_json['machine_state'] = 'WARNING'
-
-                # Increment the location's warning count also
-                location_json['count']['WARNING'] += 1
-            else:
-                # Increment the location's ok count also
-                location_json['count']['OK'] += 1
-
-            location_json['machines'].append(machine_json)
-
-        # Determine line state based on counts
-        if location_json['count']['CRITICAL'] > 0:
-            location_json['line_state'] = 'CRITICAL'
-        elif location_json['count']['WARNING'] > 0:
-            location_json['line_state'] = 'WARNING'
+def _build_real_time_parameters_data_by_group(group_name):
+    """
+    Builds the response of get_real_time_parameters_data_by_group from the factory snapshot
 
-        # Update counts for the line state
-        group_json['count']['OK'] += location_json['count']['OK']
-        group_json['count']['WARNING'] += location_json['count']['WARNING']
-        group_json['count']['CRITICAL'] += location_json['count']['CRITICAL']
+    :param group_name: Name of the parameter group to retrieve information for.
+    :type group_name: str
 
-        group_json['group_details'].append(location_json)
+    :return: JSON object representing parameter group data
+    :rtype: dict
+    """
 
-    # Determine group state based on counts
-    if group_json['count']['CRITICAL'] > 0:
-        group_json['group_state'] = 'CRITICAL'
-    elif group_json['count']['WARNING'] > 0:
-        group_json['group_state'] = 'WARNING'
+    result_df = pd.DataFrame(get_snapshot_store().get_rows(group_name=group_name), columns=SNAPSHOT_COLUMNS)
 
-    return group_json
+    # Build the nested line / machine structure with array operations
+    return build_single_group(result_df, group_name)
 
 
 @db_session(optimistic=False)
@@ -1274,12 +969,12 @@ def get_machine_states(group_name):
 
     result_df["time_from_mtlinki"] = result_df["parameter_name"]
     result_df["value_from_mtlinki"] = result_df["parameter_name"]
-    result_df["condition_from_mtlinki"] = "OK"
 
     collection = get_mongo_collection(collection="L1Signal_Pool_Active")
 
+    # The exact signal names of the group come from the signal registry, so the lookup is an indexable $in query
     machine_state_mtlinki = collection.aggregate(
-        get_machine_states_mtlinki(regex_pattern=parameter_group.mongodb_query))
+        get_machine_states_mtlinki(signal_names=get_signal_registry().signal_names_for_group(group_name)))
 
     machine_state_mtlinki = list(machine_state_mtlinki)
 
@@ -1289,68 +984,14 @@ def get_machine_states(group_name):
     result_df["time_from_mtlinki"] = result_df["time_from_mtlinki"].map(time_from_mtlinki_map)
     result_df["value_from_mtlinki"] = result_df["value_from_mtlinki"].map(value_from_mtlinki_map)
 
-    if parameter_group.parameter_type == "decreasing":
-
-        # If the parameter type is decreasing, we do the following
-
-        # Map all the values in column "condition" to 1, if the corresponding value in column "value"
-        # Is greater than the warning limit, if it is less than warning but greater than critical
-        # We set it to 2, if less than critical limit, we set it to 3
-        # self.recent_data["condition"].
-        # mask(self.recent_data["value"] > self.warning_limit, 1, inplace=True)
-        # self.recent_data["condition"].
-        # mask(self.recent_data["value"] < self.warning_limit - 1, 2, inplace=True)
-        # self.recent_data["condition"].
-        # mask(self.recent_data["value"] < self.critical_limit - 1, 3, inplace=True)
-        result_df["condition_from_mtlinki"] = np.where(
-            (result_df["value_from_mtlinki"] <= result_df["critical_limit"]),
-            "CRITICAL", result_df["condition_from_mtlinki"])
-
-        result_df["condition_from_mtlinki"] = np.where(
-            (result_df["value_from_mtlinki"] <= result_df["warn_limit"]) &
-            (result_df["value_from_mtlinki"] > result_df["critical_limit"]),
-            "WARNING", result_df["condition_from_mtlinki"])
-
-    elif parameter_group.parameter_type == "increasing":
-
-        # If parameter is of type increasing do the following
-
-        # Map all the values in column "condition" to 1, if the corresponding value in column "value"
-        # Is less than the warning limit, if it is greater than warning but less than critical
-        # # We set it to 2, if greater than critical limit, we set it to 3
-        # self.recent_data["condition"].
-        # mask(self.recent_data["value"] < self.warning_limit, 1, inplace=True)
-        # self.recent_data["condition"].
-        # mask(self.recent_data["value"] > self.warning_limit - 1, 2, inplace=True)
-        # self.recent_data["condition"].
-        # mask(self.recent_data["value"] > self.critical_limit - 1, 3, inplace=True)
-
-        result_df["condition_from_mtlinki"] = np.where(
-            (result_df["value_from_mtlinki"] >= result_df["critical_limit"]),
-            "CRITICAL", result_df["condition_from_mtlinki"])
-
-        result_df["condition_from_mtlinki"] = np.where(
-            (result_df["value_from_mtlinki"] >= result_df["warn_limit"]) &
-            (result_df["value_from_mtlinki"] < result_df["critical_limit"]),
-            "WARNING", result_df["condition_from_mtlinki"])
-
-    elif parameter_group.parameter_type == "bool":
-
-        # If parameter is of type boolean, do the following
-
-        # We map all the true values to 1, and false to 0 in the "value" column
-        # Since in Timescaledb we cannot have mixed value type in a column, hence we're converting it from
-        # Boolean to float
+    if parameter_group.parameter_type == "bool":
+        # Since in Timescaledb we cannot have mixed value type in a column, the boolean values are shown as 1 / 0
         result_df["value_from_mtlinki"] = result_df["value_from_mtlinki"].map({True: 1, False: 0})
 
-        # Mapping all 1 to 3 (True to 3, critical condition, such in "ApcBatLow_0_path1_T_B_OP160"
-        # Where true denotes battery is low), and 0 to 1 (False to 1 - OK condition)
-        result_df["condition_from_mtlinki"].mask(result_df["value_from_mtlinki"] == 1, 3, inplace=True)
-        result_df["condition_from_mtlinki"].mask(result_df["value_from_mtlinki"] == 0, 1, inplace=True)
-
-    result_df['condition_from_mtlinki'] = np.where(result_df['value_from_mtlinki'].isnull() |
-                                                   np.isnan(result_df['value_from_mtlinki']),
-                                                   'DISCONNECTED', result_df['condition_from_mtlinki'])
+    # Classify the values against their limits (null values are DISCONNECTED)
+    result_df["condition_from_mtlinki"] = condition_names(evaluate_conditions(
+        result_df["value_from_mtlinki"], result_df["warn_limit"], result_df["critical_limit"],
+        parameter_group.parameter_type))
 
     # TODO : The code till above line, collected two data from mtlinki for the current parameter group
     # TODO: The updatetime and value, and based on those values it calculates the condition
@@ -1363,85 +1004,8 @@ def get_machine_states(group_name):
     # TODO: Maybe i missed few, run this file, from main_test in debug mode, and see how data is
     # TODO: filled based on that modify others
 
-    group_json = {'group_name': group_name, 'group_details': [], 'group_state': 'OK',
-                  'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
-
-    # Iterate over unique locations within the parameter group
-    for location, location_data in result_df.groupby('location'):
-        location_json = {'line_name': location, 'machines': [], 'line_state': 'OK',
-                         'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
-        # Iterate over unique machines within the location
-        for machine_name, machine_data in location_data.groupby('machine_name'):
-            machine_json = {'machine_name': machine_name, 'parameters': [], 'machine_state': 'OK'}
-
-            # Initialize counts for the machine
-            machine_count = {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}
-
-            # Iterate over parameter data for the machine
-            for _, row in machine_data.iterrows():
-                # Replace NaN values with None
-                warning_limit = row['warn_limit'] if not pd.isna(row['warn_limit']) else None
-                critical_limit = row['critical_limit'] if not pd.isna(row['critical_limit']) else None
-                parameter_value = None if math.isnan(row['value']) else row['value']
-
-                parameter_json = {
-                    'actual_parameter_name': row['parameter_name'],
-                    'display_name': row['display_name'],
-                    'internal_parameter_name': row['internal_parameter_name'],
-                    'latest_update_time': int(row['time'].timestamp() * 1000),
-                    'parameter_value': parameter_value,
-                    'parameter_state': row['condition_name'],
-                    'warning_limit': warning_limit,
-                    'critical_limit': critical_limit
-                }
-
-                machine_json['parameters'].append(parameter_json)
-
-                # Update counts based on parameter state
-                if row['condition_name'] == 'OK':
-                    machine_count['OK'] += 1
-                elif row['condition_name'] == 'WARNING':
-                    machine_count['WARNING'] += 1
-                elif row['condition_name'] == 'CRITICAL':
-                    machine_count['CRITICAL'] += 1
-
-            # Determine machine state and line count based on machine's counts
-            if machine_count['CRITICAL'] > 0:
-                machine_json['machine_state'] = 'CRITICAL'
-
-                # Increment the location's critical count also
-                location_json['count']['CRITICAL'] += 1
-            elif machine_count['WARNING'] > 0:
-                machine_json['machine_state'] = 'WARNING'
-
-                # Increment the location's warning count also
-                location_json['count']['WARNING'] += 1
-            else:
-                # Increment the location's ok count also
-                location_json['count']['OK'] += 1
-
-            location_json['machines'].append(machine_json)
-
-        # Determine line state based on counts
-        if location_json['count']['CRITICAL'] > 0:
-            location_json['line_state'] = 'CRITICAL'
-        elif location_json['count']['WARNING'] > 0:
-            location_json['line_state'] = 'WARNING'
-
-        # Update counts for the line state
-        group_json['count']['OK'] += location_json['count']['OK']
-        group_json['count']['WARNING'] += location_json['count']['WARNING']
-        group_json['count']['CRITICAL'] += location_json['count']['CRITICAL']
-
-        group_json['group_details'].append(location_json)
-
-    # Determine group state based on counts
-    if group_json['count']['CRITICAL'] > 0:
-        group_json['group_state'] = 'CRITICAL'
-    elif group_json['count']['WARNING'] > 0:
-        group_json['group_state'] = 'WARNING'
-
-    return group_json
+    # Build the nested line / machine structure with array operations
+    return build_single_group(result_df, group_name)
 
 
 #Changes made to get the data from the mtlinki for the parameter group
@@ -1463,48 +1027,18 @@ def get_machine_states_2(group_name):
 
     parameter_group = ParameterGroup.get(group_name=group_name)
 
-    # Query the database for relevant data for the specified group
-    result = select(
-        (m.location,
-         m.name,
-         mp.name,
-         mp.display_name,
-         mp.internal_parameter_name,
-         rtpa.time,
-         rtpa.value,
-         mp.warning_limit,
-         mp.critical_limit,
-         rtpa.parameter_condition.name)
-
-        for rtpa in RealTimeParameterActive
-        for mp in MachineParameter
-        for pg in ParameterGroup
-        for m in Machine
-        if (
-                rtpa.machine_parameter == mp and
-                mp.parameter_group == pg and
-                mp.machine == m and
-                pg.group_name == group_name
-        )
-    ).order_by(lambda machine_location, _machine_name,
-                      parameter_name, display_name, internal_parameter_name, timestamp, value, warn_limit,
-                      _critical_limit, condition_name: (machine_location, _machine_name, parameter_name))
-
-    # Convert the result to a pandas DataFrame
-    columns = ['location', 'machine_name', 'parameter_name',
-               'display_name', 'internal_parameter_name', 'time', 'value', 'warn_limit',
-               'critical_limit', 'condition_name']
-    result_df = pd.DataFrame(list(result), columns=columns)
-    result_df = result_df.sort_values(by='machine_name', key=lambda col: col.map(alphanumeric_key))
+    # The machine / parameter details and limits come from the in-memory factory snapshot (already sorted),
+    # only the values are overlaid from MTLINKi
+    result_df = pd.DataFrame(get_snapshot_store().get_rows(group_name=group_name), columns=SNAPSHOT_COLUMNS)
 
     result_df["time_from_mtlinki"] = result_df["parameter_name"]
     result_df["value_from_mtlinki"] = result_df["parameter_name"]
-    result_df["condition_from_mtlinki"] = "OK"
 
     collection = get_mongo_collection(collection="L1Signal_Pool_Active")
 
+    # The exact signal names of the group come from the signal registry, so the lookup is an indexable $in query
     machine_state_mtlinki = collection.aggregate(
-        get_machine_states_mtlinki(regex_pattern=parameter_group.mongodb_query))
+        get_machine_states_mtlinki(signal_names=get_signal_registry().signal_names_for_group(group_name)))
 
     machine_state_mtlinki = list(machine_state_mtlinki)
 
@@ -1514,132 +1048,23 @@ def get_machine_states_2(group_name):
     result_df["time_from_mtlinki"] = result_df["time_from_mtlinki"].map(time_from_mtlinki_map)
     result_df["value_from_mtlinki"] = result_df["value_from_mtlinki"].map(value_from_mtlinki_map)
 
-    if parameter_group.parameter_type == "decreasing":
-        result_df["condition_from_mtlinki"] = np.where(
-            (result_df["value_from_mtlinki"] <= result_df["critical_limit"]),
-            "CRITICAL", result_df["condition_from_mtlinki"])
+    # TODO CHANGED THE VALUE FOR THE BOOLIEAN TO SHOW "OK,CRITICAL"
+    # Boolean groups are only shown as OK / DISCONNECTED on this route, their values are not evaluated
+    parameter_type = parameter_group.parameter_type
 
-        result_df["condition_from_mtlinki"] = np.where(
-            (result_df["value_from_mtlinki"] <= result_df["warn_limit"]) &
-            (result_df["value_from_mtlinki"] > result_df["critical_limit"]),
-            "WARNING", result_df["condition_from_mtlinki"])
-
-    elif parameter_group.parameter_type == "increasing":
-        result_df["condition_from_mtlinki"] = np.where(
-            (result_df["value_from_mtlinki"] >= result_df["critical_limit"]),
-            "CRITICAL", result_df["condition_from_mtlinki"])
-
-        result_df["condition_from_mtlinki"] = np.where(
-            (result_df["value_from_mtlinki"] >= result_df["warn_limit"]) &
-            (result_df["value_from_mtlinki"] < result_df["critical_limit"]),
-            "WARNING", result_df["condition_from_mtlinki"])
-
-    elif parameter_group.parameter_type == "bool":
+    if parameter_type == "bool":
         result_df["value_from_mtlinki"] = result_df["value_from_mtlinki"].map({True: 1, False: 0})
-        #TODO CHANGED THE VALUE FOR THE BOOLIEAN TO SHOW "OK,CRITICAL"
-        # result_df["condition_from_mtlinki"].mask(result_df["value_from_mtlinki"] == 1, 3, inplace=True)
-        # result_df["condition_from_mtlinki"].mask(result_df["value_from_mtlinki"] == 0, 1, inplace=True)
-
-    result_df['condition_from_mtlinki'] = np.where(result_df['value_from_mtlinki'].isnull() |
-                                                   np.isnan(result_df['value_from_mtlinki']),
-                                                   'DISCONNECTED', result_df['condition_from_mtlinki'])
-
-    group_json = {'group_name': group_name, 'group_details': [], 'group_state': 'OK',
-                  'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0, 'DISCONNECTED': 0}}  # Added 'DISCONNECTED' count
-
-    # Iterate over unique locations within the parameter group
-    for location, location_data in result_df.groupby('location'):
-        location_json = {'line_name': location, 'machines': [], 'line_state': 'OK',
-                         'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0,
-                                   'DISCONNECTED': 0}}  # Added 'DISCONNECTED' count
-
-        # Iterate over unique machines within the location
-        for machine_name, machine_data in location_data.groupby('machine_name', sort=False):
-            machine_json = {'machine_name': machine_name, 'parameters': [], 'machine_state': 'OK'}
-
-            # Initialize counts for the machine
-            machine_count = {'OK': 0, 'WARNING': 0, 'CRITICAL': 0, 'DISCONNECTED': 0}  # Added 'DISCONNECTED' count
-
-            # Iterate over parameter data for the machine
-            for _, row in machine_data.iterrows():
-                # Replace NaN values with None
-                warning_limit = row['warn_limit'] if not pd.isna(row['warn_limit']) else None
-                critical_limit = row['critical_limit'] if not pd.isna(row['critical_limit']) else None
-                parameter_value = None if pd.isna(row['value_from_mtlinki']) else row[
-                    'value_from_mtlinki']  # Changed to value_from_mtlinki
-                # Changed 'value' to 'value_from_mtlinki' in the above line
-
-                # Handle NaT values in time_from_mtlinki column
-                if pd.isna(row['time_from_mtlinki']):
-                    latest_update_time = 0  # or assign a default timestamp value
-                else:
-                    latest_update_time = int(
-                        row['time_from_mtlinki'].timestamp() * 1000)  # Changed to time_from_mtlinki
-
-                parameter_json = {
-                    'actual_parameter_name': row['parameter_name'],
-                    'display_name': row['display_name'],
-                    'internal_parameter_name': row['internal_parameter_name'],
-                    'latest_update_time': latest_update_time,
-                    'parameter_value': parameter_value,
-                    'parameter_state': row['condition_from_mtlinki'],  # Changed to condition_from_mtlinki
-                    'warning_limit': warning_limit,
-                    'critical_limit': critical_limit
-                }
-
-                machine_json['parameters'].append(parameter_json)
-
-                # Update counts based on parameter state
-                if row['condition_from_mtlinki'] == 'OK':  # Changed to condition_from_mtlinki
-                    machine_count['OK'] += 1
-                elif row['condition_from_mtlinki'] == 'WARNING':  # Changed to condition_from_mtlinki
-                    machine_count['WARNING'] += 1
-                elif row['condition_from_mtlinki'] == 'CRITICAL':  # Changed to condition_from_mtlinki
-                    machine_count['CRITICAL'] += 1
-                elif row['condition_from_mtlinki'] == 'DISCONNECTED':  # Added count for 'DISCONNECTED'
-                    machine_count['DISCONNECTED'] += 1
-
-            # Determine machine state and line count based on machine's counts
-            if machine_count['DISCONNECTED'] == len(machine_json['parameters']):
-                machine_json[
-                    'machine_state'] = 'DISCONNECTED'  # Set machine_state to 'DISCONNECTED' if all parameters are disconnected
-                location_json['count'][
-                    'DISCONNECTED'] += 1  # Increment count of machines with all parameters disconnected
-            elif machine_count['CRITICAL'] > 0:
-                machine_json['machine_state'] = 'CRITICAL'
-                location_json['count']['CRITICAL'] += 1
-            elif machine_count['WARNING'] > 0:
-                machine_json['machine_state'] = 'WARNING'
-                location_json['count']['WARNING'] += 1
-            else:
-                location_json['count']['OK'] += 1
-
-            location_json['machines'].append(machine_json)
+        parameter_type = None
 
-        # Determine line state based on counts
-        if location_json['count']['CRITICAL'] > 0:
-            location_json['line_state'] = 'CRITICAL'
-        elif location_json['count']['WARNING'] > 0:
-            location_json['line_state'] = 'WARNING'
+    # Classify the values against their limits (null values are DISCONNECTED)
+    result_df["condition_from_mtlinki"] = condition_names(evaluate_conditions(
+        result_df["value_from_mtlinki"], result_df["warn_limit"], result_df["critical_limit"], parameter_type))
 
-        group_json['count']['OK'] += location_json['count']['OK']
-        group_json['count']['WARNING'] += location_json['count']['WARNING']
-        group_json['count']['CRITICAL'] += location_json['count']['CRITICAL']
-        group_json['count']['DISCONNECTED'] += location_json['count']['DISCONNECTED']  # Added count for 'DISCONNECTED'
-
-        # Log count for 'DISCONNECTED' state
-        LOGGER.info(
-            f"+++++++++++++++++++++++++Count for DISCONNECTED at location {location}: {location_json['count']['DISCONNECTED']}")
-
-        group_json['group_details'].append(location_json)
-
-    # Determine group state based on counts
-    if group_json['count']['CRITICAL'] > 0:
-        group_json['group_state'] = 'CRITICAL'
-    elif group_json['count']['WARNING'] > 0:
-        group_json['group_state'] = 'WARNING'
-
-    return group_json
+    # Build the nested line / machine structure with array operations, a machine whose parameters are all
+    # disconnected is counted as DISCONNECTED
+    return build_single_group(result_df, group_name, value_column='value_from_mtlinki',
+                              time_column='time_from_mtlinki', condition_column='condition_from_mtlinki',
+                              with_disconnected=True)
 
 
 
@@ -1972,6 +1397,29 @@ def get_all_parameter_group_status():
         raise GetAllParameterDBError
 
 
+def _build_parameter_group_statuses():
+    """
+    Builds the response of get_parameter_group_statuses from the factory snapshot
+
+    :return: List of dictionaries containing parameter group statuses, sorted by group name.
+    :rtype: list[dict]
+    """
+
+    snapshot_store = get_snapshot_store()
+
+    group_states = {group_name: 'OK' for group_name in snapshot_store.get_group_names()}
+
+    # A group is critical if any of its parameters is critical, else warning if any of them is in warning
+    for row in snapshot_store.get_rows():
+        if row[11] == 'CRITICAL':
+            group_states[row[1]] = 'CRITICAL'
+        elif row[11] == 'WARNING' and group_states.get(row[1]) != 'CRITICAL':
+            group_states[row[1]] = 'WARNING'
+
+    return [{'item_name': group_name, 'item_state': item_state}
+            for group_name, item_state in sorted(group_states.items())]
+
+
 @db_session(optimistic=False)
 def get_parameter_group_statuses():
     """
@@ -1984,42 +1432,11 @@ def get_parameter_group_statuses():
     try:
         start_time = time.time()
 
-        status_list = []
-
-        # Using a complicated group by function along with timescale db inbuilt function
-        # To get the total number of warning and critical parameters
-        warning_data = list(select((rpa.machine_parameter.parameter_group.group_name, pony_count())
-                                   for rpa in RealTimeParameterActive
-                                   if rpa.parameter_condition.name == "WARNING" and
-                                   rpa.machine_parameter.parameter_group is not None))
-
-        critical_data = list(select((rpa.machine_parameter.parameter_group.group_name, pony_count())
-                                    for rpa in RealTimeParameterActive
-                                    if rpa.parameter_condition.name == "CRITICAL" and
-                                    rpa.machine_parameter.parameter_group is not None))
-
-        # If we have any parameter in critical state, we do the following
-        if critical_data:
-            for data in critical_data:
-                status_list.append({'item_name': data[0], 'item_state': 'CRITICAL'})
-
-        # If we have any parameter in warning state, we do the following only if it was not added in the critical state
-        if warning_data:
-            for data in warning_data:
-                if not any(item['item_name'] == data[0] for item in status_list):
-                    status_list.append({'item_name': data[0], 'item_state': 'WARNING'})
-
-        # If no warnings or critical issues, mark as OK
-        for group_name in select(pg.group_name for pg in ParameterGroup):
-            if not any(item['item_name'] == group_name for item in status_list):
-                status_list.append({'item_name': group_name, 'item_state': 'OK'})
+        status_list = get_snapshot_store().memoize(("parameter_group_statuses",), _build_parameter_group_statuses)
 
         end_time = time.time() - start_time
         LOGGER.info(f"Time for all status: {(round((end_time * 1000), 2))} ms")
 
-        # Sorting the list based on the value of 'key1'
-        status_list = sorted(status_list, key=lambda group: group['item_name'])
-
         return status_list
 
     except Exception as error:
@@ -2233,7 +1650,7 @@ def get_machine_timeline_parameter_name(parameter_name, start_time=1655859600, e
 
 @db_session(optimistic=False)
 def get_machine_timeline_parameter_name_mtlinki(machine_name, parameter_name, start_time=1655859600,
-                                                end_time=1655874000):
+                                                end_time=1655874000, max_points=None, downsampling="lttb"):
     """
 
     Retrieves the realtime data for the given parameter name for the given start and end time from MtLinki
@@ -2250,6 +1667,12 @@ def get_machine_timeline_parameter_name_mtlinki(machine_name, parameter_name, st
     :param end_time: End time for which the data needs to be queried in epoch format
     :type end_time: float
 
+    :param max_points: Maximum number of points of the timeline, None for every raw point
+    :type max_points: int | None
+
+    :param downsampling: The downsampling method ("lttb" or "minmax") used with max_points
+    :type downsampling: str
+
     :return: The current machine's full timeline information
     :rtype: dict
 
@@ -2320,6 +1743,14 @@ def get_machine_timeline_parameter_name_mtlinki(machine_name, parameter_name, st
 
         real_time_data = [[timestamp, 0] if value is None else [timestamp, value] for timestamp, value in
                           real_time_data]
+
+        if max_points is not None:
+            timestamps, values = downsample_timeline([timestamp for timestamp, _ in real_time_data],
+                                                     [value for _, value in real_time_data], max_points, downsampling,
+                                                     requested_parameter.warning_limit,
+                                                     requested_parameter.critical_limit,
+                                                     requested_parameter.parameter_type)
+            real_time_data = [list(point) for point in zip(timestamps, values)]
         LOGGER.info("++++---------real time data after inserting and changing for none values --------++++++++++")
         LOGGER.info(real_time_data)
 
@@ -2362,7 +1793,7 @@ def get_machine_timeline_parameter_name_mtlinki(machine_name, parameter_name, st
 
 @db_session(optimistic=False)
 def get_machine_timeline(machine_name, parameter_group_id=5, axis_id=0,
-                         start_time=1655859600, end_time=1655874000):
+                         start_time=1655859600, end_time=1655874000, max_points=None, downsampling="lttb"):
     """
 
     Retrieves the current machine's given parameter group and axis's full timeline information for given
@@ -2383,6 +1814,12 @@ def get_machine_timeline(machine_name, parameter_group_id=5, axis_id=0,
     :param end_time: End time for which the data needs to be queried in epoch format
     :type end_time: float
 
+    :param max_points: Maximum number of points of the timeline, None for every raw point
+    :type max_points: int | None
+
+    :param downsampling: The downsampling method ("lttb" or "minmax") used with max_points
+    :type downsampling: str
+
     :return: The current machine's full timeline information
     :rtype: dict
 
@@ -2460,26 +1897,29 @@ def get_machine_timeline(machine_name, parameter_group_id=5, axis_id=0,
                 LOGGER.info("Nan Value in database")
                 return
 
+            timestamps, values = downsample_timeline(real_time_data[0], real_time_data[1], max_points, downsampling,
+                                                     requested_parameter_object.warning_limit,
+                                                     requested_parameter_object.critical_limit,
+                                                     requested_parameter_object.parameter_type)
+
             # Creating response dictionary
             # If warning limit is none, it means it is a dynamic parameter ,
             # And we set the limits to zero for them
             if (requested_parameter_object.warning_limit is not None) and \
                     not math.isnan(requested_parameter_object.warning_limit):
 
-                print("value: ", type(requested_parameter_object.warning_limit))
-
                 response_data = {"param": parameter_group_id, "machine": machine_name, "axis": axis_id,
-                                 "start_time": real_time_data[0][0], "stop_time": real_time_data[0][-1],
-                                 "data": real_time_data[1],
-                                 "timestamps": real_time_data[0],
+                                 "start_time": float(timestamps[0]), "stop_time": float(timestamps[-1]),
+                                 "data": values.tolist(),
+                                 "timestamps": timestamps.tolist(),
                                  "warning_limit": requested_parameter_object.warning_limit,
                                  "critical_limit": requested_parameter_object.critical_limit}
             else:
 
                 response_data = {"param": parameter_group_id, "machine": machine_name, "axis": axis_id,
-                                 "start_time": real_time_data[0][0], "stop_time": real_time_data[0][-1],
-                                 "data": real_time_data[1],
-                                 "timestamps": real_time_data[0],
+                                 "start_time": float(timestamps[0]), "stop_time": float(timestamps[-1]),
+                                 "data": values.tolist(),
+                                 "timestamps": timestamps.tolist(),
                                  "warning_limit": 0,
                                  "critical_limit": 0}
 
@@ -2497,7 +1937,7 @@ def get_machine_timeline(machine_name, parameter_group_id=5, axis_id=0,
 def get_machine_parameter_timeline_spm(machine_name, parameter_name="MeasurementData(SIDE_AUTO_SIZER)"
                                                                     "_JOURNAL FINISH-GRINDING",
                                        start_time=1655859600,
-                                       end_time=1655874000):
+                                       end_time=1655874000, max_points=None, downsampling="lttb"):
     """
 
     Retrieves the full timeline data for a given parameter for a given machine (used for spm)
@@ -2514,6 +1954,12 @@ def get_machine_parameter_timeline_spm(machine_name, parameter_name="Measurement
     :param end_time: End time for which the data needs to be queried in epoch format
     :type end_time: float
 
+    :param max_points: Maximum number of points of the timeline, None for every raw point
+    :type max_points: int | None
+
+    :param downsampling: The downsampling method ("lttb" or "minmax") used with max_points
+    :type downsampling: str
+
     :return: The current machine's full timeline information
     :rtype: dict
 
@@ -2571,28 +2017,31 @@ def get_machine_parameter_timeline_spm(machine_name, parameter_name="Measurement
         # Do the following only if real time data is available (either for the requested timestamp or
         # The timestamp of recent most value and one hour before it)
         if real_time_data:
+            timestamps, values = downsample_timeline(real_time_data[0], real_time_data[1], max_points, downsampling,
+                                                     requested_parameter_object.warning_limit,
+                                                     requested_parameter_object.critical_limit,
+                                                     requested_parameter_object.parameter_type)
+
             # Creating response dictionary
             # If warning limit is none, it means it is a dynamic parameter ,
             # And we set the limits to zero for them
             if (requested_parameter_object.warning_limit is not None) and \
                     not math.isnan(requested_parameter_object.warning_limit):
 
-                print("value: ", type(requested_parameter_object.warning_limit))
-
                 response_data = {"param": requested_parameter_object.id, "machine": machine_name,
                                  "axis": requested_parameter_object.name,
-                                 "start_time": real_time_data[0][0], "stop_time": real_time_data[0][-1],
-                                 "data": real_time_data[1],
-                                 "timestamps": real_time_data[0],
+                                 "start_time": float(timestamps[0]), "stop_time": float(timestamps[-1]),
+                                 "data": values.tolist(),
+                                 "timestamps": timestamps.tolist(),
                                  "warning_limit": requested_parameter_object.warning_limit,
                                  "critical_limit": requested_parameter_object.critical_limit}
             else:
 
                 response_data = {"param": requested_parameter_object.id, "machine": machine_name,
                                  "axis": requested_parameter_object.name,
-                                 "start_time": real_time_data[0][0], "stop_time": real_time_data[0][-1],
-                                 "data": real_time_data[1],
-                                 "timestamps": real_time_data[0],
+                                 "start_time": float(timestamps[0]), "stop_time": float(timestamps[-1]),
+                                 "data": values.tolist(),
+                                 "timestamps": timestamps.tolist(),
                                  "warning_limit": 0,
                                  "critical_limit": 0}
 
@@ -2821,11 +2270,11 @@ def get_realtime_machine_parameter_data_before_requested_time_mtlinki(machine_na
         LOGGER.exception(f"Exception while getting recent most data: {error.args[0]}")
 
 
-@db_session(optimistic=False)
 def get_realtime_data(parameter_id=5361, start_time=1662505509, end_time=1662534309):
     """
 
-    Function used to return the real time data from the database for given parameter and time
+    Function used to return the real time data from the database for given parameter and time, read as columns in a
+    read-only transaction (no row lock, no entity per point)
 
     :param parameter_id: The parameter identifier
     :type parameter_id: int
@@ -2836,137 +2285,23 @@ def get_realtime_data(parameter_id=5361, start_time=1662505509, end_time=1662534
     :param end_time: End time for which the data needs to be queried in epoch format
     :type end_time: float
 
-    :return: A List of list of machine parameter data and list of timestamp
-    :rtype: list
+    :return: The array of timestamps (epoch milliseconds) and the array of values, in time order, None when there is
+             no data
+    :rtype: list[np.ndarray] | None
 
     """
 
     try:
-
-        # Converting the epoch format to datetime format (UTC- just like how it is stored in db)
-        start_time_datetime = datetime.fromtimestamp(start_time, tz=pytz.timezone("UTC"))
-        LOGGER.info("Starttime")
-        LOGGER.info(start_time_datetime)
-        end_time_datetime = datetime.fromtimestamp(end_time, tz=pytz.timezone("UTC"))
-        LOGGER.info("Starttime")
-        LOGGER.info(end_time_datetime)
-
-        # #TESTING FOR GMT
-        # # Converting the epoch format to datetime format (UTC- just like how it is stored in db)
-        # # Convert start_time from epoch to datetime in GMT+5:30 (Indian Standard Time)
-        # start_time_datetime = datetime.fromtimestamp(start_time, timezone.utc)
-        # LOGGER.info("Starttime")
-        # LOGGER.info(start_time_datetime)
-        #
-        # # Convert end_time from epoch to datetime in GMT+5:30 (Indian Standard Time)
-        # end_time_datetime = datetime.fromtimestamp(end_time, timezone.utc)
-        # LOGGER.info("Endtime")
-        # LOGGER.info(end_time_datetime)
-
-        # start_time_datetime = datetime.fromtimestamp(start_time)
-        # end_time_datetime = datetime.fromtimestamp(end_time)
-
-        LOGGER.info(f"The start time of the query is {str(start_time_datetime)}")
-        LOGGER.info(f"The end time of the query is {str(end_time_datetime)}")
+        LOGGER.info(f"The start time of the query is {str(datetime.fromtimestamp(start_time, timezone.utc))}")
+        LOGGER.info(f"The end time of the query is {str(datetime.fromtimestamp(end_time, timezone.utc))}")
         LOGGER.info(f"The parameter id of the query is {parameter_id}")
 
-        # Querying the real time data from the database for given parameter and time and sorting them using timestamp
-        data = RealTimeParameter.select(lambda parameter: parameter.machine_parameter.id == parameter_id)
-        data = data.filter(lambda parameter: parameter.time >= start_time_datetime)
+        timestamps, values = fetch_realtime_columns(parameter_id, start_time, end_time)
 
-        # LOGGER.info(f"Requested data:{data}")
-
-        # Remember that they are sorted by timestamp in ascending order
-        # In that case, the condition_id of 1 or 2 or 3 will be be coming in the end of each cycle
-        data = data.filter(lambda parameter: parameter.time <= end_time_datetime). \
-                   sort_by(RealTimeParameter.time).for_update()[:]
-        # print(data)
-        #TODO THE CHANGES
-
-        # Inside the data processing section where the error occurs
-        # for record in data:
-        #     parameter_condition = record.parameter_condition
-        #     if parameter_condition is not None:
-        #         parameter_condition_id = parameter_condition.id
-        #         # Process parameter_condition_id as needed
-        #     else:
-        #         LOGGER.warning("Parameter condition is None for record: {}".format(record))
-        #         # Set a default value of "1" for the condition_id
-        #         parameter_condition_id = "1"  # Change this default value as needed
-        #
-        # # Add more logging statements for debugging
-        # LOGGER.info("Value of parameter_condition: {}".format(parameter_condition))
-        #
-        # LOGGER.info(f"Requested data after sorting:{data}")
+        LOGGER.info(f"Fetched {len(timestamps)} points")
 
-        if data:
-            return_data = [[record.time.timestamp() * 1000 for record in data], [record.value for record in data]]
-            # LOGGER.info(return_data)
-
-            # Getting all the parameter condition_id values as list
-            # return_data_2 = [record.parameter_condition.id for record in data]
-            # LOGGER.info(return_data_2)
-            # LOGGER.info(f'{return_data[0][0]} || {return_data[0][8752]}')
-            return_data_2 = []
-            # TODO MONITOR THE CHANGE
-            for record in data:
-                try:
-                    return_data_2.append(record.parameter_condition)
-                except:
-                    return_data_2.append(None)
-
-            # Getting all the ids of rows where the condition_id is not none
-            # These represents the end of cycle row
-            LOGGER.info("++++++++++++++++++++++++++++++")
-            indices = [i for i, x in enumerate(return_data_2) if x is not None]
-            LOGGER.info(f'return_data[0]={len(return_data[0])}, return_data[1]={len(return_data[1])}')
-            LOGGER.info(indices)
-
-            response_data = []
-
-            # For each index we do the following
-            # To understand better, use the following example
-            # Assume this is a sample condition_id data
-            # condition_id = [None, None, None, None, 1, None, None, None, 1, None, None, None, 1]
-            #
-            # Then the indices will have the following values
-            # indices = [4, 8, 12]
-            #
-            # When we loop over the range(len(indices), the index will take the following values
-            # index = [0, 1, 2]
-            for index in range(len(indices)):
-                current_cycle_data = {}
-
-                # If the index is zero, it means we're starting the loop and hence we should take the
-                # start_index value to be zero
-                if index == 0:
-                    start_index = 0
-                else:
-                    # If not, (we'll take the example above, the second cycle starts at index 5
-                    # Hence we need to start from 5 (which is 4 + 1, where 4 is the index of last
-                    # time condition id was not none), we get this 4 by getting previous values
-                    start_index = indices[index - 1] + 1
-
-                end_index = indices[index] + 1
-                current_cycle_data["cycle_value"] = return_data[1][start_index: end_index]
-                current_cycle_data["timestamps"] = return_data[0][start_index: end_index]
-                # LOGGER.info(f"current_cycle_data  is : {current_cycle_data} ")
-
-                # LOGGER.info('*'*30)
-                # Add more logging statements for debugging
-                # LOGGER.info("Value of parameter_condition: {}".format(parameter_condition))
-                # TODO : ADDED THE END INDEX -1
-                try:
-                    current_cycle_data["cycle_time"] = (return_data[0][end_index - 1] - return_data[0][
-                        start_index]) / 1000
-                    # LOGGER.info(f"Current cycle data in the try +++++++++++++++++++++")
-                    # LOGGER.info({current_cycle_data})
-                except Exception:
-                    current_cycle_data["cycle_time"] = return_data[0][indices[start_index]]
-
-                response_data.append(current_cycle_data)
-            # LOGGER.info(f"Returend Data is : {return_data} ")
-            return return_data
+        if len(timestamps):
+            return [timestamps, values]
     except Exception as error:
         LOGGER.exception(f"Exception while processing status of machine for given parameter group: {error.args[0]}")
 
@@ -3029,29 +2364,19 @@ def set_dynamic_parameter_reference_signals():
     #     machine_parameter.reference_signal = current_reference_signal
     #     commit()
 
-    # Getting all the dynamic parameters
-    dynamic_parameters = MachineParameter.select(lambda p: p.parameter_group.id == 17)
+    # Getting all the dynamic parameters, the reference signal is their most recent indexed cycle
+    dynamic_parameters = MachineParameter.select(lambda p: p.parameter_group.id == DYNAMIC_PARAMETER_GROUP_ID)
 
     for parameter in dynamic_parameters:
-        real_time_data = RealTimeParameter.select(lambda p: p.machine_parameter == parameter)
-        real_time_data = real_time_data.filter(lambda p: p.parameter_condition.id > 0)
-        real_time_data = real_time_data.order_by(desc(RealTimeParameter.time))[:2]
+        last_cycle = get_recent_cycles(parameter.id, 1)
 
-        if len(real_time_data) == 2:
-
-            reference_signal = RealTimeParameter.select(lambda p: p.time > real_time_data[1].time)
-            reference_signal = reference_signal.filter(lambda p: p.time <= real_time_data[0].time)
-            reference_signal = reference_signal.filter(lambda p: p.machine_parameter == parameter)
-            reference_signal = reference_signal.order_by(RealTimeParameter.time)
-        else:
+        if not last_cycle:
             continue
-        if reference_signal:
-            set_reference_signal = []
-            for signal in reference_signal:
-                print(signal)
-                set_reference_signal.append(signal.value)
 
-            parameter.reference_signal = set_reference_signal
+        _, reference_values = get_cycle_values(parameter.id, last_cycle)[0]
+
+        if len(reference_values):
+            parameter.reference_signal = reference_values.tolist()
             commit()
     return
 
@@ -3541,6 +2866,11 @@ def update_parameter_limits_with_parameter_name(parameter_name: str, set_type: s
         )
 
         commit()
+
+        # Limit changes do not move the active parameter time, so the factory snapshot is reloaded explicitly
+        get_snapshot_store().invalidate()
+        get_tile_cache().invalidate_parameter(machine_parameter.id)
+
         return {"response_data": response_data,"previous_limit": old_warning_limit if set_type == "warning_limit" else old_critical_limit}
 
     except ObjectNotFound as error:
@@ -3652,6 +2982,8 @@ def update_parameter_limits(machine_name, parameter_group_id=5, axis_id=0,
                              "value": reference_signal}
 
         commit()
+        get_snapshot_store().invalidate()
+        get_tile_cache().invalidate_parameter(machine_parameter.id)
         # response_data = {"detail": f"Successfully updated machine parameters limit for machine: {machine_name},"
         #                            f" parameter group id: {parameter_group_id}, axis id : {axis_id}"}
 
@@ -3721,6 +3053,8 @@ def update_parameter_limits_spm(parameter_name,
                              "value": reference_signal}
 
         commit()
+        get_snapshot_store().invalidate()
+        get_tile_cache().invalidate_parameter(machine_parameter.id)
         # response_data = {"detail": f"Successfully updated machine parameters limit for machine: {machine_name},"
         #                            f" parameter group id: {parameter_group_id}, axis id : {axis_id}"}
 
@@ -3788,6 +3122,33 @@ def get_alarm_summary(start_time_datetime, end_time_datetime, production_line: s
     return total_seconds
 
 
+def _datetime_epoch_ms(value):
+    """
+    Returns the epoch milliseconds of the datetime, naive datetimes are taken as UTC (like they are stored in MTLINKi)
+    """
+
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+
+    return round(value.timestamp() * 1000)
+
+
+def _indexed_state_seconds(start_time_datetime, end_time_datetime, production_line, state):
+    """
+    Returns the total time (in seconds) the production line / machine was in the state from the state interval index,
+    None when the range is outside the horizon of the index (or the state is not indexed)
+    """
+
+    start_ms, end_ms = _datetime_epoch_ms(start_time_datetime), _datetime_epoch_ms(end_time_datetime)
+
+    if state not in STATE_SIGNALS or not get_state_interval_index().covers(start_ms, end_ms):
+        return None
+
+    matrix = get_state_interval_index().covered_matrix([start_ms, end_ms], len(STATE_SIGNALS), production_line)
+
+    return float(matrix[STATE_SIGNALS.index(state), 0])
+
+
 def get_total_time_state(start_time_datetime, end_time_datetime, production_line: str = r".*",
                          state="DISCONNECT"):
     """
@@ -3810,6 +3171,11 @@ def get_total_time_state(start_time_datetime, end_time_datetime, production_line
     :rtype: float
     """
 
+    indexed_seconds = _indexed_state_seconds(start_time_datetime, end_time_datetime, production_line, state)
+
+    if indexed_seconds is not None:
+        return indexed_seconds
+
     collection = get_mongo_collection()
 
     result_1 = collection.aggregate(get_exceed_group_template(signalname=state, production_line=production_line,
@@ -3864,6 +3230,11 @@ def get_total_time_day_state(start_time_datetime, end_time_datetime, production_
     :rtype: float
     """
 
+    indexed_seconds = _indexed_state_seconds(start_time_datetime, end_time_datetime, production_line, state)
+
+    if indexed_seconds is not None:
+        return indexed_seconds
+
     collection = get_mongo_collection()
 
     result_1 = collection.aggregate(get_exceed_group_day_template(signalname=state, production_line=production_line,
@@ -3898,10 +3269,110 @@ def get_total_time_day_state(start_time_datetime, end_time_datetime, production_
     return total_seconds
 
 
+# Number of seconds the most recent alarm of a machine is kept in the cache
+LAST_ALARM_CACHE_SECONDS = 300
+
+_LAST_ALARM_LOCK = threading.Lock()
+
+# machine name -> (enddate, updatedate, time cached)
+_LAST_ALARM_CACHE = {}
+
+
+def _get_cached_last_alarm(machine_name):
+    """
+    Returns the enddate and updatedate of the most recent alarm of the machine if it is cached and still fresh
+    """
+
+    with _LAST_ALARM_LOCK:
+        cached = _LAST_ALARM_CACHE.get(machine_name)
+
+    if cached is None or time.monotonic() - cached[2] > LAST_ALARM_CACHE_SECONDS:
+        return None
+
+    return cached[0], cached[1]
+
+
+def _cache_last_alarm(machine_name, recent_most_alarm):
+    """
+    Caches the most recent alarm of the machine (result of the recent most alarm template) and returns its enddate
+    and updatedate, None if the machine has no alarm
+    """
+
+    if not recent_most_alarm:
+        return None
+
+    last_alarm = (recent_most_alarm[0]["enddate"], recent_most_alarm[0]["updatedate"])
+
+    with _LAST_ALARM_LOCK:
+        _LAST_ALARM_CACHE[machine_name] = (*last_alarm, time.monotonic())
+
+    return last_alarm
+
+
+def _alarm_summary_from_facet(result):
+    """
+    Returns the alarm summary lists of the result of the alarm summary facet template
+    """
+
+    summary = result[0] if result else {}
+
+    return {"count_data": summary.get("count_data", []), "timespan_data": summary.get("timespan_data", []),
+            "timeline_data": summary.get("timeline_data", [])}
+
+
+def _alarm_summary_from_index(start_time_datetime, end_time_datetime, machine_name):
+    """
+    Returns the alarm summary lists of the alarms of the machine inside the range from the alarm interval index (the
+    same lists as the alarm summary facet template), None when the range is outside the horizon of the index
+    """
+
+    alarm_index = get_alarm_interval_index()
+    start_ms, end_ms = _datetime_epoch_ms(start_time_datetime), _datetime_epoch_ms(end_time_datetime)
+
+    if not alarm_index.covers(start_ms, end_ms):
+        return None
+
+    alarms = alarm_index.contained(machine_name, 0, start_ms, end_ms)
+
+    if alarms is None or not len(alarms["start_ms"]):
+        return {"count_data": [], "timespan_data": [], "timeline_data": []}
+
+    alarms = pd.DataFrame(alarms)
+
+    counts = alarms.groupby("message", sort=False).size().sort_values(ascending=False, kind="stable")
+    timespans = alarms.groupby("message", sort=False)["timespan"].sum().sort_values(ascending=False, kind="stable")
+    timeline = alarms.sort_values("start_ms", ascending=False, kind="stable")
+
+    return {"count_data": [{"total_count": count, "message": message}
+                           for message, count in zip(counts.index.tolist(), counts.tolist())],
+            "timespan_data": [{"total_time": total_time, "message": message}
+                              for message, total_time in zip(timespans.index.tolist(), timespans.tolist())],
+            "timeline_data": [{"message": message, "timespan": timespan, "enddate_epoch_time": end / 1000,
+                               "update_epoch_time": start / 1000}
+                              for message, timespan, end, start in zip(timeline["message"].tolist(),
+                                                                        timeline["timespan"].tolist(),
+                                                                        timeline["end_ms"].tolist(),
+                                                                        timeline["start_ms"].tolist())]}
+
+
+def _recent_alarm_range(last_alarm):
+    """
+    Returns the range shown when there is no alarm in the requested range, the hour before the most recent alarm
+    """
+
+    end_date, update_date = last_alarm
+
+    return end_date, update_date - timedelta(hours=1)
+
+
 def get_alarm_summary_data(start_time, end_time, machine_name):
     """
     Function to get all the data required for full alarm summary of a machine between given start and end time
 
+    The counts, timespans and timeline come from the alarm interval index when the range lies inside its horizon,
+    otherwise from a single facet aggregation. When there is no alarm in the given range, the summary of the hour
+    before the most recent alarm (cached per machine) is returned.
+
     :param start_time: The start time of the state.
     :type start_time: float
 
@@ -3926,40 +3397,261 @@ def get_alarm_summary_data(start_time, end_time, machine_name):
     collection = get_mongo_collection(collection="Alarm_History")
     # collection = get_mongo_collection(collection="Alarm History")
 
-    result_1 = collection.aggregate(get_count_group_template(start_time_datetime=start_time_datetime,
-                                                             end_time_datetime=end_time_datetime,
-                                                             machine_name=machine_name))
-    result_1 = list(result_1)
+    def alarm_summary_query(start_datetime, end_datetime):
+        indexed_results = _alarm_summary_from_index(start_datetime, end_datetime, machine_name)
+
+        if indexed_results is not None:
+            return indexed_results
 
-    if not result_1:
+        return _alarm_summary_from_facet(list(collection.aggregate(get_alarm_summary_facet_template(
+            start_time_datetime=start_datetime, end_time_datetime=end_datetime, machine_name=machine_name))))
+
+    results = alarm_summary_query(start_time_datetime, end_time_datetime)
+
+    if not results["count_data"]:
         LOGGER.info("Data not available for machine in given time, returning the recent most data")
 
-        end_time_datetime, start_time_datetime = get_recent_most_alarm_time(machine_name=machine_name)
+        recent_most_alarm_time = get_recent_most_alarm_time(machine_name=machine_name)
+
+        if recent_most_alarm_time:
+            end_time_datetime, start_time_datetime = recent_most_alarm_time
+
+            LOGGER.info(f"Current Start Time: {start_time_datetime}")
+            LOGGER.info(f"Current End Time: {end_time_datetime}")
+
+            results = alarm_summary_query(start_time_datetime, end_time_datetime)
+
+    return {"data": results}
+
+
+async def get_alarm_summary_data_async(start_time, end_time, machine_name, request=None):
+    """
+    Function to get all the data required for full alarm summary of a machine between given start and end time, with
+    the asynchronous repository
+
+    The counts, timespans and timeline come from the alarm interval index when the range lies inside its horizon,
+    otherwise from a single facet aggregation. When there is no alarm in the given range, the summary of the hour
+    before the most recent alarm (cached per machine) is returned.
+
+    :param start_time: The start time of the state.
+    :type start_time: float
+
+    :param end_time: The end time of the state
+    :type end_time: float
+
+    :param machine_name: Name of machine
+    :type machine_name: str
+
+    :param request: The request of the client, the query is cancelled when the client disconnects
+    :type request: Request | None
+
+    :return: Alarm summary data for machine
+    :rtype: dict
+    """
+
+    # Converting the epoch format to datetime format (UTC-just like how it is stored in db)
+    start_time_datetime = datetime.fromtimestamp(start_time / 1000, timezone.utc)
+    end_time_datetime = datetime.fromtimestamp(end_time / 1000, timezone.utc)
+
+    LOGGER.info(f"Current Start Time: {start_time_datetime}")
+
+    repository = get_mtlinki_repository()
+
+    async def alarm_summary_query(start_datetime, end_datetime):
+        indexed_results = _alarm_summary_from_index(start_datetime, end_datetime, machine_name)
+
+        if indexed_results is not None:
+            return indexed_results
+
+        result, = await repository.gather(
+            {"alarm_summary_facet": repository.alarm_history(get_alarm_summary_facet_template(
+                start_time_datetime=start_datetime, end_time_datetime=end_datetime, machine_name=machine_name))},
+            request=request)
+
+        return _alarm_summary_from_facet(result)
+
+    results = await alarm_summary_query(start_time_datetime, end_time_datetime)
+
+    if not results["count_data"]:
+        LOGGER.info("Data not available for machine in given time, returning the recent most data")
+
+        last_alarm = _get_cached_last_alarm(machine_name)
+
+        if last_alarm is None:
+            # Through the fan-out like the other lookups, so it has the timeout and is cancelled on disconnect
+            recent_alarms, = await repository.gather(
+                {"recent_most_alarm_time": repository.alarm_history(
+                    get_recent_most_alarm_time_template(machine_name=machine_name))},
+                request=request)
+
+            last_alarm = _cache_last_alarm(machine_name, recent_alarms)
+
+        if last_alarm is not None:
+            end_time_datetime, start_time_datetime = _recent_alarm_range(last_alarm)
+
+            LOGGER.info(f"Current Start Time: {start_time_datetime}")
+            LOGGER.info(f"Current End Time: {end_time_datetime}")
+
+            results = await alarm_summary_query(start_time_datetime, end_time_datetime)
+
+    return {"data": results}
+
+
+def _alarm_pareto_ranking(rows, rank_column, value_column, total):
+    """
+    Returns the alarms of the given ranking in rank order, with their share and the cumulative share of the total
+    """
+
+    ranking = []
+    cumulative = 0.0
+
+    for row in sorted(rows, key=lambda alarm_row: alarm_row[rank_column]):
+        share = (row[value_column] / total * 100) if total else 0.0
+        cumulative += share
+
+        ranking.append({"alarm_number": row["alarm_number"], "message": row["message"],
+                        "alarm_count": row["alarm_count"], "downtime_seconds": row["downtime_seconds"],
+                        "percentage": round(share, 2), "cumulative_percentage": round(cumulative, 2)})
+
+    return ranking
+
+
+@db_session
+def get_alarm_pareto_data(start_time, end_time, line=None, machine_name=None, top=10):
+    """
+    Function to get the top alarms by count and by total downtime of the plant, a line or a machine between given
+    start and end time, from the alarm_history hypertable (one query for both rankings)
+
+    :param start_time: The start time in epoch milliseconds
+    :type start_time: float
+
+    :param end_time: The end time in epoch milliseconds
+    :type end_time: float
+
+    :param line: The line of the machines (Head, Block or Crank), None for the whole plant
+    :type line: str | None
+
+    :param machine_name: The L1Name of the machine, None for the whole plant / line
+    :type machine_name: str | None
+
+    :param top: The number of alarms of each ranking
+    :type top: int
+
+    :return: The totals of the range and the two rankings with their cumulative percentages
+    :rtype: dict
+
+    :raises ValueError: If the line is not a line of the plant
+    """
+
+    parameters = {"start_time": datetime.fromtimestamp(start_time / 1000, timezone.utc),
+                  "end_time": datetime.fromtimestamp(end_time / 1000, timezone.utc), "top": top}
+    machine_filter = ""
+
+    if machine_name is not None:
+        machine_filter = "AND machine_name = $machine_name"
+        parameters["machine_name"] = machine_name
+    elif line is not None:
+        if line not in DISCONNECTION_LINES:
+            raise ValueError(f"Unknown line {line}, expected one of {', '.join(DISCONNECTION_LINES)}")
+
+        machine_filter = "AND line = $line"
+        parameters["line"] = line
+
+    result = PONY_DATABASE.select(get_alarm_pareto_template(schema_name=TIMESCALE_SCHEMA_NAME,
+                                                            machine_filter=machine_filter), parameters)
+
+    rows = [{"alarm_number": row[0], "message": row[1], "alarm_count": int(row[2]),
+             "downtime_seconds": float(row[3] or 0), "count_rank": row[4], "downtime_rank": row[5]} for row in result]
+
+    total_count = int(result[0][6]) if result else 0
+    total_downtime_seconds = float(result[0][7] or 0) if result else 0.0
+
+    return {"total_count": total_count, "total_downtime_seconds": round(total_downtime_seconds, 2),
+            "by_count": _alarm_pareto_ranking([row for row in rows if row["count_rank"] <= top], "count_rank",
+                                              "alarm_count", total_count),
+            "by_downtime": _alarm_pareto_ranking([row for row in rows if row["downtime_rank"] <= top],
+                                                 "downtime_rank", "downtime_seconds", total_downtime_seconds)}
+
+
+def _finite_or_none(value):
+    """
+    Returns the value, None when it is missing (None or NaN)
+    """
+
+    return None if value is None or math.isnan(value) else value
+
+
+@db_session
+def get_dynamic_parameter_cycles(machine_name, parameter_group_id, axis_id, start_time, end_time, last_cycles=None):
+    """
+    Function to get the machining cycles of a dynamic parameter from the cycle index, with their values and their
+    comparison (Kruskal-Wallis test) to the reference signal of the parameter
+
+    :param machine_name: The machine name whose data is required
+    :type machine_name: str
+
+    :param parameter_group_id: The parameter group identifier
+    :type parameter_group_id: int
+
+    :param axis_id: The parameter axis identifier
+    :type axis_id: int
+
+    :param start_time: Only the cycles that ended at or after this time (epoch milliseconds)
+    :type start_time: float
+
+    :param end_time: Only the cycles that ended at or before this time (epoch milliseconds)
+    :type end_time: float
+
+    :param last_cycles: Return the last N cycles that ended before the end time instead (start time not used)
+    :type last_cycles: int | None
+
+    :return: The cycles of the parameter, None when no cycle is indexed for the request
+    :rtype: dict | None
+    """
+
+    machine_parameters = get_parameters(machine=machine_name, parameter_group_id=parameter_group_id)
+
+    if not machine_parameters:
+        raise GetMachineTimelineError("Invalid machine/ parameter identifier")
 
-        LOGGER.info(f"Current Start Time: {start_time_datetime}")
-        LOGGER.info(f"Current End Time: {end_time_datetime}")
+    if axis_id >= len(machine_parameters):
+        raise GetMachineTimelineError("Invalid axis identifier")
 
-        result_1 = collection.aggregate(get_count_group_template(start_time_datetime=start_time_datetime,
-                                                                 end_time_datetime=end_time_datetime,
-                                                                 machine_name=machine_name))
-        result_1 = list(result_1)
+    parameter = MachineParameter[machine_parameters[axis_id]]
+    end_time_datetime = datetime.fromtimestamp(end_time / 1000, timezone.utc)
 
-    result_2 = collection.aggregate(get_timespan_group_template(start_time_datetime=start_time_datetime,
-                                                                end_time_datetime=end_time_datetime,
-                                                                machine_name=machine_name))
+    if last_cycles is not None:
+        cycles = get_recent_cycles(parameter.id, last_cycles, end_time=end_time_datetime)
+    else:
+        cycles = get_recent_cycles(parameter.id, DYNAMIC_CYCLES_LIMIT,
+                                   start_time=datetime.fromtimestamp(start_time / 1000, timezone.utc),
+                                   end_time=end_time_datetime)
+
+    if not cycles:
+        return None
 
-    result_2 = list(result_2)
+    reference = np.asarray(parameter.reference_signal or [], dtype=np.float64)
+    condition_labels = {condition.id: condition.name.lower() for condition in ParameterCondition.select()}
 
-    result_3 = collection.aggregate(get_timeline_group_template(start_time_datetime=start_time_datetime,
-                                                                end_time_datetime=end_time_datetime,
-                                                                machine_name=machine_name))
+    cycle_data = []
 
-    result_3 = list(result_3)
+    # The missing samples (NaN) of a cycle and its NaN statistics are sent as null
+    for cycle, (timestamps, values) in zip(cycles, get_cycle_values(parameter.id, cycles)):
+        stat_value, alpha_value = kruskal_wallis(values, reference)
 
-    results = {"data": {"count_data": result_1, "timespan_data": result_2,
-                        "timeline_data": result_3}}
+        cycle_data.append({"cycle_value": np.where(np.isnan(values), None, values).tolist(),
+                           "timestamps": timestamps.tolist(), "reference_cycle": reference.tolist(),
+                           "condition": condition_labels.get(cycle["condition_id"]),
+                           "alpha_value": _finite_or_none(alpha_value), "stat_value": _finite_or_none(stat_value),
+                           "variant_name": parameter.display_name or parameter.name,
+                           "cycle_time": (cycle["cycle_end"] - cycle["cycle_start"]).total_seconds(),
+                           "point_count": cycle["point_count"],
+                           **{name: _finite_or_none(cycle[name])
+                              for name in ("min_value", "max_value", "mean_value", "std_value")}})
 
-    return results
+    return {"param": parameter_group_id, "axis": axis_id, "machine": machine_name,
+            "start_time": cycles[0]["cycle_start"].timestamp() * 1000,
+            "stop_time": cycles[-1]["cycle_end"].timestamp() * 1000, "data": cycle_data}
 
 
 def get_all_states_summary(production_line, start_time_datetime, end_time_datetime):
@@ -3978,16 +3670,11 @@ def get_all_states_summary(production_line, start_time_datetime, end_time_dateti
     :return: Dictionary of total time for each state of machines/production_line
     :rtype: dict
     """
-    states = {"OPERATE": 0, "MANUAL": 0, "STOP": 0, "ALARM": 0,
-              "EMERGENCY": 0, "SUSPEND": 0, "DISCONNECT": 0}
-
-    for state in states.keys():
-        states[state] = get_total_time_state(state=state, production_line=production_line,
-                                             start_time_datetime=start_time_datetime,
-                                             end_time_datetime=end_time_datetime)
-    # pprint.pprint(states)
+    start_time = start_time_datetime.timestamp()
+    range_seconds = end_time_datetime.timestamp() - start_time
 
-    return states
+    return state_summary_slots(get_state_duration_matrix(start_time=start_time, bucket_seconds=range_seconds,
+                                                         bucket_count=1, production_line=production_line))[0]["data"]
 
 
 def get_all_states_day_summary(production_line, start_time_datetime, end_time_datetime):
@@ -4006,16 +3693,11 @@ def get_all_states_day_summary(production_line, start_time_datetime, end_time_da
     :return: Dictionary of total time for each state of machines/production_line
     :rtype: dict
     """
-    states = {"OPERATE": 0, "MANUAL": 0, "STOP": 0, "ALARM": 0,
-              "EMERGENCY": 0, "SUSPEND": 0, "DISCONNECT": 0}
+    start_time = start_time_datetime.timestamp()
+    range_seconds = end_time_datetime.timestamp() - start_time
 
-    for state in states.keys():
-        states[state] = get_total_time_day_state(state=state, production_line=production_line,
-                                                 start_time_datetime=start_time_datetime,
-                                                 end_time_datetime=end_time_datetime)
-    # pprint.pprint(states)
-
-    return states
+    return state_summary_slots(get_state_duration_matrix(start_time=start_time, bucket_seconds=range_seconds,
+                                                         bucket_count=1, production_line=production_line))[0]["data"]
 
 
 def get_full_day_summary(production_line=r'.*', day: int = 1655596800):
@@ -4032,33 +3714,8 @@ def get_full_day_summary(production_line=r'.*', day: int = 1655596800):
     :rtype: dict
     """
 
-    day_start = int(day)
-    day_end = 86400 + day
-
-    time_slots = [(slot, slot + 3600) for slot in range(day_start, day_end - 3600 + 1, 3600)]
-
-    full_day_stats = []
-
-    current_hour = 0
-
-    for current_time in time_slots:
-        current_time_stats = get_all_states_summary(production_line=production_line,
-                                                    start_time_datetime=datetime.fromtimestamp(current_time[0],
-                                                                                               tz=pytz.timezone("UTC")),
-                                                    end_time_datetime=datetime.fromtimestamp(current_time[1],
-                                                                                             tz=pytz.timezone("UTC")))
-        full_day_stats.append({"current_hour_day": current_hour, "data": current_time_stats})
-        current_hour += 1
-    full_day = {"OPERATE": 0, "MANUAL": 0, "STOP": 0, "ALARM": 0,
-                "EMERGENCY": 0, "SUSPEND": 0, "DISCONNECT": 0}
-
-    for hour in full_day_stats:
-        for state in full_day.keys():
-            full_day[state] += hour["data"][state]
-
-    full_day_stats.append({"current_hour_day": current_hour, "data": full_day})
-
-    pprint.pprint(full_day_stats)
+    full_day_stats = state_summary_slots(get_state_duration_matrix(start_time=int(day), bucket_seconds=3600,
+                                                                   bucket_count=24, production_line=production_line))
 
     return full_day_stats
 
@@ -4088,38 +3745,9 @@ def get_full_month_week_summary(production_line=r'.*', day: int = 1654043400, we
 
     number_of_days = calendar.monthrange(day_object.year, day_object.month)[1]
 
-    if week:
-        day_end = 604800 + day
-    else:
-        day_end = (number_of_days * 86400) + day
-
-    day_slots = [(slot, slot + 86400) for slot in range(day_start, day_end - 86400 + 1, 86400)]
-
-    full_month_week_stats = []
-
-    current_day = 0
-
-    for current_time in day_slots:
-        current_time_stats = get_all_states_day_summary(production_line=production_line,
-                                                        start_time_datetime=datetime.fromtimestamp(current_time[0],
-                                                                                                   tz=pytz.timezone(
-                                                                                                       "UTC")),
-                                                        end_time_datetime=datetime.fromtimestamp(current_time[1],
-                                                                                                 tz=pytz.timezone(
-                                                                                                     "UTC")))
-        full_month_week_stats.append({"current_hour_day": current_day, "data": current_time_stats})
-        current_day += 1
-
-    full_month_week = {"OPERATE": 0, "MANUAL": 0, "STOP": 0, "ALARM": 0,
-                       "EMERGENCY": 0, "SUSPEND": 0, "DISCONNECT": 0}
-
-    for day in full_month_week_stats:
-        for state in full_month_week.keys():
-            full_month_week[state] += day["data"][state]
-
-    full_month_week_stats.append({"current_hour_day": current_day, "data": full_month_week})
-
-    pprint.pprint(full_month_week_stats)
+    # The finished days are read from the daily rollups, only the days not rolled up yet are computed live
+    full_month_week_stats = state_summary_slots(get_state_day_matrix(
+        start_day=day_start, day_count=7 if week else number_of_days, production_line=production_line))
 
     # print("Total Time For Program: " + str(time.time() - program_start_time))
 
@@ -4222,22 +3850,18 @@ def get_recent_most_alarm_time(machine_name: str = "T_C_OP912"):
 
     try:
 
-        collection = get_mongo_collection(collection="Alarm_History")
-        # collection = get_mongo_collection(collection="Alarm History")
+        last_alarm = _get_cached_last_alarm(machine_name)
 
-        result_1 = collection.aggregate(get_recent_most_alarm_time_template(machine_name=machine_name))
+        if last_alarm is None:
+            collection = get_mongo_collection(collection="Alarm_History")
+            # collection = get_mongo_collection(collection="Alarm History")
 
-        result = list(result_1)
+            result_1 = collection.aggregate(get_recent_most_alarm_time_template(machine_name=machine_name))
 
-        if result:
-            end_date = result[0]["enddate"]
-            update_date = result[0]["updatedate"]
-            update_date = update_date - timedelta(hours=1)
-
-            print(end_date)
-            print(update_date)
+            last_alarm = _cache_last_alarm(machine_name, list(result_1))
 
-            return end_date, update_date
+        if last_alarm is not None:
+            return _recent_alarm_range(last_alarm)
 
     except Exception as error:
         LOGGER.exception(f"Exception while getting part similar to")
@@ -4259,10 +3883,8 @@ def get_all_machine_spare_details():
         query = select((machine.location, machine.name, spare_part.part_name,
                         machine_part_count.part_signal_name, machine_part_count.latest_update_time,
                         machine_part_count.current_part_count,
-                        (machine_part_count.current_part_count -
-                         spare_part.reference_part_number) > spare_part.warning_limit,
-                        (machine_part_count.current_part_count -
-                         spare_part.reference_part_number) > spare_part.critical_limit)
+                        machine_part_count.current_part_count - spare_part.reference_part_number,
+                        spare_part.warning_limit, spare_part.critical_limit)
                        for machine in Machine
                        for spare_part in SparePart
                        for machine_part_count in MachinePartCount
@@ -4285,11 +3907,17 @@ def get_all_machine_spare_details():
 
         columns = ["location", "machine_name", "internal_parameter_name",
                    "actual_parameter_name", "latest_update_time", "cumulative_part_count",
-                   "is_warning", "is_critical"]
+                   "spare_part_count", "warning_limit", "critical_limit"]
 
         # Create DataFrame from query results
         df = pd.DataFrame(results, columns=columns)
 
+        # A spare part is abnormal once its count (since it was fitted / reset) exceeds the limit
+        condition_codes = evaluate_conditions(df["spare_part_count"], df["warning_limit"], df["critical_limit"],
+                                              "increasing", inclusive=False)
+        df["is_warning"] = condition_codes == WARNING
+        df["is_critical"] = condition_codes == CRITICAL
+
         # Initialize group-level dictionary
         group_json = {
             "group_name": "spare_part_status",
@@ -4393,24 +4021,27 @@ def get_spare_part_states():
     """
 
     try:
-        # Selecting only the parameters that are in warning state, and grouping them by
-        # Parameter Group and getting the count of parameters in the group
-        warning_machine_part = select((part.machine.name, pony_count(part.machine))
-                                      for part in SparePart
-                                      for mpc in MachinePartCount
-                                      if mpc.machine == part.machine and
-                                      (mpc.current_part_count - part.reference_part_number) > part.warning_limit and
-                                      (mpc.current_part_count - part.reference_part_number) < part.critical_limit)
+        # The count (since it was fitted / reset) and the limits of every spare part
+        spare_part_counts = select((part.machine.name, mpc.current_part_count - part.reference_part_number,
+                                    part.warning_limit, part.critical_limit)
+                                   for part in SparePart
+                                   for mpc in MachinePartCount
+                                   if mpc.machine == part.machine)[:]
 
-        warning_machine_part = [cmp[0] for cmp in warning_machine_part]
+        machine_names = [spare_part_count[0] for spare_part_count in spare_part_counts]
 
-        critical_machine_part = select((part.machine.name, pony_count(part.machine))
-                                       for part in SparePart
-                                       for mpc in MachinePartCount
-                                       if mpc.machine == part.machine and
-                                       (mpc.current_part_count - part.reference_part_number) > part.critical_limit)
+        # A spare part is abnormal once its count exceeds the limit
+        condition_codes = evaluate_conditions([spare_part_count[1] for spare_part_count in spare_part_counts],
+                                              [spare_part_count[2] for spare_part_count in spare_part_counts],
+                                              [spare_part_count[3] for spare_part_count in spare_part_counts],
+                                              "increasing", inclusive=False)
 
-        critical_machine_part = [cmp[0] for cmp in critical_machine_part]
+        # Every machine is listed once, in the state of each of its abnormal spare parts
+        warning_machine_part = list(dict.fromkeys(machine_name for machine_name, code in
+                                                  zip(machine_names, condition_codes) if code == WARNING))
+
+        critical_machine_part = list(dict.fromkeys(machine_name for machine_name, code in
+                                                   zip(machine_names, condition_codes) if code == CRITICAL))
 
         LOGGER.info(f"Critical Spare Machine: {critical_machine_part}")
         LOGGER.info(f"Warning Spare Machine: {warning_machine_part}")
@@ -5785,6 +5416,9 @@ def fetch_update_logs_by_name(parameter_name: str) -> List[UpdateLogResponse]:
 
 IST_OFFSET = timedelta(hours=5, minutes=30)
 
+# Number of disconnection intervals per batch of the history cursor
+DISCONNECTION_HISTORY_BATCH_SIZE = 1000
+
 @db_session
 def fetch_update_logs_by_time_range(start_time_epoch: float, end_time_epoch: float) -> List[UpdateLogResponse]:
     """
@@ -5837,278 +5471,68 @@ def fetch_update_logs_by_time_range(start_time_epoch: float, end_time_epoch: flo
         raise
 
 @db_session(optimistic=False)
-def get_real_time_layout_data():
+def get_real_time_layout_data(depth="parameter", fields=None, only_abnormal=False):
     """
     Retrieves real-time parameter data for a specific set of conditions.
 
     Returns a nested JSON structure containing information about lines,
     machines, and their respective parameters.
 
+    :param depth: The deepest level to be built ("line", "machine" or "parameter", "group" is the same as "line")
+    :type depth: str
+
+    :param fields: The parameter fields to be included (all if not given)
+    :type fields: str | list[str] | None
+
+    :param only_abnormal: Whether the machines and parameters in the OK state are left out
+    :type only_abnormal: bool
+
     :return: List of JSON objects representing line data
     :rtype: dict
     """
 
-    # Query the database for relevant data
-    result = select(
-        (m.location,
-         m.name,
-         mp.name,
-         mp.display_name,
-         mp.internal_parameter_name,
-         rtpa.time,
-         rtpa.value,
-         mp.warning_limit,
-         mp.critical_limit,
-         rtpa.parameter_condition.name)
-        for rtpa in RealTimeParameterActive
-        for mp in MachineParameter
-        for pg in ParameterGroup
-        for m in Machine
-        if (
-                rtpa.machine_parameter == mp and
-                mp.parameter_group == pg and
-                mp.machine == m
-        )
-    ).order_by(lambda location, machine_name, parameter_name, display_name, internal_parameter_name, timestamp, value, warn_limit, critical_limit, condition_name: (location, machine_name, parameter_name))
-
-    # Convert the result to a pandas DataFrame
-    columns = ['location', 'machine_name', 'parameter_name',
-               'display_name', 'internal_parameter_name', 'time', 'value', 'warn_limit',
-               'critical_limit', 'condition_name']
-    result_df = pd.DataFrame(result, columns=columns)
-    result_df = result_df.sort_values(by='machine_name', key=lambda col: col.map(alphanumeric_key))
-
-    lines_overview = []
-
-    # Create a nested JSON structure
-    json_list = []
-
-    # Iterate over unique locations (lines)
-    for location, location_data in result_df.groupby('location'):
-        location_json = {'line_name': location, 'machines': [], 'line_state': 'OK',
-                         'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
-
-        # Create a temporary dictionary to track machine counts
-        machine_counts = {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}
-
-        # Iterate over unique machines within the location
-        for machine_name, machine_data in location_data.groupby('machine_name', sort=False):
-            machine_json = {'machine_name': machine_name, 'parameters': [], 'machine_state': 'OK',
-                            'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
-
-            # Iterate over parameter data for the machine
-            for _, row in machine_data.iterrows():
-                # Replace NaN values with None
-                warning_limit = row['warn_limit'] if not pd.isna(row['warn_limit']) else None
-                critical_limit = row['critical_limit'] if not pd.isna(row['critical_limit']) else None
-                parameter_value = None if math.isnan(row['value']) else row['value']
-
-                parameter_json = {
-                    'actual_parameter_name': row['parameter_name'],
-                    'display_name': row['display_name'],
-                    'internal_parameter_name': row['internal_parameter_name'],
-                    'latest_update_time': int(row['time'].timestamp() * 1000),
-                    'parameter_value': parameter_value,
-                    'parameter_state': row['condition_name'],
-                    'warning_limit': warning_limit,
-                    'critical_limit': critical_limit
-                }
+    depth, fields = normalize_layout_options(depth, fields)
 
-                machine_json['parameters'].append(parameter_json)
-
-                # Update counts based on parameter state
-                if row['condition_name'] == 'OK':
-                    machine_json['count']['OK'] += 1
-                elif row['condition_name'] == 'WARNING':
-                    machine_json['count']['WARNING'] += 1
-                elif row['condition_name'] == 'CRITICAL':
-                    machine_json['count']['CRITICAL'] += 1
-
-            # Determine machine state based on counts
-            if machine_json['count']['CRITICAL'] > 0:
-                machine_json['machine_state'] = 'CRITICAL'
-            elif machine_json['count']['WARNING'] > 0:
-                machine_json['machine_state'] = 'WARNING'
-            else:
-                machine_json['machine_state'] = 'OK'
+    return get_snapshot_store().memoize(("real_time_layout_data", depth, fields, only_abnormal),
+                                        lambda: _build_real_time_layout_data(depth, fields, only_abnormal))
 
-            # Update machine counts for the location
-            machine_counts[machine_json['machine_state']] += 1
 
-            location_json['machines'].append(machine_json)
-
-        # Update the line count based on machine counts
-        location_json['count']['OK'] = machine_counts['OK']
-        location_json['count']['WARNING'] = machine_counts['WARNING']
-        location_json['count']['CRITICAL'] = machine_counts['CRITICAL']
+def _build_real_time_layout_data(depth, fields, only_abnormal):
+    """
+    Builds the response of get_real_time_layout_data from the factory snapshot
 
-        # Determine line state based on counts
-        if location_json['count']['CRITICAL'] > 0:
-            location_json['line_state'] = 'CRITICAL'
-        elif location_json['count']['WARNING'] > 0:
-            location_json['line_state'] = 'WARNING'
-        else:
-            location_json['line_state'] = 'OK'
+    :return: List of JSON objects representing line data
+    :rtype: dict
+    """
 
-        json_list.append(location_json)
+    # The layout is per line, so the rows are re-ordered by location, machine (natural order) and parameter name
+    rows = sorted(get_snapshot_store().get_rows(), key=lambda row: (row[2], natural_machine_key(row[3]), row[4]))
+    result_df = pd.DataFrame(rows, columns=SNAPSHOT_COLUMNS)
 
-    response = {"lines": json_list}
+    # Build the nested line / machine structure with array operations, only down to the requested depth
+    response = {"lines": build_line_hierarchy(result_df, depth=depth, fields=fields, only_abnormal=only_abnormal)}
     return response
 
 
 @db_session(optimistic=False)
 def get_real_time_parameters_data_mtlinki_new_layout():
     # Get the PostgreSQL data
-    machines = select(m.name for m in Machine)
-    parameters = select(mp.name for mp in MachineParameter)
-    mongodb_q = select(mpg.mongodb_query for mpg in ParameterGroup)
-
-    # Get the MongoDB collection
-    collection = get_mongo_collection("L1Signal_Pool_Active")
-
-    # Initialize an empty list to store processed data
-    processed_data = []
-
-    # Loop through each machine name from PostgreSQL
-    for machine_name in machines:
-        # Loop through each parameter using regex pattern from PostgreSQL
-        for mongodb_query in mongodb_q:
-            # Define the MongoDB query regex pattern
-            regex_pattern = re.compile(f".*{mongodb_query}.*")
-
-            # MongoDB aggregation pipeline
-            pipeline = [
-                {
-                    '$match': {
-                        'L1Name': machine_name,
-                        'signalname': {'$regex': regex_pattern}
-                    }
-                },
-                {
-                    '$project': {
-                        'L1Name': 1,
-                        'signalname': 1,
-                        'value': 1
-                    }
-                }
-            ]
+    machines = select(m.name for m in Machine)[:]
+    group_queries = dict(select((pg.group_name, pg.mongodb_query) for pg in ParameterGroup)[:])
+    parameter_types = get_parameter_types()
 
-            # Execute the aggregation pipeline
-            result = collection.aggregate(pipeline)
+    # Read every active signal of the machines in one round trip, bucketed by machine and parameter group
+    active_signals = read_active_signals(list(machines), group_queries)
 
-            # Convert the cursor to a list of dictionaries
-            result_list = list(result)
+    # The machine / parameter details and limits come from the in-memory factory snapshot, ordered by line
+    rows = sorted(get_snapshot_store().get_rows(), key=lambda row: (row[2], natural_machine_key(row[3]), row[4]))
+    result_df = pd.DataFrame(rows, columns=SNAPSHOT_COLUMNS)
 
-            # Append the processed data to the list
-            processed_data.extend(result_list)
+    # Overwrite the parameter values with the current MTLINKi values and evaluate their conditions again
+    result_df = merge_active_signals(result_df, active_signals, parameter_types)
 
-    # Convert the processed data to a Pandas DataFrame
-    df = pd.DataFrame(processed_data)
-    LOGGER.info(df)
-
-    # Query the database for relevant data
-    result = select(
-        (pg.group_name,
-         m.location,
-         m.name,
-         mp.name,
-         mp.display_name,
-         mp.internal_parameter_name,
-         rtpa.time,
-         rtpa.value,
-         mp.warning_limit,
-         mp.critical_limit,
-         rtpa.parameter_condition.name)
-
-        for rtpa in RealTimeParameterActive
-        for mp in MachineParameter
-        for pg in ParameterGroup
-        for m in Machine
-        if (
-                rtpa.machine_parameter == mp and
-                mp.parameter_group == pg and
-                mp.machine == m
-
-        )
-    ).order_by(lambda _group_name, machine_location, _machine_name,
-                      parameter_name, display_name, internal_parameter_name, timestamp, value, warn_limit,
-                      _critical_limit, condition_name: (_group_name, machine_location, _machine_name, parameter_name))
-
-    # Convert the result to a pandas DataFrame
-    columns = ['group_name', 'location', 'machine_name', 'parameter_name',
-               'display_name', 'internal_parameter_name', 'time', 'value', 'warn_limit',
-               'critical_limit', 'condition_name']
-    result_df = pd.DataFrame(result, columns=columns)
-    result_df = result_df.sort_values(by='machine_name', key=lambda col: col.map(alphanumeric_key))
-
-    # Create a nested JSON structure
-    json_list = []
-
-    # Iterate over unique locations
-    for location, location_data in result_df.groupby('location'):
-        location_json = {'line_name': location, 'machines': [], 'line_state': 'OK',
-                         'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
-        # Iterate over unique machines within the location
-        for machine_name, machine_data in location_data.groupby('machine_name', sort=False):
-            machine_json = {'machine_name': machine_name, 'parameters': [], 'machine_state': 'OK',
-                            'count': {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}}
-
-            # Initialize counts for the machine
-            machine_count = {'OK': 0, 'WARNING': 0, 'CRITICAL': 0}
-
-            # Iterate over parameter data for the machine
-            for _, row in machine_data.iterrows():
-                # Replace NaN values with None
-                warning_limit = row['warn_limit'] if not pd.isna(row['warn_limit']) else None
-                critical_limit = row['critical_limit'] if not pd.isna(row['critical_limit']) else None
-                parameter_value = None if math.isnan(row['value']) else row['value']
-
-                parameter_json = {
-                    'actual_parameter_name': row['parameter_name'],
-                    'display_name': row['display_name'],
-                    'internal_parameter_name': row['internal_parameter_name'],
-                    'latest_update_time': int(row['time'].timestamp() * 1000),
-                    'parameter_value': parameter_value,
-                    'parameter_state': row['condition_name'],
-                    'warning_limit': warning_limit,
-                    'critical_limit': critical_limit
-                }
-
-                machine_json['parameters'].append(parameter_json)
-
-                # Update counts based on parameter state
-                if row['condition_name'] == 'OK':
-                    machine_count['OK'] += 1
-                elif row['condition_name'] == 'WARNING':
-                    machine_count['WARNING'] += 1
-                elif row['condition_name'] == 'CRITICAL':
-                    machine_count['CRITICAL'] += 1
-
-            # Determine machine state and line count based on machine's counts
-            if machine_count['CRITICAL'] > 0:
-                machine_json['machine_state'] = 'CRITICAL'
-                # Increment the location's critical count also
-                location_json['count']['CRITICAL'] += 1
-            elif machine_count['WARNING'] > 0:
-                machine_json['machine_state'] = 'WARNING'
-                # Increment the location's warning count also
-                location_json['count']['WARNING'] += 1
-            else:
-                # Increment the location's ok count also
-                location_json['count']['OK'] += 1
-
-            machine_json['count'] = machine_count
-            location_json['machines'].append(machine_json)
-
-        # Determine line state based on counts
-        if location_json['count']['CRITICAL'] > 0:
-            location_json['line_state'] = 'CRITICAL'
-        elif location_json['count']['WARNING'] > 0:
-            location_json['line_state'] = 'WARNING'
-
-        json_list.append(location_json)
-
-    response = {"lines": json_list}
+    # Build the nested line / machine structure with array operations
+    response = {"lines": build_line_hierarchy(result_df)}
     return response
 
 
@@ -6134,25 +5558,8 @@ def get_disconnected_machines_data() -> Dict:
     # Get the MongoDB collection
     collection = get_mongo_collection("L1Signal_Pool_Active")
 
-    # MongoDB aggregation pipeline
-    pipeline = [
-        {
-            '$match': {
-                'signalname': 'DISCONNECT'
-            }
-        },
-        {
-            '$project': {
-                '_id': 0,
-                'L1Name': 1,
-                'value': 1,
-                'updatedate': 1
-            }
-        }
-    ]
-
     # Execute the aggregation pipeline
-    result = collection.aggregate(pipeline)
+    result = collection.aggregate(get_disconnected_machines_template())
 
     # Convert the cursor to a list of dictionaries
     disconnected_machines = list(result)
@@ -6162,6 +5569,7 @@ def get_disconnected_machines_data() -> Dict:
 
     return sorted_machines
 
+
 def sort_machines_by_line(machines: List[Dict]) -> Dict[str, List[Dict]]:
     """
     Sorts the machines by line based on the L1Name.
@@ -6172,27 +5580,13 @@ def sort_machines_by_line(machines: List[Dict]) -> Dict[str, List[Dict]]:
     Returns:
         Dict[str, List[Dict]]: A dictionary containing the sorted machines by line.
     """
-    sorted_machines = {
-        "Head": [],
-        "Block": [],
-        "Crank": []
-    }
+    sorted_machines = {line: [] for line in DISCONNECTION_LINES}
 
     for machine in machines:
-        if machine["L1Name"].startswith("T_H_"):
-            sorted_machines["Head"].append(machine)
-        elif machine["L1Name"].startswith("T_B_"):
-            sorted_machines["Block"].append(machine)
-        elif machine["L1Name"].startswith("T_C_"):
-            sorted_machines["Crank"].append(machine)
-        else:
-            line = machine["L1Name"].split("_")[0] ###
-            if line == "H":
-                sorted_machines["Head"].append(machine)
-            elif line == "B":
-                sorted_machines["Block"].append(machine)
-            elif line == "C":
-                sorted_machines["Crank"].append(machine)
+        line = machine_line(machine["L1Name"])
+
+        if line is not None:
+            sorted_machines[line].append(machine)
 
     return sorted_machines
 
@@ -6207,39 +5601,96 @@ def get_disconnection_history_data(l1name: str, from_timestamp: int, to_timestam
 
         collection = get_mongo_collection("L1Signal_Pool")
 
-        pipeline = [
-            {
-                '$match': {
-                    'L1Name': l1name,
-                    'signalname': 'DISCONNECT',
-                    'updatedate': {'$gte': from_datetime_utc, '$lte': to_datetime_utc}
-                }
-            },
-            {
-                '$project': {
-                    '_id': 0,
-                    'L1Name': 1,
-                    'updatedate': 1,
-                    'enddate': 1,
-                    'timespan': 1
-                }
-            }
-        ]
+        result = collection.aggregate(get_disconnection_history_template(l1name, from_datetime_utc, to_datetime_utc))
 
-        result = collection.aggregate(pipeline)
+        return _disconnection_history_items(result)
+
+    except ValueError as ve:
+        LOGGER.error(f"Validation error occurred: {ve}")
+        raise ve
+    except Exception as error:
+        LOGGER.error(f"Failed to fetch disconnection history: {error}")
+        raise HTTPException(status_code=500, detail="Error while fetching disconnection history.")
+
+
+def _disconnection_history_pipeline(l1names: Optional[List[str]], line_prefix: Optional[str], from_timestamp: int,
+                                    to_timestamp: int, limit: Optional[int], cursor: Optional[str]) -> List[Dict]:
+    """
+    Validates the arguments of a disconnection history query and returns its pipeline (one extra interval is read
+    to know whether there is a next page).
+    """
+    from_datetime_utc = convert_ist_epoch_to_utc(from_timestamp)
+    to_datetime_utc = convert_ist_epoch_to_utc(to_timestamp)
+
+    if from_datetime_utc > to_datetime_utc:
+        raise ValueError("The 'from_timestamp' must be earlier than the 'to_timestamp'.")
+
+    if not l1names and not line_prefix:
+        raise ValueError("Either 'l1name' or 'line_prefix' must be given.")
+
+    return get_disconnection_history_page_template(from_datetime_utc, to_datetime_utc, machine_names=l1names,
+                                                   line_prefix=line_prefix,
+                                                   after=decode_disconnection_cursor(cursor) if cursor else None,
+                                                   limit=limit + 1 if limit is not None else None)
 
-        # Convert UTC datetime to IST and prepare the response
-        disconnection_history = [
-            DisconnectionHistoryItem(
-                L1Name=item['L1Name'],
-                updatedate=item['updatedate'].astimezone(timezone(IST_OFFSET)),  # Convert updatedate to IST
-                enddate=item['enddate'].astimezone(timezone(IST_OFFSET)) if item.get('enddate') else None,  # Convert enddate to IST
-                timespan=item['timespan']
-            )
-            for item in result
-        ]
 
-        return disconnection_history
+def encode_disconnection_cursor(item: Dict) -> str:
+    """
+    Returns the cursor of the page following the given interval, "<updatedate epoch ms>.<_id>".
+    """
+    return f"{_datetime_epoch_ms(item['updatedate'])}.{item['_id']}"
+
+
+def decode_disconnection_cursor(cursor: str) -> tuple:
+    """
+    Returns the (updatedate, _id) of the given cursor.
+
+    Raises:
+        ValueError: If the cursor is not valid.
+    """
+    try:
+        epoch_ms, document_id = cursor.split(".", 1)
+        updatedate = datetime.fromtimestamp(int(epoch_ms) / 1000, tz=timezone.utc)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid cursor '{cursor}'.")
+
+    return updatedate, ObjectId(document_id) if ObjectId.is_valid(document_id) else document_id
+
+
+async def get_disconnection_history_page_async(l1names: Optional[List[str]], from_timestamp: int, to_timestamp: int,
+                                               line_prefix: Optional[str] = None, limit: Optional[int] = None,
+                                               cursor: Optional[str] = None) -> Dict:
+    """
+    Retrieves one page of the disconnection history of one or more machines (or of all the machines of a line) with
+    one query of the asynchronous repository.
+
+    Args:
+        l1names (List[str]): Names of the machines.
+        from_timestamp (int): The start of the range, epoch timestamp in seconds (IST).
+        to_timestamp (int): The end of the range, epoch timestamp in seconds (IST).
+        line_prefix (str): Prefix of the names of the machines (e.g. T_B_), used when no names are given.
+        limit (int): Maximum number of intervals of the page, all of them if not given.
+        cursor (str): The next_cursor of the previous page.
+
+    Returns:
+        Dict: The disconnections (history, in IST) and the cursor of the next page (None on the last page).
+    """
+    try:
+        pipeline = _disconnection_history_pipeline(l1names, line_prefix, from_timestamp, to_timestamp, limit, cursor)
+
+        # A page is read in one batch
+        batch_size = min(limit + 1, DISCONNECTION_HISTORY_BATCH_SIZE) if limit is not None else \
+            DISCONNECTION_HISTORY_BATCH_SIZE
+
+        result = await get_mtlinki_repository().aggregate("L1Signal_Pool", pipeline, batch_size=batch_size)
+
+        next_cursor = None
+
+        if limit is not None and len(result) > limit:
+            result = result[:limit]
+            next_cursor = encode_disconnection_cursor(result[-1])
+
+        return {"history": _disconnection_history_items(result), "next_cursor": next_cursor}
 
     except ValueError as ve:
         LOGGER.error(f"Validation error occurred: {ve}")
@@ -6248,6 +5699,59 @@ def get_disconnection_history_data(l1name: str, from_timestamp: int, to_timestam
         LOGGER.error(f"Failed to fetch disconnection history: {error}")
         raise HTTPException(status_code=500, detail="Error while fetching disconnection history.")
 
+
+def stream_disconnection_history_async(l1names: Optional[List[str]], from_timestamp: int, to_timestamp: int,
+                                       line_prefix: Optional[str] = None, limit: Optional[int] = None,
+                                       cursor: Optional[str] = None):
+    """
+    Streams the disconnection history of one or more machines (or of all the machines of a line) batch by batch,
+    the arguments are validated before the stream starts.
+
+    Args:
+        Same as get_disconnection_history_page_async.
+
+    Returns:
+        AsyncIterator[Dict]: The disconnections (in IST), followed by {"next_cursor": ...} when the limit was reached
+        before the end of the range.
+    """
+    pipeline = _disconnection_history_pipeline(l1names, line_prefix, from_timestamp, to_timestamp, limit, cursor)
+
+    async def rows():
+        count, last_item = 0, None
+
+        async for item in get_mtlinki_repository().iterate("L1Signal_Pool", pipeline,
+                                                           batch_size=DISCONNECTION_HISTORY_BATCH_SIZE):
+            if count == limit:
+                yield {"next_cursor": encode_disconnection_cursor(last_item)}
+                return
+
+            yield _disconnection_history_row(item)
+            count, last_item = count + 1, item
+
+    return rows()
+
+
+def _disconnection_history_row(item: Dict) -> Dict:
+    """
+    Converts a DISCONNECT interval (UTC) to a disconnection history row (IST).
+    """
+
+    return {
+        "L1Name": item['L1Name'],
+        "updatedate": item['updatedate'].astimezone(timezone(IST_OFFSET)),  # Convert updatedate to IST
+        "enddate": item['enddate'].astimezone(timezone(IST_OFFSET)) if item.get('enddate') else None,  # Convert enddate to IST
+        "timespan": item['timespan']
+    }
+
+
+def _disconnection_history_items(result) -> List[DisconnectionHistoryItem]:
+    """
+    Converts the DISCONNECT intervals (UTC) to the disconnection history items (IST).
+    """
+
+    return [DisconnectionHistoryItem(**_disconnection_history_row(item)) for item in result]
+
+
 # CONVERTING THE TIMESTAMP
 def convert_ist_epoch_to_utc(epoch_time_ist: int) -> datetime:
     """
@@ -0,0 +1,461 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+MACHINING CYCLE INDEX
+================================
+
+Module that keeps the machining cycles of the dynamic parameters in the ``parameter_cycles`` hypertable, so the
+cycles of a parameter are one indexed range read instead of a segmentation of its raw signal on every request.
+
+A cycle of a dynamic parameter ends on the point whose condition is set (the data collector sets the condition of
+the last point of every cycle) and starts on the point after the end of the previous cycle. The segmenter reads the
+points written after the end of the last indexed cycle (the watermark of the parameter, persisted in
+``parameter_cycle_status``) in batches of ``CYCLE_SEGMENT_BATCH_POINTS``, stores every complete cycle with its summary
+(number of points, min, max, mean and standard deviation of the values, condition) and moves the watermark to the end
+of the last complete cycle, in one transaction. The points of the cycle in progress are read again on the next run.
+On the first run of a parameter the segmenter starts ``CYCLE_INDEX_HORIZON_DAYS`` back and the first (partial) cycle
+is dropped.
+
+The cycles are keyed by (machine_parameters_id, cycle_end): the last N cycles of a parameter are a backward scan of
+that key, their values one range read of the raw points split on the cycle boundaries.
+
+The cycles are compared to the reference signal of their parameter with the Kruskal-Wallis H test (the statistic and
+its p-value).
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * math - For the p-value of the test.
+    * datetime - To convert the cycle times.
+
+    Related 3rd Party Library
+    =============================
+    * numpy - To segment the points and compute the summaries.
+    * pony - To run the sql statements on the timescaledb connection.
+    * psycopg2 - To insert the cycles.
+
+This script contains the following function
+    * ensure_cycle_index_table - Function that creates the hypertable, its index and the status table
+    * segment_points - Function that splits points into complete cycles with their summaries
+    * segment_parameter_cycles - Function that indexes the new cycles of one parameter
+    * segment_cycles - Function that indexes the new cycles of all the dynamic parameters
+    * get_recent_cycles - Function that returns the last indexed cycles of a parameter
+    * get_cycle_values - Function that returns the values and timestamps of indexed cycles
+    * kruskal_wallis - Function that compares a cycle to the reference signal
+    * get_cycle_index_status - Function that returns the watermarks of the parameters
+"""
+
+# Standard library imports
+import logging
+import math
+from datetime import datetime, timedelta, timezone
+
+# Related third party imports
+import numpy as np
+from pony.orm import db_session, select
+from psycopg2.extras import execute_values
+
+# Local application/library specific imports
+from machine_monitoring_app.database.db_utils import PONY_DATABASE, get_recent_cycles_template
+from machine_monitoring_app.database.pony_models import schema_name, MachineParameter
+from machine_monitoring_app.database.timescale_reader import fetch_cycle_points, fetch_realtime_columns
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+# Parameter group of the dynamic (cycle based) parameters
+DYNAMIC_PARAMETER_GROUP_ID = 17
+
+# Number of points read per batch, and maximum number of batches per parameter and run
+CYCLE_SEGMENT_BATCH_POINTS = 200000
+CYCLE_SEGMENT_BATCHES_PER_RUN = 10
+
+# Days of history segmented on the first run of a parameter
+CYCLE_INDEX_HORIZON_DAYS = 30
+
+CYCLE_INDEX_TABLE_STATEMENTS = (
+    f"""CREATE TABLE IF NOT EXISTS {schema_name}.parameter_cycles (
+        machine_parameters_id INTEGER NOT NULL,
+        machine_name TEXT NOT NULL,
+        cycle_start TIMESTAMPTZ NOT NULL,
+        cycle_end TIMESTAMPTZ NOT NULL,
+        point_count INTEGER NOT NULL,
+        min_value DOUBLE PRECISION,
+        max_value DOUBLE PRECISION,
+        mean_value DOUBLE PRECISION,
+        std_value DOUBLE PRECISION,
+        condition_id INTEGER,
+        PRIMARY KEY (machine_parameters_id, cycle_end)
+    )""",
+    f"SELECT create_hypertable('{schema_name}.parameter_cycles', 'cycle_end', if_not_exists => TRUE)",
+    f"""CREATE INDEX IF NOT EXISTS parameter_cycles_machine_cycle_end_idx
+        ON {schema_name}.parameter_cycles (machine_name, cycle_end DESC)""",
+    f"""CREATE TABLE IF NOT EXISTS {schema_name}.parameter_cycle_status (
+        machine_parameters_id INTEGER PRIMARY KEY,
+        watermark TIMESTAMPTZ NOT NULL,
+        indexed_cycles BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )""",
+)
+
+INSERT_CYCLES_STATEMENT = f"""INSERT INTO {schema_name}.parameter_cycles
+    (machine_parameters_id, machine_name, cycle_start, cycle_end, point_count, min_value, max_value, mean_value,
+     std_value, condition_id) VALUES %s
+    ON CONFLICT (machine_parameters_id, cycle_end) DO NOTHING"""
+
+UPDATE_WATERMARK_STATEMENT = f"""INSERT INTO {schema_name}.parameter_cycle_status
+    (machine_parameters_id, watermark, indexed_cycles, updated_at) VALUES (%s, %s, %s, now())
+    ON CONFLICT (machine_parameters_id) DO UPDATE
+    SET watermark = EXCLUDED.watermark,
+        indexed_cycles = {schema_name}.parameter_cycle_status.indexed_cycles + EXCLUDED.indexed_cycles,
+        updated_at = now()"""
+
+CYCLE_COLUMNS = ("cycle_start", "cycle_end", "point_count", "min_value", "max_value", "mean_value", "std_value",
+                 "condition_id")
+
+
+def _from_epoch_milliseconds(value):
+    """
+    Returns the aware UTC datetime of the given epoch milliseconds
+    """
+
+    return datetime.fromtimestamp(float(value) / 1000, timezone.utc)
+
+
+def _epoch_milliseconds(value):
+    """
+    Returns the epoch milliseconds of the given datetime (naive datetimes are taken as UTC)
+    """
+
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+
+    return value.timestamp() * 1000
+
+
+@db_session
+def ensure_cycle_index_table():
+    """
+    Creates the parameter_cycles hypertable, its machine index and the status table when they do not exist
+
+    :return: Nothing
+    :rtype: None
+    """
+
+    for statement in CYCLE_INDEX_TABLE_STATEMENTS:
+        PONY_DATABASE.execute(statement)
+
+
+def segment_points(timestamps, values, conditions, first_cycle_complete=True):
+    """
+    Splits the points into complete cycles, a cycle ending on every point with a condition
+
+    :param timestamps: The times of the points (epoch milliseconds, increasing)
+    :type timestamps: np.ndarray
+
+    :param values: The values of the points
+    :type values: np.ndarray
+
+    :param conditions: The condition identifier of the points (NaN when not the end of a cycle)
+    :type conditions: np.ndarray
+
+    :param first_cycle_complete: If the first point starts a cycle (False when the points may start in the middle of
+                                 a cycle, the points up to the first end are then dropped)
+    :type first_cycle_complete: bool
+
+    :return: The columns of the cycles (cycle_start, cycle_end in epoch milliseconds, point_count, min_value,
+             max_value, mean_value, std_value, condition_id) and the index of the last segmented point (-1 when no
+             cycle ended). The summaries leave out the missing (NaN) values, cycles without any value are dropped
+    :rtype: tuple[dict, int]
+    """
+
+    cycle_ends = np.flatnonzero(~np.isnan(conditions))
+
+    if not len(cycle_ends):
+        return {column: np.empty(0) for column in CYCLE_COLUMNS}, -1
+
+    if first_cycle_complete:
+        starts, ends = np.concatenate(([0], cycle_ends[:-1] + 1)), cycle_ends
+    else:
+        starts, ends = cycle_ends[:-1] + 1, cycle_ends[1:]
+
+    if not len(ends):
+        return {column: np.empty(0) for column in CYCLE_COLUMNS}, int(cycle_ends[-1])
+
+    # The cycles are contiguous, every reduction runs once over the segmented points. Missing samples (NaN) are left
+    # out of the summaries: fmin / fmax ignore them and the sums only add the valid samples
+    segmented = values[starts[0]:ends[-1] + 1]
+    offsets = starts - starts[0]
+    counts = ends - starts + 1
+
+    valid = ~np.isnan(segmented)
+    filled = np.where(valid, segmented, 0.0)
+    valid_counts = np.add.reduceat(valid.astype(np.int64), offsets)
+
+    # Cycles without any valid sample have no summary and are not stored
+    kept = valid_counts > 0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.add.reduceat(filled, offsets) / valid_counts
+        squares = np.add.reduceat(filled * filled, offsets) / valid_counts
+
+    cycles = {"cycle_start": timestamps[starts], "cycle_end": timestamps[ends], "point_count": counts,
+              "min_value": np.fmin.reduceat(segmented, offsets), "max_value": np.fmax.reduceat(segmented, offsets),
+              "mean_value": means, "std_value": np.sqrt(np.maximum(squares - means * means, 0.0)),
+              "condition_id": conditions[ends]}
+
+    return {column: cycle_values[kept] for column, cycle_values in cycles.items()}, int(ends[-1])
+
+
+@db_session
+def _store_cycles(parameter_id, machine_name, cycles, watermark):
+    """
+    Inserts the cycles of the parameter and persists its watermark in one transaction
+    """
+
+    rows = [(parameter_id, machine_name, _from_epoch_milliseconds(start), _from_epoch_milliseconds(end), int(count),
+             float(minimum), float(maximum), float(mean), float(deviation), int(condition))
+            for start, end, count, minimum, maximum, mean, deviation, condition
+            in zip(*(cycles[column] for column in CYCLE_COLUMNS))]
+
+    connection = PONY_DATABASE.get_connection()
+
+    with connection.cursor() as cursor:
+        if rows:
+            execute_values(cursor, INSERT_CYCLES_STATEMENT, rows, page_size=1000)
+
+        cursor.execute(UPDATE_WATERMARK_STATEMENT, (parameter_id, watermark, len(rows)))
+
+    connection.commit()
+
+
+def segment_parameter_cycles(parameter_id, machine_name, watermark, batch_points=CYCLE_SEGMENT_BATCH_POINTS,
+                             max_batches=CYCLE_SEGMENT_BATCHES_PER_RUN):
+    """
+    Indexes the cycles of the parameter that ended after its watermark
+
+    :param parameter_id: The parameter identifier
+    :type parameter_id: int
+
+    :param machine_name: The name of the machine of the parameter
+    :type machine_name: str
+
+    :param watermark: The end of the last indexed cycle, None when the parameter was never segmented
+    :type watermark: datetime | None
+
+    :param batch_points: The number of points read per batch
+    :type batch_points: int
+
+    :param max_batches: The maximum number of batches of this run
+    :type max_batches: int
+
+    :return: The number of indexed cycles
+    :rtype: int
+    """
+
+    first_cycle_complete = watermark is not None
+
+    if watermark is None:
+        watermark = datetime.now(timezone.utc) - timedelta(days=CYCLE_INDEX_HORIZON_DAYS)
+
+    indexed = 0
+
+    for _ in range(max_batches):
+        timestamps, values, conditions = fetch_cycle_points(parameter_id, watermark, batch_points)
+
+        if not len(timestamps):
+            break
+
+        cycles, last_index = segment_points(timestamps, values, conditions, first_cycle_complete)
+
+        if last_index < 0:
+            if len(timestamps) < batch_points:
+                break
+
+            # No cycle ends in a full batch, the cycle is longer than a batch and is skipped
+            LOGGER.warning(f"No cycle end in {batch_points} points of parameter {parameter_id}, skipping them")
+            last_index = len(timestamps) - 1
+            first_cycle_complete = False
+
+        else:
+            first_cycle_complete = True
+
+        watermark = _from_epoch_milliseconds(timestamps[last_index])
+        _store_cycles(parameter_id, machine_name, cycles, watermark)
+        indexed += len(cycles["cycle_end"])
+
+        if len(timestamps) < batch_points:
+            break
+
+    return indexed
+
+
+@db_session
+def _dynamic_parameters():
+    """
+    Returns the identifier, machine name and watermark of every dynamic parameter
+    """
+
+    watermarks = dict(PONY_DATABASE.select(f"SELECT machine_parameters_id, watermark "
+                                           f"FROM {schema_name}.parameter_cycle_status"))
+
+    return [(parameter_id, machine_name, watermarks.get(parameter_id))
+            for parameter_id, machine_name in select((parameter.id, parameter.machine.name)
+                                                     for parameter in MachineParameter
+                                                     if parameter.parameter_group.id == DYNAMIC_PARAMETER_GROUP_ID)]
+
+
+def segment_cycles():
+    """
+    Indexes the new cycles of every dynamic parameter
+
+    :return: The number of indexed cycles
+    :rtype: int
+    """
+
+    indexed = 0
+
+    for parameter_id, machine_name, watermark in _dynamic_parameters():
+        try:
+            indexed += segment_parameter_cycles(parameter_id, machine_name, watermark)
+        except Exception as error:
+            LOGGER.exception(f"Segmenting the cycles of parameter {parameter_id} failed: {error}")
+
+    LOGGER.info(f"Indexed {indexed} cycles")
+
+    return indexed
+
+
+@db_session
+def get_recent_cycles(parameter_id, count, start_time=None, end_time=None):
+    """
+    Returns the last indexed cycles of the parameter (one indexed range read), oldest first
+
+    :param parameter_id: The parameter identifier
+    :type parameter_id: int
+
+    :param count: The maximum number of cycles
+    :type count: int
+
+    :param start_time: Only the cycles that ended at or after this time
+    :type start_time: datetime | None
+
+    :param end_time: Only the cycles that ended at or before this time
+    :type end_time: datetime | None
+
+    :return: The cycles (cycle_start, cycle_end, point_count, min_value, max_value, mean_value, std_value,
+             condition_id)
+    :rtype: list[dict]
+    """
+
+    parameters = {"parameter_id": parameter_id, "count": count}
+    time_filter = ""
+
+    if start_time is not None:
+        time_filter += " AND cycle_end >= $start_time"
+        parameters["start_time"] = start_time
+
+    if end_time is not None:
+        time_filter += " AND cycle_end <= $end_time"
+        parameters["end_time"] = end_time
+
+    rows = PONY_DATABASE.select(get_recent_cycles_template(schema_name, time_filter), parameters)
+
+    return [dict(zip(CYCLE_COLUMNS, row)) for row in reversed(rows)]
+
+
+def get_cycle_values(parameter_id, cycles):
+    """
+    Returns the timestamps and values of the given cycles, read in one range read and split on the cycle boundaries
+
+    :param parameter_id: The parameter identifier
+    :type parameter_id: int
+
+    :param cycles: The cycles (cycle_start, cycle_end), oldest first
+    :type cycles: list[dict]
+
+    :return: The timestamps (epoch milliseconds) and values of every cycle
+    :rtype: list[tuple[np.ndarray, np.ndarray]]
+    """
+
+    if not cycles:
+        return []
+
+    timestamps, values = fetch_realtime_columns(parameter_id, _epoch_milliseconds(cycles[0]["cycle_start"]) / 1000,
+                                                _epoch_milliseconds(cycles[-1]["cycle_end"]) / 1000)
+
+    starts = np.searchsorted(timestamps, [_epoch_milliseconds(cycle["cycle_start"]) for cycle in cycles], "left")
+    ends = np.searchsorted(timestamps, [_epoch_milliseconds(cycle["cycle_end"]) for cycle in cycles], "right")
+
+    return [(timestamps[start:end], values[start:end]) for start, end in zip(starts, ends)]
+
+
+def _average_ranks(values):
+    """
+    Returns the ranks (1 based) of the values, tied values sharing their average rank
+    """
+
+    order = np.argsort(values, kind="mergesort")
+    sorted_values = values[order]
+    first = np.concatenate(([True], sorted_values[1:] != sorted_values[:-1]))
+    group = np.cumsum(first) - 1
+    bounds = np.concatenate((np.flatnonzero(first), [len(values)]))
+
+    ranks = np.empty(len(values))
+    ranks[order] = (bounds[group] + bounds[group + 1] + 1) / 2
+
+    return ranks, np.diff(bounds)
+
+
+def kruskal_wallis(sample, reference):
+    """
+    Compares the values of a cycle to the reference signal with the Kruskal-Wallis H test
+
+    :param sample: The values of the cycle
+    :type sample: np.ndarray | list
+
+    :param reference: The values of the reference signal
+    :type reference: np.ndarray | list
+
+    :return: The H statistic and its p-value (None, None when a signal is empty or all the values are equal)
+    :rtype: tuple[float | None, float | None]
+    """
+
+    sample = np.asarray(sample, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    sample, reference = sample[~np.isnan(sample)], reference[~np.isnan(reference)]
+
+    if not len(sample) or not len(reference):
+        return None, None
+
+    ranks, ties = _average_ranks(np.concatenate((sample, reference)))
+    total = len(ranks)
+    tie_correction = 1 - float(np.sum(ties ** 3 - ties)) / (total ** 3 - total) if total > 1 else 0.0
+
+    if tie_correction <= 0:
+        return None, None
+
+    rank_sums = (ranks[:len(sample)].sum(), ranks[len(sample):].sum())
+    statistic = (12 / (total * (total + 1)) * (rank_sums[0] ** 2 / len(sample) + rank_sums[1] ** 2 / len(reference))
+                 - 3 * (total + 1)) / tie_correction
+
+    # Chi-squared survival function with one degree of freedom (two groups)
+    return float(statistic), math.erfc(math.sqrt(max(statistic, 0.0) / 2))
+
+
+@db_session
+def get_cycle_index_status():
+    """
+    Returns the number of indexed cycles and the watermark of every segmented parameter
+
+    :return: Mapping of the parameter identifier to its watermark, indexed cycles and time of the last update
+    :rtype: dict
+    """
+
+    return {parameter_id: {"watermark": watermark, "indexed_cycles": indexed_cycles, "updated_at": updated_at}
+            for parameter_id, watermark, indexed_cycles, updated_at
+            in PONY_DATABASE.select(f"SELECT machine_parameters_id, watermark, indexed_cycles, updated_at "
+                                    f"FROM {schema_name}.parameter_cycle_status")}
@@ -11,6 +11,10 @@ This script requires the following modules be installed in the python environmen
     * motor - To perform database connection operation in asynchronous way.
 
 This script contains the following function
+    * get_alarm_pareto_template - Function that returns the query ranking the alarms by count and downtime
+    * get_realtime_columns_template - Function that returns the query of the columns of a parameter timeline
+    * get_cycle_points_template - Function that returns the query of the points to be segmented into cycles
+    * get_recent_cycles_template - Function that returns the query of the indexed cycles of a parameter
     * connect_to_mongo - Function that connects to mongodb by creating a client at the start of the application.
     * close_mongo_connection - Function that destroys the connection to mongodb by closing the mongodb client.
 """
@@ -22,13 +26,12 @@ from datetime import timedelta
 
 # Related third party imports
 from pony.orm import Database, set_sql_debug, db_session
-
-# from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient
 # from sqlmodel import Session
 
 # Local application/library specific imports
 # from ..database import MONGODB_URL, MAX_CONNECTIONS_COUNT, MIN_CONNECTIONS_COUNT
-# from .mongodb_client import DATABASE
+from machine_monitoring_app.database.mongodb_client import DATABASE, MONGO_POOLS, get_mongo_url, mongo_client_options
 # from machine_monitoring_app.database import TIMESCALE_ENGINE
 from machine_monitoring_app.utils.global_variables import get_settings
 
@@ -126,32 +129,155 @@ def get_all_recent_time_template():
     return template
 
 
-# async def connect_to_mongo():
-#     """
-#     Function that connects to mongodb by creating a client at the start of the application.
-#
-#     :return: Nothing
-#     :rtype: None
-#     """
-#
-#     LOGGER.info("Creating Mongodb client")
-#     DATABASE.client = AsyncIOMotorClient(str(MONGODB_URL),
-#                                          maxPoolSize=MAX_CONNECTIONS_COUNT,
-#                                          minPoolSize=MIN_CONNECTIONS_COUNT)
-#     LOGGER.info("Connection Created")
-#
-#
-# async def close_mongo_connection():
-#     """
-#     Function that destroys the connection to mongodb by closing the mongodb client.
-#
-#     :return: Nothing
-#     :rtype: None
-#     """
-#
-#     LOGGER.info("Closing Mongodb Connection")
-#     DATABASE.client.close()
-#     LOGGER.info("Closed Mongodb Connection")
+def get_alarm_pareto_template(schema_name: str, machine_filter: str = ""):
+    """
+    Function used to return the query template used to rank the alarms (copied from Alarm_History) of the plant, a
+    line or a machine by count and by total downtime, in one scan of the time range. The template takes the
+    $start_time, $end_time and $top parameters ($line / $machine_name with the filter).
+
+    :param schema_name: The schema of the alarm_history hypertable
+    :type schema_name: str
+
+    :param machine_filter: Additional condition on the line / machine, e.g. "AND line = $line"
+    :type machine_filter: str
+
+    :return: A String containing the sql query
+    :rtype: str
+    """
+
+    template = f"""WITH alarm_totals AS (
+            SELECT alarm_number, min(message) AS message, count(*) AS alarm_count,
+                   sum(COALESCE(timespan, EXTRACT(EPOCH FROM end_time - start_time))) AS downtime_seconds
+            FROM {schema_name}.alarm_history
+            WHERE start_time >= $start_time AND start_time < $end_time {machine_filter}
+            GROUP BY alarm_number
+        ), ranked AS (
+            SELECT alarm_number, message, alarm_count, downtime_seconds,
+                   row_number() OVER (ORDER BY alarm_count DESC, downtime_seconds DESC) AS count_rank,
+                   row_number() OVER (ORDER BY downtime_seconds DESC, alarm_count DESC) AS downtime_rank,
+                   sum(alarm_count) OVER () AS total_count,
+                   sum(downtime_seconds) OVER () AS total_downtime_seconds
+            FROM alarm_totals
+        )
+        SELECT alarm_number, message, alarm_count, downtime_seconds, count_rank, downtime_rank, total_count,
+               total_downtime_seconds
+        FROM ranked
+        WHERE count_rank <= $top OR downtime_rank <= $top
+        """
+
+    return template
+
+
+def get_realtime_columns_template(schema_name: str):
+    """
+    Function used to return the query template used to get the timeline of a parameter as two arrays (time in epoch
+    milliseconds and value, in time order) in a single row. The template takes the %(parameter_id)s, %(start_time)s
+    and %(end_time)s parameters (psycopg2 style).
+
+    :param schema_name: The schema of the real_time_machine_parameters hypertable
+    :type schema_name: str
+
+    :return: A String containing the sql query
+    :rtype: str
+    """
+
+    template = f"""SELECT COALESCE(array_agg((EXTRACT(EPOCH FROM time) * 1000)::double precision ORDER BY time),
+                            '{{}}') AS timestamps,
+               COALESCE(array_agg(value::double precision ORDER BY time), '{{}}') AS parameter_values
+        FROM {schema_name}.real_time_machine_parameters
+        WHERE machine_parameters_id = %(parameter_id)s AND time >= %(start_time)s AND time <= %(end_time)s
+        """
+
+    return template
+
+
+def get_cycle_points_template(schema_name: str):
+    """
+    Function used to return the query template used to get the next points of a parameter after a time as three
+    arrays (time in epoch milliseconds, value and condition identifier, null except on the last point of a cycle). The
+    template takes the %(parameter_id)s, %(after)s and %(limit)s parameters (psycopg2 style).
+
+    :param schema_name: The schema of the real_time_machine_parameters hypertable
+    :type schema_name: str
+
+    :return: A String containing the sql query
+    :rtype: str
+    """
+
+    template = f"""SELECT COALESCE(array_agg((EXTRACT(EPOCH FROM time) * 1000)::double precision ORDER BY time),
+                            '{{}}') AS timestamps,
+               COALESCE(array_agg(value::double precision ORDER BY time), '{{}}') AS parameter_values,
+               COALESCE(array_agg(condition_id ORDER BY time), '{{}}') AS condition_ids
+        FROM (SELECT time, value, condition_id
+              FROM {schema_name}.real_time_machine_parameters
+              WHERE machine_parameters_id = %(parameter_id)s AND time > %(after)s
+              ORDER BY time
+              LIMIT %(limit)s) AS points
+        """
+
+    return template
+
+
+def get_recent_cycles_template(schema_name: str, time_filter: str = ""):
+    """
+    Function used to return the query template used to get the most recent indexed cycles of a parameter, newest
+    first, with one backward range scan of the (machine_parameters_id, cycle_end) key. The template takes the
+    $parameter_id and $count parameters ($start_time / $end_time with the filter).
+
+    :param schema_name: The schema of the parameter_cycles hypertable
+    :type schema_name: str
+
+    :param time_filter: Additional condition on the end of the cycles, e.g. "AND cycle_end <= $end_time"
+    :type time_filter: str
+
+    :return: A String containing the sql query
+    :rtype: str
+    """
+
+    template = f"""SELECT cycle_start, cycle_end, point_count, min_value, max_value, mean_value, std_value,
+               condition_id
+        FROM {schema_name}.parameter_cycles
+        WHERE machine_parameters_id = $parameter_id {time_filter}
+        ORDER BY cycle_end DESC
+        LIMIT $count
+        """
+
+    return template
+
+
+async def connect_to_mongo():
+    """
+    Function that connects to mongodb by creating a client at the start of the application.
+
+    :return: Nothing
+    :rtype: None
+    """
+
+    for pool in MONGO_POOLS:
+        LOGGER.info(f"Creating Mongodb client ({pool})")
+        DATABASE.clients[pool] = AsyncIOMotorClient(get_mongo_url(), **mongo_client_options(pool))
+
+    LOGGER.info("Connection Created")
+
+
+async def close_mongo_connection():
+    """
+    Function that destroys the connection to mongodb by closing the mongodb client.
+
+    :return: Nothing
+    :rtype: None
+    """
+
+    if not DATABASE.clients:
+        return
+
+    LOGGER.info("Closing Mongodb Connection")
+
+    for client in DATABASE.clients.values():
+        client.close()
+
+    DATABASE.clients.clear()
+    LOGGER.info("Closed Mongodb Connection")
 #
 #
 # def get_session():
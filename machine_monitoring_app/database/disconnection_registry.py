@@ -0,0 +1,282 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+LIVE DISCONNECTED MACHINES REGISTRY
+=====================================
+
+Module that keeps the DISCONNECT signal of every machine (L1Signal_Pool_Active) in memory, grouped by line, so the
+disconnected machines are answered without a query.
+
+The registry is fed incrementally by the disconnection watcher:
+
+    * change stream - when the deployment supports one (replica set), every update of a DISCONNECT signal is applied as
+      soon as it is written.
+    * polling - otherwise only the signals updated since the last seen ``updatedate`` (the watermark) are read. The
+      watermark is inclusive and the documents already applied are skipped, so updates written in the same
+      millisecond are not lost.
+
+Every change of the value of a machine is recorded as a transition in a ring buffer (the most recent
+``TRANSITION_BUFFER_SIZE``), under an increasing sequence number used as the cursor of the transitions endpoint. A
+cursor older than the buffer returns ``complete: False``, the client then reloads the full registry.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * threading - To share the registry between the watcher and the routes.
+    * collections - For the ring buffer of the transitions.
+
+    Related 3rd Party Library
+    =============================
+    * pymongo - To read the signals and watch the collection (through mongodb_client).
+
+This script contains the following class and function
+    * machine_line - Function that returns the line of a machine
+    * DisconnectionRegistry - Class that keeps the DISCONNECT signals and their transitions
+    * get_disconnection_registry - Function that returns the registry of the application
+    * get_disconnected_machines_live - Function that returns the disconnected machines from the registry
+"""
+
+# Standard library imports
+import logging
+import threading
+from collections import deque
+from functools import lru_cache
+
+# Related third party imports
+# None
+
+# Local application/library specific imports
+from machine_monitoring_app.database.mongodb_client import get_mongo_collection_active
+from machine_monitoring_app.database.mongo_db_utils import get_disconnected_machines_template
+from machine_monitoring_app.utils.global_variables import get_settings
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+DISCONNECTION_LINES = ("Head", "Block", "Crank")
+
+# Number of the most recent transitions kept in memory
+TRANSITION_BUFFER_SIZE = 1000
+
+_LINE_PREFIXES = {"T_H_": "Head", "T_B_": "Block", "T_C_": "Crank"}
+_LINE_CODES = {"H": "Head", "B": "Block", "C": "Crank"}
+
+
+def machine_line(machine_name):
+    """
+    Returns the line of the given machine from its L1Name (T_H_ / T_B_ / T_C_ or H_ / B_ / C_ prefix)
+
+    :param machine_name: The L1Name of the machine
+    :type machine_name: str
+
+    :return: Head, Block or Crank, None for a machine of no line
+    :rtype: str | None
+    """
+
+    line = _LINE_PREFIXES.get(machine_name[:4])
+
+    return line if line is not None else _LINE_CODES.get(machine_name.split("_")[0])
+
+
+class DisconnectionRegistry:
+    """
+    LIVE DISCONNECTED MACHINES REGISTRY
+    ======================================
+
+    Keeps the DISCONNECT signal of every machine per line and the ring buffer of the recent transitions.
+    """
+
+    def __init__(self, buffer_size=TRANSITION_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._lines = {line: {} for line in DISCONNECTION_LINES}
+        self._transitions = deque(maxlen=buffer_size)
+        self._sequence = 0
+        self._watermark = None
+        self._snapshot = None
+        self.loaded = False
+
+    @property
+    def sequence(self):
+        """
+        The sequence number of the last transition (the cursor of a client that is up to date)
+        """
+
+        return self._sequence
+
+    def apply(self, documents, record_transitions=True):
+        """
+        Applies the given DISCONNECT signals (L1Name, value, updatedate) to the registry
+
+        :param documents: The signals, in updatedate order
+        :type documents: list[dict]
+
+        :param record_transitions: Record the changes of value as transitions (False for the initial load)
+        :type record_transitions: bool
+
+        :return: The number of recorded transitions
+        :rtype: int
+        """
+
+        recorded = 0
+
+        with self._lock:
+            for document in documents:
+                line = machine_line(document["L1Name"])
+
+                if self._watermark is None or document["updatedate"] > self._watermark:
+                    self._watermark = document["updatedate"]
+
+                if line is None:
+                    continue
+
+                machine = {"L1Name": document["L1Name"], "value": document.get("value"),
+                           "updatedate": document["updatedate"]}
+                previous = self._lines[line].get(machine["L1Name"])
+
+                if previous == machine:
+                    continue
+
+                self._lines[line][machine["L1Name"]] = machine
+                self._snapshot = None
+
+                if record_transitions and (previous is None or previous["value"] != machine["value"]):
+                    self._sequence += 1
+                    recorded += 1
+                    self._transitions.append({"sequence": self._sequence, "L1Name": machine["L1Name"], "line": line,
+                                              "value": machine["value"],
+                                              "previous_value": previous["value"] if previous else None,
+                                              "updatedate": machine["updatedate"]})
+
+            self.loaded = True
+
+        return recorded
+
+    def poll(self):
+        """
+        Reads the DISCONNECT signals updated since the watermark (all of them on the first poll) and applies them
+
+        :return: The number of recorded transitions
+        :rtype: int
+        """
+
+        initial = not self.loaded
+        collection = get_mongo_collection_active("L1Signal_Pool_Active")
+
+        documents = list(collection.aggregate(get_disconnected_machines_template(
+            updated_since=None if initial else self._watermark)))
+
+        return self.apply(documents, record_transitions=not initial)
+
+    def watch(self, stop_event=None):
+        """
+        Applies the updates of the DISCONNECT signals from a change stream of L1Signal_Pool_Active until the stream
+        fails or the stop event is set, a poll is made first to catch up with the updates written before the stream
+        opened
+
+        :param stop_event: Event to stop watching
+        :type stop_event: threading.Event | None
+
+        :raises pymongo.errors.PyMongoError: If the deployment does not support change streams or the stream failed
+        """
+
+        collection = get_mongo_collection_active("L1Signal_Pool_Active")
+        pipeline = [{"$match": {"fullDocument.signalname": "DISCONNECT",
+                                "operationType": {"$in": ["insert", "update", "replace"]}}}]
+
+        with collection.watch(pipeline, full_document="updateLookup") as stream:
+            self.poll()
+
+            while stop_event is None or not stop_event.is_set():
+                change = stream.try_next()
+
+                if change is None:
+                    continue
+
+                if change.get("fullDocument") is not None:
+                    self.apply([change["fullDocument"]])
+
+    def get_machines(self):
+        """
+        Returns the DISCONNECT signal of every machine grouped by line (the response of the disconnected machines)
+
+        :return: Mapping of line (Head, Block, Crank) to the list of machines (L1Name, value, updatedate)
+        :rtype: dict
+        """
+
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = {line: list(machines.values()) for line, machines in self._lines.items()}
+
+            return self._snapshot
+
+    def transitions_since(self, cursor, limit=None):
+        """
+        Returns the transitions recorded after the given cursor
+
+        :param cursor: The sequence number of the last transition seen by the client (0 for all the buffered ones)
+        :type cursor: int
+
+        :param limit: Maximum number of returned transitions
+        :type limit: int | None
+
+        :return: The transitions, the cursor of the next call and whether no transition was missed since the given
+                 cursor (False when the client has to reload the machines)
+        :rtype: dict
+        """
+
+        with self._lock:
+            oldest = self._transitions[0]["sequence"] if self._transitions else self._sequence + 1
+            transitions = [transition for transition in self._transitions if transition["sequence"] > cursor]
+
+            if limit is not None:
+                transitions = transitions[:limit]
+
+            # A cursor ahead of the sequence comes from before a restart of the application
+            return {"cursor": transitions[-1]["sequence"] if transitions else self._sequence,
+                    "complete": oldest - 1 <= cursor <= self._sequence,
+                    "transitions": transitions}
+
+    def get_stats(self):
+        """
+        Returns the state of the registry (number of machines per line, buffered transitions and watermark)
+        """
+
+        with self._lock:
+            return {"loaded": self.loaded, "machines": {line: len(machines) for line, machines in self._lines.items()},
+                    "sequence": self._sequence, "buffered_transitions": len(self._transitions),
+                    "watermark": self._watermark}
+
+
+@lru_cache()
+def get_disconnection_registry():
+    """
+    Returns the registry of the application
+
+    :return: The registry
+    :rtype: DisconnectionRegistry
+    """
+
+    return DisconnectionRegistry()
+
+
+def get_disconnected_machines_live():
+    """
+    Returns the disconnected machines grouped by line from the registry, the registry is loaded here when the watcher
+    did not load it yet (and updated here on every call when the watcher is disabled)
+
+    :return: Mapping of line to the list of machines
+    :rtype: dict
+
+    :raises pymongo.errors.PyMongoError: If the registry could not be loaded
+    """
+
+    registry = get_disconnection_registry()
+
+    if not registry.loaded or not get_settings().disconnection_watcher_enabled:
+        registry.poll()
+
+    return registry.get_machines()
+
@@ -0,0 +1,248 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+FACTORY DRILL-DOWN INDEX
+================================
+
+Module that keeps a location -> machine -> parameter index of the factory snapshot, so that the state of one line,
+one machine or one parameter is answered with dictionary lookups instead of building (and filtering) the whole
+factory layout.
+
+The index is built once per snapshot version, with the machines of every line in natural order (the cached
+``natural_machine_key``), and the drill-down responses built from it are memoized against the same version.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+
+    Related 3rd Party Library
+    =============================
+    * pandas - To hold the parameter rows.
+
+This script contains the following function
+    * get_factory_index - Function that returns the index of the current snapshot version
+    * get_line_state - Function that returns the state of one line
+    * get_machine_state - Function that returns the state of one machine
+    * get_parameter_state - Function that returns the state of one parameter
+"""
+
+# Standard library imports
+import logging
+
+# Related third party imports
+import pandas as pd
+
+# Local application/library specific imports
+from machine_monitoring_app.database.snapshot_store import get_snapshot_store, SNAPSHOT_COLUMNS, natural_machine_key
+from machine_monitoring_app.database.hierarchy_builder import build_line_hierarchy, PARAMETER_FIELDS
+from machine_monitoring_app.exception_handling.custom_exceptions import FactoryObjectNotFoundError, \
+    AmbiguousFactoryObjectError
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+
+class FactoryIndex:
+    """
+    FACTORY DRILL-DOWN INDEX
+    ======================================
+
+    Snapshot rows indexed by line, machine and parameter name. Machines are kept in natural order within their line,
+    parameters in name order within their machine.
+    """
+
+    def __init__(self, rows):
+        ordered_rows = sorted(rows, key=lambda row: (row[2], natural_machine_key(row[3]), row[4]))
+
+        # line name -> machine name -> rows of the machine
+        self.lines = {}
+
+        # machine name -> line name
+        self.machine_lines = {}
+
+        # (machine name, parameter name) -> row, parameter names are only unique within a machine
+        self.parameters = {}
+
+        # parameter name -> names of the machines having a parameter of that name
+        self.parameter_machines = {}
+
+        for row in ordered_rows:
+            line_name, machine_name, parameter_name = row[2], row[3], row[4]
+
+            self.lines.setdefault(line_name, {}).setdefault(machine_name, []).append(row)
+            self.machine_lines.setdefault(machine_name, line_name)
+            self.parameters.setdefault((machine_name, parameter_name), row)
+
+            machine_names = self.parameter_machines.setdefault(parameter_name, [])
+
+            if machine_name not in machine_names:
+                machine_names.append(machine_name)
+
+    def line_rows(self, line_name):
+        """
+        Returns the rows of all the machines of the given line
+
+        :param line_name: Name of the line (location)
+        :type line_name: str
+
+        :return: list of rows, or None if the line is not known
+        :rtype: list[tuple] | None
+        """
+
+        machines = self.lines.get(line_name)
+
+        if machines is None:
+            return None
+
+        return [row for machine_rows in machines.values() for row in machine_rows]
+
+    def machine_rows(self, machine_name):
+        """
+        Returns the rows of the given machine (all parameter groups)
+
+        :param machine_name: Name of the machine
+        :type machine_name: str
+
+        :return: list of rows, or None if the machine is not known
+        :rtype: list[tuple] | None
+        """
+
+        line_name = self.machine_lines.get(machine_name)
+
+        if line_name is None:
+            return None
+
+        return self.lines[line_name][machine_name]
+
+    def parameter_row(self, parameter_name, machine_name=None):
+        """
+        Returns the row of the given parameter
+
+        :param parameter_name: Name of the machine parameter
+        :type parameter_name: str
+
+        :param machine_name: Name of the machine of the parameter, only needed if several machines have a parameter
+            of that name
+        :type machine_name: str | None
+
+        :return: The row, or None if the parameter is not known
+        :rtype: tuple | None
+
+        :raises AmbiguousFactoryObjectError: If no machine is given and several machines have the parameter
+        """
+
+        if machine_name is None:
+            machine_names = self.parameter_machines.get(parameter_name, [])
+
+            if len(machine_names) > 1:
+                raise AmbiguousFactoryObjectError(f"Parameter '{parameter_name}' exists on the machines "
+                                                  f"{', '.join(machine_names)}, the machine has to be given")
+
+            if not machine_names:
+                return None
+
+            machine_name = machine_names[0]
+
+        return self.parameters.get((machine_name, parameter_name))
+
+
+def get_factory_index():
+    """
+    Returns the drill-down index of the current snapshot version (built once per version)
+
+    :return: The factory index
+    :rtype: FactoryIndex
+    """
+
+    snapshot_store = get_snapshot_store()
+
+    # The index is only read, so it is shared instead of copied on every lookup
+    return snapshot_store.memoize(("factory_index",), lambda: FactoryIndex(snapshot_store.get_rows()), shared=True)
+
+
+def _build_line(rows):
+    return build_line_hierarchy(pd.DataFrame(rows, columns=SNAPSHOT_COLUMNS), machine_counts=True)[0]
+
+
+def _build_line_state(line_name):
+    rows = get_factory_index().line_rows(line_name)
+
+    if rows is None:
+        raise FactoryObjectNotFoundError(f"Line '{line_name}' is not found")
+
+    return _build_line(rows)
+
+
+def _build_machine_state(machine_name):
+    index = get_factory_index()
+    rows = index.machine_rows(machine_name)
+
+    if rows is None:
+        raise FactoryObjectNotFoundError(f"Machine '{machine_name}' is not found")
+
+    machine_json = _build_line(rows)['machines'][0]
+
+    return {"line_name": index.machine_lines[machine_name], **machine_json}
+
+
+def _build_parameter_state(parameter_name, machine_name):
+    row = get_factory_index().parameter_row(parameter_name, machine_name)
+
+    if row is None:
+        raise FactoryObjectNotFoundError(f"Parameter '{parameter_name}' is not found" +
+                                         (f" on machine '{machine_name}'" if machine_name is not None else ""))
+
+    parameter_json = _build_line([row])['machines'][0]['parameters'][0]
+
+    return {"group_name": row[1], "line_name": row[2], "machine_name": row[3],
+            **{field: parameter_json[field] for field in PARAMETER_FIELDS}}
+
+
+def get_line_state(line_name):
+    """
+    Returns the state of one line with its machines and their parameters
+
+    :param line_name: Name of the line (location)
+    :type line_name: str
+
+    :return: The line dictionary (line_name, machines, line_state, count)
+    :rtype: dict
+    """
+
+    return get_snapshot_store().memoize(("line_state", line_name), lambda: _build_line_state(line_name))
+
+
+def get_machine_state(machine_name):
+    """
+    Returns the state of one machine with its parameters (all parameter groups)
+
+    :param machine_name: Name of the machine
+    :type machine_name: str
+
+    :return: The machine dictionary (line_name, machine_name, parameters, machine_state, count)
+    :rtype: dict
+    """
+
+    return get_snapshot_store().memoize(("machine_state", machine_name), lambda: _build_machine_state(machine_name))
+
+
+def get_parameter_state(parameter_name, machine_name=None):
+    """
+    Returns the state of one parameter
+
+    :param parameter_name: Name of the machine parameter
+    :type parameter_name: str
+
+    :param machine_name: Name of the machine of the parameter, needed if several machines have a parameter of that
+        name
+    :type machine_name: str | None
+
+    :return: The parameter dictionary (group, line and machine name and the parameter fields)
+    :rtype: dict
+    """
+
+    return get_snapshot_store().memoize(("parameter_state", parameter_name, machine_name),
+                                        lambda: _build_parameter_state(parameter_name, machine_name))
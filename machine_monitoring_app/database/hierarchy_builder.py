@@ -0,0 +1,442 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+FACTORY HIERARCHY BUILDER
+================================
+
+Module that builds the nested group / line / machine / parameter JSON structure served by the factory layout end
+points from a flat DataFrame of parameter rows.
+
+The OK / WARNING / CRITICAL / DISCONNECTED counts of machines, lines and groups are computed with array operations
+(factorize, lexsort and bincount) and the nested structure is then emitted in a single pass over the sorted rows,
+instead of nesting three ``groupby`` loops with a ``DataFrame.iterrows()`` per parameter.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+
+    Related 3rd Party Library
+    =============================
+    * numpy - To perform the array operations.
+    * pandas - To handle the parameter rows.
+
+This script contains the following function
+    * normalize_layout_options - Function that validates the depth / fields options of the layout
+    * build_group_hierarchy - Function that builds the group / line / machine structure
+    * build_single_group - Function that builds the structure for one parameter group
+    * build_line_hierarchy - Function that builds the line / machine structure
+"""
+
+# Standard library imports
+import logging
+
+# Related third party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+# None
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+# State names, indexed by their state code
+STATE_NAMES = ('OK', 'WARNING', 'CRITICAL', 'DISCONNECTED')
+
+STATE_CODES = {name: code for code, name in enumerate(STATE_NAMES)}
+
+OK, WARNING, CRITICAL, DISCONNECTED = range(4)
+
+# Levels of the layout structure, from the shallowest to the deepest
+LAYOUT_DEPTHS = ('group', 'line', 'machine', 'parameter')
+
+# Fields of a parameter, in the order they are emitted
+PARAMETER_FIELDS = ('actual_parameter_name', 'display_name', 'internal_parameter_name', 'latest_update_time',
+                    'parameter_value', 'parameter_state', 'warning_limit', 'critical_limit')
+
+# Column conversion of every parameter field (sorted frame, value column, time column, condition column)
+_PARAMETER_FIELD_COLUMNS = {
+    'actual_parameter_name': lambda frame, value, time, condition: frame['parameter_name'].tolist(),
+    'display_name': lambda frame, value, time, condition: frame['display_name'].tolist(),
+    'internal_parameter_name': lambda frame, value, time, condition: frame['internal_parameter_name'].tolist(),
+    'latest_update_time': lambda frame, value, time, condition: _to_epoch_milliseconds(frame[time]),
+    'parameter_value': lambda frame, value, time, condition: _to_python_list(frame[value]),
+    'parameter_state': lambda frame, value, time, condition: frame[condition].tolist(),
+    'warning_limit': lambda frame, value, time, condition: _to_python_list(frame['warn_limit']),
+    'critical_limit': lambda frame, value, time, condition: _to_python_list(frame['critical_limit']),
+}
+
+
+def normalize_layout_options(depth='parameter', fields=None):
+    """
+    Validates the layout options and returns them in their canonical (hashable) form
+
+    :param depth: The deepest level of the structure to be built ("group", "line", "machine" or "parameter")
+    :type depth: str | None
+
+    :param fields: The parameter fields to be included, as a list or a comma separated string (all if not given)
+    :type fields: str | list[str] | tuple[str] | None
+
+    :return: The depth and the parameter fields (in emission order)
+    :rtype: tuple[str, tuple[str]]
+    """
+
+    depth = depth or 'parameter'
+
+    if depth not in LAYOUT_DEPTHS:
+        raise ValueError(f"Invalid depth '{depth}', expected one of {', '.join(LAYOUT_DEPTHS)}")
+
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+
+    if not fields:
+        return depth, PARAMETER_FIELDS
+
+    unknown_fields = set(fields) - set(PARAMETER_FIELDS)
+
+    if unknown_fields:
+        raise ValueError(f"Invalid fields {', '.join(sorted(unknown_fields))}, expected any of "
+                         f"{', '.join(PARAMETER_FIELDS)}")
+
+    return depth, tuple(field for field in PARAMETER_FIELDS if field in fields)
+
+
+def _to_python_list(series):
+    """
+    Converts a column to a list of python objects, with the missing values (NaN / None) replaced by None
+
+    :param series: The column to be converted
+    :type series: pd.Series
+
+    :return: list of python objects
+    :rtype: list
+    """
+
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _to_epoch_milliseconds(series):
+    """
+    Converts a datetime column to epoch milliseconds, missing timestamps are returned as 0
+
+    :param series: The datetime column to be converted
+    :type series: pd.Series
+
+    :return: list of epoch times in milliseconds
+    :rtype: list[int]
+    """
+
+    timestamps = pd.to_datetime(series, utc=True)
+    missing = timestamps.isna().to_numpy()
+
+    epoch_ms = (timestamps.dt.tz_localize(None).to_numpy(dtype='datetime64[ms]').astype(np.int64))
+    epoch_ms[missing] = 0
+
+    return epoch_ms.tolist()
+
+
+def _state_of(counts, with_disconnected=False, sizes=None):
+    """
+    Computes the state code of every row of a count matrix (one column per state code)
+
+    CRITICAL if anything is critical, else WARNING if anything is in warning, else OK. When with_disconnected is set,
+    an item whose members are all disconnected (count equal to its size) is DISCONNECTED.
+
+    :param counts: Matrix of counts, one row per item, one column per state code
+    :type counts: np.ndarray
+
+    :param with_disconnected: Whether the disconnected state is to be considered
+    :type with_disconnected: bool
+
+    :param sizes: Number of members of every item, required when with_disconnected is set
+    :type sizes: np.ndarray | None
+
+    :return: Array of state codes
+    :rtype: np.ndarray
+    """
+
+    states = np.select([counts[:, CRITICAL] > 0, counts[:, WARNING] > 0], [CRITICAL, WARNING], OK)
+
+    if with_disconnected:
+        states = np.where(counts[:, DISCONNECTED] == sizes, DISCONNECTED, states)
+
+    return states
+
+
+def _count_dict(counts, states):
+    return {STATE_NAMES[state]: int(counts[state]) for state in states}
+
+
+def _build(frame, group_column=None, value_column='value', time_column='time', condition_column='condition_name',
+           with_disconnected=False, machine_counts=False, depth='parameter', fields=PARAMETER_FIELDS,
+           only_abnormal=False):
+    """
+    Builds the nested structure for the given parameter rows
+
+    Groups and lines are ordered by name, machines keep the order in which they first appear within their line (the
+    rows are expected to be sorted by machine name already) and parameters keep their row order.
+
+    The levels below depth are not built at all (the parameter columns are only converted when parameters are
+    emitted, and only for the requested fields). With only_abnormal, machines and parameters in the OK state are
+    left out, the counts still cover everything.
+
+    :return: list of group dictionaries when group_column is given, else list of line dictionaries
+    :rtype: list[dict]
+    """
+
+    # Rows without a group, line or machine are left out, as the groupby of the legacy builders did (factorize would
+    # give them the code -1 and they would be counted in the last line / group)
+    key_columns = ['location', 'machine_name'] + ([group_column] if group_column is not None else [])
+    has_keys = frame[key_columns].notna().all(axis=1)
+
+    if not has_keys.all():
+        frame = frame[has_keys]
+
+    total_rows = len(frame)
+
+    if not total_rows:
+        return []
+
+    states = STATE_NAMES if with_disconnected else STATE_NAMES[:3]
+    state_range = range(len(states))
+    count_width = len(STATE_NAMES)
+
+    # Integer codes for every level, groups and lines sorted by name, machines in order of appearance
+    if group_column is None:
+        group_codes, group_names = np.zeros(total_rows, dtype=np.int64), np.array([None], dtype=object)
+    else:
+        group_codes, group_names = pd.factorize(frame[group_column], sort=True)
+
+    line_codes, line_names = pd.factorize(frame['location'], sort=True)
+    machine_codes = frame.groupby([group_codes, line_codes, frame['machine_name'].to_numpy()],
+                                  sort=False).ngroup().to_numpy()
+
+    order = np.lexsort((np.arange(total_rows), machine_codes, line_codes, group_codes))
+
+    group_codes = group_codes[order]
+    line_codes = line_codes[order]
+    machine_codes = machine_codes[order]
+
+    # Boundaries of every machine / line / group segment in the sorted rows
+    machine_start = np.flatnonzero(np.r_[True, machine_codes[1:] != machine_codes[:-1]])
+    machine_index = np.cumsum(np.r_[True, machine_codes[1:] != machine_codes[:-1]]) - 1
+    machine_end = np.r_[machine_start[1:], total_rows]
+
+    # Parameter state codes, anything else (no condition yet) is not counted
+    parameter_states = frame[condition_column].map(STATE_CODES).to_numpy(dtype=float)[order]
+    counted = ~np.isnan(parameter_states)
+    if not with_disconnected:
+        counted &= parameter_states != DISCONNECTED
+
+    # Parameter counts for every machine
+    machine_count_matrix = np.zeros((len(machine_start), count_width), dtype=np.int64)
+    np.add.at(machine_count_matrix, (machine_index[counted], parameter_states[counted].astype(np.int64)), 1)
+
+    machine_states = _state_of(machine_count_matrix, with_disconnected, machine_end - machine_start)
+
+    # Machine counts for every line, and line counts for every group
+    machine_line = line_codes[machine_start]
+    machine_group = group_codes[machine_start]
+
+    line_key = machine_group * len(line_names) + machine_line
+    line_start = np.flatnonzero(np.r_[True, line_key[1:] != line_key[:-1]])
+    line_index = np.cumsum(np.r_[True, line_key[1:] != line_key[:-1]]) - 1
+
+    line_count_matrix = np.zeros((len(line_start), count_width), dtype=np.int64)
+    np.add.at(line_count_matrix, (line_index, machine_states), 1)
+    line_states = _state_of(line_count_matrix)
+
+    line_group = machine_group[line_start]
+    group_count_matrix = np.zeros((len(group_names), count_width), dtype=np.int64)
+    np.add.at(group_count_matrix, line_group, line_count_matrix)
+    group_states = _state_of(group_count_matrix)
+
+    depth_level = LAYOUT_DEPTHS.index(depth)
+
+    # Without a group level the shallowest structure is the lines
+    if group_column is None:
+        depth_level = max(depth_level, LAYOUT_DEPTHS.index('line'))
+
+    # Group depth, only the group states and counts are needed
+    if depth_level == LAYOUT_DEPTHS.index('group'):
+        return [{'group_name': group_names[group], 'group_state': STATE_NAMES[group_states[group]],
+                 'count': _count_dict(group_count_matrix[group], state_range)}
+                for group in range(len(group_names))]
+
+    with_machines = depth_level >= LAYOUT_DEPTHS.index('machine')
+
+    lines = []
+    for line, machine in enumerate(line_start.tolist()):
+        line_json = {'line_name': line_names[machine_line[machine]]}
+
+        if with_machines:
+            line_json['machines'] = []
+
+        line_json['line_state'] = STATE_NAMES[line_states[line]]
+        line_json['count'] = _count_dict(line_count_matrix[line], state_range)
+        lines.append(line_json)
+
+    if with_machines:
+        sorted_frame = frame.iloc[order]
+        machine_names = sorted_frame['machine_name'].to_numpy()[machine_start].tolist()
+
+        with_parameters = depth_level == LAYOUT_DEPTHS.index('parameter')
+
+        # Only the requested parameter fields are converted to python objects, once, in sorted order
+        if with_parameters:
+            columns = [_PARAMETER_FIELD_COLUMNS[field](sorted_frame, value_column, time_column, condition_column)
+                       for field in fields]
+            abnormal = parameter_states != OK
+
+        # Single pass emission of the machines (and parameters)
+        for machine, (start, end) in enumerate(zip(machine_start.tolist(), machine_end.tolist())):
+
+            if only_abnormal and machine_states[machine] == OK:
+                continue
+
+            machine_json = {'machine_name': machine_names[machine]}
+
+            if with_parameters and only_abnormal:
+                machine_json['parameters'] = [dict(zip(fields, [column[row] for column in columns]))
+                                              for row in range(start, end) if abnormal[row]]
+
+            elif with_parameters:
+                machine_json['parameters'] = [dict(zip(fields, row_values))
+                                              for row_values in zip(*[column[start:end] for column in columns])]
+
+            machine_json['machine_state'] = STATE_NAMES[machine_states[machine]]
+
+            if machine_counts:
+                machine_json['count'] = _count_dict(machine_count_matrix[machine], state_range)
+
+            lines[line_index[machine]]['machines'].append(machine_json)
+
+    if group_column is None:
+        return lines
+
+    group_lines = [[] for _ in range(len(group_names))]
+    for line, line_json in enumerate(lines):
+        group_lines[line_group[line]].append(line_json)
+
+    return [{'group_name': group_names[group], 'group_details': group_lines[group],
+             'group_state': STATE_NAMES[group_states[group]],
+             'count': _count_dict(group_count_matrix[group], state_range)}
+            for group in range(len(group_names)) if group_lines[group]]
+
+
+def build_group_hierarchy(frame, value_column='value', time_column='time', condition_column='condition_name',
+                          with_disconnected=False, depth='parameter', fields=PARAMETER_FIELDS, only_abnormal=False):
+    """
+    Builds the group / line / machine / parameter structure of the factory layout
+
+    :param frame: Parameter rows with the columns group_name, location, machine_name, parameter_name, display_name,
+     internal_parameter_name, warn_limit, critical_limit and the value, time and condition columns
+    :type frame: pd.DataFrame
+
+    :param value_column: Name of the column holding the parameter value
+    :type value_column: str
+
+    :param time_column: Name of the column holding the parameter update time
+    :type time_column: str
+
+    :param condition_column: Name of the column holding the parameter condition name
+    :type condition_column: str
+
+    :param with_disconnected: Whether the DISCONNECTED state is counted
+    :type with_disconnected: bool
+
+    :param depth: The deepest level to be built ("group", "line", "machine" or "parameter")
+    :type depth: str
+
+    :param fields: The parameter fields to be included (see normalize_layout_options)
+    :type fields: tuple[str]
+
+    :param only_abnormal: Whether the machines and parameters in the OK state are left out
+    :type only_abnormal: bool
+
+    :return: list of group dictionaries, sorted by group name
+    :rtype: list[dict]
+    """
+
+    return _build(frame, group_column='group_name', value_column=value_column, time_column=time_column,
+                  condition_column=condition_column, with_disconnected=with_disconnected, depth=depth, fields=fields,
+                  only_abnormal=only_abnormal)
+
+
+def build_single_group(frame, group_name, value_column='value', time_column='time',
+                       condition_column='condition_name', with_disconnected=False):
+    """
+    Builds the line / machine / parameter structure of one parameter group
+
+    :param frame: Parameter rows of the parameter group (see build_group_hierarchy for the columns)
+    :type frame: pd.DataFrame
+
+    :param group_name: Name of the parameter group
+    :type group_name: str
+
+    :param value_column: Name of the column holding the parameter value
+    :type value_column: str
+
+    :param time_column: Name of the column holding the parameter update time
+    :type time_column: str
+
+    :param condition_column: Name of the column holding the parameter condition name
+    :type condition_column: str
+
+    :param with_disconnected: Whether the DISCONNECTED state is counted
+    :type with_disconnected: bool
+
+    :return: The group dictionary
+    :rtype: dict
+    """
+
+    lines = _build(frame, value_column=value_column, time_column=time_column, condition_column=condition_column,
+                   with_disconnected=with_disconnected)
+
+    states = STATE_NAMES if with_disconnected else STATE_NAMES[:3]
+
+    count = {state: sum(line['count'][state] for line in lines) for state in states}
+
+    group_state = 'CRITICAL' if count['CRITICAL'] > 0 else 'WARNING' if count['WARNING'] > 0 else 'OK'
+
+    return {'group_name': group_name, 'group_details': lines, 'group_state': group_state, 'count': count}
+
+
+def build_line_hierarchy(frame, value_column='value', time_column='time', condition_column='condition_name',
+                         machine_counts=True, depth='parameter', fields=PARAMETER_FIELDS, only_abnormal=False):
+    """
+    Builds the line / machine / parameter structure of the factory layout (all parameter groups together)
+
+    :param frame: Parameter rows (see build_group_hierarchy for the columns)
+    :type frame: pd.DataFrame
+
+    :param value_column: Name of the column holding the parameter value
+    :type value_column: str
+
+    :param time_column: Name of the column holding the parameter update time
+    :type time_column: str
+
+    :param condition_column: Name of the column holding the parameter condition name
+    :type condition_column: str
+
+    :param machine_counts: Whether every machine carries the count of its parameter states
+    :type machine_counts: bool
+
+    :param depth: The deepest level to be built ("line", "machine" or "parameter")
+    :type depth: str
+
+    :param fields: The parameter fields to be included (see normalize_layout_options)
+    :type fields: tuple[str]
+
+    :param only_abnormal: Whether the machines and parameters in the OK state are left out
+    :type only_abnormal: bool
+
+    :return: list of line dictionaries, sorted by line name
+    :rtype: list[dict]
+    """
+
+    return _build(frame, value_column=value_column, time_column=time_column, condition_column=condition_column,
+                  machine_counts=machine_counts, depth=depth, fields=fields, only_abnormal=only_abnormal)
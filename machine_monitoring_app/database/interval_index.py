@@ -0,0 +1,470 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+IN-MEMORY INTERVAL INDEX
+================================
+
+Module that keeps the intervals (``updatedate`` .. ``enddate``) of the machines - the state intervals of
+L1Signal_Pool and the alarms of Alarm_History - in memory for a sliding horizon (the last
+``INTERVAL_INDEX_HORIZON_DAYS`` setting), so the overlap queries of the recent windows no longer need the four
+exceed / within / between template variants.
+
+The intervals of every machine and key (state) are held in an ``IntervalSet``, arrays sorted by start with
+
+    * the running maximum of the ends - the first interval that can overlap an instant is found by bisection, the
+      static equivalent of an (augmented) interval tree.
+    * the prefix sums of the sorted starts and ends - the time covered up to an instant t is
+
+          covered(t) = sum(t - start, start < t) - sum(t - end, end < t)
+
+      so the covered duration of any window is two bisections.
+
+Overlap, contained, "active at time T" and covered duration queries are therefore logarithmic in the number of
+intervals (plus the size of the answer).
+
+The index is loaded once for the horizon and then extended incrementally with the intervals that ended since the
+last refresh (re-reading ``INTERVAL_INDEX_REWIND_SECONDS`` to catch late writes, the already indexed intervals being
+skipped), the intervals that left the horizon are dropped. A window is answered from the index when it starts inside
+the horizon and ends before the last refresh plus the ``INTERVAL_INDEX_MAX_LAG_SECONDS`` setting, otherwise the
+callers query MongoDB.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * threading - To swap the refreshed interval sets safely.
+    * re - To select the machines of a production line.
+
+    Related 3rd Party Library
+    =============================
+    * numpy - To perform the array operations.
+    * pandas - To convert the interval timestamps.
+
+This script contains the following class and function
+    * epoch_milliseconds - Function that converts datetimes to epoch milliseconds
+    * IntervalSet - Class that answers the queries on the sorted intervals of one machine and key
+    * IntervalIndex - Class that keeps the interval sets of all the machines for the horizon
+    * fetch_alarm_intervals - Function that returns the alarms overlapping a time range
+    * get_alarm_interval_index - Function that returns the alarm interval index of the application
+"""
+
+# Standard library imports
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+# Related third party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from machine_monitoring_app.database.mongodb_client import get_mongo_collection
+from machine_monitoring_app.database.mongo_db_utils import get_alarm_intervals_template, MATCH_ALL_PATTERNS
+from machine_monitoring_app.utils.global_variables import get_settings
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds re-read before the last indexed end on every refresh, for the intervals written late
+INTERVAL_INDEX_REWIND_SECONDS = 60
+
+_EPOCH = pd.Timestamp(0, tz="UTC")
+
+
+def epoch_milliseconds(timestamps):
+    """
+    Converts the given datetimes (naive datetimes are taken as UTC, like they are stored in the database) to epoch
+    milliseconds
+
+    :param timestamps: The datetimes
+    :type timestamps: list | pd.Series
+
+    :return: The epoch milliseconds
+    :rtype: np.ndarray
+    """
+
+    timestamps = pd.DatetimeIndex(pd.to_datetime(timestamps, utc=True))
+
+    return np.asarray((timestamps - _EPOCH) // pd.Timedelta(milliseconds=1), dtype=np.int64)
+
+
+class IntervalSet:
+    """
+    INTERVAL SET
+    ======================================
+
+    The intervals of one machine and key sorted by start, with the running maximum of the ends and the prefix sums
+    of the starts and ends. The set is never modified, a refresh builds a new one. A zero-length interval is returned
+    by the contained / overlapping queries and covers no time.
+    """
+
+    __slots__ = ("starts", "ends", "payload", "max_ends", "sorted_ends", "start_sums", "end_sums")
+
+    def __init__(self, starts, ends, payload=None):
+        starts, ends = np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+        order = np.argsort(starts, kind="stable")
+
+        self.starts, self.ends = starts[order], ends[order]
+        self.payload = {name: np.asarray(values)[order] for name, values in (payload or {}).items()}
+        self.max_ends = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+        self.sorted_ends = np.sort(self.ends)
+
+        # Epoch milliseconds, the sums of a set (one machine and key) stay far below the int64 range
+        self.start_sums = np.concatenate(([0], np.cumsum(self.starts)))
+        self.end_sums = np.concatenate(([0], np.cumsum(self.sorted_ends)))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlapping(self, start_ms, end_ms):
+        """
+        Returns the positions of the intervals overlapping the window (start < window end and end > window start)
+        """
+
+        first = np.searchsorted(self.max_ends, start_ms, side="right")
+        last = np.searchsorted(self.starts, end_ms, side="left")
+        candidates = np.arange(first, max(first, last))
+
+        return candidates[self.ends[candidates] > start_ms]
+
+    def contained(self, start_ms, end_ms):
+        """
+        Returns the positions of the intervals inside the window (start >= window start and end <= window end)
+        """
+
+        first = np.searchsorted(self.starts, start_ms, side="left")
+        last = np.searchsorted(self.starts, end_ms, side="right")
+        candidates = np.arange(first, max(first, last))
+
+        return candidates[self.ends[candidates] <= end_ms]
+
+    def active_at(self, instant_ms):
+        """
+        Returns the positions of the intervals active at the instant (start <= instant < end)
+        """
+
+        first = np.searchsorted(self.max_ends, instant_ms, side="right")
+        last = np.searchsorted(self.starts, instant_ms, side="right")
+        candidates = np.arange(first, max(first, last))
+
+        return candidates[self.ends[candidates] > instant_ms]
+
+    def covered_until(self, instants_ms):
+        """
+        Returns the time (ms) covered by the intervals up to every given instant, overlapping intervals are all
+        counted, the covered duration of a window is the difference at its two edges
+
+        :param instants_ms: The instants in epoch milliseconds
+        :type instants_ms: np.ndarray
+
+        :return: The covered time up to every instant in milliseconds
+        :rtype: np.ndarray
+        """
+
+        instants_ms = np.asarray(instants_ms, dtype=np.int64)
+
+        started = np.searchsorted(self.starts, instants_ms, side="right")
+        ended = np.searchsorted(self.sorted_ends, instants_ms, side="right")
+
+        return (started * instants_ms - self.start_sums[started]) - (ended * instants_ms - self.end_sums[ended])
+
+    def rows(self, positions):
+        """
+        Returns the start, end and payload arrays of the given positions
+        """
+
+        return {"start_ms": self.starts[positions], "end_ms": self.ends[positions],
+                **{name: values[positions] for name, values in self.payload.items()}}
+
+
+class IntervalIndex:
+    """
+    INTERVAL INDEX
+    ======================================
+
+    Keeps the interval set of every (machine, key) for the sliding horizon, loaded with the given loader and
+    extended incrementally on every refresh.
+
+    The loader is called with a time range in epoch seconds and returns the intervals overlapping it as a DataFrame
+    with the columns machine_name, key, start_ms, end_ms and the payload columns. An interval read again is recognised
+    by its start, end and identity (payload) columns.
+    """
+
+    def __init__(self, name, loader, payload_columns=(), identity_columns=()):
+        self.name = name
+        self._loader = loader
+        self._payload_columns = tuple(payload_columns)
+        self._identity_columns = tuple(identity_columns)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._sets = {}
+        self._horizon = None
+        self._watermark_ms = None
+        self._stats = {"refreshes": 0, "loaded_intervals": 0, "last_refresh_ms": 0.0}
+
+    @property
+    def loaded(self):
+        return self._horizon is not None
+
+    def _build_sets(self, intervals):
+        sets = {}
+
+        # Zero-length intervals are kept (the alarm counts include them), they add nothing to the covered durations
+        intervals = intervals[intervals["end_ms"] >= intervals["start_ms"]]
+
+        for (machine_name, key), group in intervals.groupby(["machine_name", "key"], sort=False):
+            sets[(machine_name, int(key))] = IntervalSet(group["start_ms"].to_numpy(), group["end_ms"].to_numpy(),
+                                                         {column: group[column].to_numpy()
+                                                          for column in self._payload_columns})
+
+        return sets
+
+    def _merge(self, sets, intervals, horizon_start_ms):
+        """
+        Returns the given sets extended with the new intervals (the already indexed ones skipped) and without the
+        intervals that left the horizon, the untouched sets are kept as they are
+        """
+
+        columns = ("start_ms", "end_ms") + self._payload_columns
+        identity = ("start_ms", "end_ms") + self._identity_columns
+        new_sets = self._build_sets(intervals) if len(intervals) else {}
+        merged = {}
+
+        for set_key in set(sets) | set(new_sets):
+            current, new = sets.get(set_key), new_sets.get(set_key)
+
+            if new is None and current.sorted_ends[0] > horizon_start_ms:
+                merged[set_key] = current
+                continue
+
+            rows = current.rows(slice(None)) if current is not None else None
+
+            if new is not None:
+                new_rows = new.rows(slice(None))
+
+                if rows is not None:
+                    # Only the intervals of the current set ending in the re-read range can be read again
+                    recent = current.ends >= new.ends.min()
+                    known = set(zip(*(rows[column][recent].tolist() for column in identity)))
+                    keep = np.fromiter((row not in known for row in zip(*(new_rows[column].tolist()
+                                                                          for column in identity))),
+                                       dtype=bool, count=len(new))
+
+                    new_rows = {column: np.concatenate((rows[column], new_rows[column][keep])) for column in columns}
+
+                rows = new_rows
+
+            alive = rows["end_ms"] > horizon_start_ms
+
+            if alive.any():
+                merged[set_key] = IntervalSet(rows["start_ms"][alive], rows["end_ms"][alive],
+                                              {column: rows[column][alive] for column in self._payload_columns})
+
+        return merged
+
+    def refresh(self, now=None):
+        """
+        Loads the index for the horizon on the first call, extends it with the intervals that ended since the
+        previous refresh on the next calls
+
+        :param now: The end of the horizon in epoch seconds (defaults to now)
+        :type now: float | None
+
+        :return: The number of intervals read
+        :rtype: int
+        """
+
+        with self._refresh_lock:
+            start_time = time.perf_counter()
+            now = time.time() if now is None else now
+
+            settings = get_settings()
+            horizon_start_ms = int((now - settings.interval_index_horizon_days * 86400) * 1000)
+
+            if self._watermark_ms is None:
+                intervals = self._loader(horizon_start_ms / 1000, now)
+                sets = self._build_sets(intervals)
+            else:
+                intervals = self._loader(self._watermark_ms / 1000 - INTERVAL_INDEX_REWIND_SECONDS, now)
+                sets = self._merge(self._sets, intervals, horizon_start_ms)
+
+            if len(intervals):
+                watermark_ms = int(intervals["end_ms"].max())
+                self._watermark_ms = max(self._watermark_ms or watermark_ms, watermark_ms)
+            elif self._watermark_ms is None:
+                self._watermark_ms = horizon_start_ms
+
+            with self._lock:
+                self._sets = sets
+                self._horizon = (horizon_start_ms, int(now * 1000))
+                self._stats["refreshes"] += 1
+                self._stats["loaded_intervals"] += len(intervals)
+                self._stats["last_refresh_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+
+        LOGGER.debug(f"Refreshed the {self.name} interval index with {len(intervals)} intervals")
+
+        return len(intervals)
+
+    def covers(self, start_ms, end_ms):
+        """
+        Returns whether the window can be answered from the index, it starts inside the horizon and ends before the
+        last refresh plus the INTERVAL_INDEX_MAX_LAG_SECONDS setting
+        """
+
+        with self._lock:
+            horizon = self._horizon
+
+        if horizon is None:
+            return False
+
+        return horizon[0] <= start_ms and end_ms <= horizon[1] + get_settings().interval_index_max_lag_seconds * 1000
+
+    def _snapshot(self):
+        with self._lock:
+            return self._sets
+
+    def machine_sets(self, production_line=r".*"):
+        """
+        Returns the interval sets of the machines of the production line (regex searched in the name of the machine,
+        like the $regex of the templates)
+
+        :param production_line: Name (regex) of production line or machine
+        :type production_line: str
+
+        :return: Mapping of (machine name, key) to the interval set
+        :rtype: dict
+        """
+
+        sets = self._snapshot()
+
+        if production_line in MATCH_ALL_PATTERNS:
+            return dict(sets)
+
+        pattern = re.compile(production_line)
+
+        return {set_key: interval_set for set_key, interval_set in sets.items() if pattern.search(set_key[0])}
+
+    def covered_matrix(self, bucket_edges_ms, key_count, production_line=r".*"):
+        """
+        Returns the time (in seconds) covered by the intervals of every key in every bucket, summed over the machines
+        of the production line
+
+        :param bucket_edges_ms: The increasing edges of the contiguous buckets in epoch milliseconds
+        :type bucket_edges_ms: np.ndarray
+
+        :param key_count: The number of keys
+        :type key_count: int
+
+        :param production_line: Name (regex) of production line or machine
+        :type production_line: str
+
+        :return: The key x bucket matrix of durations in seconds
+        :rtype: np.ndarray
+        """
+
+        bucket_edges_ms = np.asarray(bucket_edges_ms, dtype=np.int64)
+        covered = np.zeros((key_count, len(bucket_edges_ms)), dtype=np.int64)
+
+        for (_, key), interval_set in self.machine_sets(production_line).items():
+            if 0 <= key < key_count:
+                covered[key] += interval_set.covered_until(bucket_edges_ms)
+
+        return np.diff(covered, axis=1) / 1000
+
+    def overlapping(self, machine_name, key, start_ms, end_ms):
+        """
+        Returns the intervals of the machine and key overlapping the window (start_ms, end_ms and payload arrays)
+        """
+
+        interval_set = self._snapshot().get((machine_name, key))
+
+        if interval_set is None:
+            return None
+
+        return interval_set.rows(interval_set.overlapping(start_ms, end_ms))
+
+    def contained(self, machine_name, key, start_ms, end_ms):
+        """
+        Returns the intervals of the machine and key inside the window (start_ms, end_ms and payload arrays)
+        """
+
+        interval_set = self._snapshot().get((machine_name, key))
+
+        if interval_set is None:
+            return None
+
+        return interval_set.rows(interval_set.contained(start_ms, end_ms))
+
+    def active_keys(self, machine_name, instant_ms):
+        """
+        Returns the keys (states) of the machine active at the instant
+        """
+
+        return sorted(key for (name, key), interval_set in self._snapshot().items()
+                      if name == machine_name and len(interval_set.active_at(instant_ms)))
+
+    def get_stats(self):
+        """
+        Returns the horizon, the number of machines / intervals and the refresh statistics of the index
+        """
+
+        with self._lock:
+            return {"loaded": self._horizon is not None,
+                    "horizon_ms": list(self._horizon) if self._horizon else None,
+                    "machines": len({machine_name for machine_name, _ in self._sets}),
+                    "intervals": sum(len(interval_set) for interval_set in self._sets.values()),
+                    **self._stats}
+
+
+def fetch_alarm_intervals(start_time, end_time):
+    """
+    Returns the alarms of all the machines overlapping the given time range (one query)
+
+    :param start_time: The start of the range in epoch seconds
+    :type start_time: float
+
+    :param end_time: The end of the range in epoch seconds
+    :type end_time: float
+
+    :return: The alarms (machine_name, key 0, start_ms, end_ms, message, timespan)
+    :rtype: pd.DataFrame
+    """
+
+    collection = get_mongo_collection(collection="Alarm_History")
+
+    documents = list(collection.aggregate(get_alarm_intervals_template(
+        start_time_datetime=datetime.fromtimestamp(start_time, tz=timezone.utc),
+        end_time_datetime=datetime.fromtimestamp(end_time, tz=timezone.utc))))
+
+    if not documents:
+        return pd.DataFrame({"machine_name": pd.Series(dtype=object), "key": pd.Series(dtype=np.int64),
+                             "start_ms": pd.Series(dtype=np.int64), "end_ms": pd.Series(dtype=np.int64),
+                             "message": pd.Series(dtype=object), "timespan": pd.Series(dtype=float)})
+
+    alarms = pd.DataFrame(documents)
+
+    return pd.DataFrame({"machine_name": alarms["L1Name"].to_numpy(),
+                         "key": np.zeros(len(alarms), dtype=np.int64),
+                         "start_ms": epoch_milliseconds(alarms["updatedate"]),
+                         "end_ms": epoch_milliseconds(alarms["enddate"]),
+                         "message": alarms["message"].to_numpy(),
+                         "timespan": alarms["timespan"].to_numpy()})
+
+
+@lru_cache()
+def get_alarm_interval_index():
+    """
+    Returns the alarm interval index of the application (one key per machine, the message and timespan of the alarms
+    as payload)
+
+    :return: The index
+    :rtype: IntervalIndex
+    """
+
+    return IntervalIndex("alarm", fetch_alarm_intervals, payload_columns=("message", "timespan"),
+                         identity_columns=("message",))
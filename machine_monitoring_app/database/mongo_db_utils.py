@@ -29,6 +29,32 @@ __author__ = "smt18m005@iiitdm.ac.in"
 
 LOGGER = logging.getLogger(__name__)
 
+# Production line patterns matching every machine
+MATCH_ALL_PATTERNS = ("", ".*", "^.*", ".*$", "^.*$")
+
+
+def machine_name_match(production_line: str = r".*"):
+    """
+    Returns the L1Name condition of a $match stage for the given production line / machine pattern. A pattern
+    matching every machine adds no condition, so the query is not forced to scan the L1Name of every document. Other
+    patterns are anchored at the start of the name (a line or machine name is a prefix of its machine names), so the
+    condition is a bounded range of the L1Name index instead of a scan of every key.
+
+    :param production_line: Name (regex) of production line or machine
+    :type production_line: str
+
+    :return: The condition to be merged into the $match stage
+    :rtype: dict
+    """
+
+    if production_line is None or production_line in MATCH_ALL_PATTERNS:
+        return {}
+
+    if not production_line.startswith("^"):
+        production_line = "^" + production_line
+
+    return {'L1Name': {'$regex': re.compile(production_line)}}
+
 
 def get_count_group_template(start_time_datetime: datetime, end_time_datetime: datetime, machine_name: str):
     """
@@ -118,21 +144,30 @@ def get_real_time_data_mtlinki(start_time_datetime: datetime, end_time_datetime:
     return real_time_data
 
 
-def get_machine_states_mtlinki(regex_pattern: str):
+def get_machine_states_mtlinki(regex_pattern: str = None, signal_names: list = None):
     """
     Return the mtlinki aggregation template to get the current state of all factory machines within a specified
     parameter group using the MT-Linki interface.
 
+    When the exact signal names of the parameter group are given, they are matched with an ``$in`` query (which can
+    use the signalname index) instead of the regex.
+
     :param regex_pattern: The regex for the parameter group to be queried
+    :param signal_names: The exact signal names of the parameter group to be queried
 
     :return:
     :rtype:
     """
 
+    if signal_names is not None:
+        signal_match = {'$in': list(signal_names)}
+    else:
+        signal_match = re.compile(rf"{regex_pattern}")
+
     real_time_data = [
         {
             '$match': {
-                'signalname': re.compile(rf"{regex_pattern}")
+                'signalname': signal_match
             }
         }, {
             '$project': {
@@ -147,6 +182,38 @@ def get_machine_states_mtlinki(regex_pattern: str):
     return real_time_data
 
 
+def get_active_signals_mtlinki(machine_names: list):
+    """
+    Return the mtlinki aggregation template to get the current value of every signal of the given machines from the
+    active signal pool in a single query.
+
+    :param machine_names: The names (L1Name) of the machines to be queried
+
+    :return:
+    :rtype:
+    """
+
+    active_signals = [
+        {
+            '$match': {
+                'L1Name': {
+                    '$in': list(machine_names)
+                }
+            }
+        }, {
+            '$project': {
+                '_id': 0,
+                'L1Name': 1,
+                'signalname': 1,
+                'value': 1,
+                'updatedate': 1
+            }
+        }
+    ]
+
+    return active_signals
+
+
 def get_value_before_requested_data_mtlinki(start_time_datetime: datetime,
                                             machine_name: str, parameter_name: str):
     """
@@ -309,6 +376,39 @@ def get_timeline_group_template(start_time_datetime: datetime, end_time_datetime
     return timeline_group
 
 
+def get_alarm_summary_facet_template(start_time_datetime: datetime, end_time_datetime: datetime, machine_name: str):
+    """
+    Function used to return the aggregation template for the full alarm summary (counts, timespans and timeline) of
+    a machine in a single scan of the matching alarms. The template returns one document with the count_data,
+    timespan_data and timeline_data lists (the stages of the count, timespan and timeline group templates).
+
+    :param start_time_datetime: The start time of the query
+    :param end_time_datetime: The end time of the query
+    :param machine_name: The name of the machine
+
+    :return:
+    :rtype:
+    """
+
+    template_arguments = {"start_time_datetime": start_time_datetime, "end_time_datetime": end_time_datetime,
+                          "machine_name": machine_name}
+
+    count_group = get_count_group_template(**template_arguments)
+
+    alarm_summary = [
+        count_group[0],
+        {
+            '$facet': {
+                'count_data': count_group[1:],
+                'timespan_data': get_timespan_group_template(**template_arguments)[1:],
+                'timeline_data': get_timeline_group_template(**template_arguments)[1:]
+            }
+        }
+    ]
+
+    return alarm_summary
+
+
 def get_recent_most_alarm_time_template(machine_name: str):
     """
     Function used to return the aggregation template for getting the recent most available time for
@@ -349,9 +449,7 @@ def get_exceed_group_template(start_time_datetime: datetime, end_time_datetime:
         {
             '$match': {
                 'signalname': signalname,
-                'L1Name': {
-                    '$regex': re.compile(production_line)
-                },
+                **machine_name_match(production_line),
                 'value': True
             }
         }, {
@@ -409,9 +507,7 @@ def get_exceed_group_day_template(start_time_datetime: datetime, end_time_dateti
         {
             '$match': {
                 'signalname': signalname,
-                'L1Name': {
-                    '$regex': re.compile(production_line)
-                },
+                **machine_name_match(production_line),
                 'value': True
             }
         }, {
@@ -452,11 +548,7 @@ def get_within_group_template(start_time_datetime: datetime, end_time_datetime:
                 'signalname': signalname
             }
         }, {
-            '$match': {
-                'L1Name': {
-                    '$regex': re.compile(production_line)
-                }
-            }
+            '$match': machine_name_match(production_line)
         }, {
             '$match': {
                 'updatedate': {
@@ -510,11 +602,7 @@ def get_within_group_day_template(start_time_datetime: datetime, end_time_dateti
                 'signalname': signalname
             }
         }, {
-            '$match': {
-                'L1Name': {
-                    '$regex': re.compile(production_line)
-                }
-            }
+            '$match': machine_name_match(production_line)
         }, {
             '$match': {
                 'updatedate': {
@@ -547,9 +635,7 @@ def get_between_head_group_template(start_time_datetime: datetime, end_time_date
         {
             '$match': {
                 'signalname': signalname,
-                'L1Name': {
-                    '$regex': re.compile(production_line)
-                },
+                **machine_name_match(production_line),
                 'value': True
             }
         }, {
@@ -624,9 +710,7 @@ def get_between_head_group_day_template(start_time_datetime: datetime, end_time_
         {
             '$match': {
                 'signalname': signalname,
-                'L1Name': {
-                    '$regex': re.compile(production_line)
-                },
+                **machine_name_match(production_line),
                 'value': True
             }
         }, {
@@ -680,9 +764,7 @@ def get_between_tail_group_template(start_time_datetime: datetime, end_time_date
         {
             '$match': {
                 'signalname': signalname,
-                'L1Name': {
-                    '$regex': re.compile(production_line)
-                },
+                **machine_name_match(production_line),
                 'value': True
             }
         }, {
@@ -753,9 +835,7 @@ def get_between_tail_group_day_template(start_time_datetime: datetime, end_time_
         {
             '$match': {
                 'signalname': signalname,
-                'L1Name': {
-                    '$regex': re.compile(production_line)
-                },
+                **machine_name_match(production_line),
                 'value': True
             }
         }, {
@@ -803,6 +883,427 @@ def get_between_tail_group_day_template(start_time_datetime: datetime, end_time_
     return between_tail_group_4
 
 
+def get_state_intervals_template(start_time_datetime: datetime, end_time_datetime: datetime, signalnames: list,
+                                 production_line: str = r".*"):
+    """
+    Get the template for all the state intervals (of the given states) overlapping the given time range, the
+    intervals are returned as they are stored (not clipped to the time range)
+
+    :param start_time_datetime: The start time of the range
+    :type start_time_datetime: datetime
+
+    :param end_time_datetime: The end time of the range
+    :type end_time_datetime: datetime
+
+    :param signalnames: The state signal names (OPERATE, MANUAL, STOP ...)
+    :type signalnames: list
+
+    :param production_line: Name (regex) of production line or machine
+    :type production_line: str
+
+    :return: The aggregation pipeline
+    :rtype: list
+    """
+
+    state_intervals = [
+        {
+            '$match': {
+                'signalname': {
+                    '$in': list(signalnames)
+                },
+                **machine_name_match(production_line),
+                'value': True,
+                'updatedate': {
+                    '$lt': end_time_datetime
+                },
+                'enddate': {
+                    '$gt': start_time_datetime
+                }
+            }
+        }, {
+            '$project': {
+                '_id': 0,
+                'L1Name': 1,
+                'signalname': 1,
+                'updatedate': 1,
+                'enddate': 1
+            }
+        }
+    ]
+
+    return state_intervals
+
+
+def get_ended_state_intervals_template(ended_since: datetime, signalnames: list):
+    """
+    Get the template for the state intervals of all the machines (of the given states) that ended after the given
+    time, the intervals are written to the pool only once they end
+
+    :param ended_since: The watermark, the enddate after which the intervals are read
+    :type ended_since: datetime
+
+    :param signalnames: The state signal names (OPERATE, MANUAL, STOP ...)
+    :type signalnames: list
+
+    :return: The aggregation pipeline
+    :rtype: list
+    """
+
+    ended_state_intervals = [
+        {
+            '$match': {
+                'signalname': {
+                    '$in': list(signalnames)
+                },
+                'enddate': {
+                    '$gt': ended_since
+                },
+                'value': True
+            }
+        }, {
+            '$project': {
+                '_id': 0,
+                'updatedate': 1,
+                'enddate': 1
+            }
+        }
+    ]
+
+    return ended_state_intervals
+
+
+def get_alarm_intervals_template(start_time_datetime: datetime, end_time_datetime: datetime):
+    """
+    Get the template for the alarms of all the machines overlapping the given time range (Alarm_History), the alarms
+    are returned as they are stored (not clipped to the time range)
+
+    :param start_time_datetime: The start time of the range
+    :type start_time_datetime: datetime
+
+    :param end_time_datetime: The end time of the range
+    :type end_time_datetime: datetime
+
+    :return: The aggregation pipeline
+    :rtype: list
+    """
+
+    alarm_intervals = [
+        {
+            '$match': {
+                'enddate': {
+                    '$gt': start_time_datetime
+                },
+                'updatedate': {
+                    '$lt': end_time_datetime
+                }
+            }
+        }, {
+            '$project': {
+                '_id': 0,
+                'L1Name': 1,
+                'message': 1,
+                'timespan': 1,
+                'updatedate': 1,
+                'enddate': 1
+            }
+        }
+    ]
+
+    return alarm_intervals
+
+
+def get_alarm_history_sync_template(ended_since: datetime = None, inclusive: bool = True, limit: int = 5000):
+    """
+    Get the template for the next batch of alarms of all the machines to be copied to timescaledb (Alarm_History),
+    in enddate order from the watermark
+
+    :param ended_since: The watermark, the enddate of the last copied alarm (None for all the alarms)
+    :type ended_since: datetime | None
+
+    :param inclusive: Read the alarms ending at the watermark again (they are upserted)
+    :type inclusive: bool
+
+    :param limit: The number of alarms of the batch
+    :type limit: int
+
+    :return: The aggregation pipeline
+    :rtype: list
+    """
+
+    enddate_match = {'$ne': None}
+
+    if ended_since is not None:
+        enddate_match = {'$gte' if inclusive else '$gt': ended_since}
+
+    alarm_history = [
+        {
+            '$match': {
+                'enddate': enddate_match
+            }
+        }, {
+            '$sort': {
+                'enddate': 1
+            }
+        }, {
+            '$limit': limit
+        }, {
+            '$project': {
+                '_id': 0,
+                'L1Name': 1,
+                'number': 1,
+                'type': 1,
+                'message': 1,
+                'timespan': 1,
+                'updatedate': 1,
+                'enddate': 1
+            }
+        }
+    ]
+
+    return alarm_history
+
+
+def get_state_rollup_summary_template(start_day: int, end_day: int, production_line: str = r".*"):
+    """
+    Get the template for the state durations of the rolled up days, summed per day and state over all the machines
+    of the production line
+
+    :param start_day: The start of the first day in epoch seconds
+    :type start_day: int
+
+    :param end_day: The end of the last day (exclusive) in epoch seconds
+    :type end_day: int
+
+    :param production_line: Name (regex) of production line or machine
+    :type production_line: str
+
+    :return: The aggregation pipeline
+    :rtype: list
+    """
+
+    rollup_summary = [
+        {
+            '$match': {
+                'day': {
+                    '$gte': start_day,
+                    '$lt': end_day
+                },
+                **machine_name_match(production_line),
+            }
+        }, {
+            '$group': {
+                '_id': {
+                    'day': '$day',
+                    'state': '$state'
+                },
+                'TOTAL_TIME_SECONDS': {
+                    '$sum': '$seconds'
+                }
+            }
+        }
+    ]
+
+    return rollup_summary
+
+
+def get_disconnected_machines_template(updated_since: datetime = None):
+    """
+    Get the template for the DISCONNECT signal of all the machines (L1Signal_Pool_Active), optionally only the
+    signals updated since the given time (in updatedate order)
+
+    :param updated_since: Only the signals updated at or after this time, None for all the signals
+    :type updated_since: datetime | None
+
+    :return: The aggregation pipeline
+    :rtype: list
+    """
+
+    match = {'signalname': 'DISCONNECT'}
+
+    if updated_since is not None:
+        match['updatedate'] = {'$gte': updated_since}
+
+    disconnected_machines = [
+        {
+            '$match': match
+        },
+        {
+            '$project': {
+                '_id': 0,
+                'L1Name': 1,
+                'value': 1,
+                'updatedate': 1
+            }
+        }
+    ]
+
+    if updated_since is not None:
+        disconnected_machines.append({'$sort': {'updatedate': 1}})
+
+    return disconnected_machines
+
+
+def get_disconnection_history_template(machine_name: str, start_time_datetime: datetime,
+                                       end_time_datetime: datetime):
+    """
+    Get the template for the DISCONNECT intervals of a machine starting between the given times (L1Signal_Pool)
+
+    :param machine_name: Name of the machine
+    :type machine_name: str
+
+    :param start_time_datetime: The start time of the range
+    :type start_time_datetime: datetime
+
+    :param end_time_datetime: The end time of the range
+    :type end_time_datetime: datetime
+
+    :return: The aggregation pipeline
+    :rtype: list
+    """
+
+    disconnection_history = [
+        {
+            '$match': {
+                'L1Name': machine_name,
+                'signalname': 'DISCONNECT',
+                'updatedate': {'$gte': start_time_datetime, '$lte': end_time_datetime}
+            }
+        },
+        {
+            '$project': {
+                '_id': 0,
+                'L1Name': 1,
+                'updatedate': 1,
+                'enddate': 1,
+                'timespan': 1
+            }
+        }
+    ]
+
+    return disconnection_history
+
+
+def get_disconnection_history_page_template(start_time_datetime: datetime, end_time_datetime: datetime,
+                                            machine_names: list = None, line_prefix: str = None, after: tuple = None,
+                                            limit: int = None):
+    """
+    Get the template for one page of the DISCONNECT intervals of one or more machines starting between the given
+    times (L1Signal_Pool), in (updatedate, _id) order. The next page starts after the (updatedate, _id) of the last
+    interval of the previous one (keyset pagination), so every page is one index range scan.
+
+    :param start_time_datetime: The start time of the range
+    :type start_time_datetime: datetime
+
+    :param end_time_datetime: The end time of the range
+    :type end_time_datetime: datetime
+
+    :param machine_names: Names of the machines (all the machines of the line prefix if not given)
+    :type machine_names: list[str] | None
+
+    :param line_prefix: Prefix of the names of the machines, e.g. T_B_ (used when no machine names are given)
+    :type line_prefix: str | None
+
+    :param after: (updatedate, _id) of the last interval of the previous page, None for the first page
+    :type after: tuple | None
+
+    :param limit: Maximum number of intervals, None for all of them
+    :type limit: int | None
+
+    :return: The aggregation pipeline
+    :rtype: list
+    """
+
+    match = {
+        'signalname': 'DISCONNECT',
+        'updatedate': {'$gte': start_time_datetime, '$lte': end_time_datetime}
+    }
+
+    if machine_names:
+        match['L1Name'] = {'$in': list(machine_names)}
+    elif line_prefix:
+        match['L1Name'] = {'$regex': f'^{re.escape(line_prefix)}'}
+
+    if after is not None:
+        match['$or'] = [
+            {'updatedate': {'$gt': after[0]}},
+            {'updatedate': after[0], '_id': {'$gt': after[1]}}
+        ]
+
+    disconnection_history = [
+        {
+            '$match': match
+        },
+        {
+            '$sort': {'updatedate': 1, '_id': 1}
+        }
+    ]
+
+    if limit is not None:
+        disconnection_history.append({'$limit': limit})
+
+    disconnection_history.append(
+        {
+            '$project': {
+                'L1Name': 1,
+                'updatedate': 1,
+                'enddate': 1,
+                'timespan': 1
+            }
+        }
+    )
+
+    return disconnection_history
+
+
+def get_parameter_history_template(machine_name: str, signalname: str, start_time_datetime: datetime,
+                                   end_time_datetime: datetime):
+    """
+    Get the template for the values of a machine signal within the given times, in time order (L1Signal_Pool)
+
+    :param machine_name: Name of the machine
+    :type machine_name: str
+
+    :param signalname: Name of the signal (parameter)
+    :type signalname: str
+
+    :param start_time_datetime: The start time of the range
+    :type start_time_datetime: datetime
+
+    :param end_time_datetime: The end time of the range
+    :type end_time_datetime: datetime
+
+    :return: The aggregation pipeline
+    :rtype: list
+    """
+
+    parameter_history = [
+        {
+            '$match': {
+                'L1Name': machine_name,
+                'signalname': signalname,
+                'updatedate': {'$gte': start_time_datetime},
+                'enddate': {'$lte': end_time_datetime}
+            }
+        },
+        {
+            '$sort': {
+                'updatedate': 1
+            }
+        },
+        {
+            '$project': {
+                'updatedate': 1,
+                'enddate': 1,
+                'timespan': 1,
+                'value': 1,
+                'signalname': 1
+            }
+        }
+    ]
+
+    return parameter_history
+
+
 def part_signal_aggregate_template():
     """
     Function used to return the aggregate query template to get the part count signal names and their counts
@@ -814,7 +1315,7 @@ def part_signal_aggregate_template():
     all_part_count_registers = [
         {
             '$match': {
-                'signalname': re.compile(r"d9388(?i)")
+                'signalname': re.compile(r"(?i)d9388")
             }
         }, {
             '$sort': {
@@ -845,7 +1346,7 @@ def part_signal_query_with_time(input_timestamp: datetime):
     all_part_count_data = [
         {
             '$match': {
-                'signalname': re.compile(r"d9388(?i)"),
+                'signalname': re.compile(r"(?i)d9388"),
                 'updatedate': {
                     '$gt': input_timestamp
                 }
@@ -0,0 +1,326 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+MTLINKI INDEX BOOTSTRAP AND PIPELINE EXPLAIN CHECKER
+=====================================================
+
+Module that creates the compound indexes the aggregation templates of ``mongo_db_utils`` need on the MTLINKi
+collections, and checks with ``explain`` that the templates use them.
+
+Every template is explained (``executionStats``) with representative arguments, a template is flagged when its plan
+contains a collection scan (COLLSCAN) or when it examines many more documents than it returns
+(``docsExamined / nReturned`` above ``MAX_EXAMINED_RATIO``).
+
+All the functions take the database as argument (``client["MTLINKi"]``), so they run the same against the
+production server, a local mongod or an in-process stand-in providing ``index_information``, ``create_index``,
+``drop_index`` and ``command``.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * datetime - To build the representative arguments of the templates.
+
+    Related 3rd Party Library
+    =============================
+    * pymongo - To create the indexes.
+
+This script contains the following function
+    * ensure_indexes - Function that creates the missing required indexes
+    * representative_pipelines - Function that returns every template with representative arguments
+    * explain_pipeline - Function that explains one pipeline
+    * summarize_explain - Function that extracts the stages and the examined / returned counts of an explain result
+    * check_pipelines - Function that explains the templates and flags the ones not using an index
+"""
+
+# Standard library imports
+import logging
+from datetime import datetime, timedelta, timezone
+
+# Related third party imports
+from pymongo import ASCENDING, DESCENDING
+
+# Local application/library specific imports
+from machine_monitoring_app.database.mongo_db_utils import get_count_group_template, get_real_time_data_mtlinki, \
+    get_machine_states_mtlinki, get_active_signals_mtlinki, get_value_before_requested_data_mtlinki, \
+    get_recent_active_pool_value, get_timespan_group_template, get_timeline_group_template, \
+    get_recent_most_alarm_time_template, get_exceed_group_template, get_exceed_group_day_template, \
+    get_within_group_template, get_within_group_day_template, get_between_head_group_template, \
+    get_between_head_group_day_template, get_between_tail_group_template, get_between_tail_group_day_template, \
+    get_state_intervals_template, get_state_rollup_summary_template, get_disconnected_machines_template, \
+    get_disconnection_history_template, get_parameter_history_template, part_signal_aggregate_template, \
+    part_signal_query_with_time, get_disconnection_history_page_template, get_alarm_intervals_template, \
+    get_ended_state_intervals_template
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+# Maximum accepted number of examined documents per returned document
+MAX_EXAMINED_RATIO = 10
+
+# Compound indexes of every collection, the keys follow the equality - sort - range order of the templates
+REQUIRED_INDEXES = {
+    "L1Signal_Pool": [
+        # Timelines, parameter / disconnection history (L1Name, signalname equality, updatedate range)
+        [("L1Name", ASCENDING), ("signalname", ASCENDING), ("updatedate", ASCENDING)],
+        # Value before the requested range (sorted by enddate)
+        [("L1Name", ASCENDING), ("signalname", ASCENDING), ("enddate", DESCENDING)],
+        # State intervals / durations of all (or a regex of) machines
+        [("signalname", ASCENDING), ("updatedate", ASCENDING), ("enddate", ASCENDING)],
+        # Keyset pages of the disconnection history of several machines / a line
+        [("signalname", ASCENDING), ("updatedate", ASCENDING), ("_id", ASCENDING)],
+        # Incremental reads of the interval index (intervals ended since the last refresh)
+        [("signalname", ASCENDING), ("enddate", ASCENDING)],
+    ],
+    "L1Signal_Pool_Active": [
+        [("signalname", ASCENDING), ("L1Name", ASCENDING)],
+        [("L1Name", ASCENDING), ("signalname", ASCENDING)],
+        # Incremental reads by updatedate watermark
+        [("updatedate", ASCENDING)],
+    ],
+    "L1Signal_Pool_Active_2": [
+        [("updatedate", ASCENDING)],
+        [("signalname", ASCENDING)],
+    ],
+    "Alarm_History": [
+        [("L1Name", ASCENDING), ("updatedate", ASCENDING), ("enddate", ASCENDING)],
+        [("L1Name", ASCENDING), ("enddate", DESCENDING)],
+        # Alarms of all the machines ended since the last refresh of the interval index
+        [("enddate", ASCENDING)],
+    ],
+}
+
+
+def _index_name(keys):
+    return "mm_" + "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+def ensure_indexes(database, required_indexes=None):
+    """
+    Creates the missing required indexes. An index already existing with the same keys (whatever its name) is left
+    as it is, an index holding the name of a required index with other keys (a changed definition) is dropped and
+    created again with the required keys.
+
+    :param database: The MTLINKi database
+    :type database: Database
+
+    :param required_indexes: Mapping of collection name to its list of index keys, defaults to REQUIRED_INDEXES
+    :type required_indexes: dict | None
+
+    :return: The names of the existing, created and replaced indexes of every collection
+    :rtype: dict
+    """
+
+    report = {}
+
+    for collection, indexes in (required_indexes or REQUIRED_INDEXES).items():
+        existing = {name: [tuple(key) for key in information["key"]]
+                    for name, information in database[collection].index_information().items()}
+        existing_names = {tuple(keys): name for name, keys in existing.items()}
+        collection_report = report.setdefault(collection, {"existing": [], "created": [], "replaced": []})
+
+        for keys in indexes:
+            keys = [tuple(key) for key in keys]
+            name = _index_name(keys)
+
+            if tuple(keys) in existing_names:
+                collection_report["existing"].append(existing_names[tuple(keys)])
+                continue
+
+            if name in existing:
+                LOGGER.warning(f"Index {name} on {collection} has the keys {existing[name]}, replacing it")
+                database[collection].drop_index(name)
+                collection_report["replaced"].append(name)
+            else:
+                LOGGER.info(f"Creating index {keys} on {collection}")
+                collection_report["created"].append(name)
+
+            database[collection].create_index(keys, name=name)
+
+    return report
+
+
+def representative_pipelines(machine_name="T_B_OP160", parameter_name="PMC_D9388_T_B_OP160", production_line="T_B",
+                             now=None):
+    """
+    Returns every template of mongo_db_utils with representative arguments (the last hour / day of a machine)
+
+    :param machine_name: Name of the machine used in the templates
+    :type machine_name: str
+
+    :param parameter_name: Name of the signal used in the templates
+    :type parameter_name: str
+
+    :param production_line: Production line (regex) used in the templates
+    :type production_line: str
+
+    :param now: The end of the time ranges (defaults to now)
+    :type now: datetime | None
+
+    :return: List of (template name, collection, pipeline)
+    :rtype: list[tuple[str, str, list]]
+    """
+
+    end = now or datetime.now(timezone.utc)
+    hour_start, day_start = end - timedelta(hours=1), end - timedelta(days=1)
+
+    machine_range = {"start_time_datetime": day_start, "end_time_datetime": end, "machine_name": machine_name}
+    state_range = {"start_time_datetime": hour_start, "end_time_datetime": end, "signalname": "OPERATE",
+                   "production_line": production_line}
+    state_day_range = {**state_range, "start_time_datetime": day_start}
+
+    day_epoch = int(day_start.timestamp()) // 86400 * 86400
+
+    return [
+        ("get_count_group_template", "Alarm_History", get_count_group_template(**machine_range)),
+        ("get_timespan_group_template", "Alarm_History", get_timespan_group_template(**machine_range)),
+        ("get_timeline_group_template", "Alarm_History", get_timeline_group_template(**machine_range)),
+        ("get_alarm_intervals_template", "Alarm_History",
+         get_alarm_intervals_template(start_time_datetime=hour_start, end_time_datetime=end)),
+        ("get_recent_most_alarm_time_template", "Alarm_History",
+         get_recent_most_alarm_time_template(machine_name=machine_name)),
+        ("get_real_time_data_mtlinki", "L1Signal_Pool",
+         get_real_time_data_mtlinki(parameter_name=parameter_name, **machine_range)),
+        ("get_value_before_requested_data_mtlinki", "L1Signal_Pool",
+         get_value_before_requested_data_mtlinki(start_time_datetime=day_start, machine_name=machine_name,
+                                                 parameter_name=parameter_name)),
+        ("get_exceed_group_template", "L1Signal_Pool", get_exceed_group_template(**state_range)),
+        ("get_within_group_template", "L1Signal_Pool", get_within_group_template(**state_range)),
+        ("get_between_head_group_template", "L1Signal_Pool", get_between_head_group_template(**state_range)),
+        ("get_between_tail_group_template", "L1Signal_Pool", get_between_tail_group_template(**state_range)),
+        ("get_exceed_group_day_template", "L1Signal_Pool", get_exceed_group_day_template(**state_day_range)),
+        ("get_within_group_day_template", "L1Signal_Pool", get_within_group_day_template(**state_day_range)),
+        ("get_between_head_group_day_template", "L1Signal_Pool",
+         get_between_head_group_day_template(**state_day_range)),
+        ("get_between_tail_group_day_template", "L1Signal_Pool",
+         get_between_tail_group_day_template(**state_day_range)),
+        ("get_state_intervals_template", "L1Signal_Pool",
+         get_state_intervals_template(start_time_datetime=day_start, end_time_datetime=end,
+                                      signalnames=["OPERATE", "STOP", "ALARM", "DISCONNECT"])),
+        ("get_ended_state_intervals_template", "L1Signal_Pool",
+         get_ended_state_intervals_template(ended_since=day_start, signalnames=["OPERATE", "STOP", "DISCONNECT"])),
+        ("get_disconnection_history_template", "L1Signal_Pool",
+         get_disconnection_history_template(machine_name, day_start, end)),
+        ("get_disconnection_history_page_template", "L1Signal_Pool",
+         get_disconnection_history_page_template(day_start, end, line_prefix=machine_name[:4], limit=500)),
+        ("get_parameter_history_template", "L1Signal_Pool",
+         get_parameter_history_template(machine_name, parameter_name, day_start, end)),
+        ("get_machine_states_mtlinki", "L1Signal_Pool_Active",
+         get_machine_states_mtlinki(signal_names=[parameter_name])),
+        ("get_active_signals_mtlinki", "L1Signal_Pool_Active", get_active_signals_mtlinki([machine_name])),
+        ("get_recent_active_pool_value", "L1Signal_Pool_Active",
+         get_recent_active_pool_value(machine_name=machine_name, parameter_name=parameter_name)),
+        ("get_disconnected_machines_template", "L1Signal_Pool_Active", get_disconnected_machines_template()),
+        ("part_signal_aggregate_template", "L1Signal_Pool_Active_2", part_signal_aggregate_template()),
+        ("part_signal_query_with_time", "L1Signal_Pool_Active_2", part_signal_query_with_time(hour_start)),
+        ("get_state_rollup_summary_template", "State_Duration_Rollup",
+         get_state_rollup_summary_template(day_epoch, day_epoch + 86400, production_line)),
+    ]
+
+
+def explain_pipeline(database, collection, pipeline):
+    """
+    Explains the given pipeline with execution statistics
+
+    :param database: The MTLINKi database
+    :type database: Database
+
+    :param collection: Name of the collection
+    :type collection: str
+
+    :param pipeline: The aggregation pipeline
+    :type pipeline: list
+
+    :return: The explain result
+    :rtype: dict
+    """
+
+    return database.command("explain", {"aggregate": collection, "pipeline": pipeline, "cursor": {}},
+                            verbosity="executionStats")
+
+
+def _walk(node):
+    """
+    Yields every dictionary nested in the given explain result
+    """
+
+    if isinstance(node, dict):
+        yield node
+
+        for value in node.values():
+            yield from _walk(value)
+
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def summarize_explain(explain):
+    """
+    Extracts the plan stages and the examined / returned document counts of an explain result (plain find, aggregate
+    with a $cursor stage or sharded)
+
+    :param explain: The explain result
+    :type explain: dict
+
+    :return: The stages (set), docs_examined, keys_examined and returned
+    :rtype: dict
+    """
+
+    stages = set()
+    docs_examined = keys_examined = returned = 0
+
+    for node in _walk(explain):
+        if isinstance(node.get("stage"), str):
+            stages.add(node["stage"])
+
+        if "totalDocsExamined" in node and "nReturned" in node:
+            docs_examined += node["totalDocsExamined"]
+            keys_examined += node.get("totalKeysExamined", 0)
+            returned += node["nReturned"]
+
+    return {"stages": stages, "docs_examined": docs_examined, "keys_examined": keys_examined, "returned": returned}
+
+
+def check_pipelines(database, pipelines=None, max_examined_ratio=MAX_EXAMINED_RATIO):
+    """
+    Explains the given (by default all the representative) pipelines and flags the ones doing a collection scan or
+    examining too many documents per returned document
+
+    :param database: The MTLINKi database
+    :type database: Database
+
+    :param pipelines: List of (template name, collection, pipeline), defaults to representative_pipelines()
+    :type pipelines: list | None
+
+    :param max_examined_ratio: Maximum accepted docsExamined / nReturned ratio
+    :type max_examined_ratio: float
+
+    :return: One report per pipeline (template, collection, stages, counts, ratio and the list of problems)
+    :rtype: list[dict]
+    """
+
+    reports = []
+
+    for template, collection, pipeline in (pipelines if pipelines is not None else representative_pipelines()):
+        summary = summarize_explain(explain_pipeline(database, collection, pipeline))
+
+        ratio = summary["docs_examined"] / max(summary["returned"], 1)
+        problems = []
+
+        if "COLLSCAN" in summary["stages"]:
+            problems.append("COLLSCAN")
+
+        if ratio > max_examined_ratio:
+            problems.append(f"docsExamined/nReturned {round(ratio, 1)} > {max_examined_ratio}")
+
+        if problems:
+            LOGGER.warning(f"{template} on {collection}: {', '.join(problems)}")
+
+        reports.append({"template": template, "collection": collection, "stages": sorted(summary["stages"]),
+                        "docs_examined": summary["docs_examined"], "keys_examined": summary["keys_examined"],
+                        "returned": summary["returned"], "ratio": round(ratio, 2), "problems": problems})
+
+    return reports
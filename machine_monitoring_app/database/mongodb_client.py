@@ -8,17 +8,41 @@ Module that contains functions to return mongodb database client for connections
 
 This script requires the following modules be installed in the python environment
     * logging - To perform logging operations.
+    * pymongo - To connect to the mongodb database and monitor its connection pools.
+
+The connections are separated by workload into named pools, every pool has its own client (and so its own connection
+pool) with its own size, timeouts and read preference:
+
+    * realtime - the live dashboard reads of L1Signal_Pool_Active, small and fast failing.
+    * analytics - the history reads of L1Signal_Pool / Alarm_History (summaries, timelines, rollups), with long socket
+      timeouts and a bounded pool, so that analytics bursts queue among themselves instead of delaying the realtime
+      reads.
+
+The time spent waiting for a connection of each pool is recorded (``get_pool_stats``).
+
+The blocking (pymongo) clients are used by the synchronous code, the asynchronous (motor) clients held by ``DATABASE``
+are opened and closed with the application (``connect_to_mongo`` / ``close_mongo_connection`` of db_utils) and used
+by the MTLINKi repository from the async routes.
 
 This script contains the following function
-    * get_database - Function that return the mongodb database client for connections
+    * get_mongo_url - Function that returns the mongodb connection string
+    * get_collection_pool - Function that returns the name of the pool used for a collection
+    * mongo_client_options - Function that returns the client options of a pool
+    * get_mongo_client - Function that return the mongodb database client of a pool
+    * get_mongo_collection - Function that returns a collection from the client of its pool
+    * get_pool_stats - Function that returns the connection checkout statistics of every pool
 """
 
 # Standard library imports
 import logging
+import threading
+import time
+from collections import defaultdict
 from functools import lru_cache
 
 # Related third party imports
 from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
 from machine_monitoring_app.utils.global_variables import get_settings
 
 # Local application/library specific imports
@@ -28,16 +52,130 @@ __author__ = "smt18m005@iiitdm.ac.in"
 
 LOGGER = logging.getLogger(__name__)
 
+MTLINKI_DATABASE = "MTLINKi"
 
-@lru_cache()
-def get_mongo_client():
+REALTIME_POOL = "realtime"
+ANALYTICS_POOL = "analytics"
+
+# Client options of every pool (the timeouts are in milliseconds)
+MONGO_POOLS = {
+    REALTIME_POOL: {
+        "maxPoolSize": 20,
+        "minPoolSize": 2,
+        "waitQueueTimeoutMS": 2000,
+        "serverSelectionTimeoutMS": 3000,
+        "connectTimeoutMS": 3000,
+        "socketTimeoutMS": 10000,
+        "readPreference": "primaryPreferred",
+    },
+    ANALYTICS_POOL: {
+        "maxPoolSize": 10,
+        "minPoolSize": 0,
+        "waitQueueTimeoutMS": 60000,
+        "serverSelectionTimeoutMS": 10000,
+        "connectTimeoutMS": 5000,
+        "socketTimeoutMS": 300000,
+        "readPreference": "secondaryPreferred",
+    },
+}
+
+# Pool of the collections, the other collections use the analytics pool
+COLLECTION_POOLS = {
+    "L1Signal_Pool_Active": REALTIME_POOL,
+    "L1Signal_Pool_Active_2": REALTIME_POOL,
+    "L1Signal_Pool": ANALYTICS_POOL,
+    "Alarm_History": ANALYTICS_POOL,
+}
+
+
+class AsyncMongoDatabase:
+    """
+    Holder of the asynchronous (motor) clients of every pool, set by connect_to_mongo at the startup of the
+    application
     """
-    Return the mongo database client object
 
-    :return: The MongoClient instance
-    :rtype: MongoClient
+    clients = {}
+
+
+DATABASE = AsyncMongoDatabase()
+
+
+class PoolWaitListener(ConnectionPoolListener):
+    """
+    CONNECTION POOL WAIT LISTENER
+    ======================================
+
+    Records how long the operations of a pool waited to check out a connection (and the failed checkouts, e.g. when
+    the wait queue timed out). The checkout events are published on the thread doing the checkout.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._local = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        _record_checkout(self.pool, self._pop_wait())
+
+    def connection_check_out_failed(self, event):
+        _record_checkout(self.pool, self._pop_wait(), failed=True)
+
+    def _pop_wait(self):
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+
+        return 0.0 if started is None else time.perf_counter() - started
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+_STATS_LOCK = threading.Lock()
+
+_CHECKOUT_STATS = defaultdict(lambda: {"checkouts": 0, "failed": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0})
+
+
+def _record_checkout(pool, wait_seconds, failed=False):
+    wait_ms = wait_seconds * 1000
+
+    with _STATS_LOCK:
+        stats = _CHECKOUT_STATS[pool]
+        stats["checkouts"] += 1
+        stats["failed"] += failed
+        stats["total_wait_ms"] += wait_ms
+        stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+
+
+def get_mongo_url():
+    """
+    Return the mongodb connection string built from the settings
+
+    :return: The connection string
+    :rtype: str
     """
-    LOGGER.debug("New Request for mongodb client")
 
     setting = get_settings()
 
@@ -49,31 +187,104 @@ def get_mongo_client():
         # MONGODB_URL = "mongodb://localhost:27017/"  #UNCOMMENT THIS IN PRODUCTION
         MONGODB_URL = "mongodb://172.18.7.27:27017/"
 
+    return MONGODB_URL
+
+
+def get_collection_pool(collection):
+    """
+    Return the name of the pool used for the given collection
+
+    :param collection: Name of the collection
+    :type collection: str
+
+    :return: The pool name
+    :rtype: str
+    """
+
+    return COLLECTION_POOLS.get(collection, ANALYTICS_POOL)
+
+
+@lru_cache()
+def _get_pool_listener(pool):
+    return PoolWaitListener(pool)
+
+
+def mongo_client_options(pool):
+    """
+    Return the client options (pool size, timeouts, read preference, checkout listener) of the given pool, used for
+    both the blocking and the asynchronous clients
+
+    :param pool: Name of the pool
+    :type pool: str
+
+    :return: The keyword arguments of the client
+    :rtype: dict
+    """
+
+    return {**MONGO_POOLS[pool], "appname": f"machine-monitoring-{pool}",
+            "event_listeners": [_get_pool_listener(pool)]}
+
+
+@lru_cache()
+def get_mongo_client(pool=ANALYTICS_POOL):
+    """
+    Return the mongo database client object of the given pool
+
+    :param pool: Name of the pool
+    :type pool: str
+
+    :return: The MongoClient instance
+    :rtype: MongoClient
+    """
+    LOGGER.debug(f"New Request for mongodb client ({pool})")
+
     # MongoClient('mongodb://localhost:27017/')
-    return MongoClient(MONGODB_URL)
+    return MongoClient(get_mongo_url(), **mongo_client_options(pool))
 
 
-def get_mongo_collection(collection="L1Signal_Pool"):
+def get_mongo_collection(collection="L1Signal_Pool", pool=None):
     """
-    Get a collection from a mongo database
+    Get a collection from a mongo database, through the client of the collection's pool
 
     :param collection: Name of the collection
     :type collection: str
 
+    :param pool: Name of the pool, defaults to the pool of the collection
+    :type pool: str | None
+
     :return: The collection
     """
-    client = get_mongo_client()
-    return client['MTLINKi'][collection]
+    client = get_mongo_client(pool or get_collection_pool(collection))
+    return client[MTLINKI_DATABASE][collection]
 
 
-def get_mongo_collection_active(collection="L1Signal_Pool_Active"):
+def get_mongo_collection_active(collection="L1Signal_Pool_Active", pool=None):
     """
-    Get a collection from a mongo database
+    Get a collection from a mongo database, through the client of the collection's pool
 
     :param collection: Name of the collection
     :type collection: str
 
+    :param pool: Name of the pool, defaults to the pool of the collection
+    :type pool: str | None
+
     :return: The collection
     """
-    client = get_mongo_client()
-    return client['MTLINKi'][collection]
+    client = get_mongo_client(pool or get_collection_pool(collection))
+    return client[MTLINKI_DATABASE][collection]
+
+
+def get_pool_stats():
+    """
+    Return the connection checkout statistics of every pool (blocking and asynchronous clients together)
+
+    :return: Mapping of pool name to its checkouts, failed checkouts and average / maximum checkout wait (ms)
+    :rtype: dict
+    """
+
+    with _STATS_LOCK:
+        return {pool: {"checkouts": stats["checkouts"], "failed": stats["failed"],
+                       "avg_wait_ms": round(stats["total_wait_ms"] / stats["checkouts"], 3)
+                       if stats["checkouts"] else 0.0,
+                       "max_wait_ms": round(stats["max_wait_ms"], 3)}
+                for pool, stats in _CHECKOUT_STATS.items()}
@@ -0,0 +1,162 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+MTLINKI BULK READER
+================================
+
+Module that reads the current value of every relevant signal from the MTLINKi active signal pool in a single
+round trip and buckets the documents client side by machine and parameter group.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * re - To match the signal names against the parameter group queries.
+
+    Related 3rd Party Library
+    =============================
+    * pandas - To merge the signal values into the parameter rows.
+
+This script contains the following function
+    * read_active_signals - Function that reads and buckets the active signals of the given machines
+    * merge_active_signals - Function that merges the bucketed signal values into the parameter rows
+"""
+
+# Standard library imports
+import logging
+import re
+import time
+from datetime import timezone
+
+# Related third party imports
+import pandas as pd
+
+# Local application/library specific imports
+from machine_monitoring_app.database.mongodb_client import get_mongo_collection
+from machine_monitoring_app.database.mongo_db_utils import get_active_signals_mtlinki
+from machine_monitoring_app.database.condition_kernel import evaluate_conditions, condition_names
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _as_number(value):
+    """
+    Converts an MTLINKi signal value to the float representation stored in timescaledb (booleans as 1 / 0)
+
+    :return: The float value, or None if the value is missing or not numeric
+    :rtype: float | None
+    """
+
+    if isinstance(value, bool):
+        return float(value)
+
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    return None
+
+
+def read_active_signals(machine_names, group_queries):
+    """
+    Reads the active signals of all the given machines with one aggregate query (projecting only L1Name, signalname,
+    value and updatedate) and buckets them by machine and parameter group.
+
+    :param machine_names: The names (L1Name) of the machines
+    :type machine_names: list[str]
+
+    :param group_queries: Mapping of parameter group name to its mongodb_query (signal name pattern)
+    :type group_queries: dict[str, str]
+
+    :return: Mapping of machine name to a mapping of group name to a mapping of signal name to (value, updatedate)
+    :rtype: dict[str, dict[str, dict[str, tuple]]]
+    """
+
+    start_time = time.time()
+
+    collection = get_mongo_collection("L1Signal_Pool_Active")
+
+    documents = list(collection.aggregate(get_active_signals_mtlinki(machine_names)))
+
+    # Compile every group pattern once, instead of sending an unanchored regex per machine and group
+    group_patterns = [(group_name, re.compile(query)) for group_name, query in group_queries.items() if query]
+
+    buckets = {}
+
+    for document in documents:
+        signal_name = document.get('signalname')
+
+        if not signal_name:
+            continue
+
+        update_date = document.get('updatedate')
+
+        if update_date is not None and update_date.tzinfo is None:
+            update_date = update_date.replace(tzinfo=timezone.utc)
+
+        machine_bucket = buckets.setdefault(document.get('L1Name'), {})
+
+        for group_name, pattern in group_patterns:
+            if pattern.search(signal_name):
+                machine_bucket.setdefault(group_name, {})[signal_name] = (_as_number(document.get('value')),
+                                                                          update_date)
+
+    LOGGER.info(f"Read {len(documents)} active signals for {len(machine_names)} machines in "
+                f"{round((time.time() - start_time) * 1000, 2)} ms")
+
+    return buckets
+
+
+def merge_active_signals(result_df, buckets, parameter_types=None):
+    """
+    Overwrites the value and time of every parameter row with the MTLINKi value of its signal (matched by group,
+    machine and parameter name), rows without a numeric MTLINKi value keep their timescaledb value and condition.
+    The condition of the merged rows is evaluated again against the row limits, so it matches the merged value.
+
+    :param result_df: Parameter rows with the columns parameter_id, group_name, machine_name, parameter_name, value,
+        time, warn_limit, critical_limit and condition_name
+    :type result_df: pd.DataFrame
+
+    :param buckets: The buckets returned by read_active_signals
+    :type buckets: dict
+
+    :param parameter_types: Mapping of parameter id to its parameter type ("decreasing", "increasing", "bool")
+    :type parameter_types: dict[int, str] | None
+
+    :return: The parameter rows with the merged values and conditions
+    :rtype: pd.DataFrame
+    """
+
+    signals = {(group_name, machine_name, signal_name): signal
+               for machine_name, machine_bucket in buckets.items()
+               for group_name, group_bucket in machine_bucket.items()
+               for signal_name, signal in group_bucket.items()}
+
+    if result_df.empty or not signals:
+        return result_df
+
+    no_signal = (None, None)
+    matched = [signals.get(key, no_signal) for key in zip(result_df['group_name'], result_df['machine_name'],
+                                                           result_df['parameter_name'])]
+
+    values = pd.Series([signal[0] for signal in matched], index=result_df.index, dtype=float)
+    times = pd.Series([signal[1] for signal in matched], index=result_df.index, dtype=object)
+
+    has_value = values.notna()
+
+    result_df = result_df.copy()
+    result_df['value'] = result_df['value'].where(~has_value, values)
+    result_df['time'] = result_df['time'].astype(object).where(~(has_value & times.notna()), times)
+
+    if has_value.any():
+        merged = result_df[has_value]
+        types = merged['parameter_id'].map(parameter_types or {}).to_numpy(dtype=object)
+
+        result_df.loc[has_value, 'condition_name'] = condition_names(evaluate_conditions(
+            merged['value'], merged['warn_limit'], merged['critical_limit'], types))
+
+    LOGGER.debug(f"Merged {int(has_value.sum())} MTLINKi values into {len(result_df)} parameters")
+
+    return result_df
@@ -0,0 +1,164 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+ASYNCHRONOUS MTLINKI REPOSITORY
+================================
+
+Module that gives the async routes non-blocking access to the MTLINKi collections (L1Signal_Pool,
+L1Signal_Pool_Active and Alarm_History) through the pooled motor clients opened at the startup of the application, so
+a running aggregation no longer stalls the event loop. Every collection is read through the client of its pool
+(realtime / analytics). Independent pipelines are run concurrently with
+``MTLinkiRepository.gather``, through the bounded fan-out (shared concurrency limit, timeouts, cancellation when the
+client disconnects, latency per template).
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+
+    Related 3rd Party Library
+    =============================
+    * motor - To perform the database operations in asynchronous way.
+
+This script contains the following class and function
+    * MTLinkiRepository - Class that runs the aggregation pipelines on the MTLINKi collections
+    * get_mtlinki_repository - Function that returns the repository of the application client
+"""
+
+# Standard library imports
+import logging
+
+# Related third party imports
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Local application/library specific imports
+from machine_monitoring_app.database.mongodb_client import DATABASE, MTLINKI_DATABASE, MONGO_POOLS, get_mongo_url, \
+    get_collection_pool, mongo_client_options
+from machine_monitoring_app.utils.fan_out import fan_out
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+SIGNAL_POOL = "L1Signal_Pool"
+SIGNAL_POOL_ACTIVE = "L1Signal_Pool_Active"
+ALARM_HISTORY = "Alarm_History"
+
+
+class MTLinkiRepository:
+    """
+    ASYNCHRONOUS MTLINKI REPOSITORY
+    ======================================
+
+    Runs the aggregation pipelines of the application on the MTLINKi collections with the motor client.
+    """
+
+    def __init__(self, clients):
+        self.databases = {pool: client[MTLINKI_DATABASE] for pool, client in clients.items()}
+
+    def _cursor(self, collection, pipeline, batch_size=None):
+        database = self.databases[get_collection_pool(collection)]
+
+        if batch_size is None:
+            return database[collection].aggregate(pipeline)
+
+        return database[collection].aggregate(pipeline, batchSize=batch_size)
+
+    async def aggregate(self, collection, pipeline, batch_size=None):
+        """
+        Runs the given pipeline on the given collection
+
+        :param collection: Name of the collection
+        :type collection: str
+
+        :param pipeline: The aggregation pipeline
+        :type pipeline: list
+
+        :param batch_size: Number of documents per batch of the cursor (server default if not given)
+        :type batch_size: int | None
+
+        :return: The resulting documents
+        :rtype: list[dict]
+        """
+
+        return await self._cursor(collection, pipeline, batch_size).to_list(length=None)
+
+    async def iterate(self, collection, pipeline, batch_size=None):
+        """
+        Runs the given pipeline on the given collection and yields the documents batch by batch, without holding the
+        whole result in memory
+
+        :param collection: Name of the collection
+        :type collection: str
+
+        :param pipeline: The aggregation pipeline
+        :type pipeline: list
+
+        :param batch_size: Number of documents per batch of the cursor (server default if not given)
+        :type batch_size: int | None
+
+        :return: The resulting documents
+        :rtype: AsyncIterator[dict]
+        """
+
+        async for document in self._cursor(collection, pipeline, batch_size):
+            yield document
+
+    async def signal_pool(self, pipeline):
+        """
+        Runs the given pipeline on L1Signal_Pool (the history of the signals)
+        """
+
+        return await self.aggregate(SIGNAL_POOL, pipeline)
+
+    async def active_pool(self, pipeline):
+        """
+        Runs the given pipeline on L1Signal_Pool_Active (the current value of the signals)
+        """
+
+        return await self.aggregate(SIGNAL_POOL_ACTIVE, pipeline)
+
+    async def alarm_history(self, pipeline):
+        """
+        Runs the given pipeline on Alarm_History
+        """
+
+        return await self.aggregate(ALARM_HISTORY, pipeline)
+
+    @staticmethod
+    async def gather(queries, request=None, timeout=None):
+        """
+        Runs the given (independent) queries concurrently with the bounded fan-out
+
+        :param queries: Mapping of label (template name) to the query coroutine, e.g. repository.signal_pool(pipeline)
+        :type queries: dict
+
+        :param request: The request of the client, the queries are cancelled when the client disconnects
+        :type request: Request | None
+
+        :param timeout: Timeout of every query in seconds (defaults to the FAN_OUT_TIMEOUT_SECONDS setting)
+        :type timeout: float | None
+
+        :return: The results of the queries, in the given order
+        :rtype: list
+        """
+
+        return await fan_out(queries, request=request, timeout=timeout)
+
+
+def get_mtlinki_repository():
+    """
+    Returns the repository using the clients opened at the startup of the application, the clients are created here
+    when the application did not open them (scripts, tests)
+
+    :return: The repository
+    :rtype: MTLinkiRepository
+    """
+
+    for pool in MONGO_POOLS:
+        if pool not in DATABASE.clients:
+            LOGGER.info(f"Creating Mongodb client ({pool})")
+            DATABASE.clients[pool] = AsyncIOMotorClient(get_mongo_url(), **mongo_client_options(pool))
+
+    return MTLinkiRepository(DATABASE.clients)
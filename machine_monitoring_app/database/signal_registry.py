@@ -0,0 +1,181 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+MTLINKI SIGNAL REGISTRY
+================================
+
+Module that maps the MTLINKi signal names to the machine parameters they are stored as.
+
+Every MTLINKi signal name has the form ``<metric>_<axis index>_path<path>_<machine>`` (for example
+``ServoLoad_0_path1_T_B_OP160`` or ``ApcBatLow_1_path1_T_C_OP190``). The registry parses every signal name once and
+keeps, for every parameter group, the exact list of signal names it contains, so that group lookups against
+L1Signal_Pool_Active can be sent as an indexable ``$in`` query instead of a regex that scans the whole collection.
+
+The registry is built from the factory snapshot and is rebuilt only when the snapshot structure version changes
+(parameters added, removed or moved to another group / machine).
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * re - To parse the signal names.
+
+This script contains the following function
+    * parse_signal_name - Function that parses a signal name into its parts
+    * get_signal_registry - Function that returns the process level signal registry
+"""
+
+# Standard library imports
+import logging
+import re
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+# Related third party imports
+# None
+
+# Local application/library specific imports
+from machine_monitoring_app.database.snapshot_store import get_snapshot_store
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+SIGNAL_NAME_PATTERN = re.compile(r"^(?P<metric>.+?)_(?P<axis>\d+)_path(?P<path>\d+)_(?P<machine>.+)$")
+
+SignalName = namedtuple("SignalName", ["metric", "axis", "path", "machine"])
+
+SignalInfo = namedtuple("SignalInfo", ["parameter_id", "group_name", "machine_name", "parsed"])
+
+
+@lru_cache(maxsize=None)
+def parse_signal_name(signal_name):
+    """
+    Parses an MTLINKi signal name into its metric, axis index, path and machine name
+
+    :param signal_name: The signal name, for example "ServoLoad_0_path1_T_B_OP160"
+    :type signal_name: str
+
+    :return: The parsed signal name, or None if the signal name does not follow the naming convention
+    :rtype: SignalName | None
+    """
+
+    match = SIGNAL_NAME_PATTERN.match(signal_name or "")
+
+    if match is None:
+        return None
+
+    return SignalName(match.group("metric"), int(match.group("axis")), int(match.group("path")),
+                      match.group("machine"))
+
+
+class SignalRegistry:
+    """
+    MTLINKI SIGNAL REGISTRY
+    ======================================
+
+    Mapping of MTLINKi signal name to its machine parameter identifier, parameter group and parsed name parts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._structure_version = None
+        self._signals = {}
+        self._group_signals = {}
+
+    def _ensure_current(self):
+        snapshot_store = get_snapshot_store()
+        snapshot_store.refresh()
+
+        if self._structure_version == snapshot_store.structure_version:
+            return
+
+        with self._lock:
+            structure_version = snapshot_store.structure_version
+
+            if self._structure_version == structure_version:
+                return
+
+            signals = {}
+            group_signals = {}
+            unparsed = 0
+
+            for row in snapshot_store.get_rows():
+                parameter_id, group_name, _, machine_name, signal_name = row[:5]
+
+                parsed = parse_signal_name(signal_name)
+                if parsed is None:
+                    unparsed += 1
+
+                signals[signal_name] = SignalInfo(parameter_id, group_name, machine_name, parsed)
+                group_signals.setdefault(group_name, []).append(signal_name)
+
+            self._signals = signals
+            self._group_signals = group_signals
+            self._structure_version = structure_version
+
+            LOGGER.info(f"Signal registry rebuilt with {len(signals)} signals ({unparsed} not following the "
+                        f"naming convention)")
+
+    def get(self, signal_name):
+        """
+        Returns the registry entry of the given signal name
+
+        :param signal_name: The MTLINKi signal name
+        :type signal_name: str
+
+        :return: The registry entry, or None if the signal is not mapped to a machine parameter
+        :rtype: SignalInfo | None
+        """
+
+        self._ensure_current()
+
+        return self._signals.get(signal_name)
+
+    def signal_names_for_group(self, group_name):
+        """
+        Returns the exact signal names of all the machine parameters of the given parameter group
+
+        :param group_name: Name of the parameter group
+        :type group_name: str
+
+        :return: list of signal names
+        :rtype: list[str]
+        """
+
+        self._ensure_current()
+
+        return self._group_signals.get(group_name, [])
+
+    def signal_names_for_machine(self, machine_name, group_name=None):
+        """
+        Returns the exact signal names of the given machine, optionally only those of the given parameter group
+
+        :param machine_name: Name of the machine (L1Name)
+        :type machine_name: str
+
+        :param group_name: Name of the parameter group
+        :type group_name: str | None
+
+        :return: list of signal names
+        :rtype: list[str]
+        """
+
+        self._ensure_current()
+
+        return [signal_name for signal_name, info in self._signals.items()
+                if info.machine_name == machine_name and (group_name is None or info.group_name == group_name)]
+
+
+@lru_cache()
+def get_signal_registry():
+    """
+    Function that returns the process level MTLINKi signal registry
+
+    :return: The signal registry
+    :rtype: SignalRegistry
+    """
+
+    return SignalRegistry()
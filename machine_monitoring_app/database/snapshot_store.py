@@ -0,0 +1,313 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+FACTORY SNAPSHOT STORE
+================================
+
+Module that keeps an in-memory snapshot of the real time active parameter table joined with its machine parameter,
+parameter group and machine details.
+
+The factory layout end points are polled every few seconds by every dashboard tab, and each of them used to run the
+same four-way join (RealTimeParameterActive x MachineParameter x ParameterGroup x Machine). The snapshot store runs
+that join once, afterwards only fetches the rows whose ``time`` moved since the last refresh, and bumps a version
+number whenever the snapshot changes. Responses built from the snapshot can be memoized against that version.
+
+A separate structure version is bumped only when the set of parameters (or their group / line / machine) changes,
+for caches that depend on the factory structure but not on the parameter values.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * threading - To guard the snapshot against concurrent refreshes.
+    * copy - To hand out copies of the memoized responses.
+
+    Related 3rd Party Library
+    =============================
+    * pony - To perform the database queries.
+
+This script contains the following function
+    * natural_machine_key - Function that returns the (cached) natural sort key of a machine name
+    * get_snapshot_store - Function that returns the process level snapshot store
+"""
+
+# Standard library imports
+import copy
+import logging
+import re
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+# Related third party imports
+from pony.orm import db_session, select
+
+# Local application/library specific imports
+from machine_monitoring_app.database.pony_models import Machine, ParameterGroup, MachineParameter, \
+    RealTimeParameterActive
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+# Column names of the rows held by the snapshot (same order as the tuples returned by get_rows)
+SNAPSHOT_COLUMNS = ['parameter_id', 'group_name', 'location', 'machine_name', 'parameter_name',
+                    'display_name', 'internal_parameter_name', 'time', 'value', 'warn_limit',
+                    'critical_limit', 'condition_name']
+
+# Requests arriving within this many seconds of the last refresh are served without touching the database
+MIN_REFRESH_INTERVAL_SECONDS = 1.0
+
+# Interval after which the snapshot is rebuilt from a full join (picks up deleted / re-assigned parameters)
+FULL_RELOAD_INTERVAL_SECONDS = 300.0
+
+# The incremental reload re-reads the rows of this many seconds before the latest time already seen, so rows written
+# late (with an older time than rows already read) are not skipped until the next full reload
+SNAPSHOT_REWIND_SECONDS = 60.0
+
+
+@lru_cache(maxsize=None)
+def natural_machine_key(machine_name):
+    """
+    Returns the natural sort key of a machine name (the numbers compared as numbers, "T_B_OP20" before
+    "T_B_OP110"), the same ordering as alphanumeric_key but computed only once per machine name
+
+    :param machine_name: The machine name
+    :type machine_name: str
+
+    :return: The sort key
+    :rtype: tuple
+    """
+
+    return tuple(int(part) if part.isdigit() else part for part in re.split('([0-9]+)', machine_name))
+
+
+def _row_sort_key(row):
+    # group name, line, machine (natural order), parameter name
+    return row[1], row[2], natural_machine_key(row[3]), row[4]
+
+
+def _select_active_rows(changed_since=None):
+    """
+    Function that runs the four-way join on the real time active parameter table
+
+    :param changed_since: If given, only the rows whose time is greater than this value are returned
+    :type changed_since: datetime | None
+
+    :return: list of tuples in the order of SNAPSHOT_COLUMNS
+    :rtype: list[tuple]
+    """
+
+    query = select(
+        (mp.id,
+         pg.group_name,
+         m.location,
+         m.name,
+         mp.name,
+         mp.display_name,
+         mp.internal_parameter_name,
+         rtpa.time,
+         rtpa.value,
+         mp.warning_limit,
+         mp.critical_limit,
+         rtpa.parameter_condition.name)
+
+        for rtpa in RealTimeParameterActive
+        for mp in MachineParameter
+        for pg in ParameterGroup
+        for m in Machine
+        if (
+                rtpa.machine_parameter == mp and
+                mp.parameter_group == pg and
+                mp.machine == m
+        )
+    )
+
+    if changed_since is not None:
+        query = query.where(lambda rtpa: rtpa.time > changed_since)
+
+    return list(query)
+
+
+class FactorySnapshotStore:
+    """
+    FACTORY SNAPSHOT STORE
+    ======================================
+
+    Process level cache of the joined real time active parameter rows, keyed by machine parameter identifier.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rows = {}
+        self._sorted_rows = []
+        self._group_names = []
+        self._latest_time = None
+        self._last_refresh = 0.0
+        self._last_full_reload = 0.0
+        self._memo = {}
+        self.version = 0
+        self.structure_version = 0
+
+    def invalidate(self):
+        """
+        Forces a full reload of the snapshot on the next request (used after limits / parameters are modified,
+        since those changes do not move the ``time`` column)
+
+        :return: Nothing
+        :rtype: None
+        """
+
+        with self._lock:
+            self._last_full_reload = 0.0
+            self._last_refresh = 0.0
+
+    @db_session(optimistic=False)
+    def _full_reload(self):
+        rows = _select_active_rows()
+
+        previous_structure = {parameter_id: row[1:5] for parameter_id, row in self._rows.items()}
+
+        self._rows = {row[0]: row for row in rows}
+
+        if previous_structure != {parameter_id: row[1:5] for parameter_id, row in self._rows.items()}:
+            self.structure_version += 1
+
+        self._group_names = sorted(select(pg.group_name for pg in ParameterGroup)[:])
+        self._last_full_reload = time.monotonic()
+
+        LOGGER.info(f"Factory snapshot fully reloaded with {len(self._rows)} parameters")
+
+        return True
+
+    @db_session(optimistic=False)
+    def _incremental_reload(self):
+        rows = _select_active_rows(changed_since=self._latest_time - timedelta(seconds=SNAPSHOT_REWIND_SECONDS))
+
+        # The rewind re-reads rows already in the snapshot, only the ones that differ change it
+        rows = [row for row in rows if self._rows.get(row[0]) != row]
+
+        # A parameter seen for the first time changes the structure (machines / parameters) of the factory
+        if any(row[0] not in self._rows for row in rows):
+            self.structure_version += 1
+
+        for row in rows:
+            self._rows[row[0]] = row
+
+        return bool(rows)
+
+    def refresh(self, force=False):
+        """
+        Brings the snapshot up to date, running the full join only on the first call (or periodically / after
+        invalidation) and fetching only the rows whose time moved otherwise.
+
+        :param force: Skip the minimum refresh interval check
+        :type force: bool
+
+        :return: The current snapshot version
+        :rtype: int
+        """
+
+        with self._lock:
+            now = time.monotonic()
+
+            if not force and now - self._last_refresh < MIN_REFRESH_INTERVAL_SECONDS:
+                return self.version
+
+            if self._latest_time is None or now - self._last_full_reload >= FULL_RELOAD_INTERVAL_SECONDS:
+                changed = self._full_reload()
+            else:
+                changed = self._incremental_reload()
+
+            self._last_refresh = time.monotonic()
+
+            if changed:
+                times = [row[7] for row in self._rows.values() if row[7] is not None]
+                self._latest_time = max(times) if times else None
+                self._sorted_rows = sorted(self._rows.values(), key=_row_sort_key)
+                self._memo = {}
+                self.version += 1
+
+            return self.version
+
+    def get_rows(self, group_name=None):
+        """
+        Returns the snapshot rows sorted by group, line, machine and parameter name
+
+        :param group_name: If given, only the rows of this parameter group are returned
+        :type group_name: str | None
+
+        :return: list of tuples in the order of SNAPSHOT_COLUMNS
+        :rtype: list[tuple]
+        """
+
+        self.refresh()
+
+        rows = self._sorted_rows
+
+        if group_name is None:
+            return list(rows)
+
+        return [row for row in rows if row[1] == group_name]
+
+    def get_group_names(self):
+        """
+        Returns the names of all the parameter groups, sorted
+
+        :return: list of parameter group names
+        :rtype: list[str]
+        """
+
+        self.refresh()
+
+        return list(self._group_names)
+
+    def memoize(self, key, builder, shared=False):
+        """
+        Returns the response built for the given key against the current snapshot version, building it with the
+        given builder function if the snapshot changed since it was last built. Every caller gets its own copy, so
+        changing a returned response does not change the memoized one.
+
+        :param key: Hashable identifier of the response (end point name and its arguments)
+        :type key: tuple
+
+        :param builder: Function building the response from the snapshot
+        :type builder: callable
+
+        :param shared: Return the memoized object itself instead of a copy (for objects only read by their callers,
+            such as indexes)
+        :type shared: bool
+
+        :return: The built response
+        :rtype: Any
+        """
+
+        version = self.refresh()
+
+        with self._lock:
+            cached = self._memo.get(key)
+
+            if cached is not None and cached[0] == version:
+                return cached[1] if shared else copy.deepcopy(cached[1])
+
+        response = builder()
+
+        with self._lock:
+            if self.version == version:
+                self._memo[key] = (version, response)
+
+        return response if shared else copy.deepcopy(response)
+
+
+@lru_cache()
+def get_snapshot_store():
+    """
+    Function that returns the process level factory snapshot store
+
+    :return: The factory snapshot store
+    :rtype: FactorySnapshotStore
+    """
+
+    return FactorySnapshotStore()
@@ -0,0 +1,248 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+STATE DURATION ENGINE
+================================
+
+Module that computes how long the machines were in each state (OPERATE, MANUAL, STOP ...) for a series of
+contiguous time buckets (the hours of a day, the days of a week / month).
+
+All the state intervals overlapping the requested range are fetched with a single query, the intervals are then
+clipped to the buckets with array arithmetic on epoch milliseconds, which gives the full state x bucket matrix of
+durations. For every state the covered time up to an instant t is
+
+    covered(t) = sum(t - start, start < t) - sum(t - end, end < t)
+
+which is evaluated at every bucket edge with sorted starts / ends and prefix sums, the duration of a bucket being the
+difference of the covered time at its two edges. Ranges inside the horizon of the state interval index are answered
+from memory with the same formula, without a query.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * datetime - To convert the epoch timestamps for the query.
+
+    Related 3rd Party Library
+    =============================
+    * numpy - To perform the array operations.
+    * pandas - To convert the interval timestamps.
+
+This script contains the following function
+    * fetch_state_intervals - Function that returns all the state intervals overlapping a time range
+    * state_duration_matrix - Function that clips the intervals to the buckets and returns the duration matrix
+    * get_state_duration_matrix - Function that returns the duration matrix of a production line / machine
+    * get_state_interval_index - Function that returns the state interval index of the application
+    * machine_states_at - Function that returns the states of a machine at an instant
+    * state_summary_slots - Function that converts the duration matrix to the state summary response
+"""
+
+# Standard library imports
+import logging
+from datetime import datetime, timezone
+from functools import lru_cache
+
+# Related third party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from machine_monitoring_app.database.mongodb_client import get_mongo_collection
+from machine_monitoring_app.database.mongo_db_utils import get_state_intervals_template
+from machine_monitoring_app.database.interval_index import IntervalIndex, epoch_milliseconds
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+STATE_SIGNALS = ("OPERATE", "MANUAL", "STOP", "ALARM", "EMERGENCY", "SUSPEND", "DISCONNECT")
+
+INTERVAL_COLUMNS = ("machine_name", "state", "start_ms", "end_ms")
+
+def fetch_state_intervals(start_time, end_time, production_line=r".*"):
+    """
+    Returns all the state intervals of the given production line / machine overlapping the given time range (one
+    query)
+
+    :param start_time: The start of the range in epoch seconds
+    :type start_time: float
+
+    :param end_time: The end of the range in epoch seconds
+    :type end_time: float
+
+    :param production_line: Name (regex) of production line or machine
+    :type production_line: str
+
+    :return: The intervals (machine_name, state index in STATE_SIGNALS, start_ms, end_ms)
+    :rtype: pd.DataFrame
+    """
+
+    collection = get_mongo_collection()
+
+    documents = list(collection.aggregate(get_state_intervals_template(
+        start_time_datetime=datetime.fromtimestamp(start_time, tz=timezone.utc),
+        end_time_datetime=datetime.fromtimestamp(end_time, tz=timezone.utc),
+        signalnames=STATE_SIGNALS, production_line=production_line)))
+
+    if not documents:
+        return pd.DataFrame({"machine_name": pd.Series(dtype=object), "state": pd.Series(dtype=np.int64),
+                             "start_ms": pd.Series(dtype=np.int64), "end_ms": pd.Series(dtype=np.int64)})
+
+    intervals = pd.DataFrame(documents)
+
+    return pd.DataFrame({"machine_name": intervals["L1Name"].to_numpy(),
+                         "state": pd.Categorical(intervals["signalname"], categories=STATE_SIGNALS).codes
+                         .astype(np.int64),
+                         "start_ms": epoch_milliseconds(intervals["updatedate"]),
+                         "end_ms": epoch_milliseconds(intervals["enddate"])})
+
+
+def state_duration_matrix(states, starts_ms, ends_ms, bucket_edges_ms, state_count=len(STATE_SIGNALS)):
+    """
+    Clips the state intervals to the buckets and returns the time (in seconds) spent in every state in every bucket,
+    overlapping intervals (of several machines) are all counted
+
+    :param states: The state index of every interval
+    :type states: np.ndarray
+
+    :param starts_ms: The start of every interval in epoch milliseconds
+    :type starts_ms: np.ndarray
+
+    :param ends_ms: The end of every interval in epoch milliseconds
+    :type ends_ms: np.ndarray
+
+    :param bucket_edges_ms: The increasing edges of the contiguous buckets in epoch milliseconds (buckets + 1 edges)
+    :type bucket_edges_ms: np.ndarray
+
+    :param state_count: The number of states
+    :type state_count: int
+
+    :return: The state x bucket matrix of durations in seconds
+    :rtype: np.ndarray
+    """
+
+    bucket_edges_ms = np.asarray(bucket_edges_ms, dtype=np.int64)
+    origin = bucket_edges_ms[0]
+
+    # Relative to the first edge and clipped to the range, everything stays an exact integer
+    edges = bucket_edges_ms - origin
+    starts = np.clip(np.asarray(starts_ms, dtype=np.int64) - origin, 0, edges[-1])
+    ends = np.clip(np.asarray(ends_ms, dtype=np.int64) - origin, 0, edges[-1])
+    states = np.asarray(states, dtype=np.int64)
+
+    valid = (ends > starts) & (states >= 0) & (states < state_count)
+    states, starts, ends = states[valid], starts[valid], ends[valid]
+
+    covered = np.zeros((state_count, len(edges)), dtype=np.int64)
+
+    for state in np.unique(states):
+        mask = states == state
+        state_starts, state_ends = np.sort(starts[mask]), np.sort(ends[mask])
+
+        start_sums = np.concatenate(([0], np.cumsum(state_starts)))
+        end_sums = np.concatenate(([0], np.cumsum(state_ends)))
+
+        started = np.searchsorted(state_starts, edges, side="right")
+        ended = np.searchsorted(state_ends, edges, side="right")
+
+        covered[state] = (started * edges - start_sums[started]) - (ended * edges - end_sums[ended])
+
+    return np.diff(covered, axis=1) / 1000
+
+
+def get_state_duration_matrix(start_time, bucket_seconds, bucket_count, production_line=r".*"):
+    """
+    Returns the time (in seconds) the given production line / machine spent in every state in every bucket, from
+    the state interval index when the range lies inside its horizon
+
+    :param start_time: The start of the first bucket in epoch seconds
+    :type start_time: int
+
+    :param bucket_seconds: The length of a bucket in seconds (3600 for hours, 86400 for days)
+    :type bucket_seconds: int
+
+    :param bucket_count: The number of buckets
+    :type bucket_count: int
+
+    :param production_line: Name (regex) of production line or machine
+    :type production_line: str
+
+    :return: The state x bucket matrix of durations in seconds (states in STATE_SIGNALS order)
+    :rtype: np.ndarray
+    """
+
+    start_time = int(start_time)
+    end_time = start_time + bucket_seconds * bucket_count
+
+    bucket_edges_ms = (start_time + bucket_seconds * np.arange(bucket_count + 1, dtype=np.int64)) * 1000
+
+    state_index = get_state_interval_index()
+
+    if state_index.covers(start_time * 1000, end_time * 1000):
+        return state_index.covered_matrix(bucket_edges_ms, len(STATE_SIGNALS), production_line)
+
+    intervals = fetch_state_intervals(start_time, end_time, production_line)
+
+    return state_duration_matrix(intervals["state"].to_numpy(), intervals["start_ms"].to_numpy(),
+                                 intervals["end_ms"].to_numpy(), bucket_edges_ms)
+
+
+def _load_state_intervals(start_time, end_time):
+    """
+    Loader of the state interval index, the state intervals of all the machines with the state as key
+    """
+
+    return fetch_state_intervals(start_time, end_time).rename(columns={"state": "key"})
+
+
+@lru_cache()
+def get_state_interval_index():
+    """
+    Returns the state interval index of the application (one key per state, in STATE_SIGNALS order)
+
+    :return: The index
+    :rtype: IntervalIndex
+    """
+
+    return IntervalIndex("state", _load_state_intervals)
+
+
+def machine_states_at(machine_name, instant):
+    """
+    Returns the states of the machine at the given instant from the state interval index
+
+    :param machine_name: Name of the machine
+    :type machine_name: str
+
+    :param instant: The instant in epoch seconds
+    :type instant: float
+
+    :return: The names of the active states, None when the instant is outside the horizon of the index
+    :rtype: list[str] | None
+    """
+
+    state_index = get_state_interval_index()
+    instant_ms = int(instant * 1000)
+
+    if not state_index.covers(instant_ms, instant_ms):
+        return None
+
+    return [STATE_SIGNALS[state] for state in state_index.active_keys(machine_name, instant_ms)]
+
+
+def state_summary_slots(matrix):
+    """
+    Converts the state x bucket matrix to the state summary response, one entry per bucket followed by the totals
+
+    :param matrix: The state x bucket matrix of durations in seconds
+    :type matrix: np.ndarray
+
+    :return: List of {"current_hour_day": bucket, "data": {state: seconds}}, the last entry holding the totals
+    :rtype: list[dict]
+    """
+
+    columns = np.concatenate((matrix, matrix.sum(axis=1, keepdims=True)), axis=1).T.tolist()
+
+    return [{"current_hour_day": bucket, "data": dict(zip(STATE_SIGNALS, durations))}
+            for bucket, durations in enumerate(columns)]
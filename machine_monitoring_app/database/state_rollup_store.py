@@ -0,0 +1,340 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+DAILY STATE DURATION ROLLUPS
+================================
+
+Module that keeps the time every machine spent in every state for the finished days, so that week and month state
+summaries read the closed days from one indexed collection instead of aggregating the signal pool again.
+
+The rollups are stored in the ``State_Duration_Rollup`` collection, one document per machine, day and state::
+
+    {"L1Name": "T_B_OP160", "day": 1655596800, "state": "OPERATE", "seconds": 41230.5}
+
+The days covered by the store are recorded in ``State_Duration_Rollup_Status`` (one contiguous range), they are
+filled incrementally by ``update_state_rollups`` (run by the state rollup monitor) as soon as they end. An interval is
+written to the pool only once it ends, so an interval still open at the end of a day (a weekend stop, a long
+disconnection) is missing from its rollup: every update reads the intervals that ended since the watermark persisted
+with the status (re-reading the last ``ROLLUP_REWIND_SECONDS``, for the intervals written late) and rolls up again the
+covered days they overlap. The days of a request that are not covered (the current partial day, days older than the
+store) are computed live with the state duration engine.
+
+The rollups of a day are upserted and the stale ones removed, rolling up a day again gives the same documents.
+
+The day boundaries are UTC midnight shifted by the ``STATE_ROLLUP_DAY_OFFSET_SECONDS`` setting, requests whose days
+start at another time of the day are computed live.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * time - To get the current time.
+    * datetime - To convert the interval ends.
+
+    Related 3rd Party Library
+    =============================
+    * numpy - To perform the array operations.
+    * pymongo - To create the indexes of the collection and write the rollups.
+
+This script contains the following function
+    * get_rollup_collection - Function that returns the rollup collection (with its indexes)
+    * roll_up_day - Function that computes and stores the rollups of one day
+    * update_state_rollups - Function that rolls up the finished days, and again the days of the late intervals
+    * get_state_day_matrix - Function that returns the state x day matrix of durations of a production line
+"""
+
+# Standard library imports
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+# Related third party imports
+import numpy as np
+from pymongo import ASCENDING, UpdateOne
+
+# Local application/library specific imports
+from machine_monitoring_app.database.mongodb_client import get_mongo_collection
+from machine_monitoring_app.database.mongo_db_utils import get_state_rollup_summary_template, \
+    get_ended_state_intervals_template
+from machine_monitoring_app.database.state_duration_engine import STATE_SIGNALS, fetch_state_intervals, \
+    state_duration_matrix, get_state_duration_matrix
+from machine_monitoring_app.utils.global_variables import get_settings
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+DAY_SECONDS = 86400
+
+# Number of days to be rolled up when the store is empty
+ROLLUP_BACKFILL_DAYS = 62
+
+# Seconds re-read before the interval end watermark on every update, for the intervals written late
+ROLLUP_REWIND_SECONDS = 300
+
+# Maximum number of days rolled up by one update
+ROLLUP_DAYS_PER_UPDATE = 7
+
+_STATE_INDEX = {state: index for index, state in enumerate(STATE_SIGNALS)}
+
+
+@lru_cache()
+def get_rollup_collection():
+    """
+    Returns the rollup collection, creating its indexes on the first call
+
+    :return: The collection
+    """
+
+    collection = get_mongo_collection("State_Duration_Rollup")
+    collection.create_index([("day", ASCENDING), ("L1Name", ASCENDING), ("state", ASCENDING)], unique=True)
+
+    return collection
+
+
+def _day_offset():
+    return get_settings().state_rollup_day_offset_seconds % DAY_SECONDS
+
+
+def _day_start(timestamp):
+    """
+    Returns the start of the rollup day containing the given time (epoch seconds)
+    """
+
+    offset = _day_offset()
+
+    return int((timestamp - offset) // DAY_SECONDS) * DAY_SECONDS + offset
+
+
+def _get_coverage():
+    """
+    Returns the days covered by the store for the current day offset, with the interval end watermark
+
+    :return: The start of the first day, the end of the last day and the enddate of the last interval read (None
+             before the first update), None if nothing is rolled up
+    :rtype: tuple[int, int, datetime | None] | None
+    """
+
+    status = get_mongo_collection("State_Duration_Rollup_Status").find_one({"_id": _day_offset()})
+
+    if status is None:
+        return None
+
+    return status["first_day"], status["end_day"], _as_utc(status.get("ended_watermark"))
+
+
+def _set_coverage(first_day, end_day, ended_watermark):
+    get_mongo_collection("State_Duration_Rollup_Status").update_one(
+        {"_id": _day_offset()},
+        {"$set": {"first_day": first_day, "end_day": end_day, "ended_watermark": ended_watermark}}, upsert=True)
+
+
+def _as_utc(value):
+    """
+    Returns the datetime as an aware UTC datetime (MTLINKi stores naive UTC datetimes)
+    """
+
+    if value is None:
+        return None
+
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _days_of_ended_intervals(ended_since, first_day, end_day):
+    """
+    Returns the covered days overlapped by the state intervals that ended after the given time, with the enddate of
+    the last of these intervals
+
+    :return: The sorted starts of the days and the latest enddate (None when no interval ended)
+    :rtype: tuple[list[int], datetime | None]
+    """
+
+    days = set()
+    latest_end = None
+
+    for interval in get_mongo_collection().aggregate(get_ended_state_intervals_template(ended_since, STATE_SIGNALS)):
+        start, end = _as_utc(interval.get("updatedate")), _as_utc(interval.get("enddate"))
+
+        if start is None or end is None:
+            continue
+
+        latest_end = end if latest_end is None else max(latest_end, end)
+
+        day = max(_day_start(start.timestamp()), first_day)
+
+        while day < min(end.timestamp(), end_day):
+            days.add(day)
+            day += DAY_SECONDS
+
+    return sorted(days), latest_end
+
+
+def roll_up_day(day):
+    """
+    Computes the state durations of every machine for the given day (one query) and replaces the stored rollups of
+    that day
+
+    :param day: The start of the day in epoch seconds
+    :type day: int
+
+    :return: The number of rollup documents stored
+    :rtype: int
+    """
+
+    intervals = fetch_state_intervals(day, day + DAY_SECONDS)
+    collection = get_rollup_collection()
+
+    documents = []
+
+    if not intervals.empty:
+        machine_names, machine_codes = np.unique(intervals["machine_name"].to_numpy(dtype=str), return_inverse=True)
+        state_count = len(STATE_SIGNALS)
+
+        # Every machine / state pair is a "state" of its own, so a single pass gives the durations of all the pairs
+        durations = state_duration_matrix(machine_codes * state_count + intervals["state"].to_numpy(),
+                                          intervals["start_ms"].to_numpy(), intervals["end_ms"].to_numpy(),
+                                          np.array([day, day + DAY_SECONDS], dtype=np.int64) * 1000,
+                                          state_count=len(machine_names) * state_count)
+
+        durations = durations[:, 0].reshape(len(machine_names), state_count)
+
+        for machine_name, machine_durations in zip(machine_names, durations):
+            documents.extend({"L1Name": str(machine_name), "day": day, "state": state, "seconds": float(seconds)}
+                             for state, seconds in zip(STATE_SIGNALS, machine_durations) if seconds > 0)
+
+    # Upserts, then removes the machine / state pairs of the day that are not in the new rollups
+    if documents:
+        collection.bulk_write([UpdateOne({"day": day, "L1Name": document["L1Name"], "state": document["state"]},
+                                         {"$set": {"seconds": document["seconds"]}}, upsert=True)
+                               for document in documents], ordered=False)
+
+    machine_states = {}
+
+    for document in documents:
+        machine_states.setdefault(document["L1Name"], []).append(document["state"])
+
+    collection.delete_many({"day": day, "$or": [{"L1Name": {"$nin": list(machine_states)}},
+                                                *({"L1Name": machine_name, "state": {"$nin": states}}
+                                                  for machine_name, states in machine_states.items())]})
+
+    return len(documents)
+
+
+def update_state_rollups(now=None):
+    """
+    Rolls up again the covered days overlapped by the intervals that ended since the watermark, then the finished
+    days that are not in the store yet (at most ROLLUP_DAYS_PER_UPDATE new days per call)
+
+    :param now: The current time in epoch seconds (defaults to now)
+    :type now: float | None
+
+    :return: The number of new days rolled up
+    :rtype: int
+    """
+
+    now = time.time() if now is None else now
+    last_finished_end = _day_start(now)
+
+    coverage = _get_coverage()
+
+    if coverage is None:
+        first_day = end_day = last_finished_end - ROLLUP_BACKFILL_DAYS * DAY_SECONDS
+        ended_watermark = None
+    else:
+        first_day, end_day, ended_watermark = coverage
+
+        if ended_watermark is None:
+            # Status written before the watermark was tracked, the intervals ended after the covered days are read
+            ended_watermark = datetime.fromtimestamp(end_day, tz=timezone.utc)
+
+    # The days rolled up from now on include every interval ended so far
+    new_watermark = datetime.fromtimestamp(now, tz=timezone.utc)
+
+    if ended_watermark is not None:
+        late_days, latest_end = _days_of_ended_intervals(
+            ended_watermark - timedelta(seconds=ROLLUP_REWIND_SECONDS), first_day, end_day)
+
+        for day in late_days:
+            document_count = roll_up_day(day)
+            LOGGER.info(f"Rolled up day {day} again for the intervals ended late ({document_count} machine states)")
+
+        # The re-read intervals never move the watermark back
+        new_watermark = max(ended_watermark, latest_end) if latest_end is not None else ended_watermark
+        _set_coverage(first_day, end_day, new_watermark)
+
+    rolled_up_days = 0
+
+    while end_day < last_finished_end and rolled_up_days < ROLLUP_DAYS_PER_UPDATE:
+        document_count = roll_up_day(end_day)
+        end_day += DAY_SECONDS
+        rolled_up_days += 1
+
+        # The status is only moved once the day is stored, an interrupted update redoes the day
+        _set_coverage(first_day, end_day, new_watermark)
+        LOGGER.info(f"Rolled up day {end_day - DAY_SECONDS} ({document_count} machine states)")
+
+    return rolled_up_days
+
+
+def _read_rollups(start_day, end_day, production_line):
+    """
+    Returns the state x day matrix of the rolled up days between start_day and end_day (one indexed read)
+    """
+
+    matrix = np.zeros((len(STATE_SIGNALS), (end_day - start_day) // DAY_SECONDS))
+
+    for result in get_rollup_collection().aggregate(get_state_rollup_summary_template(start_day, end_day,
+                                                                                      production_line)):
+        state = _STATE_INDEX.get(result["_id"]["state"])
+
+        if state is not None:
+            matrix[state, (result["_id"]["day"] - start_day) // DAY_SECONDS] = result["TOTAL_TIME_SECONDS"]
+
+    return matrix
+
+
+def get_state_day_matrix(start_day, day_count, production_line=r".*"):
+    """
+    Returns the time (in seconds) the given production line / machine spent in every state for every day, the days
+    covered by the store are read from the rollups and the others are computed live
+
+    :param start_day: The start of the first day in epoch seconds
+    :type start_day: int
+
+    :param day_count: The number of days
+    :type day_count: int
+
+    :param production_line: Name (regex) of production line or machine
+    :type production_line: str
+
+    :return: The state x day matrix of durations in seconds (states in STATE_SIGNALS order)
+    :rtype: np.ndarray
+    """
+
+    start_day = int(start_day)
+    end_day = start_day + day_count * DAY_SECONDS
+
+    coverage = _get_coverage() if _day_start(start_day) == start_day else None
+
+    if coverage is None:
+        return get_state_duration_matrix(start_day, DAY_SECONDS, day_count, production_line)
+
+    covered_start = min(max(coverage[0], start_day), end_day)
+    covered_end = max(min(coverage[1], end_day), covered_start)
+
+    matrices = []
+
+    if covered_start > start_day:
+        matrices.append(get_state_duration_matrix(start_day, DAY_SECONDS, (covered_start - start_day) // DAY_SECONDS,
+                                                  production_line))
+
+    if covered_end > covered_start:
+        matrices.append(_read_rollups(covered_start, covered_end, production_line))
+
+    if end_day > covered_end:
+        matrices.append(get_state_duration_matrix(covered_end, DAY_SECONDS, (end_day - covered_end) // DAY_SECONDS,
+                                                  production_line))
+
+    return np.concatenate(matrices, axis=1)
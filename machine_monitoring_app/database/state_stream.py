@@ -0,0 +1,212 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+FACTORY STATE STREAM
+================================
+
+Module that turns the factory snapshot into a stream of messages for push based clients (WebSocket / SSE).
+
+A subscriber first receives the full nested state of its subscription (all groups, one parameter group and / or one
+line) and afterwards, every time the snapshot version changes, only the parameters whose value, condition or
+timestamp changed together with the machine / line / group state roll-ups those changes caused.
+
+The state of a subscription and the delta between two versions are memoized against the snapshot version, so any
+number of clients watching the same group or line cost one computation per version.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+
+    Related 3rd Party Library
+    =============================
+    * pandas - To hold the parameter rows.
+
+This script contains the following function
+    * get_stream_state - Function that returns the state of a subscription for the current snapshot version
+    * diff_stream_state - Function that returns the delta between two states of a subscription
+"""
+
+# Standard library imports
+import logging
+
+# Related third party imports
+import pandas as pd
+
+# Local application/library specific imports
+from machine_monitoring_app.database.snapshot_store import get_snapshot_store, SNAPSHOT_COLUMNS
+from machine_monitoring_app.database.hierarchy_builder import build_group_hierarchy, build_single_group
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _flatten(groups):
+    """
+    Flattens the nested group structure into keyed parameter / machine / line / group entries used for the diff
+
+    :param groups: list of group dictionaries
+    :type groups: list[dict]
+
+    :return: dictionary of parameters, machines, lines and groups keyed by their names
+    :rtype: dict
+    """
+
+    flat = {"parameters": {}, "machines": {}, "lines": {}, "groups": {}}
+
+    for group_json in groups:
+        group_name = group_json['group_name']
+        flat["groups"][group_name] = {"group_name": group_name, "group_state": group_json['group_state'],
+                                      "count": group_json['count']}
+
+        for line_json in group_json['group_details']:
+            line_name = line_json['line_name']
+            flat["lines"][(group_name, line_name)] = {"group_name": group_name, "line_name": line_name,
+                                                      "line_state": line_json['line_state'],
+                                                      "count": line_json['count']}
+
+            for machine_json in line_json['machines']:
+                machine_name = machine_json['machine_name']
+                flat["machines"][(group_name, line_name, machine_name)] = {
+                    "group_name": group_name, "line_name": line_name, "machine_name": machine_name,
+                    "machine_state": machine_json['machine_state']}
+
+                for parameter_json in machine_json['parameters']:
+                    flat["parameters"][(group_name, line_name, machine_name,
+                                        parameter_json['actual_parameter_name'])] = {
+                        "group_name": group_name, "line_name": line_name, "machine_name": machine_name,
+                        "actual_parameter_name": parameter_json['actual_parameter_name'],
+                        "parameter_value": parameter_json['parameter_value'],
+                        "parameter_state": parameter_json['parameter_state'],
+                        "latest_update_time": parameter_json['latest_update_time']}
+
+    return flat
+
+
+def _build_stream_state(group_name=None, line_name=None):
+    snapshot_store = get_snapshot_store()
+    version = snapshot_store.version
+
+    rows = snapshot_store.get_rows(group_name=group_name)
+    if line_name is not None:
+        rows = [row for row in rows if row[2] == line_name]
+
+    result_df = pd.DataFrame(rows, columns=SNAPSHOT_COLUMNS)
+
+    if group_name is not None:
+        groups = [build_single_group(result_df, group_name)]
+    else:
+        groups = build_group_hierarchy(result_df)
+
+    return {"version": version, "groups": groups, "flat": _flatten(groups)}
+
+
+def get_stream_state(group_name=None, line_name=None):
+    """
+    Returns the state of a subscription (optionally restricted to one parameter group and / or one line) for the
+    current snapshot version
+
+    :param group_name: Name of the parameter group subscribed to, None for all groups
+    :type group_name: str | None
+
+    :param line_name: Name of the line subscribed to, None for all lines
+    :type line_name: str | None
+
+    :return: dictionary with the snapshot version, the nested groups and their flattened entries
+    :rtype: dict
+    """
+
+    # The stream only reads the state, so every subscriber shares the one built per version
+    return get_snapshot_store().memoize(("stream_state", group_name, line_name),
+                                        lambda: _build_stream_state(group_name, line_name), shared=True)
+
+
+def diff_stream_state(previous_state, current_state):
+    """
+    Returns the delta message between two states of the same subscription
+
+    :param previous_state: The state last sent to the client
+    :type previous_state: dict
+
+    :param current_state: The current state
+    :type current_state: dict
+
+    :return: The delta message, None if nothing changed, or a full message if the structure itself changed
+    :rtype: dict | None
+    """
+
+    previous_flat = previous_state["flat"]
+    current_flat = current_state["flat"]
+
+    # Parameters added / removed (or moved) cannot be expressed as a delta, the client gets the full state again
+    if previous_flat["parameters"].keys() != current_flat["parameters"].keys():
+        return full_message(current_state)
+
+    delta = {"type": "delta", "version": current_state["version"], "previous_version": previous_state["version"]}
+    changed = False
+
+    for level in ("parameters", "machines", "lines", "groups"):
+        previous_entries = previous_flat[level]
+        delta[level] = [entry for key, entry in current_flat[level].items() if previous_entries.get(key) != entry]
+        changed = changed or bool(delta[level])
+
+    return delta if changed else None
+
+
+def full_message(state):
+    """
+    Returns the full state message of a subscription
+
+    :param state: The state returned by get_stream_state
+    :type state: dict
+
+    :return: The full message
+    :rtype: dict
+    """
+
+    return {"type": "full", "version": state["version"], "groups": state["groups"]}
+
+
+class StateStreamSubscription:
+    """
+    FACTORY STATE SUBSCRIPTION
+    ======================================
+
+    Keeps the state last sent to one client and returns the next message to be sent to it.
+    """
+
+    def __init__(self, group_name=None, line_name=None):
+        self.group_name = group_name
+        self.line_name = line_name
+        self._state = None
+
+    def next_message(self):
+        """
+        Returns the next message for the client, the full state on the first call and the delta since the last sent
+        state afterwards (None if nothing changed). This function accesses the database, so it is to be run in a
+        worker thread from async code.
+
+        :return: The message to be sent, or None
+        :rtype: dict | None
+        """
+
+        version = get_snapshot_store().refresh()
+
+        if self._state is not None and self._state["version"] == version:
+            return None
+
+        state = get_stream_state(self.group_name, self.line_name)
+
+        if self._state is None:
+            self._state = state
+            return full_message(state)
+
+        previous_state = self._state
+        self._state = state
+
+        # Clients at the same version share the delta computation
+        return get_snapshot_store().memoize(
+            ("stream_delta", self.group_name, self.line_name, previous_state["version"]),
+            lambda: diff_stream_state(previous_state, state), shared=True)
@@ -0,0 +1,289 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+TIMELINE TILES
+================================
+
+Module that serves the parameter timelines as tiles: fixed windows aligned to power-of-two durations, so that zooming
+and panning a chart requests the same windows again and their responses can be cached.
+
+A tile is identified by the parameter, its resolution ``r`` (the tile lasts ``2 ** r`` seconds) and its index ``i``
+(the tile covers ``[i * 2 ** r, (i + 1) * 2 ** r)`` epoch seconds). Every tile is downsampled to at most
+``TILE_MAX_POINTS`` points, keeping the limit crossings of the parameter (see utils.downsampling), so a tile of any
+resolution is about the same size.
+
+A tile that ended more than ``TILE_SETTLE_SECONDS`` ago (the usual delay of the data collection) is complete: its
+encoded body is kept in an in-memory LRU cache bounded in bytes (``TIMELINE_TILE_CACHE_BYTES`` setting) for
+``TILE_MAX_AGE_SECONDS``, which is also the max-age of its cache headers. The tile at the live edge is computed on
+every request. A complete tile can still change (data collected late, a change of the limits, whose crossings are kept
+by the downsampling), so it is never served as immutable: after the max-age the clients revalidate it with its ETag
+and the server builds it again. A cached tile is served without any query, the limits it was built with are cached
+along with it. The limit updates drop the cached tiles of the parameter (``TileCache.invalidate_parameter``), so a
+change of the limits recomputes its tiles at once in the worker that made it, and within the max-age in the others.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * threading - To share the cache between the requests.
+    * time - For the age of the cached tiles.
+    * hashlib - For the ETags of the tiles.
+    * math - To normalize the limits of the parameters.
+    * collections - For the LRU order of the cache.
+
+    Related 3rd Party Library
+    =============================
+    * numpy - To replace the missing values of the tiles.
+    * pony - To read the limits of the parameter.
+
+This script contains the following class and function
+    * TileCache - Class that keeps the encoded tiles within a byte budget
+    * get_tile_cache - Function that returns the tile cache of the application
+    * tile_bounds - Function that returns the time range of a tile
+    * get_timeline_tile - Function that returns the encoded body of a tile
+"""
+
+# Standard library imports
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+# Related third party imports
+import numpy as np
+from pony.orm import db_session
+
+# Local application/library specific imports
+from machine_monitoring_app.database.pony_models import MachineParameter
+from machine_monitoring_app.database.timescale_reader import fetch_realtime_columns
+from machine_monitoring_app.exception_handling.custom_exceptions import GetMachineTimelineError, \
+    InvalidTimelineTileError
+from machine_monitoring_app.utils.downsampling import downsample_timeline
+from machine_monitoring_app.utils.encoded_response import encode_json
+from machine_monitoring_app.utils.global_variables import get_settings
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+# Smallest (64 seconds) and largest (about 194 days) tile durations, as powers of two
+TILE_MIN_RESOLUTION = 6
+TILE_MAX_RESOLUTION = 24
+
+# Maximum number of points of a tile
+TILE_MAX_POINTS = 1024
+
+# Seconds after its end after which a tile is complete (cached and served with a max-age)
+TILE_SETTLE_SECONDS = 300
+
+# Seconds a complete tile is cached (on the server and by the clients) before it is built / revalidated again
+TILE_MAX_AGE_SECONDS = 3600
+
+
+class TileCache:
+    """
+    TIMELINE TILE CACHE
+    ======================
+
+    Least recently used cache of the encoded tiles, the total size of the bodies stays within the byte budget and a
+    tile older than the maximum age is not returned.
+    """
+
+    def __init__(self, max_bytes, max_age_seconds=TILE_MAX_AGE_SECONDS):
+        self._lock = threading.Lock()
+        self._tiles = OrderedDict()
+        self._max_bytes = max_bytes
+        self._max_age_seconds = max_age_seconds
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key):
+        """
+        Returns the cached tile (body, ETag and the limits it was built with) of the key, None when it is not cached or
+        older than the maximum age
+        """
+
+        with self._lock:
+            tile = self._tiles.get(key)
+
+            if tile is not None and time.monotonic() - tile[2] > self._max_age_seconds:
+                del self._tiles[key]
+                self._bytes -= len(tile[0])
+                self._expirations += 1
+                tile = None
+
+            if tile is None:
+                self._misses += 1
+                return None
+
+            self._tiles.move_to_end(key)
+            self._hits += 1
+
+            return tile[0], tile[1], tile[3]
+
+    def put(self, key, body, etag, limits=None):
+        """
+        Caches the tile, evicting the least recently used tiles beyond the byte budget (a tile larger than the budget
+        is not cached)
+        """
+
+        if len(body) > self._max_bytes:
+            return
+
+        with self._lock:
+            previous = self._tiles.pop(key, None)
+
+            if previous is not None:
+                self._bytes -= len(previous[0])
+
+            self._tiles[key] = (body, etag, time.monotonic(), limits)
+            self._bytes += len(body)
+
+            while self._bytes > self._max_bytes:
+                _, (evicted_body, _, _, _) = self._tiles.popitem(last=False)
+                self._bytes -= len(evicted_body)
+                self._evictions += 1
+
+    def invalidate_parameter(self, parameter_id):
+        """
+        Drops the cached tiles of the parameter (after a change of its limits)
+        """
+
+        with self._lock:
+            for key in [key for key in self._tiles if key[0] == parameter_id]:
+                self._bytes -= len(self._tiles.pop(key)[0])
+
+    def get_stats(self):
+        """
+        Returns the size, budget and hit / miss / eviction / expiration counters of the cache
+        """
+
+        with self._lock:
+            return {"tiles": len(self._tiles), "bytes": self._bytes, "max_bytes": self._max_bytes,
+                    "max_age_seconds": self._max_age_seconds, "hits": self._hits, "misses": self._misses,
+                    "evictions": self._evictions, "expirations": self._expirations}
+
+
+@lru_cache()
+def get_tile_cache():
+    """
+    Returns the tile cache of the application
+
+    :return: The cache
+    :rtype: TileCache
+    """
+
+    return TileCache(get_settings().timeline_tile_cache_bytes)
+
+
+def tile_bounds(resolution, tile_index):
+    """
+    Returns the time range of the tile
+
+    :param resolution: The resolution, the tile lasts 2 ** resolution seconds
+    :type resolution: int
+
+    :param tile_index: The index of the tile
+    :type tile_index: int
+
+    :return: The start (inclusive) and end (exclusive) of the tile in epoch seconds
+    :rtype: tuple[int, int]
+    """
+
+    duration = 2 ** resolution
+
+    return tile_index * duration, (tile_index + 1) * duration
+
+
+@db_session
+def _parameter_limits(parameter_id):
+    """
+    Returns the warning limit, critical limit and parameter type of the parameter
+    """
+
+    parameter = MachineParameter.get(id=parameter_id)
+
+    if parameter is None:
+        raise GetMachineTimelineError("Invalid parameter identifier")
+
+    # The limits of the dynamic parameters are NaN, the tiles of those parameters have no limit crossings to keep
+    return tuple(None if limit is None or math.isnan(limit) else limit
+                 for limit in (parameter.warning_limit, parameter.critical_limit)) + (parameter.parameter_type,)
+
+
+def _build_tile(parameter_id, resolution, tile_index, limits, complete):
+    """
+    Returns the encoded body of the tile, read from the database and downsampled
+    """
+
+    start_time, end_time = tile_bounds(resolution, tile_index)
+    timestamps, values = fetch_realtime_columns(parameter_id, start_time, end_time)
+
+    # The range read includes its end, which belongs to the next tile
+    inside = timestamps < end_time * 1000
+    timestamps, values = downsample_timeline(timestamps[inside], values[inside], TILE_MAX_POINTS, "lttb", *limits)
+
+    # Missing values are sent as null
+    return encode_json({"parameter_id": parameter_id, "resolution": resolution, "tile_index": tile_index,
+                        "start_time": start_time * 1000, "end_time": end_time * 1000, "complete": complete,
+                        "timestamps": timestamps.tolist(),
+                        "data": np.where(np.isnan(values), None, values).tolist()})
+
+
+def get_timeline_tile(parameter_id, resolution, tile_index, now=None):
+    """
+    Returns the encoded body of the tile, from the cache when the tile is in the past
+
+    :param parameter_id: The parameter identifier
+    :type parameter_id: int
+
+    :param resolution: The resolution, the tile lasts 2 ** resolution seconds
+    :type resolution: int
+
+    :param tile_index: The index of the tile
+    :type tile_index: int
+
+    :param now: The current time in epoch seconds (defaults to now)
+    :type now: float | None
+
+    :return: The body, its ETag and whether the tile is complete (does not change anymore)
+    :rtype: tuple[bytes, str, bool]
+
+    :raises InvalidTimelineTileError: If the resolution is not supported or the tile is in the future
+    :raises GetMachineTimelineError: If the parameter does not exist
+    """
+
+    if not TILE_MIN_RESOLUTION <= resolution <= TILE_MAX_RESOLUTION:
+        raise InvalidTimelineTileError(f"Resolution must be between {TILE_MIN_RESOLUTION} and {TILE_MAX_RESOLUTION}")
+
+    now = time.time() if now is None else now
+    start_time, end_time = tile_bounds(resolution, tile_index)
+
+    if tile_index < 0 or start_time > now:
+        raise InvalidTimelineTileError(f"Tile {tile_index} of resolution {resolution} is not in the past")
+
+    complete = end_time <= now - TILE_SETTLE_SECONDS
+    key = (parameter_id, resolution, tile_index)
+    cache = get_tile_cache()
+
+    if complete:
+        cached = cache.get(key)
+
+        if cached is not None:
+            return cached[0], cached[1], True
+
+    limits = _parameter_limits(parameter_id)
+    body = _build_tile(parameter_id, resolution, tile_index, limits, complete)
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+
+    if complete:
+        cache.put(key, body, etag, limits)
+
+    return body, etag, complete
@@ -0,0 +1,192 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+READ-ONLY TIMESCALEDB READER
+================================
+
+Module that reads the parameter timelines of timescaledb as columns (numpy arrays) on a small pool of read-only
+connections, outside of the pony sessions.
+
+The timeline of a parameter is aggregated by the database into two arrays (time and value) returned in a single row,
+so no entity and no row object is built per point. The connections are in read-only sessions and every read ends
+its transaction (rollback), a timeline read takes no row lock and never holds a transaction open between requests.
+The number of connections is the ``TIMESCALE_READER_POOL_SIZE`` setting, a read waits for a free connection.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+    * threading - To bound the number of connections in use.
+    * datetime - To convert the epoch times of the requests.
+
+    Related 3rd Party Library
+    =============================
+    * numpy - To hold the columns of the timelines.
+    * psycopg2 - To connect to timescaledb.
+
+This script contains the following class and function
+    * ReaderPool - Class that holds the read-only connections
+    * get_reader_pool - Function that returns the pool of read-only connections
+    * read_row - Function that runs a read-only query and returns its first row
+    * fetch_realtime_columns - Function that returns the timeline of a parameter as time and value arrays
+    * fetch_cycle_points - Function that returns the next points of a parameter with their condition identifiers
+"""
+
+# Standard library imports
+import logging
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+
+# Related third party imports
+import numpy as np
+from psycopg2 import InterfaceError, OperationalError
+from psycopg2.pool import ThreadedConnectionPool
+
+# Local application/library specific imports
+from machine_monitoring_app.database.db_utils import get_realtime_columns_template, get_cycle_points_template
+from machine_monitoring_app.database.pony_models import schema_name
+from machine_monitoring_app.utils.global_variables import get_settings
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+REALTIME_COLUMNS_QUERY = get_realtime_columns_template(schema_name)
+CYCLE_POINTS_QUERY = get_cycle_points_template(schema_name)
+
+
+class ReaderPool:
+    """
+    READ-ONLY CONNECTION POOL
+    ==============================
+
+    Pool of read-only timescaledb connections, ``getconn`` waits for a free connection instead of failing when all of
+    them are in use.
+    """
+
+    def __init__(self, size, **connection_arguments):
+        self._pool = ThreadedConnectionPool(0, size, **connection_arguments)
+        self._available = threading.BoundedSemaphore(size)
+
+    def read_row(self, query, parameters):
+        """
+        Runs the query in a read-only transaction and returns its first row
+
+        :param query: The sql query (psycopg2 parameter style)
+        :type query: str
+
+        :param parameters: The parameters of the query
+        :type parameters: dict
+
+        :return: The first row, None when the query returned no row
+        :rtype: tuple | None
+        """
+
+        with self._available:
+            connection = self._pool.getconn()
+            broken = False
+
+            try:
+                if not connection.readonly:
+                    connection.set_session(readonly=True)
+
+                with connection.cursor() as cursor:
+                    cursor.execute(query, parameters)
+                    return cursor.fetchone()
+            except (InterfaceError, OperationalError):
+                broken = True
+                raise
+            finally:
+                if not broken and not connection.closed:
+                    # Ends the read-only transaction (and the aborted one of a failed query)
+                    connection.rollback()
+
+                self._pool.putconn(connection, close=broken or bool(connection.closed))
+
+
+@lru_cache()
+def get_reader_pool():
+    """
+    Returns the pool of read-only connections of the application
+
+    :return: The pool
+    :rtype: ReaderPool
+    """
+
+    setting = get_settings()
+
+    return ReaderPool(setting.timescale_reader_pool_size, user=setting.timescaledb_user,
+                      password=setting.timescaledb_password, host=setting.timescaledb_host,
+                      port=setting.timescaledb_port, dbname=setting.timescaledb_database)
+
+
+def read_row(query, parameters):
+    """
+    Runs the query in a read-only transaction of the pool and returns its first row
+
+    :param query: The sql query (psycopg2 parameter style)
+    :type query: str
+
+    :param parameters: The parameters of the query
+    :type parameters: dict
+
+    :return: The first row, None when the query returned no row
+    :rtype: tuple | None
+    """
+
+    return get_reader_pool().read_row(query, parameters)
+
+
+def fetch_realtime_columns(parameter_id, start_time, end_time):
+    """
+    Returns the timeline of the parameter between the given times as two arrays, in time order
+
+    :param parameter_id: The parameter identifier
+    :type parameter_id: int
+
+    :param start_time: The start time in epoch seconds
+    :type start_time: float
+
+    :param end_time: The end time in epoch seconds
+    :type end_time: float
+
+    :return: The times (epoch milliseconds) and the values (NaN for missing values)
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+
+    row = read_row(REALTIME_COLUMNS_QUERY, {"parameter_id": parameter_id,
+                                            "start_time": datetime.fromtimestamp(start_time, timezone.utc),
+                                            "end_time": datetime.fromtimestamp(end_time, timezone.utc)})
+
+    if row is None:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+
+    return np.asarray(row[0], dtype=np.float64), np.array(row[1], dtype=np.float64)
+
+
+def fetch_cycle_points(parameter_id, after, limit):
+    """
+    Returns the first points of the parameter after the given time as three arrays, in time order
+
+    :param parameter_id: The parameter identifier
+    :type parameter_id: int
+
+    :param after: The time after which the points are read
+    :type after: datetime
+
+    :param limit: The maximum number of points
+    :type limit: int
+
+    :return: The times (epoch milliseconds), the values and the condition identifiers (NaN except on the last point
+             of a cycle)
+    :rtype: tuple[np.ndarray, np.ndarray, np.ndarray]
+    """
+
+    row = read_row(CYCLE_POINTS_QUERY, {"parameter_id": parameter_id, "after": after, "limit": limit})
+
+    if row is None:
+        return tuple(np.empty(0, dtype=np.float64) for _ in range(3))
+
+    return tuple(np.array(column, dtype=np.float64) for column in row)
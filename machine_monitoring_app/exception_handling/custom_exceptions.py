@@ -59,6 +59,51 @@ class GetMachineTimelineError(Exception):
     pass
 
 
+class FactoryObjectNotFoundError(Exception):
+    """
+
+    This exception is used when the requested line, machine or parameter is not available in the factory snapshot.
+
+    """
+    pass
+
+
+class AmbiguousFactoryObjectError(Exception):
+    """
+
+    This exception is used when the requested parameter name exists on several machines and no machine is given.
+
+    """
+    pass
+
+
+class FanOutTimeoutError(Exception):
+    """
+
+    This exception is used when a query of a fan-out has not finished within its timeout.
+
+    """
+    pass
+
+
+class ClientDisconnectedError(Exception):
+    """
+
+    This exception is used when the client has disconnected while the queries of its request were still running.
+
+    """
+    pass
+
+
+class InvalidTimelineTileError(Exception):
+    """
+
+    This exception is used when the requested timeline tile has an unsupported resolution or is not in the past.
+
+    """
+    pass
+
+
 def main():
     """
     Main Function
@@ -63,6 +63,39 @@ class Settings(BaseSettings):
     # Mongodb Database host identifier
     mongodb_host: str
 
+    # Validate the pre-encoded responses against their response models (enabled in tests)
+    validate_encoded_responses: bool = False
+
+    # Offset (seconds from UTC midnight) of the day boundaries of the daily state duration rollups
+    state_rollup_day_offset_seconds: int = 0
+
+    # Maximum number of fan-out queries running at the same time against MTLINKi (all requests together)
+    fan_out_concurrency: int = 8
+
+    # Timeout in seconds of a single fan-out query
+    fan_out_timeout_seconds: float = 30.0
+
+    # Interval in seconds of the DISCONNECT polling when the deployment does not support change streams
+    disconnection_poll_seconds: float = 5.0
+
+    # Run the disconnection watcher in the web workers (else the registry is polled on every request)
+    disconnection_watcher_enabled: bool = True
+
+    # Keep the in-memory interval index in the web workers (else the state / alarm windows are queried)
+    interval_index_enabled: bool = True
+
+    # Number of days of state intervals and alarms kept in the in-memory interval index
+    interval_index_horizon_days: int = 7
+
+    # Seconds a window may end after the last refresh of the interval index and still be answered from it
+    interval_index_max_lag_seconds: float = 15.0
+
+    # Maximum number of read-only timescaledb connections used by the parameter timelines
+    timescale_reader_pool_size: int = 4
+
+    # Byte budget of the in-memory cache of the complete timeline tiles
+    timeline_tile_cache_bytes: int = 64 * 1024 * 1024
+
 
 
 
@@ -780,6 +780,67 @@ class DisconnectionHistoryItem(BaseModel):
 
 class DisconnectionHistoryResponse(BaseModel):
     history: List[DisconnectionHistoryItem]
+    next_cursor: Optional[str] = None
+
+
+class DynamicCycleData(BaseModel):
+    """
+    Represents one machining cycle of a dynamic parameter with its comparison to the reference signal
+    """
+
+    cycle_value: List[Optional[float]]
+    timestamps: List[float]
+    reference_cycle: List[float]
+    condition: Optional[str]
+
+    # p-value and statistic of the Kruskal-Wallis test against the reference signal
+    alpha_value: Optional[float]
+    stat_value: Optional[float]
+
+    variant_name: Optional[str]
+    cycle_time: float
+    point_count: int
+    min_value: Optional[float]
+    max_value: Optional[float]
+    mean_value: Optional[float]
+    std_value: Optional[float]
+
+
+class DynamicTimelineData(BaseModel):
+    """
+    Represents the machining cycles of a dynamic parameter of a machine
+    """
+
+    param: int
+    axis: int
+    machine: str
+    start_time: float
+    stop_time: float
+    data: List[DynamicCycleData]
+
+
+class AlarmParetoItem(BaseModel):
+    """
+    Represents one alarm of the alarm pareto with its share and the cumulative share of the ranking
+    """
+
+    alarm_number: str
+    message: Optional[str]
+    alarm_count: int
+    downtime_seconds: float
+    percentage: float
+    cumulative_percentage: float
+
+
+class AlarmParetoResponse(BaseModel):
+    """
+    Represents the alarm pareto response model, the top alarms by count and by total downtime
+    """
+
+    total_count: int
+    total_downtime_seconds: float
+    by_count: List[AlarmParetoItem]
+    by_downtime: List[AlarmParetoItem]
 
 
 
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+ALARM HISTORY MONITOR
+================================
+
+Module for the service that mirrors the MTLINKi Alarm_History collection into the timescaledb alarm_history
+hypertable, every run copies the alarms that ended since the persisted watermark.
+
+The service writes to timescaledb, it is run as a single process (main_alarm_history_sync.py) and not in the web
+workers.
+
+This script requires the following modules be installed in the python environment
+    * logging - to perform logging operations
+
+This script contains the following function
+    * monitor_alarm_history - Function that copies the new alarms forever
+"""
+
+# Standard library imports
+import logging
+import time
+
+# Related third party imports
+# None
+
+# Local application/library specific imports
+from machine_monitoring_app.database.alarm_history_sync import ensure_alarm_history_table, sync_alarm_history
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+ALARM_HISTORY_MONITOR_SLEEP_SECONDS = 60
+
+
+def monitor_alarm_history(sleep_time: int):
+    """
+    Function to copy the new alarms of Alarm_History to timescaledb, the hypertable is created on the first run
+
+    :param sleep_time: The sleep time in seconds for this service
+
+    :return: Nothing
+    :rtype: None
+    """
+
+    table_ready = False
+
+    while True:
+        try:
+            if not table_ready:
+                ensure_alarm_history_table()
+                table_ready = True
+
+            sync_alarm_history()
+        except Exception as error:
+            LOGGER.exception(f"Copying the alarm history failed: {error}")
+
+        LOGGER.info(f"Sleeping for {sleep_time} seconds")
+        time.sleep(sleep_time)
+
+
+def main():
+    """
+    Main Function
+    ====================
+
+    Main function to call appropriate functions to start the alarm history monitor service
+
+    """
+
+    monitor_alarm_history(ALARM_HISTORY_MONITOR_SLEEP_SECONDS)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+CYCLE SEGMENTER MONITOR
+================================
+
+Module for the service that keeps the machining cycle index of the dynamic parameters up to date, every run indexes
+the cycles that ended since the watermark of every parameter.
+
+The service writes to timescaledb, it is run as a single process (main_cycle_segmenter.py) and not in the web workers.
+
+This script requires the following modules be installed in the python environment
+    * logging - to perform logging operations
+
+This script contains the following function
+    * monitor_cycle_segmenter - Function that indexes the new cycles forever
+"""
+
+# Standard library imports
+import logging
+import time
+
+# Related third party imports
+# None
+
+# Local application/library specific imports
+from machine_monitoring_app.database.cycle_index import ensure_cycle_index_table, segment_cycles
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+CYCLE_SEGMENTER_SLEEP_SECONDS = 30
+
+
+def monitor_cycle_segmenter(sleep_time: int):
+    """
+    Function to index the new machining cycles of the dynamic parameters, the hypertable is created on the first run
+
+    :param sleep_time: The sleep time in seconds for this service
+
+    :return: Nothing
+    :rtype: None
+    """
+
+    table_ready = False
+
+    while True:
+        try:
+            if not table_ready:
+                ensure_cycle_index_table()
+                table_ready = True
+
+            segment_cycles()
+        except Exception as error:
+            LOGGER.exception(f"Segmenting the cycles failed: {error}")
+
+        LOGGER.info(f"Sleeping for {sleep_time} seconds")
+        time.sleep(sleep_time)
+
+
+def main():
+    """
+    Main Function
+    ====================
+
+    Main function to call appropriate functions to start the cycle segmenter service
+
+    """
+
+    monitor_cycle_segmenter(CYCLE_SEGMENTER_SLEEP_SECONDS)
+
+
+if __name__ == '__main__':
+    main()
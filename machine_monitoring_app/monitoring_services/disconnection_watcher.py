@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+DISCONNECTION WATCHER
+================================
+
+Module for the background service that feeds the live disconnected machines registry. The service follows the
+DISCONNECT signals of L1Signal_Pool_Active with a change stream, when the deployment does not support change streams
+(standalone server) it polls the signals updated since the watermark every ``DISCONNECTION_POLL_SECONDS`` setting.
+
+The registry is an in-memory cache of the process serving the requests, the watcher only reads MTLINKi and writes
+nothing, so it runs in every web worker (each worker holds one change stream or poll). With many workers it can be
+switched off with the ``DISCONNECTION_WATCHER_ENABLED`` setting, the registry is then polled on every request.
+
+This script requires the following modules be installed in the python environment
+    * logging - to perform logging operations
+    * threading - to run the service in the background of the application
+    * pymongo - to tell an unsupported change stream from a failed one
+
+This script contains the following function
+    * watch_disconnections - Function that keeps the registry up to date forever
+    * start_disconnection_watcher - Function that starts the service in a background thread
+"""
+
+# Standard library imports
+import logging
+import threading
+import time
+
+# Related third party imports
+from pymongo.errors import OperationFailure, PyMongoError
+
+# Local application/library specific imports
+from machine_monitoring_app.database.disconnection_registry import get_disconnection_registry
+from machine_monitoring_app.utils.global_variables import get_settings
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+_WATCHER_THREAD = None
+
+
+def watch_disconnections(sleep_time: float, use_change_stream: bool = True):
+    """
+    Function to keep the disconnection registry up to date, with a change stream when supported, else by polling
+
+    :param sleep_time: The polling interval (and the retry interval after a failure) in seconds
+    :param use_change_stream: Try a change stream before falling back to polling
+
+    :return: Nothing
+    :rtype: None
+    """
+
+    registry = get_disconnection_registry()
+
+    while True:
+        if use_change_stream:
+            try:
+                LOGGER.info("Watching the DISCONNECT signals with a change stream")
+                registry.watch()
+            except OperationFailure as error:
+                LOGGER.info(f"Change streams are not supported ({error}), polling the DISCONNECT signals")
+                use_change_stream = False
+            except PyMongoError as error:
+                LOGGER.warning(f"The change stream of the DISCONNECT signals failed: {error}")
+                time.sleep(sleep_time)
+            continue
+
+        try:
+            transitions = registry.poll()
+
+            if transitions:
+                LOGGER.info(f"Recorded {transitions} disconnection transitions")
+        except Exception as error:
+            LOGGER.exception(f"Polling the DISCONNECT signals failed: {error}")
+
+        time.sleep(sleep_time)
+
+
+def start_disconnection_watcher(sleep_time: float = None):
+    """
+    Function to start the disconnection watcher in a background (daemon) thread, only once per process
+
+    :param sleep_time: The polling interval in seconds (defaults to the DISCONNECTION_POLL_SECONDS setting)
+
+    :return: Nothing
+    :rtype: None
+    """
+
+    global _WATCHER_THREAD
+
+    if _WATCHER_THREAD is not None and _WATCHER_THREAD.is_alive():
+        return
+
+    setting = get_settings()
+
+    if not setting.disconnection_watcher_enabled:
+        LOGGER.info("Disconnection Watcher disabled, the registry is polled on every request")
+        return
+
+    if sleep_time is None:
+        sleep_time = setting.disconnection_poll_seconds
+
+    _WATCHER_THREAD = threading.Thread(target=watch_disconnections, args=(sleep_time,), name="disconnection-watcher",
+                                       daemon=True)
+    _WATCHER_THREAD.start()
+
+    LOGGER.info("Started Disconnection Watcher")
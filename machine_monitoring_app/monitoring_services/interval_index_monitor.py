@@ -0,0 +1,88 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+INTERVAL INDEX MONITOR
+================================
+
+Module for the background service that keeps the in-memory state and alarm interval indexes up to date, the first
+run loads the horizon, every next run adds the intervals that ended since the previous one.
+
+The indexes are in-memory caches of the process serving the requests, the service only reads MTLINKi and writes
+nothing, so it runs in every web worker (each worker holds its own horizon). With many workers it can be switched off
+with the ``INTERVAL_INDEX_ENABLED`` setting, the windows are then answered by queries.
+
+This script requires the following modules be installed in the python environment
+    * logging - to perform logging operations
+    * threading - to run the service in the background of the application
+
+This script contains the following function
+    * monitor_interval_indexes - Function that refreshes the indexes forever
+    * start_interval_index_monitor - Function that starts the service in a background thread
+"""
+
+# Standard library imports
+import logging
+import threading
+import time
+
+# Related third party imports
+# None
+
+# Local application/library specific imports
+from machine_monitoring_app.database.state_duration_engine import get_state_interval_index
+from machine_monitoring_app.database.interval_index import get_alarm_interval_index
+from machine_monitoring_app.utils.global_variables import get_settings
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+INTERVAL_INDEX_REFRESH_SECONDS = 5
+
+_MONITOR_THREAD = None
+
+
+def monitor_interval_indexes(sleep_time: float):
+    """
+    Function to refresh the state and alarm interval indexes
+
+    :param sleep_time: The sleep time in seconds for this service
+
+    :return: Nothing
+    :rtype: None
+    """
+
+    while True:
+        for interval_index in (get_state_interval_index(), get_alarm_interval_index()):
+            try:
+                interval_index.refresh()
+            except Exception as error:
+                LOGGER.exception(f"Refreshing the {interval_index.name} interval index failed: {error}")
+
+        time.sleep(sleep_time)
+
+
+def start_interval_index_monitor(sleep_time: float = INTERVAL_INDEX_REFRESH_SECONDS):
+    """
+    Function to start the interval index service in a background (daemon) thread, only once per process
+
+    :param sleep_time: The sleep time in seconds for this service
+
+    :return: Nothing
+    :rtype: None
+    """
+
+    global _MONITOR_THREAD
+
+    if _MONITOR_THREAD is not None and _MONITOR_THREAD.is_alive():
+        return
+
+    if not get_settings().interval_index_enabled:
+        LOGGER.info("Interval Index Monitor disabled, the state and alarm windows are queried")
+        return
+
+    _MONITOR_THREAD = threading.Thread(target=monitor_interval_indexes, args=(sleep_time,),
+                                       name="interval-index-monitor", daemon=True)
+    _MONITOR_THREAD.start()
+
+    LOGGER.info("Started Interval Index Monitor")
@@ -25,6 +25,8 @@ from pony.orm import db_session, commit, max as pony_max, min as pony_min, selec
 from machine_monitoring_app.database.mongodb_client import get_mongo_collection
 from machine_monitoring_app.database.pony_models import Machine, MachinePartCount, SparePart
 from machine_monitoring_app.database.mongo_db_utils import part_signal_query_with_time
+from machine_monitoring_app.database.condition_kernel import evaluate_conditions
+from machine_monitoring_app.database.hierarchy_builder import WARNING, CRITICAL
 from machine_monitoring_app.report_manager.email_sender import create_excel_report
 from machine_monitoring_app.report_manager import EMAIL_REPORT_ROOT_DIRECTORY
 
@@ -90,29 +92,29 @@ def get_new_part_data(query_timestamp: datetime):
         # Getting all the spare parts for the machine
         spare_parts = SparePart.select(lambda sp: sp.machine == machine_part_count.machine)[:]
 
-        # For all the spare parts this machine has, we do the following
-        for spare_part in spare_parts:
-
-            # The current part count for this spare part is equal to the current part count of the
-            # Machine minus the reference part count. This reference part count is equal to the
-            # Part count of the machine (to which the spare part belongs) when it was created/reset
-            # From the front end.
-            current_spare_part_count = machine_part_count.current_part_count - spare_part.reference_part_number
-
-            # If the current_spare_part_count is greater than the critical limit, we append it to the list
-            # Of abnormal_spare_part_count
-            if current_spare_part_count > spare_part.critical_limit:
+        # The current part count for every spare part is equal to the current part count of the
+        # Machine minus the reference part count. This reference part count is equal to the
+        # Part count of the machine (to which the spare part belongs) when it was created/reset
+        # From the front end.
+        current_spare_part_counts = [machine_part_count.current_part_count - spare_part.reference_part_number
+                                     for spare_part in spare_parts]
+
+        # A spare part is abnormal once its count exceeds the warning / critical limit, so every spare part is added
+        # at most once to the abnormal_spare_part_count list
+        condition_codes = evaluate_conditions(current_spare_part_counts,
+                                              [spare_part.warning_limit for spare_part in spare_parts],
+                                              [spare_part.critical_limit for spare_part in spare_parts],
+                                              "increasing", inclusive=False)
+
+        for spare_part, current_spare_part_count, condition_code in zip(spare_parts, current_spare_part_counts,
+                                                                        condition_codes):
+            if condition_code == CRITICAL:
                 abnormal_spare_part_count.append((spare_part, current_spare_part_count,
-                                                  str(part["updatedate"]),
-                                                  "Critical"))
+                                                  str(part["updatedate"]), "Critical"))
 
-            # If the current_spare_part_count is greater than the warning limit, we append it to the list
-            # Of abnormal_spare_part_count
-            elif current_spare_part_count > spare_part.warning_limit:
+            elif condition_code == WARNING:
                 abnormal_spare_part_count.append((spare_part, current_spare_part_count,
                                                   str(part["updatedate"]), "Warning"))
-            # By having separate check for warning and critical, the machine will be added only once to the
-            # abnormal_spare_part_count list
 
     # The data coming from the mongodb database is already sorted in descending order with respect to the updatedate
     # So we can get the first value to get the recent most timestamp
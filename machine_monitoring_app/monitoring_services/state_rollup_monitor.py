@@ -0,0 +1,73 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+STATE ROLLUP MONITOR
+================================
+
+Module for the service that keeps the daily state duration rollups up to date, every run rolls up again the days of
+the intervals ended late and the finished days that are not in the rollup store yet.
+
+The service writes the rollups, it is run as a single process (main_state_rollup.py) and not in the web workers.
+
+This script requires the following modules be installed in the python environment
+    * logging - to perform logging operations
+
+This script contains the following function
+    * monitor_state_rollups - Function that updates the rollups forever
+"""
+
+# Standard library imports
+import logging
+import time
+
+# Related third party imports
+# None
+
+# Local application/library specific imports
+from machine_monitoring_app.database.state_rollup_store import update_state_rollups, ROLLUP_DAYS_PER_UPDATE
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+ROLLUP_MONITOR_SLEEP_SECONDS = 900
+
+
+def monitor_state_rollups(sleep_time: int):
+    """
+    Function to update the daily state duration rollups, a backlog of days is worked through without sleeping
+
+    :param sleep_time: The sleep time in seconds for this service
+
+    :return: Nothing
+    :rtype: None
+    """
+
+    while True:
+        try:
+            rolled_up_days = update_state_rollups()
+        except Exception as error:
+            LOGGER.exception(f"Updating the state rollups failed: {error}")
+            rolled_up_days = 0
+
+        if rolled_up_days == ROLLUP_DAYS_PER_UPDATE:
+            continue
+
+        LOGGER.info(f"Sleeping for {sleep_time} seconds")
+        time.sleep(sleep_time)
+
+
+def main():
+    """
+    Main Function
+    ====================
+
+    Main function to call appropriate functions to start the state rollup monitor service
+
+    """
+
+    monitor_state_rollups(ROLLUP_MONITOR_SLEEP_SECONDS)
+
+
+if __name__ == '__main__':
+    main()
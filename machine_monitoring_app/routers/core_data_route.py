@@ -33,7 +33,9 @@ import copy
 
 # Related third party imports
 import pytz
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 import pandas as pd
 import psycopg2
 
@@ -41,7 +43,18 @@ import psycopg2
 from numpy import select
 from pony.orm import db_session, commit, flush
 
-from machine_monitoring_app.database.mongodb_client import get_mongo_collection
+from machine_monitoring_app.database.mtlinki_repository import get_mtlinki_repository
+from machine_monitoring_app.database.mongo_db_utils import get_parameter_history_template
+from machine_monitoring_app.utils.fan_out import get_fan_out_stats
+from machine_monitoring_app.utils.global_variables import get_settings
+from machine_monitoring_app.database.mongodb_client import get_pool_stats
+from machine_monitoring_app.database.disconnection_registry import get_disconnection_registry, \
+    get_disconnected_machines_live
+from machine_monitoring_app.database.state_duration_engine import get_state_interval_index
+from machine_monitoring_app.database.interval_index import get_alarm_interval_index
+from machine_monitoring_app.database.alarm_history_sync import get_alarm_sync_status
+from machine_monitoring_app.database.cycle_index import get_cycle_index_status
+from machine_monitoring_app.database.timeline_tiles import get_timeline_tile, get_tile_cache, TILE_MAX_AGE_SECONDS
 from machine_monitoring_app.database.pony_models import Machine, ParameterGroup, MachineParameter, ParameterCondition, \
     ParameterComparison
 from machine_monitoring_app.models.response_models import CurrentData, FullTimelineData, StatusSummaryResponseData, \
@@ -50,7 +63,7 @@ from machine_monitoring_app.models.response_models import CurrentData, FullTimel
     MachineParameterResponseModelState, SpmStateData, SpareStateData, SpmPositionData, SpecificGroupSchema, \
     FullTimelineDataUsingParameterName, GroupSchema, MachineAnalyticsSummary, ParameterAnalyticsSummary, MachineList, \
     MaintenanceAnalyticsSummary, SpecificGroupSchema_test, UpdateLogResponse, ParameterComparisonOutput, \
-    DisconnectionHistoryResponse, ParameterComparisonOutput_mongodb
+    DisconnectionHistoryResponse, ParameterComparisonOutput_mongodb, AlarmParetoResponse, DynamicTimelineData
 
 from machine_monitoring_app.database.crud_operations import get_current_machine_data, get_machine_timeline, \
     create_spare_part, update_spare_part, get_alarm_summary_data, delete_spare_part, update_parameter_limits, \
@@ -65,13 +78,20 @@ from machine_monitoring_app.database.crud_operations import get_current_machine_
     get_machine_timeline_parameter_name_mtlinki, get_machine_names, get_latest_snapshot_for_parameter_group_test, \
     get_machine_names_2, get_maintenance_activities_parameter_new, fetch_update_logs, fetch_update_logs_by_name, \
     fetch_update_logs_by_user, fetch_update_logs_by_time_range, get_disconnected_machines_data, \
-    get_disconnection_history_data
+    get_disconnection_history_data, get_alarm_summary_data_async, get_disconnection_history_page_async, \
+    stream_disconnection_history_async, get_alarm_pareto_data, get_dynamic_parameter_cycles
 
 from machine_monitoring_app.database import TIMESCALEDB_URL
+from machine_monitoring_app.database.condition_kernel import evaluate_conditions, condition_names
 from machine_monitoring_app.exception_handling.custom_exceptions import NoParameterGroupError, GetParamGroupDBError, \
-    GetAllParameterDBError, GetMachineTimelineError
+    GetAllParameterDBError, GetMachineTimelineError, FanOutTimeoutError, ClientDisconnectedError, \
+    InvalidTimelineTileError
 
 from machine_monitoring_app.routers.router_dependencies import get_current_active_user, is_admin
+from machine_monitoring_app.utils.conditional_get import snapshot_etag, body_etag, etag_matches, \
+    not_modified_response, set_etag, get_request_counts
+from machine_monitoring_app.utils.encoded_response import encode_response, encode_snapshot_response, \
+    encoded_json_response, encode_json
 from machine_monitoring_app.database.crud_operations import get_full_day_summary, get_full_month_week_summary, \
     get_spare_parts, get_machine_parameters
 
@@ -97,7 +117,7 @@ ROUTER = APIRouter(
 
 
 @ROUTER.get("/machine-spare-states-new", response_model=GroupSchema)
-async def read_machine_spare_states_new():
+async def read_machine_spare_states_new(request: Request):
     """
     GET CURRENT PARAMETERS DATA
     ===============================
@@ -107,7 +127,13 @@ async def read_machine_spare_states_new():
 
     start_time = time.time()
     try:
-        response_data = get_all_machine_spare_details()
+        body = encode_response(get_all_machine_spare_details(), GroupSchema)
+        etag = body_etag("machine-spare-states-new", body)
+        if etag_matches(request, etag):
+            return not_modified_response("machine-spare-states-new", etag)
+
+        response_data = encoded_json_response(body)
+        set_etag(response_data, "machine-spare-states-new", etag)
         end_time = time.time() - start_time
         LOGGER.info(f"Total Time Taken For this end point: {(round((end_time * 1000), 2))} ms")
     except GetParamGroupDBError as error:
@@ -279,7 +305,7 @@ async def read_maintenance_operators():
 
 
 @ROUTER.get("/factory-state/{parameterGroupName}", response_model=SpecificGroupSchema)
-async def read_recent_group(parameterGroupName: str):
+async def read_recent_group(parameterGroupName: str, request: Request):
     """
     GET CURRENT PARAMETERS DATA
     ===============================
@@ -289,7 +315,15 @@ async def read_recent_group(parameterGroupName: str):
 
     start_time = time.time()
     try:
-        response_data = get_latest_snapshot_for_parameter_group(parameterGroupName)
+        route_key = f"factory-state/{parameterGroupName}"
+        etag = snapshot_etag(route_key)
+        if etag_matches(request, etag):
+            return not_modified_response(route_key, etag)
+
+        response_data = encoded_json_response(
+            encode_snapshot_response(route_key, lambda: get_latest_snapshot_for_parameter_group(parameterGroupName),
+                                     SpecificGroupSchema))
+        set_etag(response_data, route_key, etag)
         end_time = time.time() - start_time
         LOGGER.info(f"Total Time Taken For this end point: {(round((end_time * 1000), 2))} ms")
     except NoParameterGroupError as error:
@@ -303,7 +337,7 @@ async def read_recent_group(parameterGroupName: str):
 
 
 @ROUTER.get("/factory-state-mtlinki/{parameterGroupName}", response_model=SpecificGroupSchema)
-async def read_recent_group_mtlinki(parameterGroupName: str):
+async def read_recent_group_mtlinki(parameterGroupName: str, request: Request):
     """
     GET CURRENT PARAMETERS DATA
     ===============================
@@ -313,7 +347,15 @@ async def read_recent_group_mtlinki(parameterGroupName: str):
 
     start_time = time.time()
     try:
-        response_data = get_latest_snapshot_for_parameter_group(parameterGroupName)
+        route_key = f"factory-state-mtlinki/{parameterGroupName}"
+        etag = snapshot_etag(route_key)
+        if etag_matches(request, etag):
+            return not_modified_response(route_key, etag)
+
+        response_data = encoded_json_response(
+            encode_snapshot_response(route_key, lambda: get_latest_snapshot_for_parameter_group(parameterGroupName),
+                                     SpecificGroupSchema))
+        set_etag(response_data, route_key, etag)
         end_time = time.time() - start_time
         LOGGER.info(f"Total Time Taken For this end point: {(round((end_time * 1000), 2))} ms")
     except NoParameterGroupError as error:
@@ -329,7 +371,7 @@ async def read_recent_group_mtlinki(parameterGroupName: str):
 
 
 @ROUTER.get("/factory-state-mtlinki-test/{parameterGroupName}", response_model=SpecificGroupSchema_test)
-async def read_recent_group_mtlinki_test(parameterGroupName: str):
+async def read_recent_group_mtlinki_test(parameterGroupName: str, request: Request):
     """
     GET CURRENT PARAMETERS DATA
     ===============================
@@ -339,7 +381,15 @@ async def read_recent_group_mtlinki_test(parameterGroupName: str):
 
     start_time = time.time()
     try:
-        response_data = get_latest_snapshot_for_parameter_group_test(parameterGroupName)
+        route_key = f"factory-state-mtlinki-test/{parameterGroupName}"
+        body = encode_response(get_latest_snapshot_for_parameter_group_test(parameterGroupName),
+                               SpecificGroupSchema_test)
+        etag = body_etag(route_key, body)
+        if etag_matches(request, etag):
+            return not_modified_response(route_key, etag)
+
+        response_data = encoded_json_response(body)
+        set_etag(response_data, route_key, etag)
         end_time = time.time() - start_time
         LOGGER.info(f"Total Time Taken For this end point: {(round((end_time * 1000), 2))} ms")
     except NoParameterGroupError as error:
@@ -353,7 +403,7 @@ async def read_recent_group_mtlinki_test(parameterGroupName: str):
 
 
 @ROUTER.get("/machine-state/{parameterGroupId}", response_model=CurrentData)
-async def read_all_current_values(parameterGroupId: int):
+async def read_all_current_values(parameterGroupId: int, request: Request):
     """
     GET CURRENT PARAMETERS DATA
     ===============================
@@ -363,7 +413,15 @@ async def read_all_current_values(parameterGroupId: int):
 
     start_time = time.time()
     try:
-        response_data = get_current_machine_data(parameterGroupId)
+        # get_current_machine_data runs its own queries (not the snapshot), so the ETag is the hash of the body
+        route_key = f"machine-state/{parameterGroupId}"
+        body = encode_response(get_current_machine_data(parameterGroupId), CurrentData)
+        etag = body_etag(route_key, body)
+        if etag_matches(request, etag):
+            return not_modified_response(route_key, etag)
+
+        response_data = encoded_json_response(body)
+        set_etag(response_data, route_key, etag)
         end_time = time.time() - start_time
         LOGGER.info(f"Total Time Taken For this end point: {(round((end_time * 1000), 2))} ms")
     except NoParameterGroupError as error:
@@ -376,47 +434,59 @@ async def read_all_current_values(parameterGroupId: int):
     return response_data
 
 
-@ROUTER.get("/dynamic-parameter-real-time/{machineName}/{parameterGroupId}/{axisId}")
+@ROUTER.get("/dynamic-parameter-real-time/{machineName}/{parameterGroupId}/{axisId}",
+            response_model=DynamicTimelineData)
 async def read_timeline_machine_param_dynamic(machineName: str, parameterGroupId: int, axisId: int, startTime: float,
-                                              endTime: float):
+                                              endTime: float,
+                                              lastCycles: Optional[int] = Query(None, ge=1, le=500)):
     """
 
     GET MACHINE TIMELINE DATA DYNAMIC
     =====================================
 
-    This api is used to query the given machine's parameter for full timeline of data
+    This api is used to query the machining cycles of the given machine's dynamic parameter that ended between the
+    given epoch milliseconds (or the last ``lastCycles`` cycles before the end time), with their comparison to the
+    reference signal
 
     """
-    response_data = {
-        "param": 0,
-        "axis": 0,
-        "machine": "string",
-        "start_time": 0,
-        "stop_time": 0,
-        "data": [
-            {"cycle_value": [4, 2, 3],
-             "timestamps": [1, 2, 3],
-             "reference_cycle": [4, 4, 3],
-             "condition": "critical",
-             "alpha_value": 0.6,
-             "stat_value": 1.0,
-             "variant_name": "name",
-             "cycle_time": 60},
-            {"cycle_value": [5, 6, 7, 8],
-             "timestamps": [4, 5, 6, 7],
-             "reference_cycle": [5, 7, 7, 8],
-             "condition": "critical",
-             "alpha_value": 0.6,
-             "stat_value": 1.0,
-             "variant_name": "name",
-             "cycle_time": 60}
-        ]
-    }
-    return response_data
+    process_start_time = time.time()
+
+    if startTime > endTime:
+        raise HTTPException(status_code=400, detail="Start Time cannot be greater than End Time")
+
+    try:
+        response_data = await run_in_threadpool(get_dynamic_parameter_cycles, machineName, parameterGroupId, axisId,
+                                                startTime, endTime, lastCycles)
+    except GetMachineTimelineError as error:
+        raise HTTPException(status_code=404, detail=f"Issue with database: {error.args[0]}")
+    except GetAllParameterDBError:
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    if not response_data:
+        raise HTTPException(status_code=404, detail="No cycle available for given machine, parameter group, "
+                                                    "axis and timestamp")
+
+    response = encoded_json_response(encode_response(response_data, DynamicTimelineData))
+    end_time = time.time() - process_start_time
+    LOGGER.info(f"Total Time Taken For this end point: {(round((end_time * 1000), 2))} ms")
+
+    return response
+
+
+@ROUTER.get("/cycle-index/stats")
+def read_cycle_index_stats():
+    """
+    GET CYCLE INDEX STATISTICS
+    ===================================
+
+    This api is used to query the watermark and the number of indexed machining cycles of every dynamic parameter
+    """
+
+    return get_cycle_index_status()
 
 
 @ROUTER.get("/spm-machine-state", response_model=SpmStateData)
-async def read_spm_machine_states():
+async def read_spm_machine_states(request: Request):
     """
     GET CURRENT PARAMETERS DATA SPM
     ===================================
@@ -426,7 +496,13 @@ async def read_spm_machine_states():
 
     start_time = time.time()
     try:
-        response_data = get_all_machine_spm_status_active()
+        body = encode_response(get_all_machine_spm_status_active(), SpmStateData)
+        etag = body_etag("spm-machine-state", body)
+        if etag_matches(request, etag):
+            return not_modified_response("spm-machine-state", etag)
+
+        response_data = encoded_json_response(body)
+        set_etag(response_data, "spm-machine-state", etag)
         end_time = time.time() - start_time
         LOGGER.info(f"Total Time Taken For this end point: {(round((end_time * 1000), 2))} ms")
     except NoParameterGroupError as error:
@@ -440,7 +516,7 @@ async def read_spm_machine_states():
 
 
 @ROUTER.get("/machine-spare-states", response_model=SpareStateData)
-async def read_machine_spare_states():
+async def read_machine_spare_states(request: Request):
     """
     GET CURRENT PARAMETERS DATA CNC
     ===================================
@@ -452,8 +528,14 @@ async def read_machine_spare_states():
     try:
         warning_machines, critical_machines = get_spare_part_states()
 
-        response_data = {"spare_machine_status": {"warning_machines": warning_machines,
-                                                  "critical_machines": critical_machines}}
+        body = encode_response({"spare_machine_status": {"warning_machines": warning_machines,
+                                                         "critical_machines": critical_machines}}, SpareStateData)
+        etag = body_etag("machine-spare-states", body)
+        if etag_matches(request, etag):
+            return not_modified_response("machine-spare-states", etag)
+
+        response_data = encoded_json_response(body)
+        set_etag(response_data, "machine-spare-states", etag)
 
         end_time = time.time() - start_time
         LOGGER.info(f"Total Time Taken For this end point: {(round((end_time * 1000), 2))} ms")
@@ -467,6 +549,114 @@ async def read_machine_spare_states():
     return response_data
 
 
+@ROUTER.get("/conditional-get/stats")
+async def read_conditional_get_stats():
+    """
+    GET CONDITIONAL GET STATISTICS
+    ===================================
+
+    This api is used to query the number of full and not modified (304) answers of the snapshot style routes
+    """
+
+    return get_request_counts()
+
+
+@ROUTER.get("/fan-out/stats")
+async def read_fan_out_stats():
+    """
+    GET FAN-OUT STATISTICS
+    ===================================
+
+    This api is used to query the latency of the parallel (fan-out) queries, per template
+    """
+
+    return get_fan_out_stats()
+
+
+@ROUTER.get("/mongo-pools/stats")
+async def read_mongo_pool_stats():
+    """
+    GET MONGODB POOL STATISTICS
+    ===================================
+
+    This api is used to query the connection checkout waits of the realtime and analytics mongodb pools
+    """
+
+    return get_pool_stats()
+
+
+@ROUTER.get("/interval-index/stats")
+async def read_interval_index_stats():
+    """
+    GET INTERVAL INDEX STATISTICS
+    ===================================
+
+    This api is used to query the horizon, size and refresh statistics of the in-memory state and alarm interval
+    indexes
+    """
+
+    return {"state": get_state_interval_index().get_stats(), "alarm": get_alarm_interval_index().get_stats()}
+
+
+@ROUTER.get("/alarm-history-sync/stats")
+def read_alarm_history_sync_stats():
+    """
+    GET ALARM HISTORY SYNC STATISTICS
+    ===================================
+
+    This api is used to query the watermark and the number of alarms copied from Alarm_History to timescaledb
+    """
+
+    return get_alarm_sync_status()
+
+
+@ROUTER.get("/timeline-tiles/stats")
+async def read_timeline_tile_stats():
+    """
+    GET TIMELINE TILE CACHE STATISTICS
+    ===================================
+
+    This api is used to query the size, byte budget and hit / miss / eviction counters of the timeline tile cache
+    """
+
+    return get_tile_cache().get_stats()
+
+
+@ROUTER.get("/timeline/{parameterId}/{resolution}/{tileIndex}")
+async def read_timeline_tile(parameterId: int, resolution: int, tileIndex: int, request: Request):
+    """
+    GET PARAMETER TIMELINE TILE
+    ===================================
+
+    This api is used to query the timeline of a parameter as a tile of 2 ** resolution seconds starting at
+    tileIndex * 2 ** resolution epoch seconds (downsampled, keeping every limit crossing). The tiles in the past are
+    served from memory and cached by the clients for an hour (then revalidated with their ETag), the tile of the live
+    edge is computed on every request.
+    """
+
+    process_start_time = time.time()
+
+    try:
+        body, etag, complete = await run_in_threadpool(get_timeline_tile, parameterId, resolution, tileIndex)
+    except InvalidTimelineTileError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except GetMachineTimelineError as error:
+        raise HTTPException(status_code=404, detail=f"Issue with database: {error.args[0]}")
+
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={TILE_MAX_AGE_SECONDS}" if complete else "no-cache"}
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    response = encoded_json_response(body)
+    response.headers.update(headers)
+
+    end_time = time.time() - process_start_time
+    LOGGER.info(f"Total Time Taken For this end point: {(round((end_time * 1000), 2))} ms")
+
+    return response
+
+
 @ROUTER.get("/factory/machines/{machineName}/parameters/{parameterName}",
             response_model=FullTimelineDataUsingParameterName)
 async def read_timeline_machine_parameter_name(machineName: str, parameterName: str, startTime: float,
@@ -503,14 +693,17 @@ async def read_timeline_machine_parameter_name(machineName: str, parameterName:
 @ROUTER.get("/factory/machines/{machineName}/parameters-mtlinki/{parameterName}",
             response_model=FullTimelineDataUsingParameterName)
 async def read_timeline_machine_parameter_name_mtlinki(machineName: str, parameterName: str, startTime: float,
-                                                       endTime: float):
+                                                       endTime: float,
+                                                       max_points: Optional[int] = Query(None, ge=4, le=100000),
+                                                       downsampling: str = Query("lttb", regex="^(lttb|minmax)$")):
     """
 
     GET MACHINE TIMELINE DATA PARAMETER NAME USING MTLINKI
     =======================================================
 
     This api is used to query the given machine's parameter for full timeline of data using only  parameter name
-    from MtLinki
+    from MtLinki, with ``max_points`` the timeline is downsampled (``downsampling``: lttb or minmax) keeping every
+    limit crossing
     """
     process_start_time = time.time()
     if startTime > endTime:
@@ -519,7 +712,9 @@ async def read_timeline_machine_parameter_name_mtlinki(machineName: str, paramet
         response_data = get_machine_timeline_parameter_name_mtlinki(machine_name=machineName,
                                                                     parameter_name=parameterName,
                                                                     start_time=startTime,
-                                                                    end_time=endTime)
+                                                                    end_time=endTime,
+                                                                    max_points=max_points,
+                                                                    downsampling=downsampling)
 
         if response_data:
             end_time = time.time() - process_start_time
@@ -701,7 +896,7 @@ def read_factory_state_summary(startTime: int, factoryObject: str = "all", dayRa
 
 
 @ROUTER.get("/{machineName}/alarms", response_model=AlarmSummaryResponseModel)
-def read_alarm_summary(machineName: str, startTime: float, endTime: float):
+async def read_alarm_summary(machineName: str, startTime: float, endTime: float, request: Request):
     """
     GET MACHINE ALARM DATA
     ===============================
@@ -715,8 +910,8 @@ def read_alarm_summary(machineName: str, startTime: float, endTime: float):
         raise HTTPException(status_code=400, detail="Start Time cannot be greater than End Time")
     try:
 
-        response_data = get_alarm_summary_data(start_time=startTime, end_time=endTime,
-                                               machine_name=machineName)
+        response_data = await get_alarm_summary_data_async(start_time=startTime, end_time=endTime,
+                                                           machine_name=machineName, request=request)
 
         if response_data:
             end_time = time.time() - process_start_time
@@ -728,6 +923,41 @@ def read_alarm_summary(machineName: str, startTime: float, endTime: float):
                                                     "axis and timestamp")
     except GetMachineTimelineError as error:
         raise HTTPException(status_code=404, detail=f"Issue with database: {error.args[0]}")
+    except FanOutTimeoutError as error:
+        raise HTTPException(status_code=504, detail=str(error))
+    except ClientDisconnectedError as error:
+        raise HTTPException(status_code=499, detail=str(error))
+
+
+@ROUTER.get("/factory/alarms/pareto", response_model=AlarmParetoResponse)
+def read_alarm_pareto(startTime: float, endTime: float, line: Optional[str] = None,
+                      machineName: Optional[str] = None, top: int = Query(10, ge=1, le=100)):
+    """
+    GET ALARM PARETO
+    ===============================
+
+    This api is used to query the top alarms by count and by total downtime of the plant, of a line (``line``: Head,
+    Block or Crank) or of a machine (``machineName``) between the given epoch milliseconds
+    """
+
+    process_start_time = time.time()
+
+    if startTime > endTime:
+        raise HTTPException(status_code=400, detail="Start Time cannot be greater than End Time")
+
+    try:
+        response_data = get_alarm_pareto_data(start_time=startTime, end_time=endTime, line=line,
+                                              machine_name=machineName, top=top)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except Exception as error:
+        LOGGER.exception(f"Alarm pareto failed: {error}")
+        raise HTTPException(status_code=500, detail=f"Issue with database: {error}")
+
+    end_time = time.time() - process_start_time
+    LOGGER.info(f"Total Time Taken For this end point: {(round((end_time * 1000), 2))} ms")
+
+    return response_data
 
 
 @ROUTER.get("/{machineName}/spare-parts", response_model=GetSparePartResponse)
@@ -1177,13 +1407,15 @@ def read_machine_parameters_spm_states(machineName: str):
 
 @ROUTER.get("/spm/real-time/{machineName}/{parameterName}", response_model=FullTimelineData)
 async def read_timeline_machine_param_spm(machineName: str, parameterName: str, startTime: float,
-                                          endTime: float):
+                                          endTime: float, max_points: Optional[int] = Query(None, ge=4, le=100000),
+                                          downsampling: str = Query("lttb", regex="^(lttb|minmax)$")):
     """
 
     GET MACHINE TIMELINE DATA SPM
     ===============================
 
-    This api is used to query the given machine's (SPM) parameter for full timeline of data
+    This api is used to query the given machine's (SPM) parameter for full timeline of data, with ``max_points`` the
+    timeline is downsampled (``downsampling``: lttb or minmax) keeping every limit crossing
 
     """
     process_start_time = time.time()
@@ -1191,12 +1423,14 @@ async def read_timeline_machine_param_spm(machineName: str, parameterName: str,
     if startTime > endTime:
         raise HTTPException(status_code=400, detail="Start Time cannot be greater than End Time")
     try:
-        response_data = get_machine_parameter_timeline_spm(machineName, parameterName, startTime, endTime)
+        response_data = get_machine_parameter_timeline_spm(machineName, parameterName, startTime, endTime,
+                                                           max_points=max_points, downsampling=downsampling)
 
         if response_data:
+            response = encoded_json_response(encode_response(response_data, FullTimelineData))
             end_time = time.time() - process_start_time
             LOGGER.info(f"Total Time Taken For this end point: {(round((end_time * 1000), 2))} ms")
-            return response_data
+            return response
 
         # If there is no response, raise an exception
         raise HTTPException(status_code=404, detail="No data available for given machine, parameter group, "
@@ -1321,6 +1555,38 @@ def read_update_logs_by_time(start_time: float, end_time: float):
 
 
 
+def _evaluate_comparison_conditions(comparisons):
+    """
+    Sets the condition of every parameter comparison row from the deviation between its two parameters and the
+    row's own limits. Only rows with both limits set are evaluated, the others keep their stored condition; a row
+    whose difference is missing (null or NaN) is DISCONNECTED
+
+    :param comparisons: list of parameter comparison rows
+    :type comparisons: list[dict]
+
+    :return: The same rows
+    :rtype: list[dict]
+    """
+
+    evaluated = [comparison for comparison in comparisons
+                 if not pd.isna(comparison["warning_limit"]) and not pd.isna(comparison["critical_limit"])]
+
+    if evaluated:
+        # A missing difference is passed as NaN, which the kernel classifies as DISCONNECTED
+        differences = [float("nan") if pd.isna(comparison["difference"]) else abs(comparison["difference"])
+                       for comparison in evaluated]
+
+        names = condition_names(evaluate_conditions(differences,
+                                                    [comparison["warning_limit"] for comparison in evaluated],
+                                                    [comparison["critical_limit"] for comparison in evaluated],
+                                                    "increasing"))
+
+        for comparison, name in zip(evaluated, names):
+            comparison["parameter_condition_name"] = name
+
+    return comparisons
+
+
 @ROUTER.post("/parameter-comparison/")
 async def create_parameter_comparison(input_data: ParameterComparisonInput):
     try:
@@ -1404,7 +1670,7 @@ async def get_parameter_comparisons_by_time_range(
                     "parameter_condition_name": comparison.parameter_condition.name
                 })
 
-            return result
+            return _evaluate_comparison_conditions(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1439,7 +1705,7 @@ async def get_parameter_comparisons():
                     "parameter_condition_name": comparison.parameter_condition.name
                 })
 
-            return result
+            return _evaluate_comparison_conditions(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1510,11 +1776,14 @@ async def get_disconnected_machines():
     """
     GET DISCONNECTED MACHINES DATA
     =============================
-    This API retrieves the list of disconnected machines in the factory.
+    This API retrieves the list of disconnected machines in the factory, from the live registry kept up to date by the
+    disconnection watcher.
     """
     try:
-        response_data = get_disconnected_machines_data()
-        return response_data
+        if get_disconnection_registry().loaded and get_settings().disconnection_watcher_enabled:
+            return get_disconnected_machines_live()
+
+        return await run_in_threadpool(get_disconnected_machines_live)
     except Exception as error:
         # Log the error for debugging purposes
         LOGGER.error(f"An unexpected error occurred: {error}")
@@ -1523,15 +1792,54 @@ async def get_disconnected_machines():
         raise HTTPException(status_code=500, detail={"error": error_message})
 
 
+@ROUTER.get("/factory/disconnected_machines/transitions", response_model=dict)
+def get_disconnection_transitions(cursor: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=1000)):
+    """
+    GET DISCONNECTION TRANSITIONS
+    =============================
+    This API returns the connect / disconnect transitions of the machines recorded after the given cursor (the cursor
+    returned by the previous call, 0 for all the buffered transitions). When ``complete`` is false some transitions
+    were dropped from the buffer (or the server restarted), the client reloads /factory/disconnected_machines.
+    """
+    try:
+        return get_disconnection_registry().transitions_since(cursor, limit=limit)
+    except Exception as error:
+        LOGGER.error(f"An unexpected error occurred: {error}")
+        raise HTTPException(status_code=500, detail={"error": str(error)})
+
+
 
 
 # MACHINE DISCONNETED HISTORY LOGS
 
 @ROUTER.get("/factory/disconnection_history", response_model=DisconnectionHistoryResponse)
-async def get_disconnection_history(l1name: str, from_timestamp: int, to_timestamp: int):
+async def get_disconnection_history(from_timestamp: int, to_timestamp: int,
+                                    l1name: Optional[List[str]] = Query(None),
+                                    line_prefix: Optional[str] = None,
+                                    limit: Optional[int] = Query(None, ge=1, le=10000),
+                                    cursor: Optional[str] = None,
+                                    output_format: str = Query("json", alias="format", regex="^(json|ndjson)$")):
+    """
+    GET DISCONNECTION HISTORY
+    =============================
+    This API returns the disconnections of one or more machines (``l1name`` repeated) or of all the machines of a line
+    (``line_prefix``, e.g. T_B_) in one query. With a ``limit`` the history is paginated, the ``next_cursor`` of a page
+    is given as ``cursor`` for the next one. With ``format=ndjson`` the history is streamed one disconnection per line
+    (the last line holds the next_cursor when the limit was reached).
+    """
     try:
-        response_data = get_disconnection_history_data(l1name, from_timestamp, to_timestamp)
-        return {"history": response_data}
+        if output_format == "ndjson":
+            rows = stream_disconnection_history_async(l1name, from_timestamp, to_timestamp, line_prefix=line_prefix,
+                                                      limit=limit, cursor=cursor)
+
+            async def ndjson_lines():
+                async for row in rows:
+                    yield encode_json(row) + b"\n"
+
+            return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+        return await get_disconnection_history_page_async(l1name, from_timestamp, to_timestamp,
+                                                          line_prefix=line_prefix, limit=limit, cursor=cursor)
     except ValueError as ve:
         LOGGER.error(f"Validation error: {ve}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -1549,46 +1857,22 @@ async def get_parameter_comparison_history(
         parameter1: str,
         parameter2: str,
         from_datetime: int,  # Unix timestamp (seconds)
-        to_datetime: int  # Unix timestamp (seconds)
+        to_datetime: int,  # Unix timestamp (seconds)
+        request: Request
 ):
     try:
-        collection = get_mongo_collection("L1Signal_Pool")
-        logging.info(f"Connected to MongoDB collection: {collection.name}")
+        repository = get_mtlinki_repository()
         from_datetime_obj = datetime.fromtimestamp(from_datetime, tz=timezone.utc)
         to_datetime_obj = datetime.fromtimestamp(to_datetime, tz=timezone.utc)
         logging.info(f"Searching for data between {from_datetime_obj} and {to_datetime_obj}")
 
-        def search_parameter(param_name):
-            pipeline = [
-                {
-                    '$match': {
-                        'L1Name': machine_name,
-                        'signalname': param_name,
-                        'updatedate': {'$gte': from_datetime_obj},
-                        'enddate': {'$lte': to_datetime_obj}
-                    }
-                },
-                {
-                    '$sort': {
-                        'updatedate': 1
-                    }
-                },
-                {
-                    '$project': {
-                        'updatedate': 1,
-                        'enddate': 1,
-                        'timespan': 1,
-                        'value': 1,
-                        'signalname': 1
-                    }
-                }
-            ]
-            results = list(collection.aggregate(pipeline))
-            return results
-
-        # Perform search for both parameters
-        param1_data = search_parameter(parameter1)
-        param2_data = search_parameter(parameter2)
+        # Perform search for both parameters (concurrently)
+        param1_data, param2_data = await repository.gather(
+            {"parameter_history_1": repository.signal_pool(
+                get_parameter_history_template(machine_name, parameter1, from_datetime_obj, to_datetime_obj)),
+             "parameter_history_2": repository.signal_pool(
+                 get_parameter_history_template(machine_name, parameter2, from_datetime_obj, to_datetime_obj))},
+            request=request)
 
         # Helper function to create output items
         def create_output_items(param_data, parameter_name):
@@ -1636,6 +1920,10 @@ async def get_parameter_comparison_history(
             "parameter2_data": output_param2
         }
 
+    except FanOutTimeoutError as error:
+        raise HTTPException(status_code=504, detail=str(error))
+    except ClientDisconnectedError as error:
+        raise HTTPException(status_code=499, detail=str(error))
     except Exception as e:
         logging.error(f"Error fetching parameter comparison history: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -20,7 +20,7 @@ from datetime import datetime
 
 # Related third party imports
 import pytz
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 import pandas as pd
 import psycopg2
 
@@ -31,8 +31,18 @@ from machine_monitoring_app.models.response_models import FactoryLayout, Factory
 from machine_monitoring_app.database.crud_operations import get_real_time_parameters_data, \
     get_real_time_parameters_data_mtlinki, get_real_time_layout_data, get_real_time_parameters_data_mtlinki_new_layout
 
+from machine_monitoring_app.database.hierarchy_builder import normalize_layout_options, PARAMETER_FIELDS
+from machine_monitoring_app.database.factory_index import get_line_state, get_machine_state, get_parameter_state
+from machine_monitoring_app.exception_handling.custom_exceptions import FactoryObjectNotFoundError, \
+    AmbiguousFactoryObjectError
+
 from machine_monitoring_app.routers.router_dependencies import get_current_active_user
 
+from machine_monitoring_app.utils.conditional_get import snapshot_etag, body_etag, etag_matches, \
+    not_modified_response, set_etag
+from machine_monitoring_app.utils.encoded_response import encode_response, encode_snapshot_response, \
+    encoded_json_response
+
 LOGGER = logging.getLogger(__name__)
 
 # Depends(get_current_active_user)
@@ -43,18 +53,48 @@ ROUTER = APIRouter(
     responses={404: {"description": "Not found"}})
 
 
+def _layout_route_key(path, response_model, depth, fields, only_abnormal):
+    """
+    Returns the route key (used for the ETag and the encoded response) and the response model of a layout request,
+    a reduced layout has no response model to be validated against
+
+    :return: The route key and the response model
+    :rtype: tuple[str, type | None]
+    """
+
+    if (depth, fields, only_abnormal) == ("parameter", PARAMETER_FIELDS, False):
+        return path, response_model
+
+    return f"{path}?depth={depth}&fields={','.join(fields)}&only_abnormal={only_abnormal}", None
+
+
 @ROUTER.get("/factory/layout", response_model=FactorySchema)
-async def read_factory_layout():
+async def read_factory_layout(request: Request, depth: str = "parameter", fields: Optional[str] = None,
+                              only_abnormal: bool = False):
     """
     GET PARAMETER LAYOUT DATA
     ===============================
 
     This API is used to query the status of the factory.
+
+    The structure can be reduced to what the client shows: depth (group / line / machine / parameter) stops the
+    structure at the given level, fields (comma separated) selects the parameter fields and only_abnormal leaves
+    out the machines and parameters in the OK state.
     """
 
     start_time = time.time()
     try:
-        response_data = get_real_time_parameters_data()
+        depth, fields = normalize_layout_options(depth, fields)
+        route_key, response_model = _layout_route_key("factory/layout", FactorySchema, depth, fields, only_abnormal)
+
+        etag = snapshot_etag(route_key)
+        if etag_matches(request, etag):
+            return not_modified_response(route_key, etag)
+
+        response_data = encoded_json_response(
+            encode_snapshot_response(route_key, lambda: get_real_time_parameters_data(depth, fields, only_abnormal),
+                                     response_model))
+        set_etag(response_data, route_key, etag)
         end_time = time.time() - start_time
         LOGGER.info(f"Total Time Taken For this endpoint: {(round((end_time * 1000), 2))} ms")
         return response_data
@@ -80,7 +120,7 @@ async def read_factory_layout():
 #TODO : UUPDATING THE ROUTES USING THE MTLINKI
 
 @ROUTER.get("/factory/layout_mtlinki", response_model=FactorySchema)
-async def read_factory_layout_mtlinki():
+async def read_factory_layout_mtlinki(request: Request):
     """
     GET PARAMETER LAYOUT DATA
     ===============================
@@ -90,7 +130,13 @@ async def read_factory_layout_mtlinki():
 
     start_time = time.time()
     try:
-        response_data = get_real_time_parameters_data_mtlinki()
+        body = encode_response(get_real_time_parameters_data_mtlinki(), FactorySchema)
+        etag = body_etag("factory/layout_mtlinki", body)
+        if etag_matches(request, etag):
+            return not_modified_response("factory/layout_mtlinki", etag)
+
+        response_data = encoded_json_response(body)
+        set_etag(response_data, "factory/layout_mtlinki", etag)
         end_time = time.time() - start_time
         LOGGER.info(f"Total Time Taken For this endpoint: {(round((end_time * 1000), 2))} ms")
         return response_data
@@ -114,17 +160,33 @@ async def read_factory_layout_mtlinki():
 
 # --------------------------------------NEW LAYOUT---------------------------------------------
 @ROUTER.get("/factory/new_layout", response_model=FactorySchema_new)
-async def read_factory_layout():
+async def read_factory_layout(request: Request, depth: str = "parameter", fields: Optional[str] = None,
+                              only_abnormal: bool = False):
     """
     GET PARAMETER LAYOUT DATA
     ===============================
 
     This API is used to query the status of the factory.
+
+    The structure can be reduced to what the client shows: depth (group / line / machine / parameter) stops the
+    structure at the given level, fields (comma separated) selects the parameter fields and only_abnormal leaves
+    out the machines and parameters in the OK state.
     """
 
     start_time = time.time()
     try:
-        response_data = get_real_time_layout_data()
+        depth, fields = normalize_layout_options(depth, fields)
+        route_key, response_model = _layout_route_key("factory/new_layout", FactorySchema_new, depth, fields,
+                                                      only_abnormal)
+
+        etag = snapshot_etag(route_key)
+        if etag_matches(request, etag):
+            return not_modified_response(route_key, etag)
+
+        response_data = encoded_json_response(
+            encode_snapshot_response(route_key, lambda: get_real_time_layout_data(depth, fields, only_abnormal),
+                                     response_model))
+        set_etag(response_data, route_key, etag)
         end_time = time.time() - start_time
         LOGGER.info(f"Total Time Taken For this endpoint: {(round((end_time * 1000), 2))} ms")
         return response_data
@@ -147,7 +209,7 @@ async def read_factory_layout():
 
 
 @ROUTER.get("/factory/new_layout_mtlinki", response_model=new_ResponseModel)
-async def read_factory_layout_mtlinki():
+async def read_factory_layout_mtlinki(request: Request):
     """
     GET PARAMETER LAYOUT DATA
     ===============================
@@ -157,7 +219,13 @@ async def read_factory_layout_mtlinki():
 
     start_time = time.time()
     try:
-        response_data = get_real_time_parameters_data_mtlinki_new_layout()
+        body = encode_response(get_real_time_parameters_data_mtlinki_new_layout(), new_ResponseModel)
+        etag = body_etag("factory/new_layout_mtlinki", body)
+        if etag_matches(request, etag):
+            return not_modified_response("factory/new_layout_mtlinki", etag)
+
+        response_data = encoded_json_response(body)
+        set_etag(response_data, "factory/new_layout_mtlinki", etag)
         end_time = time.time() - start_time
         LOGGER.info(f"Total Time Taken For this endpoint: {(round((end_time * 1000), 2))} ms")
         return response_data
@@ -176,4 +244,92 @@ async def read_factory_layout_mtlinki():
 
         # Extract the error message for the client response
         error_message = str(error)
-        raise HTTPException(status_code=500, detail={"error": error_message})
\ No newline at end of file
+        raise HTTPException(status_code=500, detail={"error": error_message})
+
+
+# --------------------------------------DRILL-DOWN---------------------------------------------
+def _drill_down_response(request, route_key, builder):
+    """
+    Returns the response of a drill-down route (line / machine / parameter), served from the factory index
+
+    :return: The response (304 if the client already has the current version)
+    :rtype: Response
+    """
+
+    start_time = time.time()
+    try:
+        etag = snapshot_etag(route_key)
+        if etag_matches(request, etag):
+            return not_modified_response(route_key, etag)
+
+        response_data = encoded_json_response(encode_snapshot_response(route_key, builder))
+        set_etag(response_data, route_key, etag)
+        end_time = time.time() - start_time
+        LOGGER.info(f"Total Time Taken For this endpoint: {(round((end_time * 1000), 2))} ms")
+        return response_data
+
+    except FactoryObjectNotFoundError as error:
+        raise HTTPException(status_code=404, detail={"error": str(error)})
+
+    except AmbiguousFactoryObjectError as error:
+        raise HTTPException(status_code=409, detail={"error": str(error)})
+
+    except Exception as error:
+        # Log the error for debugging purposes
+        LOGGER.error(f"An unexpected error occurred: {error}")
+
+        # Extract the error message for the client response
+        error_message = str(error)
+        raise HTTPException(status_code=500, detail={"error": error_message})
+
+
+@ROUTER.get("/factory/lines/{lineName}")
+async def read_line_state(lineName: str, request: Request):
+    """
+    GET LINE STATE
+    ===============================
+
+    This API is used to query the state of one line with its machines and their parameters.
+    """
+
+    return _drill_down_response(request, f"factory/lines/{lineName}", lambda: get_line_state(lineName))
+
+
+@ROUTER.get("/factory/machines/{machineName}/state")
+async def read_machine_state(machineName: str, request: Request):
+    """
+    GET MACHINE STATE
+    ===============================
+
+    This API is used to query the state of one machine with its parameters (all parameter groups).
+    """
+
+    return _drill_down_response(request, f"factory/machines/{machineName}/state",
+                                lambda: get_machine_state(machineName))
+
+
+@ROUTER.get("/factory/parameters/{parameterName}/state")
+async def read_parameter_state(parameterName: str, request: Request, machineName: Optional[str] = None):
+    """
+    GET PARAMETER STATE
+    ===============================
+
+    This API is used to query the state of one machine parameter. The machine (machineName query parameter) has to
+    be given if several machines have a parameter of that name, else 409 is returned.
+    """
+
+    return _drill_down_response(request, f"factory/parameters/{parameterName}/state?machineName={machineName}",
+                                lambda: get_parameter_state(parameterName, machineName))
+
+
+@ROUTER.get("/factory/machines/{machineName}/parameters/{parameterName}/state")
+async def read_machine_parameter_state(machineName: str, parameterName: str, request: Request):
+    """
+    GET MACHINE PARAMETER STATE
+    ===============================
+
+    This API is used to query the state of one parameter of one machine.
+    """
+
+    return _drill_down_response(request, f"factory/machines/{machineName}/parameters/{parameterName}/state",
+                                lambda: get_parameter_state(parameterName, machineName))
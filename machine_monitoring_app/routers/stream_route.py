@@ -0,0 +1,151 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+FACTORY STATE STREAM ROUTES
+================================
+
+Module that contains the push based (WebSocket and Server-Sent Events) end points for the factory state.
+
+Instead of polling the full nested layout, a client connects once and receives the full state of its subscription
+followed by deltas (changed parameters and the machine / line / group roll-ups they caused) whenever the factory
+snapshot changes. Clients can subscribe to all groups, to one parameter group and / or to one line.
+
+This script requires the following modules be installed in the python environment
+    * logging - To perform logging operations.
+    * fastapi - To perform web application (backend) related functions.
+"""
+
+# Standard library imports
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
+
+# Related third party imports
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocketState
+
+# Local application/library specific imports
+from machine_monitoring_app.database.state_stream import StateStreamSubscription
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+# Interval at which every subscription checks the snapshot for a new version
+STREAM_POLL_INTERVAL_SECONDS = 1.0
+
+# Interval after which a comment line is sent on an idle SSE stream to keep proxies from closing it
+SSE_HEARTBEAT_INTERVAL_SECONDS = 15.0
+
+ROUTER = APIRouter(
+    prefix="/api/v1",
+    tags=["Factory State Stream Routes"],
+    responses={404: {"description": "Not found"}})
+
+
+@ROUTER.get("/factory/stream")
+async def stream_factory_state(request: Request, group: Optional[str] = None, line: Optional[str] = None):
+    """
+    STREAM FACTORY STATE (SSE)
+    ===============================
+
+    Server-Sent Events stream of the factory state. The first event ("full") carries the complete nested state of
+    the subscription, the following events ("delta") carry only the changed parameters and roll-ups.
+
+    :param request: The request (used to detect a disconnected client)
+    :param group: Name of the parameter group to subscribe to (all groups if not given)
+    :param line: Name of the line to subscribe to (all lines if not given)
+    """
+
+    subscription = StateStreamSubscription(group_name=group, line_name=line)
+
+    async def event_generator():
+        last_sent = time.monotonic()
+
+        while not await request.is_disconnected():
+            try:
+                message = await run_in_threadpool(subscription.next_message)
+            except Exception as error:
+                LOGGER.exception(f"Error while computing the factory state stream: {error}")
+                message = None
+
+            if message is not None:
+                last_sent = time.monotonic()
+                yield f"event: {message['type']}\nid: {message['version']}\ndata: {json.dumps(message)}\n\n"
+
+            elif time.monotonic() - last_sent >= SSE_HEARTBEAT_INTERVAL_SECONDS:
+                last_sent = time.monotonic()
+                yield ": heartbeat\n\n"
+
+            await asyncio.sleep(STREAM_POLL_INTERVAL_SECONDS)
+
+        LOGGER.info(f"Factory state stream closed (group: {group}, line: {line})")
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def _receive_until_disconnect(websocket: WebSocket):
+    """
+    Reads (and ignores) the messages of the client until it disconnects, so the disconnect is noticed while the
+    stream is idle and the receive buffer does not fill up
+    """
+
+    while True:
+        message = await websocket.receive()
+
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@ROUTER.websocket("/factory/stream/ws")
+async def stream_factory_state_websocket(websocket: WebSocket, group: Optional[str] = None,
+                                         line: Optional[str] = None):
+    """
+    STREAM FACTORY STATE (WEBSOCKET)
+    ===============================
+
+    WebSocket stream of the factory state, the messages are the same as the SSE end point ("full" first, then
+    "delta" messages).
+
+    :param websocket: The websocket connection
+    :param group: Name of the parameter group to subscribe to (all groups if not given)
+    :param line: Name of the line to subscribe to (all lines if not given)
+    """
+
+    await websocket.accept()
+
+    subscription = StateStreamSubscription(group_name=group, line_name=line)
+
+    # The client messages are read alongside the send loop, the stream ends as soon as the client disconnects
+    receive_task = asyncio.create_task(_receive_until_disconnect(websocket))
+
+    try:
+        while not receive_task.done():
+            message = await run_in_threadpool(subscription.next_message)
+
+            if message is not None:
+                await websocket.send_text(json.dumps(message))
+
+            await asyncio.wait({receive_task}, timeout=STREAM_POLL_INTERVAL_SECONDS)
+
+    except WebSocketDisconnect:
+        pass
+
+    except Exception as error:
+        LOGGER.exception(f"Error while streaming the factory state (group: {group}, line: {line}): {error}")
+
+        if websocket.client_state == WebSocketState.CONNECTED:
+            try:
+                await websocket.close(code=1011)
+            except Exception as close_error:
+                LOGGER.debug(f"Factory state websocket could not be closed: {close_error}")
+
+    finally:
+        receive_task.cancel()
+
+    LOGGER.info(f"Factory state websocket closed (group: {group}, line: {line})")
@@ -0,0 +1,197 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+CONDITIONAL GET HELPERS
+================================
+
+Module that contains the helpers used by the snapshot style routes to answer conditional requests
+(``If-None-Match``) with ``304 Not Modified``.
+
+Two kinds of ETag are used:
+    * Snapshot ETags - derived from the factory snapshot version, for routes served from the snapshot store. A
+      matching request is answered before any query or serialization is done.
+    * Body ETags - a hash of the response body, for routes whose data has no version (MTLINKi / spare parts). The
+      body is always rebuilt and hashed (without a data version a remembered ETag could match changed content), the
+      304 only saves the transfer.
+
+Every answer is counted per route, so the effect of the short-circuit can be measured. The counters are kept for at
+most ``MAX_ROUTE_KEYS`` route keys, so path parameters cannot grow them without bound.
+
+This script requires the following modules be installed in the python environment
+    * logging - To perform logging operations.
+    * fastapi - To perform web application (backend) related functions.
+
+This script contains the following function
+    * snapshot_etag - Function that returns the ETag of a snapshot backed route
+    * body_etag - Function that computes the body ETag of a route
+    * etag_matches - Function that checks the If-None-Match header of a request
+    * not_modified_response - Function that returns the 304 response
+    * set_etag - Function that sets the ETag of a full response
+    * get_request_counts - Function that returns the request counters
+"""
+
+# Standard library imports
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+# Related third party imports
+from fastapi import Request, Response
+
+# Local application/library specific imports
+from machine_monitoring_app.database.snapshot_store import get_snapshot_store
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+# Maximum number of route keys (routes with their path parameters) whose counters are kept, the least recently used
+# keys are dropped first
+MAX_ROUTE_KEYS = 1024
+
+_LOCK = threading.Lock()
+
+_REQUEST_COUNTS = OrderedDict()
+
+
+def _remember(entries, route_key, value):
+    """
+    Stores the value of the route key as the most recently used one, dropping the least recently used keys over
+    MAX_ROUTE_KEYS (called with the lock held)
+    """
+
+    entries[route_key] = value
+    entries.move_to_end(route_key)
+
+    while len(entries) > MAX_ROUTE_KEYS:
+        entries.popitem(last=False)
+
+
+def _count(route_key, answer):
+    """
+    Counts a full or not modified answer of the route (called with the lock held)
+    """
+
+    counts = _REQUEST_COUNTS.get(route_key) or {"full": 0, "not_modified": 0}
+    counts[answer] += 1
+
+    _remember(_REQUEST_COUNTS, route_key, counts)
+
+
+def _route_tag(route_key):
+    return hashlib.md5(route_key.encode("utf-8")).hexdigest()[:8]
+
+
+def snapshot_etag(route_key):
+    """
+    Returns the ETag of a route served from the factory snapshot (changes with the snapshot version)
+
+    :param route_key: Identifier of the route and its path parameters
+    :type route_key: str
+
+    :return: The ETag
+    :rtype: str
+    """
+
+    return f'W/"{_route_tag(route_key)}-{get_snapshot_store().refresh()}"'
+
+
+def body_etag(route_key, body):
+    """
+    Computes the ETag of a response body for the route
+
+    :param route_key: Identifier of the route and its path parameters
+    :type route_key: str
+
+    :param body: The encoded response body
+    :type body: bytes
+
+    :return: The ETag
+    :rtype: str
+    """
+
+    return f'"{_route_tag(route_key)}-{hashlib.md5(body).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag):
+    """
+    Checks if the If-None-Match header of the request matches the given ETag
+
+    :param request: The request
+    :type request: Request
+
+    :param etag: The current ETag of the route
+    :type etag: str | None
+
+    :return: True if the client already has the current content
+    :rtype: bool
+    """
+
+    if etag is None:
+        return False
+
+    header = request.headers.get("if-none-match")
+
+    if not header:
+        return False
+
+    candidates = [candidate.strip() for candidate in header.split(",")]
+
+    return "*" in candidates or etag in candidates
+
+
+def not_modified_response(route_key, etag):
+    """
+    Returns the 304 response for the route (and counts it)
+
+    :param route_key: Identifier of the route and its path parameters
+    :type route_key: str
+
+    :param etag: The current ETag of the route
+    :type etag: str
+
+    :return: The 304 response
+    :rtype: Response
+    """
+
+    with _LOCK:
+        _count(route_key, "not_modified")
+
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def set_etag(response: Response, route_key, etag):
+    """
+    Sets the ETag on a full response for the route (and counts it)
+
+    :param response: The response of the route
+    :type response: Response
+
+    :param route_key: Identifier of the route and its path parameters
+    :type route_key: str
+
+    :param etag: The current ETag of the route
+    :type etag: str
+
+    :return: Nothing
+    :rtype: None
+    """
+
+    with _LOCK:
+        _count(route_key, "full")
+
+    response.headers["ETag"] = etag
+
+
+def get_request_counts():
+    """
+    Returns the number of full and not modified (304) answers of every route (the MAX_ROUTE_KEYS most recently
+    used ones)
+
+    :return: Mapping of route key to its counters
+    :rtype: dict
+    """
+
+    with _LOCK:
+        return {route_key: dict(counts) for route_key, counts in _REQUEST_COUNTS.items()}
@@ -0,0 +1,256 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+TIMELINE DOWNSAMPLING
+================================
+
+Module that reduces a parameter timeline to at most ``max_points`` points before it is serialized, a week of a 1 Hz
+signal being far more points than a chart can draw.
+
+Two methods are available:
+
+    * lttb - Largest-Triangle-Three-Buckets, keeps the point of every bucket forming the largest triangle with the
+      point kept in the previous bucket and the average of the next bucket (the visual shape of the signal).
+    * minmax - keeps the minimum and the maximum of every bucket (the envelope of the signal).
+
+Whatever the method, the points where the condition of the value changes (OK / WARNING / CRITICAL / DISCONNECTED,
+evaluated with the condition kernel against the limits of the parameter) are always kept, the point before and the
+point after the change, together with the extreme value of every WARNING / CRITICAL excursion. A chart of the
+downsampled timeline therefore shows every limit crossing and state change; when they alone reach ``max_points``,
+an evenly spaced selection of them is returned, so ``max_points`` is always a hard cap.
+
+Missing values (NaN) are left out of the buckets, so a gap is never drawn as a dip to zero; the gap itself stays
+visible through the DISCONNECTED state changes around it.
+
+This script requires the following modules be installed in the python environment
+
+    Standard Library
+    =================
+    * logging - To perform logging operations.
+
+    Related 3rd Party Library
+    =============================
+    * numpy - To perform the array operations.
+
+This script contains the following function
+    * lttb_indices - Function that returns the indices of the points kept by LTTB
+    * min_max_indices - Function that returns the indices of the minimum and maximum of every bucket
+    * condition_change_indices - Function that returns the indices of the limit crossings and state changes
+    * downsample_timeline - Function that downsamples the timestamps and values of a timeline
+"""
+
+# Standard library imports
+import logging
+
+# Related third party imports
+import numpy as np
+
+# Local application/library specific imports
+from machine_monitoring_app.database.condition_kernel import evaluate_conditions
+from machine_monitoring_app.database.hierarchy_builder import WARNING, CRITICAL
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+DOWNSAMPLING_METHODS = ("lttb", "minmax")
+
+
+def _bucket_edges(size, buckets):
+    """
+    Returns the edges of the given number of buckets over the points 1 .. size - 2 (the first and the last point are
+    always kept)
+    """
+
+    return np.linspace(1, size - 1, buckets + 1).astype(np.int64)
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Returns the indices of the points kept by Largest-Triangle-Three-Buckets
+
+    :param x: The timestamps (increasing)
+    :type x: np.ndarray
+
+    :param y: The values, without NaN
+    :type y: np.ndarray
+
+    :param threshold: The number of kept points (at least 3)
+    :type threshold: int
+
+    :return: The sorted indices of the kept points
+    :rtype: np.ndarray
+    """
+
+    size = len(x)
+
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+
+    edges = _bucket_edges(size, threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, size - 1
+    selected = 0
+
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+            average_x, average_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            average_x, average_y = x[-1], y[-1]
+
+        # Twice the area of the triangle (selected point, candidate, average of the next bucket)
+        areas = np.abs((x[selected] - average_x) * (y[start:end] - y[selected]) -
+                       (x[selected] - x[start:end]) * (average_y - y[selected]))
+
+        selected = start + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+
+    return indices
+
+
+def min_max_indices(y, threshold):
+    """
+    Returns the indices of the minimum and the maximum of every bucket (threshold / 2 buckets), with the first and
+    the last point
+
+    :param y: The values, without NaN
+    :type y: np.ndarray
+
+    :param threshold: The number of kept points (at least 4)
+    :type threshold: int
+
+    :return: The sorted indices of the kept points
+    :rtype: np.ndarray
+    """
+
+    size = len(y)
+
+    if threshold >= size or threshold < 4:
+        return np.arange(size)
+
+    edges = _bucket_edges(size, (threshold - 2) // 2)
+    indices = [0, size - 1]
+
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            indices.append(start + int(np.argmin(y[start:end])))
+            indices.append(start + int(np.argmax(y[start:end])))
+
+    return np.unique(indices)
+
+
+def condition_change_indices(values, warning_limit=None, critical_limit=None, parameter_type=None):
+    """
+    Returns the indices of the points around every change of condition of the values, and of the extreme value of
+    every WARNING / CRITICAL excursion
+
+    :param values: The values (NaN for missing values)
+    :type values: np.ndarray
+
+    :param warning_limit: The warning limit of the parameter
+    :type warning_limit: float | None
+
+    :param critical_limit: The critical limit of the parameter
+    :type critical_limit: float | None
+
+    :param parameter_type: The parameter type ("decreasing", "increasing", "bool")
+    :type parameter_type: str | None
+
+    :return: The sorted indices
+    :rtype: np.ndarray
+    """
+
+    codes = evaluate_conditions(values, np.nan if warning_limit is None else warning_limit,
+                                np.nan if critical_limit is None else critical_limit, parameter_type)
+
+    changes = np.flatnonzero(codes[1:] != codes[:-1])
+    indices = [changes, changes + 1]
+
+    # A run of WARNING / CRITICAL values keeps its extreme value (the peak of the excursion)
+    abnormal = np.isin(codes, (WARNING, CRITICAL))
+    run_starts = np.flatnonzero(abnormal & ~np.concatenate(([False], abnormal[:-1])))
+    run_ends = np.flatnonzero(abnormal & ~np.concatenate((abnormal[1:], [False]))) + 1
+    extreme = np.argmin if parameter_type == "decreasing" else np.argmax
+
+    indices.append(np.array([start + int(extreme(values[start:end])) for start, end in zip(run_starts, run_ends)],
+                            dtype=np.int64))
+
+    return np.unique(np.concatenate(indices))
+
+
+def downsample_timeline(timestamps, values, max_points, method="lttb", warning_limit=None, critical_limit=None,
+                        parameter_type=None):
+    """
+    Downsamples the timeline to at most max_points points, keeping every limit crossing and state change (an evenly
+    spaced selection of them when they alone reach max_points)
+
+    :param timestamps: The timestamps of the timeline (increasing)
+    :type timestamps: list | np.ndarray
+
+    :param values: The values of the timeline (None or NaN for missing values)
+    :type values: list | np.ndarray
+
+    :param max_points: The maximum number of points, None to return the timeline as it is
+    :type max_points: int | None
+
+    :param method: The downsampling method ("lttb" or "minmax")
+    :type method: str
+
+    :param warning_limit: The warning limit of the parameter
+    :type warning_limit: float | None
+
+    :param critical_limit: The critical limit of the parameter
+    :type critical_limit: float | None
+
+    :param parameter_type: The parameter type ("decreasing", "increasing", "bool")
+    :type parameter_type: str | None
+
+    :return: The kept timestamps and values (the original values, not interpolated), arrays when given arrays
+    :rtype: tuple[list, list] | tuple[np.ndarray, np.ndarray]
+
+    :raises ValueError: If the method is unknown
+    """
+
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"Unknown downsampling method {method}, expected one of {', '.join(DOWNSAMPLING_METHODS)}")
+
+    if max_points is None or len(timestamps) <= max_points:
+        return timestamps, values
+
+    x = np.asarray(timestamps, dtype=np.float64)
+
+    if isinstance(values, np.ndarray):
+        y = values.astype(np.float64, copy=False)
+    else:
+        y = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+    kept = condition_change_indices(y, warning_limit, critical_limit, parameter_type)
+
+    if len(kept) >= max_points:
+        LOGGER.info(f"{len(kept)} limit crossings and state changes exceed {max_points} points, keeping an evenly "
+                    f"spaced selection of them")
+        indices = kept[np.unique(np.linspace(0, len(kept) - 1, max_points).astype(np.int64))]
+
+    else:
+        # The missing values are left out of the buckets, the sampled indices are mapped back to the timeline
+        budget = max_points - len(kept)
+        valid = np.flatnonzero(~np.isnan(y))
+
+        if not len(valid):
+            sampled = valid
+        elif budget < 4:
+            sampled = np.unique(valid[[0, -1]])[:budget]
+        elif method == "lttb":
+            sampled = valid[lttb_indices(x[valid], y[valid], budget)]
+        else:
+            sampled = valid[min_max_indices(y[valid], budget)]
+
+        indices = np.union1d(kept, sampled)
+
+    if isinstance(timestamps, np.ndarray) and isinstance(values, np.ndarray):
+        return timestamps[indices], values[indices]
+
+    return [timestamps[index] for index in indices], [values[index] for index in indices]
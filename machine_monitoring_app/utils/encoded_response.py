@@ -0,0 +1,351 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+PRE-ENCODED JSON RESPONSES
+================================
+
+Module that encodes the large nested dashboard payloads (factory layout, factory state, spare part states, timelines)
+straight into JSON bytes and returns them as a response, so FastAPI neither re-validates the payload through the
+``response_model`` nor encodes it again on every request.
+
+For the snapshot backed routes the encoded bytes are memoized against the snapshot version, every request for the
+same version returns the same bytes.
+
+``orjson`` is used as the encoder when it is installed, otherwise the standard library encoder is used. Both encode
+NaN and infinite values as ``null`` (the standard library encoder rejects them, the payload is then encoded again with
+the non finite values replaced).
+
+The payload is shaped to the route's ``response_model`` before encoding: only the fields of the model are kept (in
+the model's order, missing optional fields get their default), integer, string and enum fields are coerced, and
+nested models, lists, dictionaries and optionals are followed. The shaping function of every model is compiled once
+from its type hints, so this costs a dictionary comprehension per object rather than a full validation. When the
+``VALIDATE_ENCODED_RESPONSES`` setting is enabled (tests), the payload is validated against the ``response_model``
+instead, which gives exactly the body FastAPI would have sent.
+
+This script requires the following modules be installed in the python environment
+    * logging - To perform logging operations.
+    * math - To find the non finite values.
+    * typing - To read the field types of the response models.
+    * fastapi - To perform web application (backend) related functions.
+    * orjson (optional) - To encode the payloads faster.
+
+This script contains the following function
+    * encode_json - Function that encodes a payload into JSON bytes
+    * shape_response - Function that shapes the payload of a route to its response model
+    * encode_response - Function that shapes (or validates) and encodes the payload of a route
+    * encode_snapshot_response - Function that encodes the payload of a snapshot route once per version
+    * encoded_json_response - Function that returns the response for already encoded JSON bytes
+"""
+
+# Standard library imports
+import json
+import logging
+import math
+import types
+from datetime import date, datetime
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Union, get_args, get_origin, get_type_hints
+
+# Related third party imports
+import numpy as np
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Local application/library specific imports
+from machine_monitoring_app.database.snapshot_store import get_snapshot_store
+from machine_monitoring_app.utils.global_variables import get_settings
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _default(value):
+    """
+    Encodes the values the JSON encoders do not know natively
+
+    :param value: The value to be encoded
+    :type value: Any
+
+    :return: The JSON compatible value
+    :rtype: Any
+    """
+
+    if isinstance(value, BaseModel):
+        return value.dict()
+
+    if isinstance(value, np.generic):
+        return value.item()
+
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _replace_non_finite(value):
+    """
+    Returns the value with the NaN and infinite floats (of the nested containers and arrays) replaced by None, like
+    orjson encodes them
+
+    :param value: The value to be encoded
+    :type value: Any
+
+    :return: The value without non finite floats
+    :rtype: Any
+    """
+
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+
+    if isinstance(value, dict):
+        return {key: _replace_non_finite(item) for key, item in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        return [_replace_non_finite(item) for item in value]
+
+    if isinstance(value, BaseModel):
+        return _replace_non_finite(value.dict())
+
+    if isinstance(value, (np.ndarray, np.generic)):
+        return _replace_non_finite(value.tolist())
+
+    return value
+
+
+def encode_json(content):
+    """
+    Encodes the given payload into JSON bytes, NaN and infinite values as null
+
+    :param content: The payload (dictionaries, lists and scalars)
+    :type content: Any
+
+    :return: The JSON bytes
+    :rtype: bytes
+    """
+
+    if orjson is not None:
+        return orjson.dumps(content, default=_default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+    try:
+        return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False,
+                          separators=(",", ":")).encode("utf-8")
+    except ValueError:
+        # NaN / infinite values, encoded as null like orjson does
+        return json.dumps(_replace_non_finite(content), default=_default, ensure_ascii=False, allow_nan=False,
+                          separators=(",", ":")).encode("utf-8")
+
+
+def _coerce_int(value):
+    if value is None or type(value) is int:
+        return value
+
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return value
+
+
+def _coerce_str(value):
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def _enum_coercer(enum_type):
+    def coerce(value):
+        if value is None or isinstance(value, Enum):
+            return None if value is None else value.value
+
+        try:
+            return enum_type(value).value
+        except ValueError:
+            return value
+
+    return coerce
+
+
+def _shaper(annotation):
+    """
+    Returns the function shaping a value to the given type annotation, None when the value is passed as it is
+
+    :param annotation: The type annotation of a response model field
+    :type annotation: Any
+
+    :return: The shaping function, or None
+    :rtype: callable | None
+    """
+
+    origin = get_origin(annotation)
+
+    if origin is Union or origin is getattr(types, "UnionType", Union):
+        arguments = [argument for argument in get_args(annotation) if argument is not type(None)]
+
+        # Unions of several types are passed as they are (the encoder handles every member)
+        return _shaper(arguments[0]) if len(arguments) == 1 else None
+
+    if origin in (list, tuple, set, frozenset):
+        arguments = get_args(annotation)
+        item_shaper = _shaper(arguments[0]) if arguments else None
+
+        if item_shaper is None:
+            return None
+
+        return lambda value: [item_shaper(item) for item in value] if isinstance(value, (list, tuple)) else value
+
+    if origin is dict:
+        arguments = get_args(annotation)
+        item_shaper = _shaper(arguments[1]) if len(arguments) == 2 else None
+
+        if item_shaper is None:
+            return None
+
+        return lambda value: {key: item_shaper(item) for key, item in value.items()} \
+            if isinstance(value, dict) else value
+
+    if not isinstance(annotation, type) or annotation is Any:
+        return None
+
+    if issubclass(annotation, BaseModel):
+        return _model_shaper(annotation)
+
+    if issubclass(annotation, Enum):
+        return _enum_coercer(annotation)
+
+    if issubclass(annotation, bool):
+        return None
+
+    if issubclass(annotation, int):
+        return _coerce_int
+
+    if issubclass(annotation, str):
+        return _coerce_str
+
+    return None
+
+
+@lru_cache(maxsize=None)
+def _model_shaper(response_model):
+    """
+    Returns the function shaping a payload object to the given response model: only the model fields are kept,
+    missing optional fields get their default and the field values are shaped to the field types
+
+    :param response_model: The response model
+    :type response_model: type[BaseModel]
+
+    :return: The shaping function
+    :rtype: callable
+    """
+
+    type_hints = get_type_hints(response_model)
+
+    fields = [(field.alias, _shaper(type_hints.get(name, Any)), field.required,
+               None if field.required else jsonable_encoder(field.get_default()))
+              for name, field in response_model.__fields__.items()]
+
+    def shape(value):
+        if isinstance(value, BaseModel):
+            value = value.dict(by_alias=True)
+
+        if not isinstance(value, dict):
+            return value
+
+        shaped = {}
+
+        for key, field_shaper, required, default in fields:
+            if key in value:
+                item = value[key]
+                shaped[key] = item if field_shaper is None or item is None else field_shaper(item)
+
+            elif not required:
+                shaped[key] = default
+
+        return shaped
+
+    return shape
+
+
+def shape_response(content, response_model):
+    """
+    Shapes the payload of a route to its response model (the model fields only, coerced to their types) without
+    validating it
+
+    :param content: The payload of the route
+    :type content: Any
+
+    :param response_model: The response model of the route
+    :type response_model: type[BaseModel]
+
+    :return: The shaped payload
+    :rtype: Any
+    """
+
+    return _model_shaper(response_model)(content)
+
+
+def encode_response(content, response_model=None):
+    """
+    Encodes the payload of a route into JSON bytes, shaped to the route's response model (validated against it when
+    the VALIDATE_ENCODED_RESPONSES setting is enabled)
+
+    :param content: The payload of the route
+    :type content: Any
+
+    :param response_model: The response model of the route
+    :type response_model: type[BaseModel] | None
+
+    :return: The JSON bytes
+    :rtype: bytes
+    """
+
+    if response_model is not None:
+        if get_settings().validate_encoded_responses:
+            content = jsonable_encoder(response_model.parse_obj(content))
+        else:
+            content = shape_response(content, response_model)
+
+    return encode_json(content)
+
+
+def encode_snapshot_response(route_key, builder, response_model=None):
+    """
+    Returns the encoded payload of a snapshot backed route, encoding it only once per snapshot version
+
+    :param route_key: Identifier of the route and its path parameters
+    :type route_key: str
+
+    :param builder: Function returning the payload of the route
+    :type builder: callable
+
+    :param response_model: The response model of the route
+    :type response_model: type[BaseModel] | None
+
+    :return: The JSON bytes
+    :rtype: bytes
+    """
+
+    return get_snapshot_store().memoize(("encoded_response", route_key),
+                                        lambda: encode_response(builder(), response_model))
+
+
+def encoded_json_response(body):
+    """
+    Returns the response for already encoded JSON bytes
+
+    :param body: The JSON bytes
+    :type body: bytes
+
+    :return: The response
+    :rtype: Response
+    """
+
+    return Response(content=body, media_type="application/json")
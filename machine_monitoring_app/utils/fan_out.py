@@ -0,0 +1,196 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+BOUNDED FAN-OUT OF QUERIES
+================================
+
+Module that runs the independent queries (aggregation pipelines) of a request in parallel without overloading the
+MTLINKi server:
+
+    * concurrency - all the fan-outs of the application share one limit (``FAN_OUT_CONCURRENCY`` setting), a single
+      fan-out can be limited further with ``limit``.
+    * timeouts - every query has its own timeout (``FAN_OUT_TIMEOUT_SECONDS`` setting), an expired query raises
+      FanOutTimeoutError and cancels the other queries of the fan-out.
+    * disconnects - when the request is given, the queries are cancelled as soon as the client disconnects
+      (ClientDisconnectedError).
+
+The latency of every query is recorded under its label (the template name), so the dominating template of an
+endpoint can be read from the statistics.
+
+This script requires the following modules be installed in the python environment
+    * asyncio - To run the queries concurrently.
+    * logging - To perform logging operations.
+    * fastapi - To check the connection of the client.
+
+This script contains the following function
+    * fan_out - Function that runs the labelled queries concurrently and returns their results
+    * get_fan_out_stats - Function that returns the latency statistics of every label
+"""
+
+# Standard library imports
+import asyncio
+import inspect
+import logging
+import threading
+import time
+import weakref
+from collections import defaultdict
+
+# Related third party imports
+from fastapi import Request
+
+# Local application/library specific imports
+from machine_monitoring_app.exception_handling.custom_exceptions import FanOutTimeoutError, ClientDisconnectedError
+from machine_monitoring_app.utils.global_variables import get_settings
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+# Interval in seconds at which the connection of the client is checked
+DISCONNECT_POLL_SECONDS = 0.5
+
+_LOCK = threading.Lock()
+
+# One shared semaphore per event loop
+_SEMAPHORES = weakref.WeakKeyDictionary()
+
+_LATENCIES = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "timeouts": 0})
+
+
+def _get_semaphore():
+    """
+    Returns the semaphore shared by all the fan-outs of the running event loop
+    """
+
+    loop = asyncio.get_running_loop()
+    semaphore = _SEMAPHORES.get(loop)
+
+    if semaphore is None:
+        semaphore = _SEMAPHORES[loop] = asyncio.Semaphore(get_settings().fan_out_concurrency)
+
+    return semaphore
+
+
+def _record(label, elapsed_seconds, timed_out=False):
+    elapsed_ms = elapsed_seconds * 1000
+
+    with _LOCK:
+        latency = _LATENCIES[label]
+        latency["count"] += 1
+        latency["total_ms"] += elapsed_ms
+        latency["max_ms"] = max(latency["max_ms"], elapsed_ms)
+        latency["timeouts"] += timed_out
+
+    LOGGER.debug(f"Fan-out query '{label}' took {round(elapsed_ms, 2)} ms")
+
+
+async def _run_query(label, query, semaphores, timeout):
+    """
+    Runs one query once all the semaphores are acquired, recording its latency
+    """
+
+    started = False
+
+    try:
+        async with semaphores[0]:
+            async with semaphores[1]:
+                start_time = time.perf_counter()
+                started = True
+
+                try:
+                    result = await asyncio.wait_for(query, timeout)
+                except asyncio.TimeoutError:
+                    _record(label, time.perf_counter() - start_time, timed_out=True)
+                    raise FanOutTimeoutError(f"The query '{label}' did not finish within {timeout} seconds")
+
+                _record(label, time.perf_counter() - start_time)
+
+                return result
+
+    finally:
+        # A query cancelled while waiting for the semaphores is never awaited
+        if not started and inspect.iscoroutine(query):
+            query.close()
+
+
+async def _wait_for_disconnect(request: Request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def fan_out(queries, request: Request = None, timeout=None, limit=None):
+    """
+    Runs the given labelled queries concurrently (bounded by the shared concurrency limit) and returns their results
+
+    :param queries: Mapping of label (template name) to the query coroutine, e.g. repository.signal_pool(pipeline)
+    :type queries: dict
+
+    :param request: The request of the client, the queries are cancelled when the client disconnects
+    :type request: Request | None
+
+    :param timeout: Timeout of every query in seconds (defaults to the FAN_OUT_TIMEOUT_SECONDS setting)
+    :type timeout: float | None
+
+    :param limit: Maximum number of queries of this fan-out running at the same time (on top of the shared limit)
+    :type limit: int | None
+
+    :return: The results of the queries, in the given order
+    :rtype: list
+
+    :raises FanOutTimeoutError: If a query did not finish within the timeout
+    :raises ClientDisconnectedError: If the client disconnected before the queries finished
+    """
+
+    if timeout is None:
+        timeout = get_settings().fan_out_timeout_seconds
+
+    semaphores = (_get_semaphore(), asyncio.Semaphore(limit or len(queries) or 1))
+
+    tasks = [asyncio.ensure_future(_run_query(label, query, semaphores, timeout)) for label, query in queries.items()]
+    gathered = asyncio.gather(*tasks)
+
+    # The exception of a gather cancelled or abandoned below is retrieved here, it is not logged as never retrieved
+    gathered.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request)) if request is not None else None
+
+    try:
+        if watcher is None:
+            return list(await gathered)
+
+        done, _ = await asyncio.wait({gathered, watcher}, return_when=asyncio.FIRST_COMPLETED)
+
+        if gathered in done:
+            return list(gathered.result())
+
+        LOGGER.info(f"Client disconnected, cancelling the queries {list(queries)}")
+        raise ClientDisconnectedError("The client disconnected before the queries finished")
+
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+        # Cancelling the unfinished gather cancels its queries, a failed gather still has queries to be cancelled
+        if not gathered.done():
+            gathered.cancel()
+        else:
+            for task in tasks:
+                task.cancel()
+
+
+def get_fan_out_stats():
+    """
+    Returns the latency statistics of the fan-out queries of every label
+
+    :return: Mapping of label to its count, average, maximum and total latency (ms) and number of timeouts
+    :rtype: dict
+    """
+
+    with _LOCK:
+        return {label: {"count": latency["count"],
+                        "avg_ms": round(latency["total_ms"] / latency["count"], 2) if latency["count"] else 0.0,
+                        "max_ms": round(latency["max_ms"], 2),
+                        "total_ms": round(latency["total_ms"], 2),
+                        "timeouts": latency["timeouts"]}
+                for label, latency in _LATENCIES.items()}
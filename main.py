@@ -20,9 +20,12 @@ from fastapi.middleware.cors import CORSMiddleware
 
 # Local application/library specific imports
 from machine_monitoring_app.utils.configuration_helper import initialize_server
-from machine_monitoring_app.routers import core_data_route, security_routes, front_end_utility_route, base_routers
+from machine_monitoring_app.routers import core_data_route, security_routes, front_end_utility_route, base_routers, \
+    stream_route
+from machine_monitoring_app.monitoring_services.disconnection_watcher import start_disconnection_watcher
+from machine_monitoring_app.monitoring_services.interval_index_monitor import start_interval_index_monitor
 
-#from machine_monitoring_app.database.db_utils import connect_to_mongo, close_mongo_connection
+from machine_monitoring_app.database.db_utils import connect_to_mongo, close_mongo_connection
 
 
 __author__ = "smt18m005@iiitdm.ac.in"
@@ -43,12 +46,16 @@ APP.add_middleware(
 )
 
 APP.add_event_handler("startup", initialize_server)
-#APP.add_event_handler("shutdown", close_mongo_connection)
+APP.add_event_handler("startup", connect_to_mongo)
+APP.add_event_handler("startup", start_disconnection_watcher)
+APP.add_event_handler("startup", start_interval_index_monitor)
+APP.add_event_handler("shutdown", close_mongo_connection)
 
 APP.include_router(core_data_route.ROUTER)
 APP.include_router(security_routes.ROUTER)
 APP.include_router(front_end_utility_route.ROUTER)
 APP.include_router(base_routers.ROUTER)
+APP.include_router(stream_route.ROUTER)
 
 LOGGER.info("Starting Application")
 
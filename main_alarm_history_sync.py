@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Main Module for the Alarm History Mirror Service
+================================================
+
+Module for starting point of the alarm history mirror service. The service copies the alarms to timescaledb, it
+runs as a single process of its own (not in the web workers)
+
+    python main_alarm_history_sync.py
+
+This script requires the following modules be installed in the python environment
+    * logging - To perform logging operations.
+"""
+
+# Standard library imports
+import logging
+
+
+# Local application/library specific imports
+from machine_monitoring_app.utils.configuration_helper import initialize_server
+from machine_monitoring_app.monitoring_services.alarm_history_monitor import monitor_alarm_history, \
+    ALARM_HISTORY_MONITOR_SLEEP_SECONDS
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+
+def main():
+    """
+    Main Function
+    ====================
+
+    Main function to call appropriate functions to start the alarm history mirror service
+
+    :return: Nothing
+    :rtype: None
+
+    """
+
+    initialize_server()
+    monitor_alarm_history(ALARM_HISTORY_MONITOR_SLEEP_SECONDS)
+
+
+if __name__ == '__main__':
+
+    main()
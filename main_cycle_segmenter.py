@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Main Module for the Cycle Segmenter Service
+===========================================
+
+Module for starting point of the cycle segmenter service. The service writes the machining cycle index, it runs as
+a single process of its own (not in the web workers)
+
+    python main_cycle_segmenter.py
+
+This script requires the following modules be installed in the python environment
+    * logging - To perform logging operations.
+"""
+
+# Standard library imports
+import logging
+
+
+# Local application/library specific imports
+from machine_monitoring_app.utils.configuration_helper import initialize_server
+from machine_monitoring_app.monitoring_services.cycle_segmenter_monitor import monitor_cycle_segmenter, \
+    CYCLE_SEGMENTER_SLEEP_SECONDS
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+
+def main():
+    """
+    Main Function
+    ====================
+
+    Main function to call appropriate functions to start the cycle segmenter service
+
+    :return: Nothing
+    :rtype: None
+
+    """
+
+    initialize_server()
+    monitor_cycle_segmenter(CYCLE_SEGMENTER_SLEEP_SECONDS)
+
+
+if __name__ == '__main__':
+
+    main()
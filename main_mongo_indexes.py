@@ -0,0 +1,101 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Main Module for the MTLINKi Index Bootstrap
+===============================================
+
+Management command that creates the indexes needed by the aggregation templates on the MTLINKi database and
+explains every template to flag the ones doing a collection scan or examining too many documents.
+
+    python main_mongo_indexes.py --create --check
+    python main_mongo_indexes.py --check --url mongodb://localhost:27017/ --max-ratio 20
+
+The command exits with status 1 when a template is flagged, so it can be used in a deployment check.
+
+This script requires the following modules be installed in the python environment
+    * logging - To perform logging operations.
+    * argparse - To parse the command line arguments.
+    * pymongo - To connect to the mongodb database.
+"""
+
+# Standard library imports
+import argparse
+import logging
+import sys
+
+# Related third party imports
+from pymongo import MongoClient
+
+# Local application/library specific imports
+from machine_monitoring_app.database.mongodb_client import get_mongo_client, MTLINKI_DATABASE
+from machine_monitoring_app.database.mongo_index_manager import ensure_indexes, check_pipelines, \
+    representative_pipelines, MAX_EXAMINED_RATIO
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+
+def parse_arguments(arguments=None):
+    """
+    Parses the command line arguments
+
+    :return: The parsed arguments
+    :rtype: argparse.Namespace
+    """
+
+    parser = argparse.ArgumentParser(description="Create and check the MTLINKi indexes of the monitoring application")
+    parser.add_argument("--create", action="store_true", help="create the required indexes")
+    parser.add_argument("--check", action="store_true", help="explain every template and flag the bad plans")
+    parser.add_argument("--url", default=None, help="mongodb url (defaults to the configured server)")
+    parser.add_argument("--machine", default="T_B_OP160", help="machine used in the representative arguments")
+    parser.add_argument("--parameter", default="PMC_D9388_T_B_OP160",
+                        help="signal used in the representative arguments")
+    parser.add_argument("--max-ratio", type=float, default=MAX_EXAMINED_RATIO,
+                        help="maximum accepted docsExamined / nReturned ratio")
+
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None):
+    """
+    Main Function
+    ====================
+
+    Main function to create the indexes and check the templates
+
+    :return: The exit status (1 if a template is flagged)
+    :rtype: int
+
+    """
+
+    logging.basicConfig(level=logging.INFO)
+
+    arguments = parse_arguments(arguments)
+
+    client = MongoClient(arguments.url) if arguments.url else get_mongo_client()
+    database = client[MTLINKI_DATABASE]
+
+    if arguments.create:
+        for collection, indexes in ensure_indexes(database).items():
+            print(f"{collection}: " + "; ".join(f"{state} {', '.join(names)}" for state, names in indexes.items()
+                                                if names))
+
+    if not arguments.check:
+        return 0
+
+    reports = check_pipelines(database, representative_pipelines(machine_name=arguments.machine,
+                                                                 parameter_name=arguments.parameter),
+                              max_examined_ratio=arguments.max_ratio)
+
+    for report in reports:
+        status = "FLAGGED " + "; ".join(report["problems"]) if report["problems"] else "ok"
+        print(f"{report['template']:<42} {report['collection']:<22} examined={report['docs_examined']:<8} "
+              f"returned={report['returned']:<8} {'/'.join(report['stages'])}  {status}")
+
+    return 1 if any(report["problems"] for report in reports) else 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Main Module for the State Rollup Service
+===============================================
+
+Module for starting point of the daily state duration rollup service. The service writes the rollups, it runs as a
+single process of its own (not in the web workers)
+
+    python main_state_rollup.py
+
+This script requires the following modules be installed in the python environment
+    * logging - To perform logging operations.
+"""
+
+# Standard library imports
+import logging
+
+
+# Local application/library specific imports
+from machine_monitoring_app.utils.configuration_helper import initialize_server
+from machine_monitoring_app.monitoring_services.state_rollup_monitor import monitor_state_rollups, \
+    ROLLUP_MONITOR_SLEEP_SECONDS
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+LOGGER = logging.getLogger(__name__)
+
+
+def main():
+    """
+    Main Function
+    ====================
+
+    Main function to call appropriate functions to start the state rollup service
+
+    :return: Nothing
+    :rtype: None
+
+    """
+
+    initialize_server()
+    monitor_state_rollups(ROLLUP_MONITOR_SLEEP_SECONDS)
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+TEST FIXTURES
+================================
+
+Fixtures shared by the tests: a factory snapshot store reading its rows from a list instead of the database.
+
+This script requires the following modules be installed in the python environment
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+from datetime import datetime, timedelta
+
+# Related third party imports
+import pytest
+
+# Local application/library specific imports
+from machine_monitoring_app.database import snapshot_store
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+BASE_TIME = datetime(2022, 6, 19)
+
+
+def snapshot_row(parameter_id, machine_name="T_B_OP160", parameter_name="P1", group_name="Spindle",
+                 location="Block", seconds=0, value=1.0, condition_name="OK", warn_limit=None, critical_limit=None):
+    """
+    Returns a snapshot row (in the order of SNAPSHOT_COLUMNS)
+    """
+
+    return (parameter_id, group_name, location, machine_name, parameter_name, parameter_name, parameter_name,
+            BASE_TIME + timedelta(seconds=seconds), value, warn_limit, critical_limit, condition_name)
+
+
+class _GroupNameQuery:
+    def __init__(self, group_names):
+        self.group_names = group_names
+
+    def __getitem__(self, item):
+        return self.group_names
+
+
+@pytest.fixture(name="snapshot_rows")
+def fixture_snapshot_rows(monkeypatch):
+    """
+    Makes the process level snapshot store read the rows of the returned list (the rows with a time after the
+    requested one for the incremental reloads), without the minimum refresh interval
+    """
+
+    rows = []
+
+    def select_active_rows(changed_since=None):
+        return [row for row in rows if changed_since is None or row[7] > changed_since]
+
+    monkeypatch.setattr(snapshot_store, "_select_active_rows", select_active_rows)
+    monkeypatch.setattr(snapshot_store, "select", lambda query: _GroupNameQuery(sorted({row[1] for row in rows})))
+    monkeypatch.setattr(snapshot_store, "MIN_REFRESH_INTERVAL_SECONDS", 0.0)
+
+    snapshot_store.get_snapshot_store.cache_clear()
+
+    yield rows
+
+    snapshot_store.get_snapshot_store.cache_clear()
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+CONDITION KERNEL TESTS
+================================
+
+Tests of the vectorized condition kernel against the per-row limit checks it replaced: the decreasing, increasing and
+bool parameter types (values exactly at the limits included), the missing values, the per row parameter types, the
+exclusive limits of the spare part counts and the age of the values.
+
+This script requires the following modules be installed in the python environment
+    * math - To find the missing values.
+    * numpy - To generate the values.
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+import math
+
+# Related third party imports
+import numpy as np
+import pytest
+
+# Local application/library specific imports
+from machine_monitoring_app.database.condition_kernel import evaluate_conditions, condition_names
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+
+def legacy_condition(value, warning_limit, critical_limit, parameter_type, inclusive=True):
+    """
+    Returns the condition name of one value, with the limit checks of the legacy per-row code
+    """
+
+    if value is None or math.isnan(value):
+        return "DISCONNECTED"
+
+    if parameter_type == "decreasing":
+        if (value <= critical_limit) if inclusive else (value < critical_limit):
+            return "CRITICAL"
+        if (value <= warning_limit) if inclusive else (value < warning_limit):
+            return "WARNING"
+
+    elif parameter_type == "increasing":
+        if (value >= critical_limit) if inclusive else (value > critical_limit):
+            return "CRITICAL"
+        if (value >= warning_limit) if inclusive else (value > warning_limit):
+            return "WARNING"
+
+    elif parameter_type == "bool":
+        if value == 1:
+            return "CRITICAL"
+
+    return "OK"
+
+
+def random_values(seed, count=2000):
+    """
+    Returns random values (a share of them missing or exactly at a limit) with their limits
+    """
+
+    generator = np.random.default_rng(seed)
+
+    warning_limits = generator.integers(40, 60, count).astype(float)
+    critical_limits = warning_limits + generator.integers(1, 20, count)
+    values = generator.integers(0, 100, count).astype(float)
+
+    at_warning, at_critical, missing = (generator.random(count) < 0.1 for _ in range(3))
+    values[at_warning] = warning_limits[at_warning]
+    values[at_critical] = critical_limits[at_critical]
+    values[missing] = np.nan
+
+    return values, warning_limits, critical_limits
+
+
+@pytest.mark.parametrize("inclusive", [True, False])
+@pytest.mark.parametrize("parameter_type", ["increasing", "decreasing", "bool", None, "unknown"])
+def test_kernel_matches_legacy_checks(parameter_type, inclusive):
+    values, warning_limits, critical_limits = random_values(1)
+
+    if parameter_type == "decreasing":
+        warning_limits, critical_limits = critical_limits, warning_limits
+
+    if parameter_type == "bool":
+        values = np.where(np.isnan(values), np.nan, values % 2)
+
+    codes = evaluate_conditions(values, warning_limits, critical_limits, parameter_type, inclusive=inclusive)
+
+    assert condition_names(codes).tolist() == [
+        legacy_condition(value, warning_limit, critical_limit, parameter_type, inclusive)
+        for value, warning_limit, critical_limit in zip(values, warning_limits, critical_limits)]
+
+
+def test_per_row_parameter_types_match_legacy_checks():
+    values, warning_limits, critical_limits = random_values(2)
+    parameter_types = np.random.default_rng(2).choice(["increasing", "decreasing", "bool", None],
+                                                      len(values))
+
+    codes = evaluate_conditions(values, warning_limits, critical_limits, parameter_types)
+
+    assert condition_names(codes).tolist() == [
+        legacy_condition(*row) for row in zip(values, warning_limits, critical_limits, parameter_types)]
+
+
+def test_scalar_limits_and_non_numeric_values():
+    codes = evaluate_conditions([10, 70, 95, None, "n/a"], 70, 90, "increasing")
+
+    assert condition_names(codes).tolist() == ["OK", "WARNING", "CRITICAL", "DISCONNECTED", "DISCONNECTED"]
+
+
+def test_missing_limits_are_not_crossed():
+    codes = evaluate_conditions([10.0, 95.0], [None, 70.0], [None, None], "increasing")
+
+    assert condition_names(codes).tolist() == ["OK", "WARNING"]
+
+
+def test_values_older_than_max_age_are_disconnected():
+    now = 1_000_000.0
+
+    codes = evaluate_conditions([10.0, 10.0, 95.0, 95.0], 70, 90, "increasing",
+                                timestamps=[now - 10, now - 100, now - 10, math.nan], now=now, max_age_seconds=60)
+
+    assert condition_names(codes).tolist() == ["OK", "DISCONNECTED", "CRITICAL", "DISCONNECTED"]
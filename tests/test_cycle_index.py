@@ -0,0 +1,87 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+CYCLE INDEX TESTS
+================================
+
+Tests of the cycle segmentation: the cycle boundaries and the summaries of every cycle, with missing (NaN) samples
+left out of the summaries.
+
+This script requires the following modules be installed in the python environment
+    * numpy - To build the points.
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+import math
+
+# Related third party imports
+import numpy as np
+import pytest
+
+# Local application/library specific imports
+from machine_monitoring_app.database.cycle_index import segment_points, kruskal_wallis
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+NAN = math.nan
+
+
+def points(values, cycle_ends):
+    """
+    Returns the timestamps, values and conditions of the points, a cycle ending on every index of cycle_ends
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    conditions = np.full(len(values), NAN)
+    conditions[list(cycle_ends)] = 1
+
+    return np.arange(len(values), dtype=np.float64) * 1000, values, conditions
+
+
+def test_cycles_end_on_the_points_with_a_condition():
+    cycles, last_index = segment_points(*points([1, 2, 3, 4, 5, 6, 7], [2, 5]))
+
+    assert cycles["cycle_start"].tolist() == [0, 3000]
+    assert cycles["cycle_end"].tolist() == [2000, 5000]
+    assert cycles["point_count"].tolist() == [3, 3]
+    assert cycles["mean_value"].tolist() == [2, 5]
+    assert last_index == 5
+
+
+def test_partial_first_cycle_is_dropped():
+    cycles, last_index = segment_points(*points([1, 2, 3, 4, 5, 6], [1, 4]), first_cycle_complete=False)
+
+    assert cycles["cycle_start"].tolist() == [2000]
+    assert cycles["min_value"].tolist() == [3]
+    assert last_index == 4
+
+
+def test_missing_samples_are_left_out_of_the_summaries():
+    values = [1, 2, 3, NAN, 5, 9, 7, 8, 9]
+    cycles, _ = segment_points(*points(values, [2, 5, 8]))
+
+    # The second cycle (3, 5, 9 with the gap) is summarized over 5 and 9
+    assert cycles["min_value"].tolist() == [1, 5, 7]
+    assert cycles["max_value"].tolist() == [3, 9, 9]
+    assert cycles["mean_value"].tolist() == pytest.approx([2, 7, 8])
+    assert cycles["std_value"].tolist() == pytest.approx([np.std([1, 2, 3]), 2, np.std([7, 8, 9])])
+    assert cycles["point_count"].tolist() == [3, 3, 3]
+
+    for column, column_values in cycles.items():
+        assert not np.isnan(column_values.astype(np.float64)).any(), column
+
+
+def test_cycles_without_valid_samples_are_dropped():
+    cycles, last_index = segment_points(*points([1, 2, NAN, NAN, 5, 6], [1, 3, 5]))
+
+    assert cycles["cycle_end"].tolist() == [1000, 5000]
+    assert cycles["mean_value"].tolist() == [1.5, 5.5]
+    assert last_index == 5
+
+
+def test_kruskal_wallis_ignores_missing_samples():
+    statistic, p_value = kruskal_wallis([1, 2, NAN, 3], [1, 2, 3])
+
+    assert statistic == pytest.approx(0.0)
+    assert p_value == pytest.approx(1.0)
@@ -0,0 +1,214 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+DISCONNECTION HISTORY TESTS
+================================
+
+Tests of the keyset pagination of the disconnection history: the pages of a line followed through their cursors
+against the whole history (intervals starting at the same time included), pages that stay stable when intervals are
+written before the cursor, the cursor format, and the NDJSON stream of the route.
+
+The pipelines are run by a repository evaluating the operators used by the history template on in-memory documents.
+
+This script requires the following modules be installed in the python environment
+    * bson - For the identifiers of the documents.
+    * fastapi - To call the route.
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+import asyncio
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+# Related third party imports
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+# Local application/library specific imports
+from machine_monitoring_app.database import crud_operations
+from machine_monitoring_app.database.crud_operations import get_disconnection_history_page_async, \
+    encode_disconnection_cursor, decode_disconnection_cursor
+from main import APP
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+FROM_TIMESTAMP = int(START.timestamp())
+
+TO_TIMESTAMP = FROM_TIMESTAMP + 86400
+
+ROUTE = "/api/v1/factory/disconnection_history"
+
+
+def _matches(document, match):
+    for key, condition in match.items():
+        if key == "$or":
+            if not any(_matches(document, alternative) for alternative in condition):
+                return False
+
+        elif isinstance(condition, dict):
+            value = document.get(key)
+            checks = {"$gte": lambda bound: value >= bound, "$lte": lambda bound: value <= bound,
+                      "$gt": lambda bound: value > bound, "$in": lambda values: value in values,
+                      "$regex": lambda pattern: re.search(pattern, value) is not None}
+
+            if not all(checks[operator](operand) for operator, operand in condition.items()):
+                return False
+
+        elif document.get(key) != condition:
+            return False
+
+    return True
+
+
+def run_pipeline(documents, pipeline):
+    """
+    Runs the $match / $sort / $limit / $project stages of the pipeline on the documents
+    """
+
+    for stage in pipeline:
+        (operator, argument), = stage.items()
+
+        if operator == "$match":
+            documents = [document for document in documents if _matches(document, argument)]
+        elif operator == "$sort":
+            documents = sorted(documents, key=lambda document: tuple(document[key] for key in argument))
+        elif operator == "$limit":
+            documents = documents[:argument]
+        elif operator == "$project":
+            documents = [{key: document[key] for key in ("_id", *argument) if key in document}
+                         for document in documents]
+
+    return documents
+
+
+class FakeRepository:
+    """
+    Repository running the pipelines on in-memory documents
+    """
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def aggregate(self, collection, pipeline, batch_size=None):
+        return run_pipeline(self.documents, pipeline)
+
+    async def iterate(self, collection, pipeline, batch_size=None):
+        for document in run_pipeline(self.documents, pipeline):
+            yield document
+
+
+def disconnection(machine_name, minutes, timespan=60):
+    """
+    Returns a DISCONNECT interval of the machine starting the given minutes after the start of the range
+    """
+
+    updatedate = START + timedelta(minutes=minutes)
+
+    return {"_id": ObjectId(), "signalname": "DISCONNECT", "L1Name": machine_name, "updatedate": updatedate,
+            "enddate": updatedate + timedelta(seconds=timespan), "timespan": timespan}
+
+
+@pytest.fixture(name="documents")
+def fixture_documents(monkeypatch):
+    """
+    Serves the returned documents as the signal pool: disconnections of two machines of the line T_B_ (several
+    starting at the same time) and one of another line
+    """
+
+    documents = [disconnection("T_B_OP10", 5), disconnection("T_B_OP20", 5), disconnection("T_B_OP30", 5),
+                 disconnection("T_B_OP10", 30), disconnection("T_C_OP10", 40), disconnection("T_B_OP20", 50),
+                 disconnection("T_B_OP20", 50), {**disconnection("T_B_OP10", 60), "signalname": "OPERATE"},
+                 disconnection("T_B_OP10", 24 * 60 + 1)]
+
+    monkeypatch.setattr(crud_operations, "get_mtlinki_repository", lambda: FakeRepository(documents))
+
+    return documents
+
+
+def expected_history(documents, prefix="T_B_"):
+    return sorted((document for document in documents if document["signalname"] == "DISCONNECT" and
+                   document["L1Name"].startswith(prefix) and document["updatedate"] <= START + timedelta(days=1)),
+                  key=lambda document: (document["updatedate"], document["_id"]))
+
+
+def read_page(limit, cursor=None):
+    return asyncio.run(get_disconnection_history_page_async(None, FROM_TIMESTAMP, TO_TIMESTAMP, line_prefix="T_B_",
+                                                            limit=limit, cursor=cursor))
+
+
+def history_key(item):
+    return item.L1Name, item.updatedate
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 6, 100])
+def test_pages_cover_the_history_once(documents, limit):
+    pages, cursor = [], None
+
+    while True:
+        page = read_page(limit, cursor)
+        pages.append(page["history"])
+        cursor = page["next_cursor"]
+
+        if cursor is None:
+            break
+
+    assert all(len(page) <= limit for page in pages)
+    assert [history_key(item) for page in pages for item in page] == \
+        [(document["L1Name"], document["updatedate"]) for document in expected_history(documents)]
+
+
+def test_pages_are_stable_when_earlier_intervals_are_written(documents):
+    first_page = read_page(3)
+    expected_rest = [(document["L1Name"], document["updatedate"]) for document in expected_history(documents)[3:]]
+
+    # Written late, before the cursor of the first page
+    documents.append(disconnection("T_B_OP30", 1))
+
+    rest = read_page(100, first_page["next_cursor"])
+
+    assert [history_key(item) for item in rest["history"]] == expected_rest
+
+
+def test_cursor_round_trip():
+    document = disconnection("T_B_OP10", 5)
+    naive = {**document, "updatedate": document["updatedate"].replace(tzinfo=None)}
+
+    assert decode_disconnection_cursor(encode_disconnection_cursor(document)) == (document["updatedate"],
+                                                                                 document["_id"])
+    assert encode_disconnection_cursor(naive) == encode_disconnection_cursor(document)
+
+    with pytest.raises(ValueError):
+        decode_disconnection_cursor("not-a-cursor")
+
+
+def test_invalid_requests_are_rejected(documents):
+    client = TestClient(APP)
+
+    assert client.get(ROUTE, params={"from_timestamp": FROM_TIMESTAMP, "to_timestamp": TO_TIMESTAMP,
+                                     "line_prefix": "T_B_", "cursor": "x"}).status_code == 400
+    assert client.get(ROUTE, params={"from_timestamp": FROM_TIMESTAMP,
+                                     "to_timestamp": TO_TIMESTAMP}).status_code == 400
+
+
+def test_ndjson_stream_ends_with_the_next_cursor(documents):
+    client = TestClient(APP)
+    params = {"from_timestamp": FROM_TIMESTAMP, "to_timestamp": TO_TIMESTAMP, "l1name": ["T_B_OP10", "T_B_OP20"],
+              "format": "ndjson", "limit": 3}
+
+    response = client.get(ROUTE, params=params)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [line["L1Name"] for line in lines[:3]] == ["T_B_OP10", "T_B_OP20", "T_B_OP10"]
+    assert list(lines[3]) == ["next_cursor"]
+
+    response = client.get(ROUTE, params={**params, "cursor": lines[3]["next_cursor"]})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    # The last page has no cursor line
+    assert [line["L1Name"] for line in lines] == ["T_B_OP20", "T_B_OP20"]
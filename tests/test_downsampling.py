@@ -0,0 +1,140 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+TIMELINE DOWNSAMPLING TESTS
+================================
+
+Tests of the timeline downsampling: the point budget of LTTB and min / max (a hard cap, with the limit crossings
+kept), the gaps left out of the buckets, and LTTB against a straightforward reference implementation.
+
+This script requires the following modules be installed in the python environment
+    * numpy - To generate the timelines.
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+# None
+
+# Related third party imports
+import numpy as np
+import pytest
+
+# Local application/library specific imports
+from machine_monitoring_app.utils.downsampling import lttb_indices, min_max_indices, downsample_timeline, \
+    condition_change_indices
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+
+def reference_lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets written point by point, over the same bucket edges
+    """
+
+    size = len(x)
+    edges = np.linspace(1, size - 1, threshold - 1).astype(np.int64)
+    selected, indices = 0, [0]
+
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+
+        if bucket + 2 < len(edges):
+            average_x = sum(x[edges[bucket + 1]:edges[bucket + 2]]) / (edges[bucket + 2] - edges[bucket + 1])
+            average_y = sum(y[edges[bucket + 1]:edges[bucket + 2]]) / (edges[bucket + 2] - edges[bucket + 1])
+        else:
+            average_x, average_y = x[-1], y[-1]
+
+        areas = [abs((x[selected] - average_x) * (y[index] - y[selected]) -
+                     (x[selected] - x[index]) * (average_y - y[selected])) for index in range(start, end)]
+        selected = start + int(np.argmax(areas))
+        indices.append(selected)
+
+    return indices + [size - 1]
+
+
+@pytest.fixture(name="timeline")
+def fixture_timeline():
+    generator = np.random.default_rng(2022)
+    x = np.arange(5000, dtype=np.float64) * 1000
+    y = np.sin(np.arange(5000) / 200) * 50 + generator.normal(0, 2, 5000)
+
+    return x, y
+
+
+def test_lttb_matches_the_reference(timeline):
+    x, y = timeline
+
+    assert lttb_indices(x, y, 100).tolist() == reference_lttb(x, y, 100)
+
+
+@pytest.mark.parametrize("threshold", [3, 10, 101, 1000])
+def test_lttb_keeps_exactly_the_threshold(timeline, threshold):
+    x, y = timeline
+    indices = lttb_indices(x, y, threshold)
+
+    assert len(np.unique(indices)) == threshold
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+
+
+@pytest.mark.parametrize("threshold", [4, 11, 100, 1000])
+def test_min_max_keeps_at_most_the_threshold(timeline, threshold):
+    _, y = timeline
+    indices = min_max_indices(y, threshold)
+
+    assert len(indices) <= threshold
+    assert y.argmax() in indices and y.argmin() in indices
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+@pytest.mark.parametrize("max_points", [4, 50, 500])
+def test_max_points_is_a_hard_cap_and_crossings_are_kept(timeline, method, max_points):
+    x, y = timeline
+
+    timestamps, values = downsample_timeline(x, y, max_points, method, warning_limit=40.0, critical_limit=48.0,
+                                             parameter_type="increasing")
+    crossings = condition_change_indices(y, 40.0, 48.0, "increasing")
+
+    assert len(timestamps) <= max_points
+    assert np.all(np.diff(timestamps) > 0)
+
+    if len(crossings) < max_points:
+        assert set(x[crossings].tolist()) <= set(timestamps.tolist())
+
+
+def test_crossings_beyond_max_points_are_clamped():
+    # Every other value is CRITICAL, every point is a crossing
+    y = np.tile([0.0, 10.0], 500)
+    x = np.arange(len(y), dtype=np.float64)
+
+    timestamps, _ = downsample_timeline(x, y, 20, warning_limit=5.0, critical_limit=8.0, parameter_type="increasing")
+
+    assert len(timestamps) == 20
+    assert timestamps[0] == 0 and timestamps[-1] == len(y) - 1
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_gaps_are_not_sampled_as_zeros(method):
+    x = np.arange(3000, dtype=np.float64)
+    y = np.full(3000, 100.0) + np.sin(x / 50)
+    y[1000:1200] = np.nan
+
+    timestamps, values = downsample_timeline(x, y, 60, method)
+    values = np.asarray(values)
+
+    # No zero dip, the gap is only visible through the missing values around it
+    assert np.nanmin(values) > 98
+    assert len(timestamps) <= 60
+    assert {999.0, 1000.0, 1199.0, 1200.0} <= set(timestamps.tolist())
+
+
+def test_short_timeline_and_lists_are_returned_as_they_are():
+    assert downsample_timeline([1, 2, 3], [1.0, None, 3.0], 10) == ([1, 2, 3], [1.0, None, 3.0])
+
+    timestamps, values = downsample_timeline(list(range(100)), [float(value) for value in range(100)], 10, "minmax")
+
+    assert isinstance(timestamps, list) and len(timestamps) <= 10
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        downsample_timeline([1, 2], [1.0, 2.0], 10, "average")
@@ -0,0 +1,207 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+PRE-ENCODED RESPONSE TESTS
+================================
+
+Tests of the pre-encoded JSON responses: with the ``VALIDATE_ENCODED_RESPONSES`` setting enabled, the payload of
+every converted route is validated through its response model and encoded to the body FastAPI would have sent,
+without it the payload is shaped to the same body (extra keys dropped, types coerced), and the NaN values are encoded
+as null with and without orjson.
+
+This script requires the following modules be installed in the python environment
+    * json - To decode the encoded bodies.
+    * pydantic - For the validation errors.
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+import json
+import math
+from types import SimpleNamespace
+
+# Related third party imports
+import numpy as np
+import pytest
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+
+# Local application/library specific imports
+from machine_monitoring_app.utils import encoded_response
+from machine_monitoring_app.utils.encoded_response import encode_response, encode_json
+from machine_monitoring_app.models.response_models import CurrentData, SpmStateData, SpareStateData, \
+    FullTimelineData, GroupSchema, FactorySchema, SpecificGroupSchema, SpecificGroupSchema_test, FactorySchema_new, \
+    new_ResponseModel, DynamicTimelineData, MachineSchema
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+
+def parameter(value=12.5):
+    return {"internal_parameter_name": "A0-P1", "display_name": "X", "actual_parameter_name": "PMC_D9388_T_B_OP160",
+            "latest_update_time": 1655596800, "parameter_value": value, "parameter_state": "OK",
+            "warning_limit": 60.0, "critical_limit": None}
+
+
+def machine(value=12.5, count=None):
+    machine_data = {"machine_name": "T_B_OP160", "machine_state": "OK", "parameters": [parameter(value)]}
+
+    if count is not None:
+        machine_data["count"] = count
+
+    return machine_data
+
+
+def group(value=12.5, disconnected=False):
+    count = {"OK": 1, "WARNING": 0, "CRITICAL": 0, **({"DISCONNECTED": 0} if disconnected else {})}
+
+    return {"group_name": "Spindle", "group_state": "OK", "count": count,
+            "group_details": [{"line_name": "Block", "line_state": "OK", "count": count,
+                               "machines": [machine(value)]}]}
+
+
+def overview():
+    return [{"item_name": "Spindle", "item_state": "OK"}]
+
+
+def new_layout(value=12.5):
+    count = {"OK": 1, "WARNING": 0, "CRITICAL": 0}
+
+    return {"lines": [{"line_name": "Block", "line_state": "OK", "count": count,
+                       "machines": [machine(value, count)]}]}
+
+
+# The response model and a representative payload (with a NaN value) of every route returning pre-encoded bytes
+ROUTE_PAYLOADS = {
+    "machine-spare-states-new": (GroupSchema, group(math.nan)),
+    "factory-state": (SpecificGroupSchema, {"group_names": overview(), "requested_group_details": group(math.nan)}),
+    "factory-state-test": (SpecificGroupSchema_test, {"group_names": overview(),
+                                                      "requested_group_details": group(math.nan, True)}),
+    "machine-state": (CurrentData, {"param": 1, "param_actual_name": "Spindle Temperature", "params_group_status": [1],
+                                    "machines": [{"name": "T_B_OP160", "status": 1,
+                                                  "axes": [{"name": 0, "actual_name": "X", "status": 2,
+                                                            "last_update_time": 1655596800.0,
+                                                            "value": math.nan}]}]}),
+    "spm-machine-state": (SpmStateData, {"spm_machine_status": [1, 2, 3]}),
+    "machine-spare-states": (SpareStateData, {"spare_machine_status": {"warning_machines": ["T_B_OP160"],
+                                                                       "critical_machines": []}}),
+    "spm-real-time": (FullTimelineData, {"param": 1, "axis": "X", "machine": "T_B_OP160",
+                                         "start_time": 1655596800.0, "stop_time": 1655600400.0,
+                                         "data": [1.0, math.nan, 3.0],
+                                         "timestamps": [1655596800000.0, 1655596801000.0, 1655596802000.0],
+                                         "critical_limit": None, "warning_limit": 2.5}),
+    "factory-layout": (FactorySchema, {"group_names": overview(), "all_group_details": [group(math.nan)]}),
+    "factory-layout-mtlinki": (FactorySchema, {"group_names": overview(), "all_group_details": [group()]}),
+    "factory-new-layout": (FactorySchema_new, new_layout(math.nan)),
+    "factory-new-layout-mtlinki": (new_ResponseModel, new_layout()),
+    "dynamic-parameter-real-time": (DynamicTimelineData, {
+        "param": 17, "axis": 0, "machine": "T_B_OP160", "start_time": 1655596800000.0, "stop_time": 1655596860000.0,
+        "data": [{"cycle_value": [1.0, None, 3.0], "timestamps": [1655596800000.0, 1655596801000.0, 1655596802000.0],
+                  "reference_cycle": [1.0, 2.0, 3.0], "condition": "ok", "alpha_value": None, "stat_value": None,
+                  "variant_name": "Spindle Load", "cycle_time": 2.0, "point_count": 3, "min_value": None,
+                  "max_value": None, "mean_value": None, "std_value": None}]}),
+}
+
+
+def replace_nan(value):
+    """
+    Returns the value with the NaN floats replaced by None (how they are encoded)
+    """
+
+    if isinstance(value, float) and math.isnan(value):
+        return None
+
+    if isinstance(value, dict):
+        return {key: replace_nan(item) for key, item in value.items()}
+
+    if isinstance(value, list):
+        return [replace_nan(item) for item in value]
+
+    return value
+
+
+@pytest.fixture(name="validation")
+def fixture_validation(monkeypatch):
+    monkeypatch.setattr(encoded_response, "get_settings", lambda: SimpleNamespace(validate_encoded_responses=True))
+
+
+@pytest.fixture(name="encoder", params=["orjson", "json"])
+def fixture_encoder(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(encoded_response, "orjson", None)
+
+    return request.param
+
+
+@pytest.mark.parametrize("route", sorted(ROUTE_PAYLOADS))
+def test_route_payload_is_encoded_through_its_response_model(route, validation, encoder):
+    response_model, payload = ROUTE_PAYLOADS[route]
+
+    body = encode_response(payload, response_model)
+
+    # The body FastAPI would have sent (the response model applied), NaN encoded as null
+    assert json.loads(body) == replace_nan(jsonable_encoder(response_model.parse_obj(payload)))
+
+
+@pytest.mark.parametrize("route", ["factory-state", "machine-state", "factory-new-layout"])
+def test_invalid_payload_is_rejected_when_validating(route, validation):
+    response_model, payload = ROUTE_PAYLOADS[route]
+    key = next(iter(payload))
+
+    with pytest.raises(ValidationError):
+        encode_response({name: value for name, value in payload.items() if name != key}, response_model)
+
+
+@pytest.fixture(name="no_validation")
+def fixture_no_validation(monkeypatch):
+    monkeypatch.setattr(encoded_response, "get_settings", lambda: SimpleNamespace(validate_encoded_responses=False))
+
+
+def with_extra_keys(value):
+    """
+    Returns the payload with an extra key in every object and the integers given as floats / the enums as integers
+    """
+
+    if isinstance(value, dict):
+        return {**{key: with_extra_keys(item) for key, item in value.items()}, "internal_row_id": 42}
+
+    if isinstance(value, list):
+        return [with_extra_keys(item) for item in value]
+
+    if isinstance(value, bool) or not isinstance(value, int):
+        return value
+
+    return float(value)
+
+
+@pytest.mark.parametrize("route", sorted(ROUTE_PAYLOADS))
+def test_route_payload_is_shaped_to_its_response_model(route, no_validation, encoder):
+    response_model, payload = ROUTE_PAYLOADS[route]
+
+    payload = with_extra_keys(payload)
+
+    body = encode_response(payload, response_model)
+    expected = replace_nan(jsonable_encoder(response_model.parse_obj(payload)))
+
+    assert json.loads(body) == expected
+    assert json.dumps(json.loads(body)) == json.dumps(expected)
+
+
+def test_missing_optional_fields_get_their_default(no_validation):
+    machine_data = {"machine_name": "T_B_OP160", "parameters": []}
+
+    assert json.loads(encode_response(machine_data, MachineSchema)) == {"machine_name": "T_B_OP160",
+                                                                         "parameters": [], "machine_state": "OK"}
+
+
+def test_payload_of_the_wrong_shape_is_passed_through(no_validation):
+    assert json.loads(encode_response(["not", "a group"], GroupSchema)) == ["not", "a group"]
+
+
+def test_non_finite_values_are_encoded_as_null(encoder):
+    payload = {"value": math.nan, "values": [1.0, math.inf, -math.inf], "array": np.array([math.nan, 2.0]),
+               "scalar": np.float64("nan")}
+
+    assert json.loads(encode_json(payload)) == {"value": None, "values": [1.0, None, None], "array": [None, 2.0],
+                                                "scalar": None}
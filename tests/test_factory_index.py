@@ -0,0 +1,127 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+FACTORY DRILL-DOWN TESTS
+================================
+
+Tests of the factory drill-down index and its routes: the line / machine / parameter lookups, the parameter names
+shared by several machines, and the 404 / 409 answers of the routes for unknown and ambiguous objects.
+
+This script requires the following modules be installed in the python environment
+    * fastapi - To call the routes.
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+# None
+
+# Related third party imports
+import pytest
+from fastapi.testclient import TestClient
+
+# Local application/library specific imports
+from machine_monitoring_app.database.factory_index import FactoryIndex, get_line_state, get_machine_state, \
+    get_parameter_state
+from machine_monitoring_app.exception_handling.custom_exceptions import FactoryObjectNotFoundError, \
+    AmbiguousFactoryObjectError
+from main import APP
+from tests.conftest import snapshot_row
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+ROWS = [snapshot_row(1, machine_name="T_B_OP110", parameter_name="Load"),
+        snapshot_row(2, machine_name="T_B_OP20", parameter_name="Load", value=95.0, condition_name="CRITICAL"),
+        snapshot_row(3, machine_name="T_B_OP20", parameter_name="Speed"),
+        snapshot_row(4, machine_name="T_C_OP10", parameter_name="Temperature", location="Crank")]
+
+
+@pytest.fixture(name="factory")
+def fixture_factory(snapshot_rows):
+    """
+    Loads the snapshot with two lines, the "Load" parameter on two machines
+    """
+
+    snapshot_rows.extend(ROWS)
+
+    yield snapshot_rows
+
+
+@pytest.fixture(name="client")
+def fixture_client(factory):
+    """
+    Returns a client of the application, the snapshot loaded with the factory
+    """
+
+    return TestClient(APP)
+
+
+def test_index_orders_machines_naturally():
+    index = FactoryIndex(ROWS)
+
+    assert list(index.lines["Block"]) == ["T_B_OP20", "T_B_OP110"]
+    assert [row[0] for row in index.line_rows("Block")] == [2, 3, 1]
+    assert index.line_rows("Head") is None
+    assert index.machine_rows("T_B_OP999") is None
+
+
+def test_index_parameter_lookup():
+    index = FactoryIndex(ROWS)
+
+    assert index.parameter_row("Speed")[0] == 3
+    assert index.parameter_row("Load", "T_B_OP20")[0] == 2
+    assert index.parameter_row("Load", "T_C_OP10") is None
+    assert index.parameter_row("Pressure") is None
+
+    with pytest.raises(AmbiguousFactoryObjectError):
+        index.parameter_row("Load")
+
+
+def test_state_lookups(factory):
+    line = get_line_state("Block")
+
+    assert [machine["machine_name"] for machine in line["machines"]] == ["T_B_OP20", "T_B_OP110"]
+    assert line["line_state"] == "CRITICAL"
+
+    machine = get_machine_state("T_C_OP10")
+
+    assert machine["line_name"] == "Crank"
+    assert [parameter["actual_parameter_name"] for parameter in machine["parameters"]] == ["Temperature"]
+
+    parameter = get_parameter_state("Load", "T_B_OP20")
+
+    assert (parameter["line_name"], parameter["machine_name"]) == ("Block", "T_B_OP20")
+    assert parameter["parameter_state"] == "CRITICAL"
+
+    with pytest.raises(FactoryObjectNotFoundError):
+        get_machine_state("T_B_OP999")
+
+
+@pytest.mark.parametrize("path", ["/api/v1/factory/lines/Head", "/api/v1/factory/machines/T_B_OP999/state",
+                                  "/api/v1/factory/parameters/Pressure/state",
+                                  "/api/v1/factory/parameters/Load/state?machineName=T_C_OP10"])
+def test_unknown_objects_are_not_found(client, path):
+    response = client.get(path)
+
+    assert response.status_code == 404
+    assert "not found" in response.json()["detail"]["error"]
+
+
+def test_ambiguous_parameter_is_a_conflict(client):
+    response = client.get("/api/v1/factory/parameters/Load/state")
+
+    assert response.status_code == 409
+    assert "T_B_OP20" in response.json()["detail"]["error"]
+
+
+def test_parameter_with_machine_is_found(client):
+    response = client.get("/api/v1/factory/parameters/Load/state", params={"machineName": "T_B_OP110"})
+
+    assert response.status_code == 200
+    assert response.json()["machine_name"] == "T_B_OP110"
+
+    # The same version is answered with 304
+    etag = response.headers["ETag"]
+    response = client.get("/api/v1/factory/parameters/Load/state", params={"machineName": "T_B_OP110"},
+                          headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
@@ -0,0 +1,156 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+HIERARCHY BUILDER TESTS
+================================
+
+Tests of the factory hierarchy builder against the iterrows based assembly it replaced (see
+benchmark_hierarchy_builder), including the rows without a line, machine or group, and of the layout options (depth,
+fields and only_abnormal).
+
+This script requires the following modules be installed in the python environment
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+# None
+
+# Related third party imports
+import pytest
+
+# Local application/library specific imports
+from benchmark_hierarchy_builder import synthetic_factory, legacy_group_hierarchy, legacy_line_hierarchy, \
+    alphanumeric_key
+from machine_monitoring_app.database.hierarchy_builder import build_group_hierarchy, build_line_hierarchy, \
+    build_single_group, normalize_layout_options, PARAMETER_FIELDS
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+
+@pytest.fixture(name="factory", scope="module")
+def fixture_factory():
+    """
+    Returns the rows of a small synthetic factory
+    """
+
+    return synthetic_factory(6, seed=3)
+
+
+def line_ordered(frame):
+    """
+    Returns the rows in line / machine (natural order) / parameter order, the order the line layout is built from
+    """
+
+    return frame.sort_values(by="machine_name", key=lambda column: column.map(alphanumeric_key),
+                             kind="stable").reset_index(drop=True)
+
+
+def without_keys(frame, column, rows):
+    """
+    Returns a copy of the frame with the given column missing in the given rows
+    """
+
+    frame = frame.copy()
+    frame.loc[rows, column] = None
+
+    return frame
+
+
+def test_group_hierarchy_matches_legacy(factory):
+    assert build_group_hierarchy(factory) == legacy_group_hierarchy(factory)
+
+
+def test_line_hierarchy_matches_legacy(factory):
+    frame = line_ordered(factory)
+
+    assert build_line_hierarchy(frame) == legacy_line_hierarchy(frame)
+
+
+@pytest.mark.parametrize("column", ["location", "machine_name", "group_name"])
+def test_rows_without_keys_are_left_out(factory, column):
+    frame = without_keys(factory, column, [0, 7, len(factory) - 1])
+
+    assert build_group_hierarchy(frame) == legacy_group_hierarchy(frame)
+
+    # The legacy line assembly sorts by machine name first, which fails on the missing names
+    if column != "group_name":
+        frame = without_keys(line_ordered(factory), column, [0, 7, len(factory) - 1])
+
+        assert build_line_hierarchy(frame) == legacy_line_hierarchy(frame.dropna(subset=[column]))
+
+
+def test_no_rows_with_keys_gives_empty_structure(factory):
+    frame = without_keys(factory, "location", slice(None))
+
+    assert build_group_hierarchy(frame) == []
+    assert build_line_hierarchy(frame) == []
+    assert build_single_group(frame, "GROUP_00")["group_details"] == []
+
+
+def test_group_depth_keeps_states_and_counts(factory):
+    full = build_group_hierarchy(factory)
+
+    assert build_group_hierarchy(factory, depth="group") == [
+        {"group_name": group["group_name"], "group_state": group["group_state"], "count": group["count"]}
+        for group in full]
+
+
+def test_line_and_machine_depths_drop_the_levels_below(factory):
+    full = build_line_hierarchy(factory)
+
+    lines = build_line_hierarchy(factory, depth="line")
+    machines = build_line_hierarchy(factory, depth="machine")
+
+    assert lines == [{key: value for key, value in line.items() if key != "machines"} for line in full]
+    assert machines == [dict(line, machines=[{key: value for key, value in machine.items() if key != "parameters"}
+                                             for machine in line["machines"]])
+                        for line in full]
+
+
+def test_fields_select_the_parameter_fields(factory):
+    depth, fields = normalize_layout_options("parameter", "parameter_state, actual_parameter_name")
+
+    assert fields == ("actual_parameter_name", "parameter_state")
+
+    full = build_group_hierarchy(factory)
+    selected = build_group_hierarchy(factory, depth=depth, fields=fields)
+
+    for full_group, group in zip(full, selected):
+        for full_line, line in zip(full_group["group_details"], group["group_details"]):
+            for full_machine, machine in zip(full_line["machines"], line["machines"]):
+                assert machine["parameters"] == [{field: parameter[field] for field in fields}
+                                                 for parameter in full_machine["parameters"]]
+
+
+def test_only_abnormal_leaves_out_ok_machines_and_parameters(factory):
+    full = build_line_hierarchy(factory)
+    abnormal = build_line_hierarchy(factory, only_abnormal=True)
+
+    for full_line, line in zip(full, abnormal):
+        # The counts still cover every machine
+        assert line["count"] == full_line["count"]
+        assert line["line_state"] == full_line["line_state"]
+
+        expected_machines = [dict(machine, parameters=[parameter for parameter in machine["parameters"]
+                                                       if parameter["parameter_state"] != "OK"])
+                             for machine in full_line["machines"] if machine["machine_state"] != "OK"]
+
+        assert line["machines"] == expected_machines
+
+
+def test_normalize_layout_options_defaults_and_errors():
+    assert normalize_layout_options(None, None) == ("parameter", PARAMETER_FIELDS)
+    assert normalize_layout_options("line", []) == ("line", PARAMETER_FIELDS)
+
+    with pytest.raises(ValueError):
+        normalize_layout_options("factory")
+
+    with pytest.raises(ValueError):
+        normalize_layout_options("parameter", ["parameter_value", "colour"])
+
+
+def test_single_group_matches_the_group_of_the_hierarchy(factory):
+    group_name = "GROUP_01"
+    frame = factory[factory["group_name"] == group_name].reset_index(drop=True)
+
+    assert build_single_group(frame, group_name) == build_group_hierarchy(frame)[0]
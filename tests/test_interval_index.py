@@ -0,0 +1,183 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+INTERVAL INDEX TESTS
+================================
+
+Tests of the in-memory interval index: the queries of an interval set against a brute-force reference, and the
+incremental refresh (merge of the re-read intervals and watermark) against a full load.
+
+This script requires the following modules be installed in the python environment
+    * numpy - To generate the intervals.
+    * pandas - To build the loader results.
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+from types import SimpleNamespace
+
+# Related third party imports
+import numpy as np
+import pandas as pd
+import pytest
+
+# Local application/library specific imports
+from machine_monitoring_app.database import interval_index
+from machine_monitoring_app.database.interval_index import IntervalSet, IntervalIndex, INTERVAL_INDEX_REWIND_SECONDS
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+DAY_MS = 86400 * 1000
+
+
+def random_intervals(generator, count, span_ms=DAY_MS, zero_length_share=0.2):
+    """
+    Returns random intervals (starts, ends) inside [0, span_ms), a share of them zero-length
+    """
+
+    starts = generator.integers(0, span_ms, count)
+    lengths = generator.integers(1, span_ms // 20, count)
+    lengths[generator.random(count) < zero_length_share] = 0
+
+    return starts, np.minimum(starts + lengths, span_ms)
+
+
+def windows(generator, count, span_ms=DAY_MS):
+    """
+    Returns random windows, with the edges of some of them on the interval bounds
+    """
+
+    edges = np.sort(generator.integers(-1000, span_ms + 1000, (count, 2)), axis=1)
+
+    return [(int(start), int(end)) for start, end in edges]
+
+
+@pytest.fixture(name="generator")
+def fixture_generator():
+    return np.random.default_rng(2022)
+
+
+def test_queries_match_brute_force(generator):
+    starts, ends = random_intervals(generator, 400)
+    interval_set = IntervalSet(starts, ends, {"identifier": np.arange(len(starts))})
+    identifiers = interval_set.payload["identifier"]
+
+    # Windows on the bounds of the intervals as well as random ones
+    test_windows = windows(generator, 200) + [(int(starts[i]), int(ends[i])) for i in range(0, 400, 10)]
+
+    for start_ms, end_ms in test_windows:
+        overlapping = set(identifiers[interval_set.overlapping(start_ms, end_ms)].tolist())
+        contained = set(identifiers[interval_set.contained(start_ms, end_ms)].tolist())
+
+        assert overlapping == {i for i in range(len(starts)) if starts[i] < end_ms and ends[i] > start_ms}
+        assert contained == {i for i in range(len(starts)) if starts[i] >= start_ms and ends[i] <= end_ms}
+
+    for instant_ms in list(generator.integers(0, DAY_MS, 200)) + starts[:50].tolist() + ends[:50].tolist():
+        active = set(identifiers[interval_set.active_at(instant_ms)].tolist())
+
+        assert active == {i for i in range(len(starts)) if starts[i] <= instant_ms < ends[i]}
+
+
+def test_covered_until_matches_brute_force(generator):
+    starts, ends = random_intervals(generator, 300)
+    interval_set = IntervalSet(starts, ends)
+
+    instants = np.sort(np.concatenate((generator.integers(-1000, DAY_MS + 1000, 200), starts[:20], ends[:20])))
+    expected = [sum(max(0, min(end, instant) - start) for start, end in zip(starts.tolist(), ends.tolist()))
+                for instant in instants.tolist()]
+
+    assert interval_set.covered_until(instants).tolist() == expected
+
+
+def test_zero_length_intervals_are_counted_not_covered():
+    interval_set = IntervalSet([1000, 2000, 2000], [1000, 2000, 3000])
+
+    assert sorted(interval_set.contained(0, 5000).tolist()) == [0, 1, 2]
+    assert interval_set.covered_until(np.array([0, 5000])).tolist() == [0, 1000]
+
+
+def test_build_sets_keeps_zero_length_intervals():
+    index = IntervalIndex("test", loader=None)
+    sets = index._build_sets(pd.DataFrame({"machine_name": ["A", "A", "A"], "key": [0, 0, 0],
+                                           "start_ms": [1000, 2000, 3000], "end_ms": [1000, 2500, 2900]}))
+
+    # The zero-length interval is kept, the one ending before it starts is dropped
+    assert sets[("A", 0)].starts.tolist() == [1000, 2000]
+
+
+class FakeLoader:
+    """
+    Loader returning the stored intervals overlapping the requested range, the intervals being visible only once
+    they ended (like the signal pool)
+    """
+
+    def __init__(self, intervals):
+        self.intervals = intervals
+        self.now_ms = 0
+
+    def __call__(self, start_time, end_time):
+        intervals = self.intervals
+        visible = (intervals["end_ms"] <= self.now_ms) & (intervals["end_ms"] > start_time * 1000) & \
+                  (intervals["start_ms"] < end_time * 1000)
+
+        return intervals[visible].reset_index(drop=True)
+
+
+def index_contents(index):
+    """
+    Returns the sorted (machine, key, start, end, message) tuples of the index
+    """
+
+    return sorted((machine_name, key, start, end, message)
+                  for (machine_name, key), interval_set in index._snapshot().items()
+                  for start, end, message in zip(interval_set.starts.tolist(), interval_set.ends.tolist(),
+                                                 interval_set.payload["message"].tolist()))
+
+
+def test_incremental_refresh_matches_full_load(generator, monkeypatch):
+    monkeypatch.setattr(interval_index, "get_settings",
+                        lambda: SimpleNamespace(interval_index_horizon_days=1, interval_index_max_lag_seconds=15))
+
+    count = 600
+    starts, ends = random_intervals(generator, count, span_ms=2 * DAY_MS)
+    intervals = pd.DataFrame({"machine_name": generator.choice(["A", "B", "C"], count),
+                              "key": generator.integers(0, 3, count), "start_ms": starts, "end_ms": ends,
+                              "message": [f"alarm {i}" for i in range(count)]})
+
+    loader = FakeLoader(intervals)
+    incremental = IntervalIndex("incremental", loader, payload_columns=("message",), identity_columns=("message",))
+
+    # Refreshes every 10 minutes of the second day, the rewind re-reads intervals already indexed
+    for now_ms in range(DAY_MS, 2 * DAY_MS + 1, 600 * 1000):
+        loader.now_ms = now_ms
+        incremental.refresh(now=now_ms / 1000)
+
+    full = IntervalIndex("full", loader, payload_columns=("message",), identity_columns=("message",))
+    full.refresh(now=loader.now_ms / 1000)
+
+    assert index_contents(incremental) == index_contents(full)
+    assert len(index_contents(incremental)) == len(set(index_contents(incremental)))
+
+
+def test_watermark_follows_the_last_end(monkeypatch):
+    monkeypatch.setattr(interval_index, "get_settings",
+                        lambda: SimpleNamespace(interval_index_horizon_days=1, interval_index_max_lag_seconds=15))
+
+    intervals = pd.DataFrame({"machine_name": ["A", "A"], "key": [0, 0], "start_ms": [DAY_MS, DAY_MS + 5000],
+                              "end_ms": [DAY_MS + 4000, DAY_MS + 9000], "message": ["first", "second"]})
+    loader = FakeLoader(intervals)
+    index = IntervalIndex("test", loader, payload_columns=("message",), identity_columns=("message",))
+
+    loader.now_ms = DAY_MS + 5000
+    index.refresh(now=loader.now_ms / 1000)
+    assert index._watermark_ms == DAY_MS + 4000
+
+    loader.now_ms = DAY_MS + 10000
+    index.refresh(now=loader.now_ms / 1000)
+    assert index._watermark_ms == DAY_MS + 9000
+
+    # Nothing new ended, the watermark stays and the re-read intervals are not duplicated
+    loader.now_ms = DAY_MS + INTERVAL_INDEX_REWIND_SECONDS * 1000
+    index.refresh(now=loader.now_ms / 1000)
+    assert index._watermark_ms == DAY_MS + 9000
+    assert [row[3] for row in index_contents(index)] == [DAY_MS + 4000, DAY_MS + 9000]
@@ -0,0 +1,175 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+MTLINKI INDEX MANAGER TESTS
+================================
+
+Tests of the MTLINKi index bootstrap and pipeline checker against an in-process stand-in of the database: missing,
+mismatched and existing indexes, and the flagging of collection scans and high examined / returned ratios.
+
+This script requires the following modules be installed in the python environment
+    * pymongo - For the operation errors raised by the stand-in.
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+from datetime import datetime, timezone
+
+# Related third party imports
+import pytest
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+# Local application/library specific imports
+from machine_monitoring_app.database.mongo_db_utils import machine_name_match
+from machine_monitoring_app.database.mongo_index_manager import ensure_indexes, check_pipelines, \
+    representative_pipelines, summarize_explain, REQUIRED_INDEXES
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+ALARM_INDEXES = {"Alarm_History": [[("L1Name", ASCENDING), ("updatedate", ASCENDING), ("enddate", ASCENDING)],
+                                   [("L1Name", ASCENDING), ("enddate", DESCENDING)]]}
+
+
+class FakeCollection:
+    """
+    Collection keeping its index definitions like mongod: creating an index whose keys already exist under another
+    name, or whose name exists with other keys, fails
+    """
+
+    def __init__(self):
+        self.indexes = {"_id_": [("_id", ASCENDING)]}
+        self.created = []
+
+    def index_information(self):
+        return {name: {"key": list(keys), "v": 2} for name, keys in self.indexes.items()}
+
+    def create_index(self, keys, name):
+        keys = [tuple(key) for key in keys]
+
+        for existing_name, existing_keys in self.indexes.items():
+            if existing_keys == keys and existing_name != name:
+                raise OperationFailure("Index already exists with a different name", code=85)
+
+            if existing_name == name and existing_keys != keys:
+                raise OperationFailure("An existing index has the same name with different keys", code=86)
+
+        self.indexes[name] = keys
+        self.created.append(name)
+
+        return name
+
+    def drop_index(self, name):
+        del self.indexes[name]
+
+
+class FakeDatabase:
+    """
+    Database of fake collections, explaining a pipeline as an index scan when an index starts with a field of its
+    first $match stage, else as a collection scan
+    """
+
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def command(self, command, specification, verbosity=None):
+        assert command == "explain" and verbosity == "executionStats"
+
+        match = specification["pipeline"][0].get("$match", {})
+        indexed = any(keys[0][0] in match for name, keys in self[specification["aggregate"]].indexes.items()
+                      if name != "_id_")
+
+        if indexed:
+            plan, examined = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}, 12
+        else:
+            plan, examined = {"stage": "COLLSCAN"}, 5000
+
+        return {"stages": [{"$cursor": {"queryPlanner": {"winningPlan": plan},
+                                        "executionStats": {"nReturned": 10, "totalDocsExamined": examined,
+                                                           "totalKeysExamined": examined if indexed else 0}}}]}
+
+
+@pytest.fixture(name="database")
+def fixture_database():
+    return FakeDatabase()
+
+
+def test_missing_indexes_are_created(database):
+    report = ensure_indexes(database, ALARM_INDEXES)
+
+    assert report["Alarm_History"]["created"] == ["mm_L1Name_1_updatedate_1_enddate_1", "mm_L1Name_1_enddate_-1"]
+    assert database["Alarm_History"].indexes["mm_L1Name_1_enddate_-1"] == [("L1Name", 1), ("enddate", -1)]
+
+
+def test_existing_indexes_are_left_as_they_are(database):
+    # Created by hand under another name, creating it again with our name would fail on mongod
+    database["Alarm_History"].create_index([("L1Name", ASCENDING), ("enddate", DESCENDING)], name="L1Name_enddate")
+
+    report = ensure_indexes(database, ALARM_INDEXES)
+
+    assert report["Alarm_History"]["existing"] == ["L1Name_enddate"]
+    assert report["Alarm_History"]["created"] == ["mm_L1Name_1_updatedate_1_enddate_1"]
+
+    # A second run finds everything
+    assert ensure_indexes(database, ALARM_INDEXES)["Alarm_History"] == {
+        "existing": ["mm_L1Name_1_updatedate_1_enddate_1", "L1Name_enddate"], "created": [], "replaced": []}
+
+
+def test_mismatched_index_is_replaced(database):
+    database["Alarm_History"].create_index([("L1Name", ASCENDING)], name="mm_L1Name_1_enddate_-1")
+
+    report = ensure_indexes(database, ALARM_INDEXES)
+
+    assert report["Alarm_History"]["replaced"] == ["mm_L1Name_1_enddate_-1"]
+    assert database["Alarm_History"].indexes["mm_L1Name_1_enddate_-1"] == [("L1Name", 1), ("enddate", -1)]
+
+
+def test_all_required_indexes_can_be_created(database):
+    report = ensure_indexes(database)
+
+    assert {collection: len(indexes["created"]) for collection, indexes in report.items()} == \
+           {collection: len(indexes) for collection, indexes in REQUIRED_INDEXES.items()}
+
+
+def test_collection_scans_are_flagged_until_indexed(database):
+    pipelines = [("alarm_count", "Alarm_History", [{"$match": {"L1Name": "T_B_OP160"}}, {"$count": "count"}])]
+
+    before = check_pipelines(database, pipelines)
+    assert before[0]["problems"] == ["COLLSCAN", "docsExamined/nReturned 500.0 > 10"]
+
+    ensure_indexes(database, ALARM_INDEXES)
+
+    after = check_pipelines(database, pipelines)
+    assert after[0]["problems"] == []
+    assert after[0]["stages"] == ["FETCH", "IXSCAN"]
+    assert after[0]["ratio"] == 1.2
+
+
+def test_summarize_explain_adds_up_the_shards():
+    explain = {"shards": {"a": {"executionStats": {"nReturned": 5, "totalDocsExamined": 10, "totalKeysExamined": 10},
+                                "queryPlanner": {"winningPlan": {"stage": "IXSCAN"}}},
+                          "b": {"executionStats": {"nReturned": 1, "totalDocsExamined": 50},
+                                "queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}}}
+
+    assert summarize_explain(explain) == {"stages": {"IXSCAN", "COLLSCAN"}, "docs_examined": 60,
+                                          "keys_examined": 10, "returned": 6}
+
+
+def test_representative_pipelines_cover_the_indexed_collections():
+    pipelines = representative_pipelines(now=datetime(2022, 6, 19, tzinfo=timezone.utc))
+
+    assert {collection for _, collection, _ in pipelines} >= set(REQUIRED_INDEXES)
+    assert all(isinstance(pipeline, list) and pipeline for _, _, pipeline in pipelines)
+
+
+@pytest.mark.parametrize("pattern, expected", [("T_B", "^T_B"), ("^T_B_OP160", "^T_B_OP160")])
+def test_machine_patterns_are_anchored(pattern, expected):
+    assert machine_name_match(pattern)["L1Name"]["$regex"].pattern == expected
+
+
+@pytest.mark.parametrize("pattern", [None, "", ".*", "^.*$"])
+def test_match_all_patterns_add_no_condition(pattern):
+    assert machine_name_match(pattern) == {}
@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+SNAPSHOT STORE TESTS
+================================
+
+Tests of the factory snapshot store: the incremental reload (watermark rewind for the rows written late, versions
+bumped only by actual changes, structure version) and the memoization of the responses against the version (copies
+by default, the same object when shared).
+
+This script requires the following modules be installed in the python environment
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+# None
+
+# Related third party imports
+import pytest
+
+# Local application/library specific imports
+from machine_monitoring_app.database.snapshot_store import get_snapshot_store, SNAPSHOT_REWIND_SECONDS
+from tests.conftest import snapshot_row
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+
+@pytest.fixture(name="store")
+def fixture_store(snapshot_rows):
+    """
+    Returns the snapshot store loaded with two parameters, the latest one at 100 seconds
+    """
+
+    snapshot_rows.extend([snapshot_row(1, seconds=50), snapshot_row(2, parameter_name="P2", seconds=100)])
+
+    store = get_snapshot_store()
+    store.refresh()
+
+    return store
+
+
+def test_incremental_reload_picks_up_changed_rows(store, snapshot_rows):
+    version = store.version
+
+    snapshot_rows[0] = snapshot_row(1, seconds=120, value=2.0)
+
+    assert store.refresh() == version + 1
+    assert [row[8] for row in store.get_rows()] == [2.0, 1.0]
+
+
+def test_rewind_picks_up_late_rows(store, snapshot_rows):
+    version = store.version
+
+    # Written late, with a time older than the latest one already read but within the rewind
+    snapshot_rows[0] = snapshot_row(1, seconds=100 - SNAPSHOT_REWIND_SECONDS + 1, value=3.0)
+
+    assert store.refresh() == version + 1
+    assert store.get_rows()[0][8] == 3.0
+
+
+def test_rows_older_than_rewind_wait_for_full_reload(store, snapshot_rows):
+    version = store.version
+
+    snapshot_rows[0] = snapshot_row(1, seconds=100 - SNAPSHOT_REWIND_SECONDS - 1, value=3.0)
+
+    assert store.refresh() == version
+    assert store.get_rows()[0][8] == 1.0
+
+    store.invalidate()
+
+    assert store.refresh() == version + 1
+    assert store.get_rows()[0][8] == 3.0
+
+
+def test_re_read_unchanged_rows_keep_the_version(store):
+    version = store.version
+
+    # Both rows are within the rewind and read again, but unchanged
+    assert store.refresh() == version
+    assert store.refresh() == version
+
+
+def test_structure_version_changes_only_with_new_parameters(store, snapshot_rows):
+    structure_version = store.structure_version
+
+    snapshot_rows[1] = snapshot_row(2, parameter_name="P2", seconds=110, value=5.0)
+    store.refresh()
+
+    assert store.structure_version == structure_version
+
+    snapshot_rows.append(snapshot_row(3, parameter_name="P3", seconds=110))
+    store.refresh()
+
+    assert store.structure_version == structure_version + 1
+
+
+def test_memoize_builds_once_per_version_and_returns_copies(store, snapshot_rows):
+    builds = []
+
+    def builder():
+        builds.append(store.version)
+        return {"rows": [1, 2]}
+
+    first = store.memoize(("test",), builder)
+    first["rows"].append(3)
+    second = store.memoize(("test",), builder)
+
+    assert second == {"rows": [1, 2]}
+    assert first is not second
+    assert len(builds) == 1
+
+    snapshot_rows[0] = snapshot_row(1, seconds=120, value=2.0)
+    store.memoize(("test",), builder)
+
+    assert len(builds) == 2
+
+
+def test_memoize_shared_returns_the_memoized_object(store):
+    first = store.memoize(("shared",), lambda: {"rows": [1, 2]}, shared=True)
+    second = store.memoize(("shared",), lambda: {"rows": [3]}, shared=True)
+
+    assert first is second
@@ -0,0 +1,162 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+STATE ROLLUP TESTS
+================================
+
+Tests of the day boundaries of the daily state duration rollups: the day starts with a day offset, the covered days
+overlapped by the intervals ended late, the split of a request between the rollups and the live computation, and the
+days rolled up by an update.
+
+This script requires the following modules be installed in the python environment
+    * datetime - To build the state intervals.
+    * numpy - To build the duration matrices.
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# Related third party imports
+import numpy as np
+import pytest
+
+# Local application/library specific imports
+from machine_monitoring_app.database import state_rollup_store
+from machine_monitoring_app.database.state_rollup_store import DAY_SECONDS, ROLLUP_BACKFILL_DAYS, \
+    ROLLUP_DAYS_PER_UPDATE
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+# 2022-06-19 00:00 UTC
+DAY = 1655596800
+
+# Days starting at 05:30 UTC
+OFFSET = 19800
+
+
+def utc(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture(name="day_offset")
+def fixture_day_offset(monkeypatch):
+    """
+    Makes the rollup days start at the returned offset after UTC midnight
+    """
+
+    monkeypatch.setattr(state_rollup_store, "get_settings",
+                        lambda: SimpleNamespace(state_rollup_day_offset_seconds=OFFSET))
+
+    return OFFSET
+
+
+@pytest.fixture(name="live_days")
+def fixture_live_days(monkeypatch):
+    """
+    Replaces the live computation and the rollup reads by matrices holding the start of every day, and returns the
+    ranges read from each
+    """
+
+    reads = []
+
+    def live(start_day, interval_seconds, day_count, production_line):
+        reads.append(("live", start_day, day_count))
+        return np.array([[start_day + day * DAY_SECONDS for day in range(day_count)]], dtype=float)
+
+    def rollups(start_day, end_day, production_line):
+        reads.append(("rollup", start_day, (end_day - start_day) // DAY_SECONDS))
+        return np.array([list(range(start_day, end_day, DAY_SECONDS))], dtype=float)
+
+    monkeypatch.setattr(state_rollup_store, "get_state_duration_matrix", live)
+    monkeypatch.setattr(state_rollup_store, "_read_rollups", rollups)
+
+    return reads
+
+
+@pytest.mark.parametrize("offset, timestamp, expected", [
+    (0, DAY, DAY), (0, DAY - 1, DAY - DAY_SECONDS), (0, DAY + DAY_SECONDS - 1, DAY),
+    (OFFSET, DAY + OFFSET, DAY + OFFSET), (OFFSET, DAY + OFFSET - 1, DAY + OFFSET - DAY_SECONDS),
+    (-OFFSET, DAY - OFFSET, DAY - OFFSET), (DAY_SECONDS + OFFSET, DAY + OFFSET, DAY + OFFSET)])
+def test_day_start(monkeypatch, offset, timestamp, expected):
+    monkeypatch.setattr(state_rollup_store, "get_settings",
+                        lambda: SimpleNamespace(state_rollup_day_offset_seconds=offset))
+
+    assert state_rollup_store._day_start(timestamp) == expected
+
+
+def test_late_intervals_roll_up_the_covered_days_they_overlap(monkeypatch, day_offset):
+    first_day = DAY + day_offset
+    end_day = first_day + 3 * DAY_SECONDS
+
+    intervals = [
+        # Across the boundary between the first and second day
+        {"updatedate": utc(first_day + DAY_SECONDS - 60), "enddate": utc(first_day + DAY_SECONDS + 60)},
+        # Started before the covered days, ended at the start of the third day (which it does not overlap)
+        {"updatedate": utc(first_day - 3600), "enddate": utc(first_day + 2 * DAY_SECONDS)},
+        # Still open at the end of the covered days
+        {"updatedate": utc(end_day - 60), "enddate": utc(end_day + 3600)},
+        {"updatedate": None, "enddate": utc(end_day + 7200)},
+    ]
+
+    monkeypatch.setattr(state_rollup_store, "get_mongo_collection",
+                        lambda *args: SimpleNamespace(aggregate=lambda pipeline: intervals))
+
+    days, latest_end = state_rollup_store._days_of_ended_intervals(utc(first_day), first_day, end_day)
+
+    assert days == [first_day, first_day + DAY_SECONDS, first_day + 2 * DAY_SECONDS]
+    assert latest_end == datetime.fromtimestamp(end_day + 3600, tz=timezone.utc)
+
+
+def test_request_is_split_between_live_days_and_rollups(monkeypatch, day_offset, live_days):
+    first_day = DAY + day_offset
+    monkeypatch.setattr(state_rollup_store, "_get_coverage",
+                        lambda: (first_day + DAY_SECONDS, first_day + 3 * DAY_SECONDS, None))
+
+    matrix = state_rollup_store.get_state_day_matrix(first_day, 5)
+
+    assert matrix[0].tolist() == [first_day + day * DAY_SECONDS for day in range(5)]
+    assert live_days == [("live", first_day, 1), ("rollup", first_day + DAY_SECONDS, 2),
+                         ("live", first_day + 3 * DAY_SECONDS, 2)]
+
+
+def test_request_off_the_day_boundaries_is_computed_live(monkeypatch, day_offset, live_days):
+    monkeypatch.setattr(state_rollup_store, "_get_coverage", lambda: (DAY - 10 * DAY_SECONDS, DAY, None))
+
+    # UTC midnight is not a rollup day start with the offset
+    state_rollup_store.get_state_day_matrix(DAY - 2 * DAY_SECONDS, 2)
+
+    assert live_days == [("live", DAY - 2 * DAY_SECONDS, 2)]
+
+
+def test_empty_store_backfills_whole_days(monkeypatch, day_offset):
+    rolled_up = []
+    coverage = []
+
+    monkeypatch.setattr(state_rollup_store, "_get_coverage", lambda: None)
+    monkeypatch.setattr(state_rollup_store, "_set_coverage", lambda *args: coverage.append(args))
+    monkeypatch.setattr(state_rollup_store, "roll_up_day", lambda day: rolled_up.append(day) or 0)
+
+    # One second before the end of a rollup day
+    now = DAY + day_offset + DAY_SECONDS - 1
+    first_day = DAY + day_offset - ROLLUP_BACKFILL_DAYS * DAY_SECONDS
+
+    assert state_rollup_store.update_state_rollups(now=now) == ROLLUP_DAYS_PER_UPDATE
+    assert rolled_up == [first_day + day * DAY_SECONDS for day in range(ROLLUP_DAYS_PER_UPDATE)]
+    assert coverage[-1][:2] == (first_day, first_day + ROLLUP_DAYS_PER_UPDATE * DAY_SECONDS)
+
+
+def test_current_day_is_not_rolled_up(monkeypatch, day_offset):
+    rolled_up = []
+    end_day = DAY + day_offset
+
+    monkeypatch.setattr(state_rollup_store, "_get_coverage",
+                        lambda: (end_day - DAY_SECONDS, end_day, datetime.fromtimestamp(end_day, tz=timezone.utc)))
+    monkeypatch.setattr(state_rollup_store, "_set_coverage", lambda *args: None)
+    monkeypatch.setattr(state_rollup_store, "_days_of_ended_intervals", lambda *args: ([], None))
+    monkeypatch.setattr(state_rollup_store, "roll_up_day", lambda day: rolled_up.append(day) or 0)
+
+    assert state_rollup_store.update_state_rollups(now=end_day + DAY_SECONDS - 1) == 0
+    assert state_rollup_store.update_state_rollups(now=end_day + DAY_SECONDS) == 1
+    assert rolled_up == [end_day]
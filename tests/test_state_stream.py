@@ -0,0 +1,65 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+FACTORY STATE STREAM TESTS
+================================
+
+Tests of the factory state stream: the full and delta messages of a subscription, and the state and delta being
+built once per snapshot version for all the subscribers.
+
+This script requires the following modules be installed in the python environment
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+# None
+
+# Related third party imports
+# None
+
+# Local application/library specific imports
+from machine_monitoring_app.database import state_stream
+from machine_monitoring_app.database.state_stream import StateStreamSubscription
+from tests.conftest import snapshot_row
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+
+def test_subscription_receives_full_then_delta(snapshot_rows):
+    snapshot_rows.extend([snapshot_row(1, parameter_name="P1"), snapshot_row(2, parameter_name="P2")])
+    subscription = StateStreamSubscription()
+
+    assert subscription.next_message()["type"] == "full"
+    assert subscription.next_message() is None
+
+    snapshot_rows[1] = snapshot_row(2, parameter_name="P2", seconds=10, value=5.0, condition_name="CRITICAL")
+    delta = subscription.next_message()
+
+    assert delta["type"] == "delta"
+    assert [(entry["actual_parameter_name"], entry["parameter_state"]) for entry in delta["parameters"]] == \
+           [("P2", "CRITICAL")]
+    assert [entry["machine_state"] for entry in delta["machines"]] == ["CRITICAL"]
+
+
+def test_subscribers_share_one_build_per_version(snapshot_rows, monkeypatch):
+    builds, diffs = [], []
+    build_stream_state, diff_stream_state = state_stream._build_stream_state, state_stream.diff_stream_state
+
+    monkeypatch.setattr(state_stream, "_build_stream_state",
+                        lambda *args: builds.append(args) or build_stream_state(*args))
+    monkeypatch.setattr(state_stream, "diff_stream_state",
+                        lambda *args: diffs.append(args) or diff_stream_state(*args))
+
+    snapshot_rows.append(snapshot_row(1))
+    subscriptions = [StateStreamSubscription() for _ in range(5)]
+
+    messages = [subscription.next_message() for subscription in subscriptions]
+    assert len(builds) == 1
+    assert all(message["groups"] is messages[0]["groups"] for message in messages)
+
+    snapshot_rows[0] = snapshot_row(1, seconds=10, value=2.0)
+    messages = [subscription.next_message() for subscription in subscriptions]
+
+    assert len(builds) == 2
+    assert len(diffs) == 1
+    assert all(message["type"] == "delta" for message in messages)
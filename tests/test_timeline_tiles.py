@@ -0,0 +1,160 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+TIMELINE TILE TESTS
+================================
+
+Tests of the timeline tiles: the power-of-two tile addressing, the byte budget and LRU order of the tile cache, and
+the cached tiles served without reading the limits of the parameter again.
+
+This script requires the following modules be installed in the python environment
+    * numpy - To build the timelines read.
+    * pytest - To run the tests.
+"""
+
+# Standard library imports
+# None
+
+# Related third party imports
+import numpy as np
+import pytest
+
+# Local application/library specific imports
+from machine_monitoring_app.database import timeline_tiles
+from machine_monitoring_app.database.timeline_tiles import TileCache, tile_bounds, get_timeline_tile, \
+    TILE_MIN_RESOLUTION, TILE_MAX_RESOLUTION, TILE_SETTLE_SECONDS
+from machine_monitoring_app.exception_handling.custom_exceptions import InvalidTimelineTileError
+
+__author__ = "smt18m005@iiitdm.ac.in"
+
+
+@pytest.fixture(name="tile_reads")
+def fixture_tile_reads(monkeypatch):
+    """
+    Makes the tiles read a constant timeline and fixed limits instead of the database, and returns the number of
+    reads of each
+    """
+
+    reads = {"limits": 0, "values": 0}
+
+    def parameter_limits(parameter_id):
+        reads["limits"] += 1
+        return 10.0, 20.0, "increasing"
+
+    def fetch_realtime_columns(parameter_id, start_time, end_time):
+        reads["values"] += 1
+        timestamps = np.arange(start_time, end_time + 1, 16, dtype=np.int64) * 1000
+        return timestamps, np.ones(len(timestamps))
+
+    monkeypatch.setattr(timeline_tiles, "_parameter_limits", parameter_limits)
+    monkeypatch.setattr(timeline_tiles, "fetch_realtime_columns", fetch_realtime_columns)
+
+    cache = TileCache(1 << 20)
+    monkeypatch.setattr(timeline_tiles, "get_tile_cache", lambda: cache)
+
+    yield reads
+
+
+def test_tile_bounds_are_aligned_and_adjacent():
+    for resolution in (TILE_MIN_RESOLUTION, 10, TILE_MAX_RESOLUTION):
+        duration = 2 ** resolution
+
+        for tile_index in (0, 1, 12345):
+            start_time, end_time = tile_bounds(resolution, tile_index)
+
+            assert start_time % duration == 0
+            assert end_time - start_time == duration
+            assert tile_bounds(resolution, tile_index + 1)[0] == end_time
+
+        # A tile is covered exactly by the two tiles of the next finer resolution
+        assert tile_bounds(resolution - 1, 2 * 7)[0] == tile_bounds(resolution, 7)[0]
+        assert tile_bounds(resolution - 1, 2 * 7 + 1)[1] == tile_bounds(resolution, 7)[1]
+
+
+def test_cache_evicts_least_recently_used_within_byte_budget():
+    cache = TileCache(max_bytes=30)
+
+    cache.put("a", b"a" * 10, "ea")
+    cache.put("b", b"b" * 10, "eb")
+    cache.put("c", b"c" * 10, "ec")
+
+    # "a" becomes the most recently used, so "b" is evicted by "d"
+    assert cache.get("a")[0] == b"a" * 10
+    cache.put("d", b"d" * 10, "ed")
+
+    assert cache.get("b") is None
+    assert [cache.get(key)[1] for key in ("a", "c", "d")] == ["ea", "ec", "ed"]
+
+    stats = cache.get_stats()
+    assert stats["bytes"] == 30
+    assert stats["tiles"] == 3
+    assert stats["evictions"] == 1
+
+
+def test_cache_skips_tiles_larger_than_the_budget():
+    cache = TileCache(max_bytes=10)
+
+    cache.put("a", b"a" * 11, "ea")
+
+    assert cache.get("a") is None
+    assert cache.get_stats()["bytes"] == 0
+
+
+def test_cache_expires_tiles_after_max_age():
+    cache = TileCache(max_bytes=100, max_age_seconds=-1)
+
+    cache.put("a", b"a", "ea")
+
+    assert cache.get("a") is None
+    assert cache.get_stats()["expirations"] == 1
+    assert cache.get_stats()["bytes"] == 0
+
+
+def test_invalidate_parameter_drops_only_its_tiles():
+    cache = TileCache(max_bytes=100)
+
+    cache.put((1, 10, 0), b"one", "e1")
+    cache.put((2, 10, 0), b"two", "e2")
+    cache.invalidate_parameter(1)
+
+    assert cache.get((1, 10, 0)) is None
+    assert cache.get((2, 10, 0))[1] == "e2"
+    assert cache.get_stats()["bytes"] == 3
+
+
+def test_complete_tile_is_served_from_cache_without_queries(tile_reads):
+    now = 2 ** 20
+
+    body, etag, complete = get_timeline_tile(7, 10, 5, now=now)
+    cached_body, cached_etag, cached_complete = get_timeline_tile(7, 10, 5, now=now)
+
+    assert complete and cached_complete
+    assert (cached_body, cached_etag) == (body, etag)
+    assert tile_reads == {"limits": 1, "values": 1}
+
+
+def test_invalidated_tile_reads_the_limits_again(tile_reads):
+    now = 2 ** 20
+
+    get_timeline_tile(7, 10, 5, now=now)
+    timeline_tiles.get_tile_cache().invalidate_parameter(7)
+    get_timeline_tile(7, 10, 5, now=now)
+
+    assert tile_reads == {"limits": 2, "values": 2}
+
+
+def test_live_tile_is_built_on_every_request(tile_reads):
+    start_time, end_time = tile_bounds(10, 5)
+    now = end_time + TILE_SETTLE_SECONDS - 1
+
+    assert not get_timeline_tile(7, 10, 5, now=now)[2]
+    get_timeline_tile(7, 10, 5, now=now)
+
+    assert tile_reads == {"limits": 2, "values": 2}
+
+
+@pytest.mark.parametrize("resolution, tile_index", [(TILE_MIN_RESOLUTION - 1, 0), (TILE_MAX_RESOLUTION + 1, 0),
+                                                    (10, -1), (10, 2 ** 20)])
+def test_invalid_tiles_are_rejected(resolution, tile_index):
+    with pytest.raises(InvalidTimelineTileError):
+        get_timeline_tile(7, resolution, tile_index, now=2 ** 20)